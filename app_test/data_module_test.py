@@ -0,0 +1,90 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : data_module_test.py
+@Software: PyCharm
+@Remark  : Li.concat后按ID排序, DataModule.view为不复制的切片, test_rows和dtp_df.loc[TEST_ID]一致
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import DataModule, FailFlag
+from common.li import Li
+from parser_core.stdf_parser_file_write_read import ParserData
+
+
+def file_module(unit_id: int, die_qty: int, test_qty: int) -> DataModule:
+    """ 和 ParserData.attach_unit_id 的输出格式一致 """
+    rng = np.random.default_rng(unit_id)
+    prr_df = pd.DataFrame({
+        "PART_ID": np.arange(1, die_qty + 1), "SITE_NUM": 1, "X_COORD": 0, "Y_COORD": 0, "HARD_BIN": 1,
+        "SOFT_BIN": 1, "FAIL_FLAG": FailFlag.PASS,
+    })
+    dtp_df = pd.DataFrame({
+        "PART_ID": np.tile(np.arange(1, die_qty + 1), test_qty),
+        "TEST_ID": np.repeat(np.arange(1, test_qty + 1), die_qty),
+        "RESULT": rng.normal(size=die_qty * test_qty),
+        "FAIL_FLG": FailFlag.PASS,
+    })
+    ptmd_df = pd.DataFrame({
+        "TEST_ID": np.arange(1, test_qty + 1), "DATAT_TYPE": "PTR", "TEST_NUM": np.arange(1, test_qty + 1),
+        "TEST_TXT": ["T{}".format(each) for each in range(1, test_qty + 1)], "PARM_FLG": 0, "OPT_FLAG": 0,
+        "RES_SCAL": 0, "LLM_SCAL": 0, "HLM_SCAL": 0, "LO_LIMIT": -2.0, "HI_LIMIT": 2.0, "UNITS": "V",
+    })
+    ptmd_df["TEXT"] = ptmd_df["TEST_NUM"].astype(str) + ":" + ptmd_df["TEST_TXT"]
+    return ParserData.attach_unit_id(DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df), unit_id)
+
+
+class DataModuleCase(unittest.TestCase):
+
+    def setUp(self):
+        self.li = Li()
+        # 选取顺序和ID顺序不同, 测项数也不同
+        self.li.id_module_dict = {3: file_module(3, 7, 4), 1: file_module(1, 5, 3), 2: file_module(2, 6, 4)}
+        self.li.concat()
+        self.df_module = self.li.df_module
+
+    @Tester()
+    def test_sorted_by_id(self):
+        for df in (self.df_module.prr_df, self.df_module.dtp_df):
+            self.assertTrue(df["ID"].is_monotonic_increasing)
+        prr_offsets, dtp_offsets = self.df_module.partition()
+        self.assertEqual(prr_offsets, {1: (0, 5), 2: (5, 11), 3: (11, 18)})
+        self.assertEqual(dtp_offsets, {1: (0, 15), 2: (15, 39), 3: (39, 67)})
+
+    @Tester()
+    def test_view(self):
+        dtp_df = self.df_module.dtp_df
+        for unit_id, die_qty, test_qty in ((1, 5, 3), (2, 6, 4), (3, 7, 4)):
+            view = self.df_module.view(unit_id)
+            self.assertTrue((view.prr_df["ID"] == unit_id).all())
+            self.assertEqual(len(view.prr_df), die_qty)
+            self.assertTrue(view.dtp_df.equals(dtp_df[dtp_df["ID"] == unit_id]))
+            # 切片和原数据共享内存
+            self.assertTrue(np.shares_memory(view.dtp_df["RESULT"].to_numpy(), dtp_df["RESULT"].to_numpy()))
+            self.assertEqual(len(view.ptmd_df), test_qty)
+        self.assertEqual(len(self.df_module.view(9).prr_df), 0)
+
+    @Tester()
+    def test_partition_follow_frame(self):
+        prr_offsets, _ = self.df_module.partition()
+        # 换成新的数据帧后偏移表重新生成
+        self.df_module.prr_df = self.df_module.prr_df[self.df_module.prr_df["ID"] != 2]
+        self.assertEqual(self.df_module.partition()[0], {1: (0, 5), 3: (5, 12)})
+        self.assertEqual(prr_offsets[3], (11, 18))
+        with self.assertRaises(ValueError):
+            DataModule.id_offsets(np.array([2, 1]))
+
+    @Tester()
+    def test_test_rows(self):
+        dtp_df = self.df_module.dtp_df
+        for test_id in self.df_module.ptmd_df["TEST_ID"]:
+            expect = dtp_df[dtp_df.index.get_level_values("TEST_ID") == test_id].droplevel("TEST_ID")
+            self.assertTrue(self.df_module.test_rows(test_id).equals(expect), test_id)
+        with self.assertRaises(KeyError):
+            self.df_module.test_rows(-1)
@@ -0,0 +1,102 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : die_history_test.py
+@Software: PyCharm
+@Remark  : DieHistory 和以前 ParserData.get_prr_data 的pandas逻辑对比
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import FailFlag, PartFlags
+from parser_core.stdf_die_history import DieHistory
+from parser_core.stdf_parser_func import PrrPartFlag
+
+
+class DieHistoryCase(unittest.TestCase):
+    die_qty = 3000
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # 坐标范围小, 大量复测
+        x = rng.integers(-5, 15, self.die_qty)
+        y = rng.integers(-5, 15, self.die_qty)
+        self.prr_df = pd.DataFrame({
+            "DIE_ID": np.arange(1, self.die_qty + 1),
+            "PART_ID": rng.permutation(self.die_qty) + 1,
+            "X_COORD": x,
+            "Y_COORD": y,
+            "PART_FLG": np.where(rng.random(self.die_qty) < 0.3, PrrPartFlag.FirstTest, 0),
+            "FAIL_FLAG": np.where(rng.random(self.die_qty) < 0.2, FailFlag.FAIL, FailFlag.PASS),
+            "LOT_ID": rng.choice(["LOT_A", "LOT_B"], self.die_qty),
+        })
+
+    @staticmethod
+    def get_prr_data(prr_df, part_flag, read_fail) -> pd.DataFrame:
+        """ 以前的实现 """
+        df = prr_df
+        if not read_fail:
+            df = df[df.FAIL_FLAG == FailFlag.PASS]
+        if part_flag == PartFlags.FIRST:
+            df = df[df.PART_FLG & PrrPartFlag.FirstTest != PrrPartFlag.FirstTest]
+        if part_flag == PartFlags.RETEST:
+            df = df[df.PART_FLG & PrrPartFlag.FirstTest == PrrPartFlag.FirstTest]
+        if part_flag == PartFlags.FINALLY:
+            first_df = df[df.PART_FLG & PrrPartFlag.FirstTest != PrrPartFlag.FirstTest]
+            retest_df = df[df.PART_FLG & PrrPartFlag.FirstTest == PrrPartFlag.FirstTest]
+            first_pass_df = first_df[first_df.FAIL_FLAG == FailFlag.PASS]
+            df = pd.concat([first_pass_df, retest_df])
+        if part_flag == PartFlags.XY_COORD:
+            df1 = df[["DIE_ID", "X_COORD", "Y_COORD"]].groupby(["X_COORD", "Y_COORD"]).last()
+            df = df[df.DIE_ID.isin(df1.DIE_ID)]
+        return df
+
+    @Tester()
+    def test_select_same_as_get_prr_data(self):
+        history = DieHistory(self.prr_df)
+        for part_flag in range(len(PartFlags.PART_FLAGS)):
+            for read_fail in (0, 1):
+                expect = self.get_prr_data(self.prr_df, part_flag, read_fail)
+                rows = history.select(part_flag, read_fail)
+                self.assertEqual(
+                    self.prr_df.DIE_ID.to_numpy()[rows].tolist(), expect.DIE_ID.tolist(),
+                    (PartFlags.PART_FLAGS[part_flag], read_fail)
+                )
+
+    @Tester()
+    def test_first_final_positions(self):
+        history = DieHistory(self.prr_df)
+        for keep, rows in (("first", history.first_positions()), ("last", history.final_positions())):
+            expect = self.prr_df.drop_duplicates(["X_COORD", "Y_COORD"], keep=keep)
+            self.assertEqual(rows.tolist(), expect.index.tolist(), keep)
+        counts = self.prr_df.groupby(["X_COORD", "Y_COORD"]).DIE_ID.transform("count").to_numpy()
+        self.assertTrue(np.array_equal(history.retest_count, counts - 1))
+        self.assertTrue(np.array_equal(
+            history.attempt, self.prr_df.groupby(["X_COORD", "Y_COORD"]).cumcount().to_numpy()
+        ))
+
+    @Tester()
+    def test_order_and_by(self):
+        """ 按PART_ID决定测试先后, 按LOT_ID分开算同一坐标 """
+        history = DieHistory.of(self.prr_df, order_by="PART_ID", by="LOT_ID")
+        self.assertIs(DieHistory.of(self.prr_df, order_by="PART_ID", by="LOT_ID"), history)
+        expect = self.prr_df.sort_values("PART_ID").drop_duplicates(["LOT_ID", "X_COORD", "Y_COORD"], keep="last")
+        self.assertEqual(history.final_positions().tolist(), expect.index.tolist())
+
+    @Tester()
+    def test_of_after_inplace_change(self):
+        """ 同一个数据帧原地排序或修改后不用旧的索引 """
+        prr_df = self.prr_df.copy()
+        history = DieHistory.of(prr_df)
+        prr_df.sort_values("PART_ID", ascending=False, inplace=True)
+        self.assertIsNot(DieHistory.of(prr_df), history)
+        self.assertTrue(np.array_equal(DieHistory.of(prr_df).final_pos, DieHistory(prr_df).final_pos))
+        history = DieHistory.of(prr_df)
+        prr_df["FAIL_FLAG"] = FailFlag.PASS
+        self.assertTrue(DieHistory.of(prr_df).last_pass_at_xy[DieHistory.of(prr_df).is_final].all())
+        self.assertIsNot(DieHistory.of(prr_df), history)
@@ -0,0 +1,74 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : export_writer_test.py
+@Software: PyCharm
+@Remark  : ExportWriter.csv 分块写入的文件和 DataFrame.to_csv 逐字节一致
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import GlobalVariable
+from report_core.export_writer import ExportWriter, ExportCancelled
+
+
+class ExportWriterCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        size = 1003
+        self.df = pd.DataFrame({
+            "LOT_ID": rng.choice(["LOT_A", "批次B", "C,D"], size),
+            "SITE_NUM": rng.integers(0, 8, size),
+            1: rng.normal(size=size),
+            2: rng.normal(size=size).astype(np.float32),
+        }, index=pd.Index(np.arange(size) + 1, name="DIE_ID"))
+        self.df.iloc[::13, 2] = np.nan
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.temp_dir, name), "rb") as f:
+            return f.read()
+
+    def assert_same_as_to_csv(self, df: pd.DataFrame, chunk_size: int, **kwargs):
+        to_csv_kwargs = dict(kwargs)
+        to_csv_kwargs.setdefault("index", False)
+        df.to_csv(os.path.join(self.temp_dir, "expect.csv"), encoding="utf_8_sig", **to_csv_kwargs)
+        ExportWriter.csv(os.path.join(self.temp_dir, "result.csv"), df, chunk_size=chunk_size, **kwargs)
+        self.assertEqual(self.read("result.csv"), self.read("expect.csv"), (chunk_size, kwargs))
+
+    @Tester()
+    def test_csv_same_as_to_csv(self):
+        for chunk_size in (1, 100, 1003, 5000):
+            self.assert_same_as_to_csv(self.df, chunk_size)
+        self.assert_same_as_to_csv(self.df, 100, index=True)
+        self.assert_same_as_to_csv(self.df, 100, header=["A", "B", "C", "D"], index=True)
+        self.assert_same_as_to_csv(self.df, 100, float_format=GlobalVariable.CSV_FLOAT_FORMAT)
+        self.assert_same_as_to_csv(self.df.iloc[:0], 100)
+        self.assert_same_as_to_csv(self.df.iloc[:0], 100, index=True)
+
+    @Tester()
+    def test_csv_progress_and_cancel(self):
+        calls = []
+        ExportWriter.csv(
+            os.path.join(self.temp_dir, "result.csv"), self.df, chunk_size=400,
+            progress=lambda done, total: calls.append((done, total))
+        )
+        self.assertEqual(calls, [(400, 1003), (800, 1003), (1003, 1003)])
+
+        def cancel(done, total):
+            raise ExportCancelled()
+
+        with self.assertRaises(ExportCancelled):
+            ExportWriter.csv(os.path.join(self.temp_dir, "cancel.csv"), self.df, chunk_size=400, progress=cancel)
@@ -0,0 +1,160 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : group_capability_test.py
+@Software: PyCharm
+@Remark  : 分组制程能力和分组截尾均值, 和逐组的pandas计算对比
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import DataModule, DatatType, FailFlag, LimitType
+from common.cal_interface.group_capability import GroupCapability
+
+
+class GroupCapabilityCase(unittest.TestCase):
+    die_qty = 400
+    test_qty = 5
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        die_ids = np.arange(1, self.die_qty + 1)
+        self.prr_df = pd.DataFrame({
+            "DIE_ID": die_ids,
+            "LOT_ID": rng.choice(["LOT_A", "LOT_B"], self.die_qty),
+            "SITE_NUM": rng.choice(["S001", "S002", "S003"], self.die_qty),
+            "FAIL_FLAG": np.where(rng.random(self.die_qty) < 0.1, FailFlag.FAIL, FailFlag.PASS),
+        }).set_index("DIE_ID")
+        rows = []
+        for test_id in range(self.test_qty):
+            # 最后一个测项是FTR, 每个DIE都有测试, 少量DIE缺测
+            tested = die_ids[rng.random(self.die_qty) > 0.05]
+            result = rng.normal(test_id, 1 + test_id * 0.1, len(tested))
+            result[::17] = np.nan
+            rows.append(pd.DataFrame({
+                "TEST_ID": test_id, "DIE_ID": tested, "RESULT": result,
+                "FAIL_FLG": np.where(np.abs(result - test_id) > 2, FailFlag.FAIL, FailFlag.PASS).astype(np.uint8),
+            }))
+        self.dtp_df = pd.concat(rows).set_index(["TEST_ID", "DIE_ID"])
+        self.df_module = DataModule(prr_df=self.prr_df, dtp_df=self.dtp_df, ptmd_df=None)
+        self.capability_key_list = [
+            {
+                "TEST_ID": test_id,
+                "TEST_TYPE": DatatType.FTR if test_id == self.test_qty - 1 else DatatType.PTR,
+                "TEST_NUM": test_id + 100, "TEST_TXT": "T{}".format(test_id),
+                "TEXT": "{}:T{}".format(test_id + 100, test_id), "UNITS": "V",
+                "LO_LIMIT": test_id - 2.0, "HI_LIMIT": test_id + 2.0,
+                "LO_LIMIT_TYPE": LimitType.NoLowLimit if test_id == 1 else LimitType.EqualLowLimit,
+                "HI_LIMIT_TYPE": LimitType.EqualHighLimit,
+            } for test_id in range(self.test_qty)
+        ]
+        self.die_group = self.prr_df["LOT_ID"]
+        self.die_da_group = self.prr_df["SITE_NUM"]
+
+    def reference(self, limit_dict: dict = None) -> pd.DataFrame:
+        """ 逐个(组, 测项)用pandas计算 """
+        df = self.dtp_df.reset_index().merge(
+            self.prr_df[["LOT_ID", "SITE_NUM"]], left_on="DIE_ID", right_index=True
+        )
+        # 每颗DIE第一个FAIL的测项, 按capability_key_list的顺序
+        test_order = {each["TEST_ID"]: index for index, each in enumerate(self.capability_key_list)}
+        fail_df = df[df.FAIL_FLG == FailFlag.FAIL].assign(ORDER=lambda x: x.TEST_ID.map(test_order))
+        first_fail = fail_df.sort_values("ORDER").drop_duplicates("DIE_ID")
+        rows = []
+        for each in self.capability_key_list:
+            test_id = each["TEST_ID"]
+            lo_limit, hi_limit = (limit_dict or {}).get(test_id, (each["LO_LIMIT"], each["HI_LIMIT"]))
+            for (group, da_group), cell in df[df.TEST_ID == test_id].groupby(["LOT_ID", "SITE_NUM"]):
+                passed = cell[cell.FAIL_FLG == FailFlag.PASS].RESULT.dropna()
+                mean, std = passed.mean(), passed.std()
+                cpk_std = 1E-05 if std == 0 else std
+                cpk = (hi_limit - mean) / (3 * cpk_std)
+                if each["LO_LIMIT_TYPE"] != LimitType.NoLowLimit:
+                    cpk = min(cpk, (mean - lo_limit) / (3 * cpk_std))
+                is_ptr = each["TEST_TYPE"] == DatatType.PTR
+                rows.append({
+                    "GROUP": group, "DA_GROUP": da_group, "TEST_ID": test_id,
+                    "LO_LIMIT": lo_limit, "HI_LIMIT": hi_limit,
+                    "QTY": len(cell), "REJECT_QTY": int((cell.FAIL_FLG == FailFlag.FAIL).sum()),
+                    "FAIL_QTY": int((first_fail[first_fail.DIE_ID.isin(cell.DIE_ID)].TEST_ID == test_id).sum()),
+                    "AVG": mean if is_ptr else np.nan, "STD": std if is_ptr else np.nan,
+                    "MIN": passed.min() if is_ptr else np.nan, "MAX": passed.max() if is_ptr else np.nan,
+                    "CPK": abs(cpk) if is_ptr else np.nan,
+                })
+        return pd.DataFrame(rows)
+
+    def assert_same_as_reference(self, result: pd.DataFrame, reference: pd.DataFrame):
+        self.assertEqual(list(result.columns), GroupCapability.HEAD)
+        merged = reference.merge(result, on=["GROUP", "DA_GROUP", "TEST_ID"], suffixes=("_REF", ""))
+        self.assertEqual(len(merged), len(reference))
+        self.assertEqual(len(result), len(reference))
+        for column in ("LO_LIMIT", "HI_LIMIT", "QTY", "FAIL_QTY", "REJECT_QTY"):
+            self.assertTrue(np.array_equal(merged[column + "_REF"], merged[column]), column)
+        for column in ("AVG", "STD", "MIN", "MAX", "CPK"):
+            self.assertTrue(np.allclose(
+                merged[column + "_REF"], merged[column], atol=1E-5, equal_nan=True
+            ), column)
+
+    @Tester()
+    def test_calculation_same_as_pandas(self):
+        result = GroupCapability.calculation(
+            self.df_module, self.die_group, self.die_da_group, self.capability_key_list
+        )
+        self.assert_same_as_reference(result, self.reference())
+
+    @Tester()
+    def test_calculation_use_new_limit(self):
+        """ update_limit写入的NEW_LO_LIMIT/NEW_HI_LIMIT优先, NaN的还是用原limit """
+        limit_dict = {0: (-1.0, 1.0), 2: (1.5, 2.5)}
+        for each in self.capability_key_list:
+            each["NEW_LO_LIMIT"], each["NEW_HI_LIMIT"] = limit_dict.get(each["TEST_ID"], (np.nan, np.nan))
+        result = GroupCapability.calculation(
+            self.df_module, self.die_group, self.die_da_group, self.capability_key_list
+        )
+        self.assert_same_as_reference(result, self.reference(limit_dict))
+
+    @Tester()
+    def test_group_yield(self):
+        result = GroupCapability.group_yield(self.prr_df, self.die_group, self.die_da_group)
+        for row in result.itertuples(index=False):
+            cell = self.prr_df[(self.prr_df.LOT_ID == row.GROUP) & (self.prr_df.SITE_NUM == row.DA_GROUP)]
+            self.assertEqual(row.TOTAL, len(cell))
+            self.assertEqual(row.PASS, int((cell.FAIL_FLAG == FailFlag.PASS).sum()))
+        self.assertEqual(result.TOTAL.sum(), self.die_qty)
+
+    @Tester()
+    def test_trimmed_mean_same_as_sorted_slice(self):
+        trim = 0.05
+        result = GroupCapability.trimmed_mean(
+            self.df_module, self.die_group, self.die_da_group, self.capability_key_list, trim
+        )
+        ptr_ids = [each["TEST_ID"] for each in self.capability_key_list if each["TEST_TYPE"] == DatatType.PTR]
+        self.assertEqual(list(result.index), ptr_ids)
+        df = self.dtp_df.reset_index().merge(
+            self.prr_df[["LOT_ID", "SITE_NUM"]], left_on="DIE_ID", right_index=True
+        )
+        for (test_id, group, da_group), cell in df.groupby(["TEST_ID", "LOT_ID", "SITE_NUM"]):
+            if test_id not in ptr_ids:
+                continue
+            data = sorted(cell.RESULT.dropna())
+            n = len(data)
+            expect = np.mean(data[int(n * trim): int(n * (1 - trim))])
+            self.assertAlmostEqual(result.loc[test_id, "{}@{}".format(group, da_group)], expect, places=9)
+
+    @Tester()
+    def test_pivot(self):
+        result = GroupCapability.calculation(
+            self.df_module, self.die_group, self.die_da_group, self.capability_key_list
+        )
+        wide = GroupCapability.pivot(result, ["AVG", "CPK"])
+        self.assertEqual(len(wide), self.test_qty)
+        row = result.iloc[0]
+        column = "{}@{}_AVG".format(row.GROUP, row.DA_GROUP)
+        self.assertTrue(np.allclose(
+            wide.set_index("TEST_ID").loc[row.TEST_ID, column], row.AVG, equal_nan=True
+        ))
@@ -0,0 +1,164 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : jmp_template_test.py
+@Software: PyCharm
+@Remark  : JmpTemplate 生成的JSL和以前 JmpGraphBuilder/JmpDistribution 拼接的结果一致, JmpFile.save_scripts分块写入
+"""
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from app_test.test_utils.wrapper_utils import Tester
+from chart_core.chart_jmp.jmp_box import JmpBox
+from chart_core.chart_jmp.jmp_file import JmpFile
+from chart_core.chart_jmp_factory.class_jmp_distribution import JmpDistribution
+from chart_core.chart_jmp_factory.class_jmp_factory import NewJmpFactory
+from chart_core.chart_jmp_factory.class_jmp_graph_builder import JmpGraphBuilder
+from chart_core.chart_jmp_factory.class_jmp_template import JmpTemplate
+from common.app_variable import GlobalVariable
+from ui_component.ui_app_variable import UiGlobalVariable
+
+
+class JmpTemplateCase(unittest.TestCase):
+    title = "dis_bar"
+
+    def setUp(self):
+        self.flags = UiGlobalVariable.JmpNoLimit, UiGlobalVariable.JmpDisPlotBox, UiGlobalVariable.JmpScreen
+        UiGlobalVariable.JmpScreen = 0
+        self.capability = {
+            "1:VDD_{}".format(index): {
+                "LO_LIMIT": -1.0 - index, "HI_LIMIT": 1.5 + index, "LO_LIMIT_TYPE": "GE", "HI_LIMIT_TYPE": "LE",
+                "MIN": -0.8, "MAX": 1.2, "AVG": 0.123456789 * index, "STD": 0.1,
+            } for index in range(3)
+        }
+
+    def tearDown(self):
+        UiGlobalVariable.JmpNoLimit, UiGlobalVariable.JmpDisPlotBox, UiGlobalVariable.JmpScreen = self.flags
+
+    @staticmethod
+    def normalize(script: str) -> str:
+        """ 去掉空白和以前拼接时留下的空参数, 只比较JSL的结构 """
+        script = re.sub(r"\s+", "", script)
+        while True:
+            text = script.replace(",,", ",").replace(",)", ")").replace("(,", "(")
+            if text == script:
+                return script
+            script = text
+
+    def old_report(self, key: str, row: dict, by_columns: list) -> str:
+        """ 以前的 NewJmpFactory.jmp_distribution_report_only """
+        by_column_str = ""
+        if by_columns:
+            by_column_str = "By( {} )".format(", ".join([f':{col}' for col in by_columns]))
+        jmp_dis = JmpDistribution()
+        limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
+        cap_ans = ""
+        if not UiGlobalVariable.JmpNoLimit:
+            cap_ans = f"Capability Analysis( LSL( {limits['l_limit']} ), USL( {limits['h_limit']} ) )"
+        jmp_dis.set_config("Stack( 1 )", "Automatic Recalc( 1 )", by_column_str)
+        jmp_dis.new_continuous_distribution(f'Column( :"{key}" )', "Horizontal Layout( 1 )", "Vertical( 0 )", cap_ans)
+        axis_params = f'Format( "Fixed Dec", 12, {limits["decimal"]} ), Min( {limits["min"]} ), ' \
+                      f'Max( {limits["max"]} ), Inc( {limits["inc"]} )'
+        jmp_dis.new_dispatch(f'Dispatch( {{:"{key}"}}, "1", ScaleBox, {{{axis_params}}} )')
+        jmp_dis.new_dispatch(f'Dispatch( {{:"{key}"}}, "Histogram", OutlineBox, {{Close( 1 )}} )')
+        jmp_dis.new_dispatch(f'Dispatch( , "Distributions", OutlineBox, {{Set Title( "{key} - {self.title}" )}} )')
+        return JmpBox.new_v_list_box(jmp_dis.execute(no_header=True))
+
+    @staticmethod
+    def old_graph(key: str, row: dict, overlay_column: str) -> str:
+        """ 以前的 NewJmpFactory.jmp_distribution 中的 Graph Builder """
+        overlay_str = f', Overlay( :{overlay_column} )' if overlay_column else ''
+        elements_str = 'Histogram( X, Legend( 5 ) )'
+        if UiGlobalVariable.JmpDisPlotBox and not overlay_column:
+            elements_str += ', Box Plot( X, Legend( 6 ) )'
+        jmp_gb = JmpGraphBuilder()
+        jmp_gb.set_config(f"""
+            Size( 800, 480 ),
+            Show Control Panel( 0 ),
+            Variables( X( :"{key}" ){overlay_str} ),
+            Elements( {elements_str} )
+            """)
+        limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
+        axis_params = f'Format( "Fixed Dec", 12, {limits["decimal"]} ), Min( {limits["min"]} ), ' \
+                      f'Max( {limits["max"]} ), Inc( {limits["inc"]} )'
+        jmp_gb.new_dispatch(f'Dispatch(,"{key}",ScaleBox,{{{axis_params}}})')
+        if not UiGlobalVariable.JmpNoLimit:
+            jmp_gb.new_dispatch(f"""Dispatch(,"Graph Builder",FrameBox,{{
+                Add Ref Line( {limits['l_limit']}, "Solid", "Medium Dark Red", "LSL({limits['l_limit']})", 2),
+                Add Ref Line( {limits['h_limit']}, "Solid", "Dark Red", "USL({limits['h_limit']})", 2 ),
+                Add Ref Line( {limits['avg']}, "Dashed", "Blue", "Mean({limits['avg']})", 1 )
+            }})""")
+        return jmp_gb.execute(no_header=True)
+
+    @Tester()
+    def test_same_as_builder(self):
+        for no_limit in (False, True):
+            for plot_box in (False, True):
+                for by_columns, overlay_column in ((None, None), (["LOT_ID"], None), (["LOT_ID", "SITE_NUM"], "GROUP")):
+                    UiGlobalVariable.JmpNoLimit, UiGlobalVariable.JmpDisPlotBox = no_limit, plot_box
+                    case = (no_limit, plot_box, by_columns, overlay_column)
+                    items = list(NewJmpFactory.distribution_items(
+                        self.capability, self.title, by_columns, overlay_column
+                    ))
+                    self.assertEqual(len(items), len(self.capability))
+                    for item, (key, row) in zip(items, self.capability.items()):
+                        expect = JmpBox.new_h_list_box(
+                            self.old_graph(key, row, overlay_column), self.old_report(key, row, by_columns)
+                        )
+                        self.assertEqual(self.normalize(item), self.normalize(expect), case)
+
+    @Tester()
+    def test_trans_and_report_only(self):
+        key, row = next(iter(self.capability.items()))
+        limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
+        graph = self.normalize(JmpTemplate.graph(key, limits, trans=True))
+        self.assertIn("Size(1085,480)", graph)
+        self.assertIn('Variables(Y(:"{}"))'.format(key), graph)
+        self.assertIn("Elements(Histogram(Y,Legend(5))", graph)
+        items = list(NewJmpFactory.distribution_items(self.capability, self.title, show_color_chart=False))
+        for item, (key, row) in zip(items, self.capability.items()):
+            self.assertEqual(self.normalize(item), self.normalize(self.old_report(key, row, None)))
+
+
+class JmpSaveScriptsCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.chunk, self.max_bytes = GlobalVariable.JMP_SCRIPT_CHUNK, GlobalVariable.JMP_SCRIPT_MAX_BYTES
+
+    def tearDown(self):
+        GlobalVariable.JMP_SCRIPT_CHUNK, GlobalVariable.JMP_SCRIPT_MAX_BYTES = self.chunk, self.max_bytes
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @staticmethod
+    def read(path: str) -> str:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    @Tester()
+    def test_save_scripts(self):
+        items = ["item_{}".format(index) for index in range(25)]
+        scrip_name = os.path.join(self.temp_dir, "dis.jsl")
+        GlobalVariable.JMP_SCRIPT_CHUNK = 4
+        GlobalVariable.JMP_SCRIPT_MAX_BYTES = 10 ** 9
+        paths = JmpFile.save_scripts(scrip_name, "open;", "head(", ")", iter(items))
+        self.assertEqual(paths, [scrip_name])
+        self.assertEqual(self.read(scrip_name), "open;head(" + ",".join(items) + ")")
+
+        # 超过大小后分成多个脚本, 每个脚本都有prefix/head/tail, 所有item按顺序各出现一次
+        GlobalVariable.JMP_SCRIPT_MAX_BYTES = 30
+        paths = JmpFile.save_scripts(scrip_name, "open;", "head(", ")", iter(items))
+        self.assertEqual(paths[1], os.path.join(self.temp_dir, "dis_2.jsl"))
+        self.assertGreater(len(paths), 1)
+        found = []
+        for path in paths:
+            text = self.read(path)
+            self.assertTrue(text.startswith("open;head(") and text.endswith(")"), path)
+            found.extend(text[len("open;head("):-1].split(","))
+        self.assertEqual(found, items)
+        self.assertEqual(JmpFile.save_scripts(scrip_name, "open;", "head(", ")", iter([])), [])
@@ -0,0 +1,157 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : li_pipeline_test.py
+@Software: PyCharm
+@Remark  : LiPipeline 阶段复用, 中断后Li恢复; HDF5的读取换成生成的数据
+"""
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import DataModule, FailFlag, GlobalVariable
+from common.li import Li, SummaryCore
+from common.li_pipeline import LiPipeline, CalculationCancelled
+from parser_core.stdf_parser_file_write_read import ParserData
+
+
+def full_module(die_qty: int = 200, test_qty: int = 6) -> DataModule:
+    """ 和 ParserData.read_hdf5_module 返回的格式一致, 最后两个测项为FTR """
+    rng = np.random.default_rng(die_qty)
+    prr_df = pd.DataFrame({
+        "PART_ID": np.arange(1, die_qty + 1), "HEAD_NUM": 1, "SITE_NUM": ["S001"] * die_qty,
+        "X_COORD": np.arange(die_qty) % 20, "Y_COORD": np.arange(die_qty) // 20, "HARD_BIN": 1, "SOFT_BIN": 1,
+        "PART_FLG": 0, "NUM_TEST": test_qty, "FAIL_FLAG": FailFlag.PASS, "TEST_T": 10,
+    })
+    rows = []
+    for test_id in range(1, test_qty + 1):
+        result = rng.normal(size=die_qty).astype(np.float32)
+        rows.append(pd.DataFrame({
+            "PART_ID": np.arange(1, die_qty + 1), "TEST_ID": test_id, "RESULT": result,
+            "TEST_FLG": np.where(np.abs(result) > 2, 128, 0), "PARM_FLG": 0, "OPT_FLAG": 0,
+            "LO_LIMIT": -2.0, "HI_LIMIT": 2.0,
+            "FAIL_FLG": np.where(np.abs(result) > 2, FailFlag.FAIL, FailFlag.PASS).astype(np.uint8),
+        }))
+    ptmd_df = pd.DataFrame({
+        "TEST_ID": range(1, test_qty + 1), "DATAT_TYPE": ["PTR"] * (test_qty - 2) + ["FTR"] * 2,
+        "TEST_NUM": range(1, test_qty + 1), "TEST_TXT": ["T{}".format(each) for each in range(1, test_qty + 1)],
+        "PARM_FLG": 0, "OPT_FLAG": 0, "RES_SCAL": 0, "LLM_SCAL": 0, "HLM_SCAL": 0,
+        "LO_LIMIT": -2.0, "HI_LIMIT": 2.0, "UNITS": "V",
+    })
+    ptmd_df["TEXT"] = ptmd_df["TEST_NUM"].astype(str) + ":" + ptmd_df["TEST_TXT"]
+    return DataModule(prr_df=prr_df, dtp_df=pd.concat(rows, ignore_index=True), ptmd_df=ptmd_df)
+
+
+class LiPipelineCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = GlobalVariable.RESULT_CACHE_PATH
+        GlobalVariable.RESULT_CACHE_PATH = os.path.join(self.temp_dir, "RESULT_CACHE")
+        self.patch = mock.patch.object(ParserData, "read_hdf5_module", staticmethod(lambda path: full_module()))
+        self.patch.start()
+        paths = []
+        for index in range(2):
+            # 只用来计算文件指纹, 内容由read_hdf5_module生成
+            path = os.path.join(self.temp_dir, "{}.h5".format(index))
+            with open(path, "w") as f:
+                f.write("x" * (index + 1) * 100)
+            paths.append(path)
+        self.summary = SummaryCore()
+        self.summary.set_data(pd.DataFrame({
+            "ID": [1, 2], "LOT_ID": ["A", "B"], "HDF5_PATH": paths, "PART_FLAG": [0, 0], "READ_FAIL": [1, 1],
+            "QTY": [1, 1], "PASS": [1, 1], "START_T": [1, 2],
+        }))
+        self.li = Li()
+        self.pipeline = LiPipeline(self.li)
+
+    def tearDown(self):
+        self.patch.stop()
+        GlobalVariable.RESULT_CACHE_PATH = self.cache_path
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def reused(self) -> list:
+        return [name for name, _, _ in LiPipeline.STAGES if self.pipeline.timings.get(name, 0) is None]
+
+    @Tester()
+    def test_reuse_stages(self):
+        events = []
+        self.pipeline.run(self.summary, [1, 2], None, progress=lambda *args: events.append(args))
+        self.assertEqual(self.reused(), [])
+        self.assertEqual({each[0] for each in events}, set(range(len(LiPipeline.STAGES))))
+        capability = pd.DataFrame(self.li.capability_key_list)
+        self.assertEqual(len(capability), 6)
+        self.assertEqual(self.li.to_chart_csv_data.df.shape, (400, 6))
+
+        # 只改测试类型过滤, 不重新载入和concat
+        self.pipeline.run(self.summary, [1, 2], ["FTR"])
+        self.assertEqual(self.reused(), ["load", "concat"])
+        self.assertEqual(self.li.df_module.ptmd_df["DATAT_TYPE"].unique().tolist(), ["FTR"])
+
+        # 改回来, top_fail/capability从ResultCache取, 和第一次的结果一致
+        self.pipeline.run(self.summary, [1, 2], None)
+        self.assertEqual(self.reused(), ["load", "concat"])
+        self.assertTrue(pd.DataFrame(self.li.capability_key_list).equals(capability))
+        self.pipeline.run(self.summary, [1, 2], None)
+        self.assertEqual(self.reused(), [name for name, _, _ in LiPipeline.STAGES])
+
+    @Tester()
+    def test_cancel_restore(self):
+        self.pipeline.run(self.summary, [1, 2], None)
+        li = self.li
+        before = {
+            "select_summary": li.select_summary, "df_module": li.df_module, "capability_key_list": li.capability_key_list,
+            "top_fail_dict": li.top_fail_dict, "data_version": li.data_version, "chart_df": li.to_chart_csv_data.df,
+        }
+        capability_items = dict(li.capability_key_dict)
+
+        def cancel(index, done, total):
+            if index == LiPipeline.STAGE_INDEX["capability"] and done > 0:
+                raise CalculationCancelled()
+
+        with self.assertRaises(CalculationCancelled):
+            self.pipeline.run(self.summary, [1], ["PTR"], progress=cancel)
+        self.assertIs(li.select_summary, before["select_summary"])
+        self.assertIs(li.df_module, before["df_module"])
+        self.assertIs(li.capability_key_list, before["capability_key_list"])
+        self.assertIs(li.top_fail_dict, before["top_fail_dict"])
+        self.assertEqual(li.data_version, before["data_version"])
+        self.assertIs(li.to_chart_csv_data.df, before["chart_df"])
+        self.assertEqual(li.capability_key_dict, capability_items)
+        self.assertIsNone(self.pipeline.progress)
+
+        # 中断前完成的阶段保留
+        self.pipeline.run(self.summary, [1], ["PTR"])
+        self.assertEqual(self.reused(), ["load", "concat", "filter", "top_fail"])
+        self.assertEqual(len(li.capability_key_list), 4)
+
+    @Tester()
+    def test_memo_not_shared_with_li(self):
+        self.pipeline.run(self.summary, [1, 2], None)
+        # DA_GROUP只写在Li自己的prr_df上
+        memo_prr_df = self.pipeline.memo["concat"][1].prr_df
+        memo_da_group = memo_prr_df["DA_GROUP"].copy() if "DA_GROUP" in memo_prr_df else None
+        self.li.set_data_group(None, ["SITE_NUM"])
+        self.assertTrue((self.li.df_module.prr_df["DA_GROUP"] == "S001").all())
+        if memo_da_group is None:
+            self.assertNotIn("DA_GROUP", memo_prr_df)
+        else:
+            self.assertTrue(memo_prr_df["DA_GROUP"].equals(memo_da_group))
+
+        # unstack只保存弱引用, Li换掉绘图数据后重新计算
+        gc.collect()
+        self.assertIsNone(self.pipeline.memo["unstack"][1]())
+        self.pipeline.run(self.summary, [1, 2], None)
+        self.assertEqual(self.reused(), ["load", "concat", "filter", "top_fail", "capability"])
+        self.assertTrue((self.li.df_module.prr_df["DA_GROUP"] == "*").all())
+        self.pipeline.run(self.summary, [1, 2], None)
+        self.assertIn("unstack", self.reused())
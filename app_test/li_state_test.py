@@ -0,0 +1,95 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : li_state_test.py
+@Software: PyCharm
+@Remark  : LiStateHistory 的撤销/重做和mask取数
+"""
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import DataModule
+from common.li_state import LiSnapshot, LiStateHistory
+
+
+class LiStateHistoryCase(unittest.TestCase):
+    die_qty = 50
+    test_qty = 4
+
+    def setUp(self):
+        die_ids = np.arange(1, self.die_qty + 1)
+        prr_df = pd.DataFrame({"DIE_ID": die_ids, "SOFT_BIN": die_ids % 3}).set_index("DIE_ID")
+        dtp_df = pd.DataFrame({
+            "TEST_ID": np.repeat(np.arange(self.test_qty), self.die_qty),
+            "DIE_ID": np.tile(die_ids, self.test_qty),
+            "RESULT": np.arange(self.die_qty * self.test_qty, dtype=np.float64),
+        }).set_index(["TEST_ID", "DIE_ID"])
+        ptmd_df = pd.DataFrame({"TEST_ID": np.arange(self.test_qty)})
+        self.base = DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df)
+        self.history = LiStateHistory(self.base, LiSnapshot(capability_key_list=[{"TEST_ID": 0}], top_fail_dict={}))
+
+    @Tester()
+    def test_undo_redo(self):
+        history = self.history
+        root = history.current
+        self.assertFalse(history.can_undo())
+        self.assertIsNone(history.undo())
+
+        first = history.push(root.evolve(die_mask=history.die_mask_without(root, [1, 2])))
+        second = history.push(first.evolve(test_ids=history.test_ids_within(first, [1, 2])))
+        self.assertIs(history.current, second)
+        self.assertIs(history.undo(), first)
+        self.assertIs(history.undo(), root)
+        self.assertIsNone(history.undo())
+        self.assertIs(history.redo(), first)
+        self.assertIs(history.redo(), second)
+        self.assertIsNone(history.redo())
+
+        # 在中间push, 后面可重做的状态丢弃
+        history.undo()
+        third = history.push(first.evolve(operation_state="limit_changed"))
+        self.assertFalse(history.can_redo())
+        self.assertIs(history.undo(), first)
+        self.assertIs(history.redo(), third)
+
+    @Tester()
+    def test_evolve(self):
+        root = self.history.root
+        mask = self.history.die_mask_without(root, [3])
+        snapshot = root.evolve(die_mask=mask)
+        # 派生的状态需要重算, 没有改动的部分共享
+        self.assertIsNone(snapshot.capability_key_list)
+        self.assertIsNone(snapshot.top_fail_dict)
+        self.assertIs(snapshot.die_mask, mask)
+        self.assertIs(snapshot.evolve(operation_state="data_filtered").die_mask, mask)
+        self.assertEqual(root.capability_key_list, [{"TEST_ID": 0}])
+
+    @Tester()
+    def test_materialize(self):
+        history = self.history
+        root = history.root
+        module = history.materialize(root)
+        self.assertIs(module.prr_df, self.base.prr_df)
+        self.assertIs(module.dtp_df, self.base.dtp_df)
+
+        first = root.evolve(die_mask=history.die_mask_without(root, [1, 2, 3]))
+        second = first.evolve(
+            die_mask=history.die_mask_without(first, [10]), test_ids=history.test_ids_within(first, [2, 3, 9])
+        )
+        module = history.materialize(second)
+        self.assertEqual(module.prr_df.index.tolist(), [each for each in range(4, self.die_qty + 1) if each != 10])
+        self.assertEqual(module.ptmd_df["TEST_ID"].tolist(), [2, 3])
+        expect = self.base.dtp_df[
+            self.base.dtp_df.index.get_level_values("DIE_ID").isin(module.prr_df.index)
+            & self.base.dtp_df.index.get_level_values("TEST_ID").isin([2, 3])
+        ]
+        self.assertTrue(module.dtp_df.equals(expect))
+        # base不被修改
+        self.assertEqual(len(self.base.prr_df), self.die_qty)
+        self.assertEqual(len(self.base.dtp_df), self.die_qty * self.test_qty)
+        self.assertEqual(history.test_ids_within(second, [3]).tolist(), [3])
@@ -9,9 +9,11 @@
 """
 import unittest
 
+import numpy as np
 import pandas as pd
 
 from app_test.test_utils.wrapper_utils import Tester
+from common.func import join_columns
 
 
 class QtUiCase(unittest.TestCase):
@@ -38,3 +40,16 @@ class QtUiCase(unittest.TestCase):
             [1, 2, 3],
         ]
         print(pd.DataFrame(data))
+
+    @Tester()
+    def test_join_columns_same_as_apply(self):
+        """ 混合类型时和逐行apply的字符串一致, 如int和float混合时int写成'1.0' """
+        df = pd.DataFrame({
+            "LOT_ID": ["L1", "L2", "L1", None], "SITE_NUM": [1, 2, 1, 2], "TEMP": [25.0, np.nan, 25.0, 85.5],
+            "F32": np.array([0.1, 0.2, 0.1, 0.3], dtype=np.float32), "FLAG": [True, False, True, True],
+        })
+        for columns in (["SITE_NUM", "TEMP"], ["LOT_ID", "SITE_NUM"], ["F32", "TEMP"], ["FLAG", "SITE_NUM"],
+                        ["LOT_ID", "TEMP", "F32"]):
+            data = df.dropna(subset=["LOT_ID"]) if "LOT_ID" in columns else df
+            expect = data[columns].apply(lambda x: "_".join(x.map(str)), axis=1).tolist()
+            self.assertEqual(join_columns(data, columns, "_").tolist(), expect, columns)
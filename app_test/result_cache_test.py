@@ -0,0 +1,119 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : result_cache_test.py
+@Software: PyCharm
+@Remark  : ResultCache 的key失效, 读写和淘汰
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.wrapper_utils import Tester
+from common.app_variable import GlobalVariable
+from common.cal_interface.result_cache import ResultCache
+
+
+class ResultCacheCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path, self.cache_size = GlobalVariable.RESULT_CACHE_PATH, GlobalVariable.RESULT_CACHE_SIZE
+        GlobalVariable.RESULT_CACHE_PATH = os.path.join(self.temp_dir, "RESULT_CACHE")
+        self.paths = []
+        for index in range(2):
+            path = os.path.join(self.temp_dir, "{}.h5".format(index))
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            self.paths.append(path)
+        self.summary = pd.DataFrame({
+            "ID": [1, 2], "HDF5_PATH": self.paths, "PART_FLAG": [0, 0], "READ_FAIL": [1, 1],
+        })
+
+    def tearDown(self):
+        GlobalVariable.RESULT_CACHE_PATH, GlobalVariable.RESULT_CACHE_SIZE = self.cache_path, self.cache_size
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @Tester()
+    def test_dataset_key_invalidation(self):
+        key = ResultCache.dataset_key(self.summary, None)
+        self.assertEqual(key, ResultCache.dataset_key(self.summary.copy(), None))
+        # 测试类型过滤, 顺序无关
+        self.assertNotEqual(key, ResultCache.dataset_key(self.summary, ["PTR"]))
+        self.assertEqual(
+            ResultCache.dataset_key(self.summary, ["PTR", "FTR"]), ResultCache.dataset_key(self.summary, ["FTR", "PTR"])
+        )
+        # PART_FLAG/READ_FAIL和concat顺序
+        changed = self.summary.copy()
+        changed.loc[0, "PART_FLAG"] = 1
+        self.assertNotEqual(key, ResultCache.dataset_key(changed, None))
+        self.assertNotEqual(key, ResultCache.dataset_key(self.summary.iloc[::-1], None))
+        # HDF5被重写
+        with open(self.paths[0], "wb") as f:
+            f.write(b"y" * 200)
+        self.assertNotEqual(key, ResultCache.dataset_key(self.summary, None))
+        # 文件不存在时不使用缓存
+        os.remove(self.paths[1])
+        self.assertIsNone(ResultCache.dataset_key(self.summary, None))
+        self.assertIsNone(ResultCache.dataset_key(None, None))
+
+    @Tester()
+    def test_limit_and_array_key(self):
+        self.assertIsNone(ResultCache.limit_key(None))
+        self.assertIsNone(ResultCache.limit_key({}))
+        overlay = {2: (0.1, 0.3, "GE", "LE"), 1: (-1, 1, "GT", "LT")}
+        self.assertEqual(ResultCache.limit_key(overlay), ResultCache.limit_key(dict(sorted(overlay.items()))))
+        self.assertNotEqual(
+            ResultCache.limit_key(overlay), ResultCache.limit_key({**overlay, 2: (0.1, 0.3 + 1E-12, "GE", "LE")})
+        )
+        mask = np.array([True, False, True])
+        self.assertEqual(ResultCache.array_key(mask), ResultCache.array_key(mask.copy()))
+        self.assertNotEqual(ResultCache.array_key(mask), ResultCache.array_key(~mask))
+        self.assertIsNone(ResultCache.array_key(None))
+
+    @Tester()
+    def test_put_get(self):
+        dataset_key = ResultCache.dataset_key(self.summary, None)
+        key = dataset_key + ("capability", None)
+        self.assertIsNone(ResultCache.get(key))
+        value = ([{"TEST_ID": 1, "CPK": 1.5}], {1: 3})
+        ResultCache.put(key, value)
+        self.assertEqual(ResultCache.get(key), value)
+        self.assertIsNone(ResultCache.get(dataset_key + ("capability", "other")))
+        self.assertIsNone(ResultCache.get(None))
+        ResultCache.put(None, value)
+        # 文件被重写后同样的调用得到新的key, 旧结果不再命中
+        with open(self.paths[0], "wb") as f:
+            f.write(b"y" * 200)
+        self.assertIsNone(ResultCache.get(ResultCache.dataset_key(self.summary, None) + ("capability", None)))
+        # 损坏的缓存文件当作没有缓存, 并删除
+        path = ResultCache.file_path(key)
+        with open(path, "wb") as f:
+            f.write(b"broken")
+        self.assertIsNone(ResultCache.get(key))
+        self.assertFalse(os.path.exists(path))
+
+    @Tester()
+    def test_evict(self):
+        GlobalVariable.RESULT_CACHE_SIZE = 3
+        keys = [("evict", index) for index in range(5)]
+        for index, key in enumerate(keys):
+            ResultCache.put(key, index)
+            # 用修改时间区分先后
+            os.utime(ResultCache.file_path(key), ns=(index * 10 ** 9, index * 10 ** 9))
+            if index == 2:
+                # 读取会刷新修改时间, 最早的key变成最近用过的
+                self.assertEqual(ResultCache.get(keys[0]), 0)
+        files = [name for name in os.listdir(GlobalVariable.RESULT_CACHE_PATH) if name.endswith(ResultCache.SUFFIX)]
+        self.assertEqual(len(files), 3)
+        self.assertEqual(ResultCache.get(keys[0]), 0)
+        self.assertIsNone(ResultCache.get(keys[1]))
+        self.assertIsNone(ResultCache.get(keys[2]))
+        ResultCache.clear()
+        self.assertIsNone(ResultCache.get(keys[4]))
@@ -0,0 +1,64 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : visual_aggregate_test.py
+@Software: PyCharm
+@Remark  : 坐标聚合的正确性和性能, 编译了visual.pyx时同时对比编译版本
+"""
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app_test.test_utils.log_utils import Print
+from app_test.test_utils.wrapper_utils import Tester
+from chart_core.chart_pyqtgraph.core.visual import aggregate
+from chart_core.chart_pyqtgraph.core.visual.aggregate import coord_aggregate, coord_aggregate_numpy, AGG_CODE
+
+
+class VisualAggregateCase(unittest.TestCase):
+    shape = (300, 300)
+
+    def data(self, size: int):
+        rng = np.random.default_rng(0)
+        x = rng.integers(0, self.shape[0], size).astype(np.float64)
+        y = rng.integers(0, self.shape[1], size).astype(np.float64)
+        d = rng.random(size)
+        d[::7] = np.nan
+        x[::11] = np.nan
+        return x, y, d
+
+    @Tester()
+    def test_aggregate_same_as_pandas(self):
+        x, y, d = self.data(100000)
+        df = pd.DataFrame({"X": x, "Y": y, "D": d}).dropna()
+        group = df.groupby(["X", "Y"]).D
+        reference = {
+            "count": group.count(), "mean": group.mean(), "median": group.median(),
+            "min": group.min(), "max": group.max(), "last": group.last(),
+        }
+        for how, ref in reference.items():
+            c = coord_aggregate(x, y, d, self.shape, how)
+            ix = ref.index.get_level_values(0).astype(int)
+            iy = ref.index.get_level_values(1).astype(int)
+            self.assertTrue(np.allclose(c[ix, iy], ref.values), how)
+            self.assertEqual(int(np.count_nonzero(~np.isnan(c))), len(ref), how)
+
+    @Tester()
+    def test_aggregate_benchmark(self):
+        x, y, d = self.data(2000000)
+        for how in AGG_CODE:
+            start = time.perf_counter()
+            c = coord_aggregate_numpy(x, y, d, self.shape, how)
+            numpy_time = round(time.perf_counter() - start, 3)
+            if aggregate.coord_aggregate_kernel is None or how == "median":
+                Print.info("{}: numpy {}s".format(how, numpy_time))
+                continue
+            start = time.perf_counter()
+            compiled = coord_aggregate(x, y, d, self.shape, how)
+            compiled_time = round(time.perf_counter() - start, 3)
+            self.assertTrue(np.allclose(c, compiled, equal_nan=True), how)
+            Print.info("{}: numpy {}s, compiled {}s".format(how, numpy_time, compiled_time))
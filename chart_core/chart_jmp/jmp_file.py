@@ -7,19 +7,74 @@
 @Time    : 2022/3/27 17:04
 @Mark    : 
 """
+import os
+from typing import Iterable, List
+
 import win32api
 
+from common.app_variable import GlobalVariable
+
 
 class JmpFile:
     """
     JMP的文件操作接口
     """
 
+    @staticmethod
+    def run_script(scrip_name):
+        win32api.ShellExecute(0, 'open', scrip_name, '', '', 1)
+
     @staticmethod
     def save_with_run_script(jmp_script, scrip_name="stdf_script.jsl"):
         with open(scrip_name, "w", encoding="utf-8") as f:
             f.write(jmp_script)
-        win32api.ShellExecute(0, 'open', scrip_name, '', '', 1)
+        JmpFile.run_script(scrip_name)
+
+    @staticmethod
+    def save_scripts(scrip_name: str, prefix: str, head: str, tail: str, items: Iterable[str],
+                     sep: str = ",") -> List[str]:
+        """
+        逐个取出items, 每GlobalVariable.JMP_SCRIPT_CHUNK个写入一次文件, 不在内存中拼出整个脚本
+        一个脚本超过GlobalVariable.JMP_SCRIPT_MAX_BYTES后结束, 后面的items写到 name_2.jsl, name_3.jsl ...
+        每个脚本为: prefix + head + items(用sep连接) + tail
+        :return: 写出的脚本路径
+        """
+        root, ext = os.path.splitext(scrip_name)
+        paths = []
+        f, size, count = None, 0, 0
+        buffer = []
+
+        def flush():
+            nonlocal size
+            if buffer:
+                text = (sep if count > len(buffer) else "") + sep.join(buffer)
+                f.write(text)
+                size += len(text.encode("utf-8"))
+                buffer.clear()
+
+        try:
+            for item in items:
+                if f is None:
+                    path = scrip_name if not paths else "{}_{}{}".format(root, len(paths) + 1, ext)
+                    paths.append(path)
+                    f = open(path, "w", encoding="utf-8")
+                    f.write(prefix + head)
+                    size, count = 0, 0
+                buffer.append(item)
+                count += 1
+                if len(buffer) >= GlobalVariable.JMP_SCRIPT_CHUNK:
+                    flush()
+                    if size >= GlobalVariable.JMP_SCRIPT_MAX_BYTES:
+                        f.write(tail)
+                        f.close()
+                        f = None
+            if f is not None:
+                flush()
+                f.write(tail)
+        finally:
+            if f is not None:
+                f.close()
+        return paths
 
     @staticmethod
     def load_csv_file(filepath: str):
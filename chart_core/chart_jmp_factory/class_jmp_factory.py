@@ -7,11 +7,13 @@
 @Time    : 2022/10/7 10:51
 @Mark    : 调用并运行的地方
 """
+from typing import Iterator, List
+
 import pandas as pd
 
 from chart_core.chart_jmp.jmp_box import JmpBox
-from chart_core.chart_jmp_factory.class_jmp_distribution import JmpDistribution
-from chart_core.chart_jmp_factory.class_jmp_graph_builder import JmpGraphBuilder
+from chart_core.chart_jmp.jmp_file import JmpFile
+from chart_core.chart_jmp_factory.class_jmp_template import JmpTemplate
 from ui_component.ui_app_variable import UiGlobalVariable
 
 
@@ -75,198 +77,92 @@ class NewJmpFactory:
         }
 
     @staticmethod
-    def jmp_distribution(capability: dict, title: str = "dis_bar", by_columns: list = None, overlay_column: str = None, show_color_chart: bool = True) -> str:
+    def overlay_pre_script(by_columns: list = None, overlay_column: str = None) -> tuple:
         """
-        使用Graph Builder生成带颜色叠加的分布图, 并附带统计报告
-        修改后：为每个测试项生成一个图表和报告的组合，然后垂直排列所有组合。
+        有分组时先在数据表中新建一列Combined_Overlay用于颜色叠加(所有图共用)
+        :return: pre_script, 图中Overlay用的列
         """
-        if not capability:
-            return ""
-
-        # --- Part 0: Create combined column script if needed (once for all graphs) ---
-        pre_script = ""
-        final_overlay_column = overlay_column
-        if by_columns and overlay_column:
-            final_overlay_column = "Combined_Overlay"
-            all_cols = by_columns + [overlay_column]
-            cols_to_combine = sorted(list(set(col for col in all_cols if col.upper() != 'OVERLAY_GROUP')))
-            formula_parts = [f':{col}' for col in cols_to_combine]
-            formula = ' || "_" || '.join(formula_parts)
-            pre_script = f'Current Data Table() << New Column( "{final_overlay_column}", Character, Formula( {formula} ) );\n'
+        if not (by_columns and overlay_column):
+            return "", overlay_column
+        final_overlay_column = "Combined_Overlay"
+        all_cols = by_columns + [overlay_column]
+        cols_to_combine = sorted(list(set(col for col in all_cols if col.upper() != 'OVERLAY_GROUP')))
+        formula_parts = [f':{col}' for col in cols_to_combine]
+        formula = ' || "_" || '.join(formula_parts)
+        pre_script = f'Current Data Table() << New Column( "{final_overlay_column}", Character, Formula( {formula} ) );\n'
+        return pre_script, final_overlay_column
 
-        # --- Loop through each test item to create a combined graph-report view ---
-        combined_item_scripts = []
+    @staticmethod
+    def distribution_items(capability: dict, title: str, by_columns: list = None, overlay_column: str = None,
+                           show_color_chart: bool = True, trans: bool = False) -> Iterator[str]:
+        """
+        逐个生成每个测项的 图 + 统计报告, 图的Overlay列为overlay_pre_script返回的列
+        :param trans: 横向分布图
+        """
+        by = JmpTemplate.by(by_columns)
         for key, row in capability.items():
-            # --- Part 1B: Generate the statistical report for the current item ---
-            single_item_capability = {key: row}
-            report_script = NewJmpFactory.jmp_distribution_report_only(single_item_capability, title, by_columns)
-
-            # --- Part 1A & 1C: Conditionally generate graph and combine ---
+            limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
+            report_script = JmpTemplate.report(key, limits, title, by)
             if show_color_chart:
-                # --- Part 1A: Generate the overlaid graph for the current item ---
-                overlay_str = f', Overlay( :{final_overlay_column} )' if final_overlay_column else ''
-                elements_str = 'Histogram( X, Legend( 5 ) )'
-                if UiGlobalVariable.JmpDisPlotBox and not final_overlay_column:
-                    elements_str += ', Box Plot( X, Legend( 6 ) )'
-
-                jmp_gb = JmpGraphBuilder()
-                variables_str = f'X( :"{key}" ){overlay_str}'
-                
-                jmp_gb.set_config(
-                    f"""
-                    Size( 800, 480 ),
-                    Show Control Panel( 0 ),
-                    Variables( {variables_str} ),
-                    Elements( {elements_str} )
-                    """
-                )
-                
-                limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
-                axis_params = f'Format( "Fixed Dec", 12, {limits["decimal"]} ), Min( {limits["min"]} ), Max( {limits["max"]} ), Inc( {limits["inc"]} )'
-                
-                ref_lines_str = ""
-                if not UiGlobalVariable.JmpNoLimit:
-                    ref_lines_str = f"""
-                        Add Ref Line( {limits['l_limit']}, "Solid", "Medium Dark Red", "LSL({limits['l_limit']})", 2),
-                        Add Ref Line( {limits['h_limit']}, "Solid", "Dark Red", "USL({limits['h_limit']})", 2 ),
-                        Add Ref Line( {limits['avg']}, "Dashed", "Blue", "Mean({limits['avg']})", 1 )
-                    """
-                
-                jmp_gb.new_dispatch(f'Dispatch(,"{key}",ScaleBox,{{{axis_params}}})')
-                if ref_lines_str:
-                    jmp_gb.new_dispatch(f'Dispatch(,"Graph Builder",FrameBox,{{{ref_lines_str}}})')
-                
-                graph_script = jmp_gb.execute(no_header=True)
-
-                # --- Part 1C: Combine the graph and report side-by-side for the current item ---
-                item_script = JmpBox.new_h_list_box(graph_script, report_script)
+                yield JmpTemplate.item(JmpTemplate.graph(key, limits, overlay_column, trans), report_script)
             else:
-                item_script = report_script
-
-            combined_item_scripts.append(item_script)
-
-        # --- Part 2: Combine all item-specific views vertically ---
-        combined_script = JmpBox.new_v_list_box(*combined_item_scripts)
+                yield report_script
 
-        # --- Part 3: Wrap the combined view in a window ---
-        window_script = JmpBox.new_window(JmpBox.new_outline_box(combined_script, title=title))
-
-        # --- Part 4: Prepend the column creation script to the window script ---
-        final_script = pre_script + window_script
+    @staticmethod
+    def distribution_script(capability: dict, title: str, by_columns: list = None, overlay_column: str = None,
+                            show_color_chart: bool = True, trans: bool = False) -> str:
+        if not capability:
+            return ""
+        pre_script, final_overlay_column = NewJmpFactory.overlay_pre_script(by_columns, overlay_column)
+        items = NewJmpFactory.distribution_items(
+            capability, title, by_columns, final_overlay_column, show_color_chart, trans
+        )
+        # 每个测项的图和报告垂直排列, 放在一个窗口中
+        window_script = JmpBox.new_window(JmpBox.new_outline_box(JmpBox.new_v_list_box(*items), title=title))
+        return pre_script + window_script
 
-        return final_script
+    @staticmethod
+    def distribution_files(csv_path: str, scrip_name: str, capability: dict, title: str, by_columns: list = None,
+                           overlay_column: str = None, show_color_chart: bool = True, trans: bool = False) -> List[str]:
+        """
+        测项很多时用: 按块写入脚本文件, 超过GlobalVariable.JMP_SCRIPT_MAX_BYTES时分成多个脚本, 每个脚本都打开CSV
+        :return: 脚本路径
+        """
+        pre_script, final_overlay_column = NewJmpFactory.overlay_pre_script(by_columns, overlay_column)
+        items = NewJmpFactory.distribution_items(
+            capability, title, by_columns, final_overlay_column, show_color_chart, trans
+        )
+        return JmpFile.save_scripts(
+            scrip_name,
+            JmpFile.load_csv_file(csv_path) + ";\n" + pre_script,
+            'New Window( "Window", Outline Box( "{}", V List Box(\n'.format(title),
+            "\n) ) )\n",
+            items,
+        )
 
+    @staticmethod
+    def jmp_distribution(capability: dict, title: str = "dis_bar", by_columns: list = None, overlay_column: str = None, show_color_chart: bool = True) -> str:
+        """
+        使用Graph Builder生成带颜色叠加的分布图, 并附带统计报告
+        为每个测试项生成一个图表和报告的组合，然后垂直排列所有组合。
+        """
+        return NewJmpFactory.distribution_script(capability, title, by_columns, overlay_column, show_color_chart)
 
     @staticmethod
     def jmp_distribution_report_only(capability: dict, title: str = "report", by_columns: list = None) -> str:
         """
         使用Distribution平台只生成统计报告，不显示图表
         """
-        jmp_dis_reports = []
-        by_column_str = ""
-        if by_columns:
-            by_cols = ", ".join([f':{col}' for col in by_columns])
-            by_column_str = f"By( {by_cols} )"
-
-        for key, row in capability.items():
-            jmp_dis = JmpDistribution()
-            limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
-            cap_ans = ""
-            if not UiGlobalVariable.JmpNoLimit:
-                cap_ans = f"Capability Analysis( LSL( {limits['l_limit']} ), USL( {limits['h_limit']} ) )"
-            
-            jmp_dis.set_config("Stack( 1 )", "Automatic Recalc( 1 )", by_column_str)
-            jmp_dis.new_continuous_distribution(f'Column( :"{key}" )', "Horizontal Layout( 1 )", "Vertical( 0 )", cap_ans)
-
-            # 合理化坐标轴
-            axis_params = f'Format( "Fixed Dec", 12, {limits["decimal"]} ), Min( {limits["min"]} ), Max( {limits["max"]} ), Inc( {limits["inc"]} )'
-            jmp_dis.new_dispatch(f'Dispatch( {{:"{key}"}}, "1", ScaleBox, {{{axis_params}}} )')
-            
-            # 隐藏直方图，只保留报告
-            jmp_dis.new_dispatch(f'Dispatch( {{:"{key}"}}, "Histogram", OutlineBox, {{Close( 1 )}} )')
-            # 为报告添加标题
-            jmp_dis.new_dispatch(f'Dispatch( , "Distributions", OutlineBox, {{Set Title( "{key} - {title}" )}} )')
-            jmp_dis_reports.append(jmp_dis.execute(no_header=True))
-            
-        return JmpBox.new_v_list_box(*jmp_dis_reports)
+        by = JmpTemplate.by(by_columns)
+        return JmpBox.new_v_list_box(*[
+            JmpTemplate.report(key, NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True), title, by)
+            for key, row in capability.items()
+        ])
 
     @staticmethod
     def jmp_distribution_trans_bar(capability: dict, title: str = "trans_bar", by_columns: list = None, overlay_column: str = None, show_color_chart: bool = True) -> str:
         """
         使用Graph Builder生成带颜色叠加的横向分布图, 并附带统计报告
-        修改后：为每个测试项生成一个图表和报告的组合，然后垂直排列所有组合。
+        为每个测试项生成一个图表和报告的组合，然后垂直排列所有组合。
         """
-        if not capability:
-            return ""
-
-        # --- Part 0: Create combined column script if needed (once for all graphs) ---
-        pre_script = ""
-        final_overlay_column = overlay_column
-        if by_columns and overlay_column:
-            final_overlay_column = "Combined_Overlay"
-            all_cols = by_columns + [overlay_column]
-            cols_to_combine = sorted(list(set(col for col in all_cols if col.upper() != 'OVERLAY_GROUP')))
-            formula_parts = [f':{col}' for col in cols_to_combine]
-            formula = ' || "_" || '.join(formula_parts)
-            pre_script = f'Current Data Table() << New Column( "{final_overlay_column}", Character, Formula( {formula} ) );\n'
-
-        # --- Loop through each test item to create a combined graph-report view ---
-        combined_item_scripts = []
-        for key, row in capability.items():
-            # --- Part 1B: Generate the statistical report for the current item ---
-            single_item_capability = {key: row}
-            report_script = NewJmpFactory.jmp_distribution_report_only(single_item_capability, title, by_columns)
-
-            # --- Part 1A & 1C: Conditionally generate graph and combine ---
-            if show_color_chart:
-                # --- Part 1A: Generate the overlaid graph for the current item ---
-                overlay_str = f', Overlay( :{final_overlay_column} )' if final_overlay_column else ''
-                elements_str = 'Histogram( Y, Legend( 5 ) )'
-                if UiGlobalVariable.JmpDisPlotBox and not final_overlay_column:
-                    elements_str += ', Box Plot( Y, Legend( 6 ) )'
-
-                jmp_gb = JmpGraphBuilder()
-                variables_str = f'Y( :"{key}" ){overlay_str}'
-                
-                jmp_gb.set_config(
-                    f"""
-                    Size( 1085, 480 ),
-                    Show Control Panel( 0 ),
-                    Variables( {variables_str} ),
-                    Elements( {elements_str} )
-                    """
-                )
-
-                limits = NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
-                axis_params = f'Format( "Fixed Dec", 12, {limits["decimal"]} ), Min( {limits["min"]} ), Max( {limits["max"]} ), Inc( {limits["inc"]} )'
-                
-                ref_lines_str = ""
-                if not UiGlobalVariable.JmpNoLimit:
-                    ref_lines_str = f"""
-                        Add Ref Line( {limits['l_limit']}, "Solid", "Medium Dark Red", "LSL({limits['l_limit']})", 2),
-                        Add Ref Line( {limits['h_limit']}, "Solid", "Dark Red", "USL({limits['h_limit']})", 2 ),
-                        Add Ref Line( {limits['avg']}, "Dashed", "Blue", "Mean({limits['avg']})", 1 )
-                    """
-                
-                jmp_gb.new_dispatch(f'Dispatch(,"{key}",ScaleBox,{{{axis_params}}})')
-                if ref_lines_str:
-                    jmp_gb.new_dispatch(f'Dispatch(,"Graph Builder",FrameBox,{{{ref_lines_str}}})')
-                
-                graph_script = jmp_gb.execute(no_header=True)
-
-                # --- Part 1C: Combine the graph and report side-by-side for the current item ---
-                item_script = JmpBox.new_h_list_box(graph_script, report_script)
-            else:
-                item_script = report_script
-                
-            combined_item_scripts.append(item_script)
-
-        # --- Part 2: Combine all item-specific views vertically ---
-        combined_script = JmpBox.new_v_list_box(*combined_item_scripts)
-
-        # --- Part 3: Wrap the combined view in a window ---
-        window_script = JmpBox.new_window(JmpBox.new_outline_box(combined_script, title=title))
-
-        # --- Part 4: Prepend the column creation script to the window script ---
-        final_script = pre_script + window_script
-        return final_script
+        return NewJmpFactory.distribution_script(capability, title, by_columns, overlay_column, show_color_chart, trans=True)
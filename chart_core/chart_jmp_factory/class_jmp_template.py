@@ -0,0 +1,94 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : class_jmp_template.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 分布图每个测项的JSL模板, 几千个测项时一次format生成, 不再逐段拼接JmpGraphBuilder/JmpDistribution
+"""
+from ui_component.ui_app_variable import UiGlobalVariable
+
+
+class JmpTemplate:
+    """
+    GRAPH: Graph Builder直方图, 横向分布图时axis为Y
+    REPORT: Distribution平台只保留统计报告
+    ITEM: 每个测项的图和报告左右排列
+    """
+    GRAPH = """
+        Graph Builder(
+            Size( {width}, 480 ),
+            Show Control Panel( 0 ),
+            Variables( {axis}( :"{key}" ){overlay} ),
+            Elements( Histogram( {axis}, Legend( 5 ) ){box} ),
+            SendToReport(
+                Dispatch(,"{key}",ScaleBox,{{{axis_params}}}){ref_lines}
+            )
+        )
+        """
+    REF_LINES = """,
+                Dispatch(,"Graph Builder",FrameBox,{{
+                    Add Ref Line( {l_limit}, "Solid", "Medium Dark Red", "LSL({l_limit})", 2),
+                    Add Ref Line( {h_limit}, "Solid", "Dark Red", "USL({h_limit})", 2 ),
+                    Add Ref Line( {avg}, "Dashed", "Blue", "Mean({avg})", 1 )
+                }})"""
+    AXIS = 'Format( "Fixed Dec", 12, {decimal} ), Min( {min} ), Max( {max} ), Inc( {inc} )'
+    REPORT = """
+        V List Box(
+            Distribution(
+                Stack( 1 ), Automatic Recalc( 1 ){by},
+                Continuous Distribution( Column( :"{key}" ), Horizontal Layout( 1 ), Vertical( 0 ){capability} ),
+                SendToReport(
+                    Dispatch( {{:"{key}"}}, "1", ScaleBox, {{{axis_params}}} ),
+                    Dispatch( {{:"{key}"}}, "Histogram", OutlineBox, {{Close( 1 )}} ),
+                    Dispatch( , "Distributions", OutlineBox, {{Set Title( "{key} - {title}" )}} )
+                )
+            )
+        )
+        """
+    CAPABILITY = ", Capability Analysis( LSL( {l_limit} ), USL( {h_limit} ) )"
+    ITEM = """
+        H List Box(
+            {graph};{report}
+        )
+        """
+
+    @staticmethod
+    def by(by_columns: list) -> str:
+        if not by_columns:
+            return ""
+        return ", By( {} )".format(", ".join(f':{col}' for col in by_columns))
+
+    @staticmethod
+    def graph(key: str, limits: dict, overlay_column: str = None, trans: bool = False) -> str:
+        """
+        :param limits: NewJmpFactory.get_jmp_lsl_usl(row, is_dis=True)
+        """
+        box = ""
+        if UiGlobalVariable.JmpDisPlotBox and not overlay_column:
+            box = ", Box Plot( {}, Legend( 6 ) )".format("Y" if trans else "X")
+        ref_lines = "" if UiGlobalVariable.JmpNoLimit else JmpTemplate.REF_LINES.format(**limits)
+        return JmpTemplate.GRAPH.format(
+            width=1085 if trans else 800,
+            axis="Y" if trans else "X",
+            key=key,
+            overlay=f', Overlay( :{overlay_column} )' if overlay_column else '',
+            box=box,
+            axis_params=JmpTemplate.AXIS.format(**limits),
+            ref_lines=ref_lines,
+        )
+
+    @staticmethod
+    def report(key: str, limits: dict, title: str, by: str) -> str:
+        """
+        :param by: JmpTemplate.by(by_columns), 所有测项相同, 只生成一次
+        """
+        capability = "" if UiGlobalVariable.JmpNoLimit else JmpTemplate.CAPABILITY.format(**limits)
+        return JmpTemplate.REPORT.format(
+            key=key, by=by, capability=capability, axis_params=JmpTemplate.AXIS.format(**limits), title=title,
+        )
+
+    @staticmethod
+    def item(graph: str, report: str) -> str:
+        return JmpTemplate.ITEM.format(graph=graph, report=report)
@@ -0,0 +1,83 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : group_histogram.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 多分组直方图, 一次bincount算出所有组, 细分计数缓存后重新分组
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from common.app_variable import GroupIndex
+
+
+class GroupHistogram:
+    """
+    1. 对一个测项, 用 np.bincount 在 (组编号, 细分bin) 上一次算出所有组的计数, 不再按组 value_counts
+    2. 细分计数(累加后)缓存在 GroupIndex.histogram_cache 中, 分组改变后GroupIndex重建, 缓存随之失效
+    3. 请求的bins落在缓存范围内并且不比细分bin细太多时, 直接用累加计数相减得到, 否则按请求的范围重建细分计数
+    区间和 value_counts(bins=edges) 一致: 右闭 (a, b], 第一个区间包含下限
+    从缓存重新分组时bin边界取最近的细分边界, 对不齐时边界附近的误差不超过半个细分bin, 只用于绘图
+    """
+    FINE_PER_BIN = 16  # 重建时每个请求的bin再细分的数量
+    MIN_FINE_PER_BIN = 8  # 请求的bin至少包含这么多细分bin才从缓存中取
+    CACHE_SIZE = 256  # 每个GroupIndex缓存的测项数
+
+    @staticmethod
+    def _cache(groups: GroupIndex) -> OrderedDict:
+        cache = getattr(groups, "histogram_cache", None)
+        if cache is None:
+            cache = groups.histogram_cache = OrderedDict()
+        return cache
+
+    @classmethod
+    def _build(cls, groups: GroupIndex, column, lo: float, hi: float, fine: int):
+        rows = groups.order
+        values = groups.df[column].to_numpy(dtype=np.float64)[rows]
+        codes = groups.codes[rows]
+        fine_edges = np.linspace(lo, hi, fine + 1)
+        valid = (values >= lo) & (values <= hi)
+        index = np.searchsorted(fine_edges, values[valid], side="left") - 1
+        index[index < 0] = 0
+        counts = np.bincount(
+            codes[valid] * fine + index, minlength=len(groups) * fine
+        ).reshape(len(groups), fine)
+        cumulative = np.zeros((len(groups), fine + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+        return fine_edges, cumulative
+
+    @classmethod
+    def _usable(cls, item, edges: np.ndarray) -> bool:
+        fine_edges, _ = item
+        step = fine_edges[1] - fine_edges[0]
+        tolerance = step * 1e-6
+        if edges[0] < fine_edges[0] - tolerance or edges[-1] > fine_edges[-1] + tolerance:
+            return False
+        return np.min(np.diff(edges)) >= step * cls.MIN_FINE_PER_BIN - tolerance
+
+    @classmethod
+    def counts(cls, groups: GroupIndex, column, edges: np.ndarray) -> np.ndarray:
+        """
+        :param groups: 分组(可以是masked后的GroupIndex)
+        :param column: 测项列(TEST_ID)
+        :param edges: 升序的bin边界, 如 np.linspace(y_min, y_max, bins)
+        :return: shape为(组数, len(edges) - 1)的计数, 行顺序和 groups.keys() 一致
+        """
+        edges = np.asarray(edges, dtype=np.float64)
+        if len(edges) < 2 or not edges[-1] > edges[0]:
+            return np.zeros((len(groups), max(len(edges) - 1, 0)), dtype=np.int64)
+        cache = cls._cache(groups)
+        item = cache.get(column)
+        if item is None or not cls._usable(item, edges):
+            item = cls._build(groups, column, edges[0], edges[-1], (len(edges) - 1) * cls.FINE_PER_BIN)
+            cache[column] = item
+            while len(cache) > cls.CACHE_SIZE:
+                cache.popitem(last=False)
+        cache.move_to_end(column)
+        fine_edges, cumulative = item
+        step = fine_edges[1] - fine_edges[0]
+        position = np.clip(np.rint((edges - fine_edges[0]) / step).astype(np.int64), 0, len(fine_edges) - 1)
+        return cumulative[:, position[1:]] - cumulative[:, position[:-1]]
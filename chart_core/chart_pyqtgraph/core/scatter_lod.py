@@ -0,0 +1,82 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : scatter_lod.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 散点图按视图抽样(LOD)
+"""
+from typing import List, Tuple
+
+import numpy as np
+from PySide2.QtCore import QThread, Signal
+
+
+class ScatterLod:
+    """
+    按当前视图和像素大小抽样:
+        1. 只取X在视图内的点, 不超过 full_points 时全部显示(放大后就是全分辨率)
+        2. 否则把视图按 cell 个像素划成网格, 每个有点的格子保留一个点, 密度分布和离群的孤立点都会保留
+        3. 每个像素列额外保留Y的最小/最大点(包括Y在视图外的), 极值不会被抽掉
+    返回的是行号, 用来从原数组中取点
+    """
+
+    @staticmethod
+    def decimate(x: np.ndarray, y: np.ndarray, view: Tuple[Tuple[float, float], Tuple[float, float]],
+                 pixels: Tuple[int, int], full_points: int, cell: int = 2) -> np.ndarray:
+        (x_min, x_max), (y_min, y_max) = view
+        visible = (x >= x_min) & (x <= x_max) & ~np.isnan(y)
+        index = np.flatnonzero(visible)
+        if len(index) <= full_points:
+            return index
+        width, height = max(int(pixels[0]), 1), max(int(pixels[1]), 1)
+        columns, rows = max(width // cell, 1), max(height // cell, 1)
+        x_span = (x_max - x_min) or 1
+        y_span = (y_max - y_min) or 1
+        vx, vy = x[index], y[index]
+        col = np.clip(((vx - x_min) / x_span * columns).astype(np.int64), 0, columns - 1)
+
+        in_y = (vy >= y_min) & (vy <= y_max)
+        row = np.clip(((vy[in_y] - y_min) / y_span * rows).astype(np.int64), 0, rows - 1)
+        _, cell_first = np.unique(col[in_y] * rows + row, return_index=True)
+        keep = [np.flatnonzero(in_y)[cell_first]]
+
+        order = np.lexsort((vy, col))
+        sorted_col = col[order]
+        starts = np.flatnonzero(np.r_[True, sorted_col[1:] != sorted_col[:-1]])
+        stops = np.r_[starts[1:], len(order)] - 1
+        keep.append(order[starts])
+        keep.append(order[stops])
+        return index[np.unique(np.concatenate(keep))]
+
+
+class ScatterLodWorker(QThread):
+    """
+    在子线程中计算各图层的抽样行号, 完成后发出 (generation, [行号, ...])
+    generation 用来丢弃已经过期的结果(视图又变化了)
+    """
+    lodSignal = Signal(int, list)
+
+    generation: int = 0
+    layers: List[Tuple[np.ndarray, np.ndarray]] = None
+    view = None
+    pixels = None
+    full_points: int = 0
+    cell: int = 2
+
+    def set_task(self, generation: int, layers: List[Tuple[np.ndarray, np.ndarray]], view, pixels,
+                 full_points: int, cell: int):
+        self.generation = generation
+        self.layers = layers
+        self.view = view
+        self.pixels = pixels
+        self.full_points = full_points
+        self.cell = cell
+
+    def run(self) -> None:
+        result = [
+            ScatterLod.decimate(x, y, self.view, self.pixels, self.full_points, self.cell)
+            for x, y in self.layers
+        ]
+        self.lodSignal.emit(self.generation, result)
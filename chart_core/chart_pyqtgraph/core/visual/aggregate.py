@@ -0,0 +1,96 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : aggregate.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 坐标聚合, 多颗die/多片wafer落在同一个(X, Y)格子时按 count/mean/median/min/max/last 聚合
+"""
+import numpy as np
+
+try:
+    from chart_core.chart_pyqtgraph.core.visual.visual import coord_aggregate_kernel
+except ImportError:
+    # 没有编译visual.pyx(python setup.py build_ext --inplace)时用numpy实现
+    coord_aggregate_kernel = None
+
+AGG_CODE = {"count": 0, "mean": 1, "median": 2, "min": 3, "max": 4, "last": 5}
+
+
+def _coord(x) -> np.ndarray:
+    """
+    坐标转成int64, NaN坐标转成-1(越界, 会被跳过)
+    """
+    x = np.asarray(x)
+    if x.dtype.kind == "f":
+        x = np.where(np.isnan(x), -1, x)
+    return x.astype(np.int64)
+
+
+def _cell_index(x, y, d, shape):
+    """
+    :return: 有效数据在c.ravel()中的位置, 有效数据
+    """
+    x, y = _coord(x), _coord(y)
+    d = np.asarray(d, dtype=np.float64)
+    valid = (x >= 0) & (x < shape[0]) & (y >= 0) & (y < shape[1]) & ~np.isnan(d)
+    return x[valid] * shape[1] + y[valid], d[valid]
+
+
+def coord_aggregate_numpy(x, y, d, shape, how: str = "last") -> np.ndarray:
+    """
+    numpy实现: count/mean用bincount, min/max用ufunc.at, median/last用排序
+    """
+    flat, d = _cell_index(x, y, d, shape)
+    size = shape[0] * shape[1]
+    count = np.bincount(flat, minlength=size)
+    out = np.full(size, np.nan)
+    filled = count > 0
+    if how == "count":
+        out[filled] = count[filled]
+    elif how == "mean":
+        out[filled] = np.bincount(flat, weights=d, minlength=size)[filled] / count[filled]
+    elif how == "min":
+        temp = np.full(size, np.inf)
+        np.minimum.at(temp, flat, d)
+        out[filled] = temp[filled]
+    elif how == "max":
+        temp = np.full(size, -np.inf)
+        np.maximum.at(temp, flat, d)
+        out[filled] = temp[filled]
+    elif how == "last":
+        cells, first_from_end = np.unique(flat[::-1], return_index=True)
+        out[cells] = d[::-1][first_from_end]
+    elif how == "median":
+        order = np.lexsort((d, flat))
+        cells, starts, counts = np.unique(flat[order], return_index=True, return_counts=True)
+        sorted_d = d[order]
+        out[cells] = (sorted_d[starts + (counts - 1) // 2] + sorted_d[starts + counts // 2]) / 2
+    else:
+        raise ValueError("unknown aggregate: {}".format(how))
+    return out.reshape(shape)
+
+
+def coord_aggregate(x, y, d, shape, how: str = "last") -> np.ndarray:
+    """
+    :param x: 相对于X_MIN的X坐标
+    :param y: 相对于Y_MIN的Y坐标
+    :param d: 数据, NaN跳过
+    :param shape: (X宽度, Y高度)
+    :param how: count/mean/median/min/max/last, last为按数据顺序最后一颗(和以前的coord_to_np一致)
+    :return: shape大小的float64数组, 没有数据的格子为NaN
+    """
+    if how not in AGG_CODE:
+        raise ValueError("unknown aggregate: {}".format(how))
+    if coord_aggregate_kernel is None or how == "median":
+        return coord_aggregate_numpy(x, y, d, shape, how)
+    c = np.full(shape, np.nan)
+    n = np.zeros(shape, dtype=np.int64)
+    coord_aggregate_kernel(
+        np.ascontiguousarray(_coord(x)),
+        np.ascontiguousarray(_coord(y)),
+        np.ascontiguousarray(d, dtype=np.float64),
+        c, n, AGG_CODE[how],
+    )
+    return c
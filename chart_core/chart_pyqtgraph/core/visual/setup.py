@@ -5,10 +5,13 @@
 @File    : setup.py
 @Author  : Link
 @Time    : 2022/8/25 22:46
-@Mark    : 
+@Mark    : Windows/Linux 都用: python setup.py build_ext --inplace
 """
 
-from distutils.core import setup, Extension
+try:
+    from setuptools import setup, Extension
+except ImportError:
+    from distutils.core import setup, Extension
 
 from Cython.Build import cythonize
 import numpy
@@ -19,6 +22,6 @@ setup(ext_modules=cythonize(
         sources=["visual.pyx"],
         language='c',
         include_dirs=[numpy.get_include()],
-
+        define_macros=[("NPY_NO_DEPRECATED_API", "NPY_1_7_API_VERSION")],
     )
     , language_level=3))
@@ -10,6 +10,17 @@
 
 cimport numpy as np
 cimport cython
+from libc.math cimport isnan
+
+np.import_array()
+
+# 和aggregate.AGG_CODE一致, median走排序, 不在这里
+cdef enum:
+    AGG_COUNT = 0
+    AGG_MEAN = 1
+    AGG_MIN = 3
+    AGG_MAX = 4
+    AGG_LAST = 5
 
 def add(a, b):
     cdef double x = 1.1
@@ -25,3 +36,42 @@ cpdef coord_to_np(np.ndarray[np.int16_t, ndim=1] x, np.ndarray[np.int16_t, ndim=
     l = x.shape[0]
     for i in range(l):
         c[x[i], y[i]] = d[i]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cpdef coord_aggregate_kernel(np.int64_t[:] x, np.int64_t[:] y, np.float64_t[:] d,
+                             np.float64_t[:, :] c, np.int64_t[:, :] n, int how):
+    """
+    一次遍历把每个(x, y)格子的 count/mean/min/max/last 聚合到c中, n为每个格子的有效数量
+    越界和NaN的数据跳过, c需要预先填充NaN, n需要预先填0
+    """
+    cdef Py_ssize_t i, l = x.shape[0], w = c.shape[0], h = c.shape[1]
+    cdef np.int64_t cx, cy
+    cdef double v
+    with nogil:
+        for i in range(l):
+            cx = x[i]
+            cy = y[i]
+            v = d[i]
+            if cx < 0 or cx >= w or cy < 0 or cy >= h or isnan(v):
+                continue
+            if n[cx, cy] == 0:
+                c[cx, cy] = 1 if how == AGG_COUNT else v
+            elif how == AGG_COUNT:
+                c[cx, cy] += 1
+            elif how == AGG_MEAN:
+                c[cx, cy] += v
+            elif how == AGG_MIN:
+                if v < c[cx, cy]:
+                    c[cx, cy] = v
+            elif how == AGG_MAX:
+                if v > c[cx, cy]:
+                    c[cx, cy] = v
+            else:
+                c[cx, cy] = v
+            n[cx, cy] += 1
+        if how == AGG_MEAN:
+            for cx in range(w):
+                for cy in range(h):
+                    if n[cx, cy] > 0:
+                        c[cx, cy] /= n[cx, cy]
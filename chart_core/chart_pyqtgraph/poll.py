@@ -14,6 +14,7 @@ from PySide2.QtWidgets import QMainWindow
 from pyqtgraph.dockarea import DockArea, Dock
 
 from chart_core.chart_pyqtgraph.core.mixin import ChartType
+from chart_core.chart_pyqtgraph.ui_components.chart_bin_pareto import BinParetoChart
 from chart_core.chart_pyqtgraph.ui_components.ui_multi_chart import MultiChartWindow
 from chart_core.chart_pyqtgraph.ui_designer.ui_chart_window import Ui_MainWindow
 from common.li import Li, SummaryCore
@@ -24,6 +25,9 @@ class MyDock(Dock):
     closeSignal = Signal(object)
 
     def close(self):
+        # 先关闭dock中的控件, 触发它们的closeEvent来停掉后台任务
+        for widget in self.widgets or []:
+            widget.close()
         super(MyDock, self).close()
         Print.warning("Dock Close")
         self.widgets = None
@@ -97,6 +101,11 @@ class ChartDockWindow(QMainWindow, Ui_MainWindow):
             mapping_chart.set_data(test_id_list, chart_type)
             dock = MyDock("Mapping图_{}".format(self.charts), size=(600, 500), closable=True)
             dock.addWidget(mapping_chart)
+        if chart_type == ChartType.BinPareto:
+            pareto_chart = BinParetoChart(self.li)
+            pareto_chart.set_data()
+            dock = MyDock("Bin Pareto_{}".format(self.charts), size=(600, 400), closable=True)
+            dock.addWidget(pareto_chart)
         return self.add_dock(dock)
 
     def add_summary_dock(self):
@@ -142,5 +151,30 @@ class ChartDockWindow(QMainWindow, Ui_MainWindow):
 
         return self.add_dock(dock)
 
+    def show_process_widget(self):
+        """
+        显示分组制程能力(GROUP x DA_GROUP), 分组用Li当前的group_params/da_group_params
+        :return: 是否成功添加
+        """
+        from ui_component.ui_analysis_stdf.ui_components.ui_processing import ProcessWidget
+
+        if self.li is None:
+            Print.warning("Li数据未初始化")
+            return False
+
+        if self.li.capability_key_list is None or len(self.li.capability_key_list) == 0:
+            Print.warning("制程能力数据未计算，请先加载数据并计算")
+            return False
+
+        self.charts += 1
+        process_widget = ProcessWidget(self)
+        process_widget.set_data(self.li)
+        process_widget.gen_listView()
+
+        dock = MyDock("分组制程能力_{}".format(self.charts), size=(1000, 800), closable=True)
+        dock.addWidget(process_widget)
+
+        return self.add_dock(dock)
+
     def closeDock(self, dock_name):
         del self.area.docks[dock_name]
\ No newline at end of file
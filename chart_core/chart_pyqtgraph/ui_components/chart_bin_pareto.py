@@ -0,0 +1,168 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : chart_bin_pareto.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : Bin Pareto图, 数据来自解析时保存的Bin计数(BinCube), 不读原始数据
+"""
+import numpy as np
+import pandas as pd
+from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox, QPushButton
+from PySide2.QtGui import QFont
+import pyqtgraph as pg
+from pyqtgraph import PlotWidget, BarGraphItem, ViewBox
+
+from chart_core.chart_pyqtgraph.ui_components.ui_unit_chart import UnitChartWindow
+from common.li import Li
+from parser_core.stdf_bin_cube import BinCube
+
+
+class BinParetoChart(UnitChartWindow):
+    """
+    Bin Pareto图:
+        1. 柱状图为每个BIN的数量(降序), 右轴折线为累计百分比, 百分比的分母是所有BIN的总数
+        2. 可选 SOFT_BIN/HARD_BIN, Final Test(每个坐标最后一次)/All Test, 单个Site, 是否只看Fail Bin
+    数据空间中文件再多, 也只是把每个文件几百行的bin_cube合并起来
+    """
+    SCOPE = {"Final Test": "FINAL_QTY", "All Test": "QTY"}
+
+    def __init__(self, li: Li):
+        super(BinParetoChart, self).__init__()
+        self.li = li
+        self.bin_cube: pd.DataFrame = None
+        self.pareto_df: pd.DataFrame = None
+
+        self.init_ui()
+
+        if self.li:
+            self.li.QChartRefresh.connect(self.li_chart_signal)
+
+    def init_ui(self):
+        self.main_widget = QWidget()
+        self.setCentralWidget(self.main_widget)
+        main_layout = QVBoxLayout(self.main_widget)
+
+        control_layout = QHBoxLayout()
+        self.title_label = QLabel("Bin Pareto")
+        font = QFont()
+        font.setPointSize(14)
+        font.setBold(True)
+        self.title_label.setFont(font)
+        control_layout.addWidget(self.title_label)
+        control_layout.addStretch()
+
+        self.bin_type_combo = QComboBox()
+        self.bin_type_combo.addItems(["SOFT_BIN", "HARD_BIN"])
+        self.bin_type_combo.currentIndexChanged.connect(self.refresh_pareto)
+        control_layout.addWidget(self.bin_type_combo)
+
+        self.scope_combo = QComboBox()
+        self.scope_combo.addItems(list(self.SCOPE))
+        self.scope_combo.currentIndexChanged.connect(self.refresh_pareto)
+        control_layout.addWidget(self.scope_combo)
+
+        self.site_combo = QComboBox()
+        self.site_combo.currentIndexChanged.connect(self.refresh_pareto)
+        control_layout.addWidget(self.site_combo)
+
+        self.fail_only_check = QCheckBox("Fail Only")
+        self.fail_only_check.setChecked(True)
+        self.fail_only_check.stateChanged.connect(self.refresh_pareto)
+        control_layout.addWidget(self.fail_only_check)
+
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.set_data)
+        control_layout.addWidget(refresh_btn)
+        main_layout.addLayout(control_layout)
+
+        self.pw = PlotWidget()
+        self.pw.setMouseEnabled(x=True, y=False)
+        self.plot_item = self.pw.getPlotItem()
+        self.plot_item.setLabel("left", "QTY")
+        self.plot_item.showAxis("right")
+        self.plot_item.setLabel("right", "Cumulative %")
+        self.plot_item.showGrid(y=True, alpha=0.3)
+        # 累计百分比画在第二个ViewBox中, 对应右轴
+        self.percent_vb = ViewBox()
+        self.plot_item.scene().addItem(self.percent_vb)
+        self.plot_item.getAxis("right").linkToView(self.percent_vb)
+        self.percent_vb.setXLink(self.plot_item)
+        self.percent_vb.setYRange(0, 105, padding=0)
+        self.percent_vb.setMouseEnabled(x=False, y=False)
+        self.plot_item.vb.sigResized.connect(self.update_views)
+        main_layout.addWidget(self.pw, stretch=4)
+
+        self.info_label = QLabel("")
+        main_layout.addWidget(self.info_label)
+
+    def update_views(self):
+        self.percent_vb.setGeometry(self.plot_item.vb.sceneBoundingRect())
+        self.percent_vb.linkedViewChanged(self.plot_item.vb, self.percent_vb.XAxis)
+
+    def set_data(self):
+        """ 重新取数据空间中所有文件的Bin计数 """
+        if self.li is None:
+            return
+        self.bin_cube = self.li.get_bin_cube()
+        sites = [] if self.bin_cube is None else sorted(self.bin_cube["SITE_NUM"].unique())
+        current = self.site_combo.currentText()
+        self.site_combo.blockSignals(True)
+        self.site_combo.clear()
+        self.site_combo.addItems(["All Site"] + ["S{:03d}".format(int(each)) for each in sites])
+        if self.site_combo.findText(current) >= 0:
+            self.site_combo.setCurrentText(current)
+        self.site_combo.blockSignals(False)
+        self.refresh_pareto()
+
+    def li_chart_signal(self):
+        if self.action_signal_binding.isChecked():
+            self.set_data()
+
+    def select_cube(self) -> pd.DataFrame:
+        cube = self.bin_cube
+        if self.site_combo.currentIndex() > 0:
+            cube = cube[cube["SITE_NUM"] == int(self.site_combo.currentText()[1:])]
+        return cube
+
+    def refresh_pareto(self):
+        self.plot_item.clear()
+        self.percent_vb.clear()
+        if self.bin_cube is None or len(self.bin_cube) == 0:
+            self.info_label.setText("没有Bin数据")
+            return
+        bin_type = self.bin_type_combo.currentText()
+        self.pareto_df = BinCube.pareto(
+            self.select_cube(), bin_type, self.SCOPE[self.scope_combo.currentText()],
+            self.fail_only_check.isChecked(),
+        )
+        if self.pareto_df.empty:
+            self.info_label.setText("没有{}数据".format("Fail Bin" if self.fail_only_check.isChecked() else "Bin"))
+            return
+
+        x = np.arange(len(self.pareto_df))
+        brushes = [
+            pg.mkBrush(0, 170, 0, 200) if is_pass else pg.mkBrush(220, 60, 60, 200)
+            for is_pass in self.pareto_df["IS_PASS"]
+        ]
+        bar = BarGraphItem(x=x, height=self.pareto_df["QTY"].to_numpy(), width=0.7, brushes=brushes)
+        self.plot_item.addItem(bar)
+
+        line = pg.PlotDataItem(
+            x, self.pareto_df["CUM_PERCENTAGE"].to_numpy(),
+            pen=pg.mkPen(30, 30, 200, width=2), symbol="o", symbolSize=5, symbolBrush=(30, 30, 200),
+        )
+        self.percent_vb.addItem(line)
+
+        ticks = [(i, "B{}".format(int(each))) for i, each in enumerate(self.pareto_df["BIN"])]
+        self.plot_item.getAxis("bottom").setTicks([ticks])
+        self.plot_item.setXRange(-0.5, len(x) - 0.5, padding=0.02)
+        self.plot_item.setYRange(0, self.pareto_df["QTY"].max() * 1.1, padding=0)
+        self.update_views()
+
+        top = self.pareto_df.iloc[0]
+        self.info_label.setText("{}: {} Bins, Top B{} {} ({:.2f}%), 文件数 {}".format(
+            bin_type, len(self.pareto_df), int(top["BIN"]), int(top["QTY"]), top["PERCENTAGE"],
+            self.bin_cube["ID"].nunique(),
+        ))
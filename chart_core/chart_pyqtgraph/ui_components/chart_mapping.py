@@ -15,14 +15,17 @@ import pandas as pd
 from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                                QComboBox, QPushButton, QTableWidget, 
                                QTableWidgetItem, QHeaderView, QSplitter)
-from PySide2.QtCore import Slot, Qt
+from PySide2.QtCore import Slot, Qt, QRectF
 from PySide2.QtGui import QFont, QColor
 import pyqtgraph as pg
 from pyqtgraph import GraphicsLayoutWidget, ImageItem, ColorBarItem
 from pyqtgraph.Qt import QtWidgets
 
 from chart_core.chart_pyqtgraph.ui_components.ui_unit_chart import UnitChartWindow
+from common.app_variable import DatatType
 from common.li import Li
+from parser_core.stdf_bin_cube import BinCube
+from parser_core.stdf_die_history import DieHistory
 from ui_component.ui_app_variable import UiGlobalVariable
 
 
@@ -42,24 +45,50 @@ def coord_to_np(x, y, d, c):
         c[valid_x, valid_y] = valid_d
 
 
+def coord_to_index_grid(x, y, d):
+    """
+    和coord_to_np一样把坐标栅格化, 格子里存的是行号, 空位为-1, 同一坐标有多颗时保留最后一颗
+    :return: grid[x - x0, y - y0], x0, y0
+    """
+    valid_mask = ~(np.isnan(x) | np.isnan(y) | np.isnan(d))
+    if not np.any(valid_mask):
+        return np.full((0, 0), -1, dtype=np.int64), 0, 0
+    valid_x = x[valid_mask].astype(np.int64)
+    valid_y = y[valid_mask].astype(np.int64)
+    x0, y0 = valid_x.min(), valid_y.min()
+    grid = np.full((valid_x.max() - x0 + 1, valid_y.max() - y0 + 1), -1, dtype=np.int64)
+    grid[valid_x - x0, valid_y - y0] = np.flatnonzero(valid_mask)
+    return grid, int(x0), int(y0)
+
+
+def index_grid_to_rgba(grid, bin_values, lut, color_dict, missing_color=(128, 128, 128, 255)):
+    """
+    用create_dynamic_colormap的LUT给每个格子上色, 空位透明, 不在color_dict中的bin为灰色
+    """
+    palette = np.tile(np.array(missing_color, dtype=np.ubyte), (len(lut) + 1, 1))
+    known = np.array([b for b in color_dict if 0 <= b < len(lut)], dtype=np.int64)
+    palette[known] = lut[known]
+    rgba = np.zeros(grid.shape + (4,), dtype=np.ubyte)
+    filled = grid >= 0
+    bins = bin_values[grid[filled]].astype(np.int64)
+    bins[(bins < 0) | (bins >= len(lut))] = len(lut)
+    rgba[filled] = palette[bins]
+    return rgba
+
+
 def create_dynamic_colormap(bin_values, fail_flags, mapping_type="SOFT_BIN"):
     """动态创建PASS/FAIL颜色映射"""
+    bin_values = np.asarray(bin_values, dtype=np.float64)
+    fail_flags = np.asarray(fail_flags, dtype=np.float64)
+    valid = ~(np.isnan(bin_values) | np.isnan(fail_flags))
+    bin_ints = bin_values[valid].astype(np.int64)
+    flag_ints = fail_flags[valid].astype(np.int64)
     unique_bins = {}
-    bin_fail_counts = {}
-    
-    for bin_val, fail_flag in zip(bin_values, fail_flags):
-        if not np.isnan(bin_val) and not np.isnan(fail_flag):
-            bin_val_int = int(bin_val)
-            fail_flag_int = int(fail_flag)
-            
-            if bin_val_int not in bin_fail_counts:
-                bin_fail_counts[bin_val_int] = {0: 0, 1: 0}
-            
-            if fail_flag_int in [0, 1]:
-                bin_fail_counts[bin_val_int][fail_flag_int] += 1
-    
-    for bin_val_int, counts in bin_fail_counts.items():
-        unique_bins[bin_val_int] = 1 if counts[1] >= counts[0] else 0
+    if len(bin_ints):
+        bins, inverse = np.unique(bin_ints, return_inverse=True)
+        pass_counts = np.bincount(inverse, weights=flag_ints == 1, minlength=len(bins))
+        fail_counts = np.bincount(inverse, weights=flag_ints == 0, minlength=len(bins))
+        unique_bins = {int(b): 1 if p >= f else 0 for b, p, f in zip(bins, pass_counts, fail_counts)}
     
     if not unique_bins:
         lut = np.array([[0, 0, 0, 255]], dtype=np.ubyte)
@@ -238,8 +267,11 @@ class MappingChart(UnitChartWindow):
         # 颜色映射缓存
         self.current_color_dict = {}
         
-        # 芯片数据缓存（用于鼠标悬停）
-        self.chip_data = {}  # {(x, y): {'bin': int, 'idx': int, 'site': int}}
+        # 芯片数据缓存（用于鼠标悬停）, hover_grid[x - x0, y - y0] 为 hover_df 的行号, 空位为-1
+        self.hover_grid = None
+        self.hover_origin = (0, 0)
+        self.hover_df = None
+        self.hover_mapping_col = None
         
         self.init_ui()
         self.init_coord()
@@ -276,6 +308,23 @@ class MappingChart(UnitChartWindow):
         self.test_type_combo.currentIndexChanged.connect(self.refresh_mapping)
         control_layout.addWidget(self.test_type_combo)
 
+        # 单片/多片叠加
+        self.stack_combo = QComboBox()
+        self.stack_combo.addItems(["Wafer", "Stacked Yield", "Stacked Bin", "Stacked Param"])
+        self.stack_combo.currentIndexChanged.connect(self.refresh_mapping)
+        control_layout.addWidget(self.stack_combo)
+
+        self.stack_bin_combo = QComboBox()
+        self.stack_bin_combo.currentIndexChanged.connect(self.refresh_mapping)
+        self.stack_bin_combo.hide()
+        control_layout.addWidget(self.stack_bin_combo)
+
+        # 叠加参数均值时选择测项(TEXT)
+        self.stack_param_combo = QComboBox()
+        self.stack_param_combo.currentIndexChanged.connect(self.refresh_mapping)
+        self.stack_param_combo.hide()
+        control_layout.addWidget(self.stack_param_combo)
+
         # 刷新按钮
         refresh_btn = QPushButton("刷新")
         refresh_btn.clicked.connect(self.refresh_mapping)
@@ -336,9 +385,16 @@ class MappingChart(UnitChartWindow):
         if self.action_signal_binding.isChecked():
             self.refresh_mapping()
 
+    def _select_test_positions(self, history: DieHistory) -> np.ndarray:
+        """ Final Test取每个坐标最后一次测试, 否则取第一次 """
+        if self.test_type_combo.currentText() == 'Final Test':
+            return history.final_positions()
+        return history.first_positions()
+
     def _calculate_bin_statistics(self, data_df, mapping_col):
         """
-        计算bin统计信息.
+        计算bin统计信息, 先把选取的数据统计成Bin计数(BinCube), 图例只读计数.
+        is_pass: 该bin中PASS的数量不少于FAIL的数量
         
         返回:
             bin_stats: {bin_value: {'count': int, 'percentage': float, 'is_pass': bool}}
@@ -346,35 +402,12 @@ class MappingChart(UnitChartWindow):
         if data_df.empty or mapping_col not in data_df.columns:
             return {}
 
-        bin_stats = {}
-        total_count = len(data_df)
-        
-        if total_count == 0:
-            return bin_stats
-        
-        # 基于传入的数据进行统计
-        bin_counts = data_df[mapping_col].value_counts()
-        
-        for bin_val, count in bin_counts.items():
-            if pd.isna(bin_val):
-                continue
-            
-            # 获取该bin的FAIL_FLAG (以第一个为代表)
-            is_pass = False
-            if 'FAIL_FLAG' in data_df.columns:
-                fail_flag_series = data_df[data_df[mapping_col] == bin_val]['FAIL_FLAG']
-                if not fail_flag_series.empty:
-                    is_pass = fail_flag_series.iloc[0] == 1
-
-            percentage = (count / total_count) * 100
-            
-            bin_stats[int(bin_val)] = {
-                'count': count,
-                'percentage': percentage,
-                'is_pass': is_pass
-            }
-        
-        return bin_stats
+        data_df = data_df[data_df[mapping_col].notna()]
+        for column in ('SITE_NUM', 'FAIL_FLAG'):
+            if column not in data_df.columns:
+                data_df = data_df.assign(**{column: 0})
+        bin_cube = BinCube.build(data_df, np.arange(len(data_df)), bin_types=(mapping_col,))
+        return BinCube.legend(bin_cube, mapping_col)
 
     def set_data(self):
         """设置数据并刷新"""
@@ -396,11 +429,12 @@ class MappingChart(UnitChartWindow):
             if not self.li or not hasattr(self.li, 'to_chart_csv_data') or self.li.to_chart_csv_data is None:
                 return
 
+            # 只读, 不复制, 这样同一份数据的DieHistory可以在重绘时复用
             source_df = None
             if hasattr(self.li.to_chart_csv_data, 'chart_df') and self.li.to_chart_csv_data.chart_df is not None:
-                source_df = self.li.to_chart_csv_data.chart_df.copy()
+                source_df = self.li.to_chart_csv_data.chart_df
             elif hasattr(self.li.to_chart_csv_data, 'df') and self.li.to_chart_csv_data.df is not None:
-                source_df = self.li.to_chart_csv_data.df.copy()
+                source_df = self.li.to_chart_csv_data.df
 
             if source_df is None or len(source_df) == 0:
                 return
@@ -416,6 +450,12 @@ class MappingChart(UnitChartWindow):
 
             self.graphics_widget.clear()
 
+            if self.stack_combo.currentText() != "Wafer":
+                self._generate_stacked_mapping()
+                return
+            self.stack_bin_combo.hide()
+            self.stack_param_combo.hide()
+
             if 'GROUP' in source_df.columns and len(source_df['GROUP'].unique()) > 1:
                 self._generate_grouped_mapping(source_df, mapping_col)
             else:
@@ -428,83 +468,29 @@ class MappingChart(UnitChartWindow):
 
 
     def _generate_single_mapping(self, data_df, mapping_col):
-        """生成单个Mapping图 - 竖条散点快速渲染（动态调整大小）"""
+        """生成单个Mapping图 - 栅格化后用ImageItem渲染"""
         # 根据选择器过滤数据
-        test_type = self.test_type_combo.currentText()
-        keep_option = 'last' if test_type == 'Final Test' else 'first'
-        data_df = data_df.drop_duplicates(subset=['X_COORD', 'Y_COORD'], keep=keep_option)
+        data_df = data_df.take(self._select_test_positions(DieHistory.of(data_df)))
         
         bin_stats = self._calculate_bin_statistics(data_df, mapping_col)
         
         bin_values = data_df[mapping_col].dropna().values
         fail_flags = data_df.loc[data_df[mapping_col].notna(), 'FAIL_FLAG'].values if 'FAIL_FLAG' in data_df.columns else np.ones(len(bin_values))
         
-        _, self.current_color_dict = create_dynamic_colormap(bin_values, fail_flags, "SOFT_BIN")
-        
-        self.chip_data = {}
-        has_site = 'SITE_NUM' in data_df.columns
+        lut, self.current_color_dict = create_dynamic_colormap(bin_values, fail_flags, "SOFT_BIN")
         
         plot_item = self.graphics_widget.addPlot()
         plot_item.invertY(True)
         plot_item.hideAxis('bottom')
         plot_item.hideAxis('left')
         
-        scatter_pos = []
-        scatter_brushes = []
+        self.hover_df, self.hover_mapping_col = data_df, mapping_col
+        self.hover_grid, x0, y0 = self._add_grid_image(plot_item, data_df, mapping_col, lut)
+        self.hover_origin = (x0, y0)
         
-        valid_mask = ~(np.isnan(data_df.X_COORD.values) | np.isnan(data_df.Y_COORD.values) | np.isnan(data_df[mapping_col].values))
-        
-        if np.any(valid_mask):
-            valid_indices = np.where(valid_mask)[0]
-            
-            for idx in valid_indices:
-                x = int(data_df.X_COORD.iloc[idx])
-                y = int(data_df.Y_COORD.iloc[idx])
-                bin_val = int(data_df[mapping_col].iloc[idx])
-                
-                site = "N/A"
-                if has_site:
-                    try:
-                        site_val = data_df['SITE_NUM'].iloc[idx]
-                        if not pd.isna(site_val):
-                            site = str(site_val)
-                    except (KeyError, IndexError):
-                        pass
-                
-                self.chip_data[(x, y)] = {'bin': bin_val, 'idx': idx, 'site': site}
-                scatter_pos.append((x, y))
-                
-                if bin_val in self.current_color_dict:
-                    r, g, b, a = self.current_color_dict[bin_val]
-                    scatter_brushes.append(pg.mkBrush(r, g, b, a))
-                else:
-                    scatter_brushes.append(pg.mkBrush(128, 128, 128, 255))
-        
-        # 计算长条大小（使用数据坐标系）
         x_range = self.x_max - self.x_min
         y_range = self.y_max - self.y_min
         
-        # 芯片间距（假设芯片间距为1个单位）
-        chip_spacing = 1.0
-        
-        if scatter_pos:
-            from pyqtgraph import QtGui
-            path = QtGui.QPainterPath()
-            # 长条形：宽度0.25单位，高度0.8单位（数据坐标系）
-            bar_width = chip_spacing * 0.25
-            bar_height = chip_spacing * 0.8
-            path.addRect(-bar_width/2, -bar_height/2, bar_width, bar_height)
-            
-            scatter = pg.ScatterPlotItem(
-                pos=scatter_pos,
-                brush=scatter_brushes,
-                pen=None,  # 去掉黑边框
-                size=bar_height,
-                symbol=path,
-                pxMode=False
-            )
-            plot_item.addItem(scatter)
-        
         x_center = (self.x_min + self.x_max) / 2
         y_center = (self.y_min + self.y_max) / 2
         wafer_diameter = max(x_range, y_range)
@@ -527,15 +513,47 @@ class MappingChart(UnitChartWindow):
         
         self.legend_widget.update_legend(bin_stats, self.current_color_dict)
     
+    def _add_grid_image(self, plot_item, data_df, mapping_col, lut):
+        """
+        所有die栅格化成一个二维数组, 用一个ImageItem画出, 每颗die占一个单位格子(中心在整数坐标上)
+        :return: 行号网格, x0, y0
+        """
+        grid, x0, y0 = coord_to_index_grid(
+            data_df.X_COORD.to_numpy(dtype=np.float64),
+            data_df.Y_COORD.to_numpy(dtype=np.float64),
+            data_df[mapping_col].to_numpy(dtype=np.float64),
+        )
+        if grid.size == 0:
+            return grid, x0, y0
+        rgba = index_grid_to_rgba(grid, data_df[mapping_col].to_numpy(dtype=np.float64), lut, self.current_color_dict)
+        image = ImageItem(rgba, axisOrder="col-major")
+        image.setRect(QRectF(x0 - 0.5, y0 - 0.5, grid.shape[0], grid.shape[1]))
+        plot_item.addItem(image)
+        return grid, x0, y0
+
+    def _hover_row(self, x: int, y: int) -> int:
+        if self.hover_grid is None:
+            return -1
+        gx, gy = x - self.hover_origin[0], y - self.hover_origin[1]
+        if 0 <= gx < self.hover_grid.shape[0] and 0 <= gy < self.hover_grid.shape[1]:
+            return int(self.hover_grid[gx, gy])
+        return -1
+
     def _on_mouse_moved(self, pos, plot_item):
         """鼠标移动事件 - 显示tooltip"""
         if plot_item.sceneBoundingRect().contains(pos):
             mouse_point = plot_item.vb.mapSceneToView(pos)
             x, y = int(round(mouse_point.x())), int(round(mouse_point.y()))
             
-            if (x, y) in self.chip_data:
-                data = self.chip_data[(x, y)]
-                tooltip_text = f"X: {x}\nY: {y}\nBin: {data['bin']}\nSite: {data['site']}\nIDX: {data['idx']}"
+            idx = self._hover_row(x, y)
+            if idx >= 0:
+                bin_val = int(self.hover_df[self.hover_mapping_col].iat[idx])
+                site = "N/A"
+                if 'SITE_NUM' in self.hover_df.columns:
+                    site_val = self.hover_df['SITE_NUM'].iat[idx]
+                    if not pd.isna(site_val):
+                        site = str(site_val)
+                tooltip_text = f"X: {x}\nY: {y}\nBin: {bin_val}\nSite: {site}\nIDX: {idx}"
                 self.tooltip_label.setText(tooltip_text)
                 self.tooltip_label.setPos(mouse_point.x(), mouse_point.y())
                 self.tooltip_label.setVisible(True)
@@ -545,11 +563,11 @@ class MappingChart(UnitChartWindow):
             self.tooltip_label.setVisible(False)
 
     def _generate_grouped_mapping(self, data_df, mapping_col):
-        """生成分组Mapping图 - 竖条散点（动态调整大小）"""
-        test_type = self.test_type_combo.currentText()
-        keep_option = 'last' if test_type == 'Final Test' else 'first'
-
-        map_groups = data_df.groupby("GROUP")
+        """生成分组Mapping图 - 每组一个ImageItem"""
+        self.hover_grid = None
+        # 每个组内各自取首测/最终测试, 和组内drop_duplicates一致
+        history = DieHistory.of(data_df, by="GROUP")
+        map_groups = data_df.take(self._select_test_positions(history)).groupby("GROUP")
 
         if len(map_groups) > 16:
             map_groups = dict(list(map_groups)[:16])
@@ -561,15 +579,13 @@ class MappingChart(UnitChartWindow):
         # 颜色映射基于所有数据，确保颜色一致性
         bin_values = data_df[mapping_col].dropna().values
         fail_flags = data_df.loc[data_df[mapping_col].notna(), 'FAIL_FLAG'].values if 'FAIL_FLAG' in data_df.columns else np.ones(len(bin_values))
-        _, self.current_color_dict = create_dynamic_colormap(bin_values, fail_flags, "SOFT_BIN")
+        lut, self.current_color_dict = create_dynamic_colormap(bin_values, fail_flags, "SOFT_BIN")
 
         all_group_stats = {}
-        chip_spacing = 1.0
 
         for idx, (group_name, group_df) in enumerate(map_groups):
-            # 在每个组内部进行数据筛选
-            filtered_group_df = group_df.drop_duplicates(subset=['X_COORD', 'Y_COORD'], keep=keep_option)
-            
+            filtered_group_df = group_df
+
             # 为每个组计算独立的统计数据
             group_bin_stats = self._calculate_bin_statistics(filtered_group_df, mapping_col)
             all_group_stats[group_name] = group_bin_stats
@@ -582,43 +598,7 @@ class MappingChart(UnitChartWindow):
             plot_item.hideAxis('bottom')
             plot_item.hideAxis('left')
             
-            scatter_pos = []
-            scatter_brushes = []
-            
-            # 使用筛选后的数据进行绘图
-            valid_mask = ~(np.isnan(filtered_group_df.X_COORD.values) | np.isnan(filtered_group_df.Y_COORD.values) | np.isnan(filtered_group_df[mapping_col].values))
-            if np.any(valid_mask):
-                valid_indices = np.where(valid_mask)[0]
-                
-                for i in valid_indices:
-                    x = int(filtered_group_df.X_COORD.iloc[i])
-                    y = int(filtered_group_df.Y_COORD.iloc[i])
-                    bin_val = int(filtered_group_df[mapping_col].iloc[i])
-                    
-                    scatter_pos.append((x, y))
-                    
-                    if bin_val in self.current_color_dict:
-                        r, g, b, a = self.current_color_dict[bin_val]
-                        scatter_brushes.append(pg.mkBrush(r, g, b, a))
-                    else:
-                        scatter_brushes.append(pg.mkBrush(128, 128, 128, 255))
-            
-            if scatter_pos:
-                from pyqtgraph import QtGui
-                path = QtGui.QPainterPath()
-                bar_width = chip_spacing * 0.25
-                bar_height = chip_spacing * 0.8
-                path.addRect(-bar_width/2, -bar_height/2, bar_width, bar_height)
-                
-                scatter = pg.ScatterPlotItem(
-                    pos=scatter_pos,
-                    brush=scatter_brushes,
-                    pen=None,
-                    size=bar_height,
-                    symbol=path,
-                    pxMode=False
-                )
-                plot_item.addItem(scatter)
+            self._add_grid_image(plot_item, filtered_group_df, mapping_col, lut)
             
             x_center = (self.x_min + self.x_max) / 2
             y_center = (self.y_min + self.y_max) / 2
@@ -636,6 +616,71 @@ class MappingChart(UnitChartWindow):
         # 使用新的图例方法显示所有分组的统计
         self.legend_widget.update_legend(all_group_stats, self.current_color_dict)
 
+    @staticmethod
+    def _set_combo_items(combo: QComboBox, items: list):
+        """ 选项变了才重建, 尽量保持当前的选择 """
+        if [combo.itemText(i) for i in range(combo.count())] == items:
+            return
+        current = combo.currentText()
+        combo.blockSignals(True)
+        combo.clear()
+        combo.addItems(items)
+        if current in items:
+            combo.setCurrentText(current)
+        combo.blockSignals(False)
+
+    def _generate_stacked_mapping(self):
+        """
+        多片wafer叠加: 每个坐标的良率, 某个SOFT_BIN出现的频率或某个参数的均值, 都是最后一次测试
+        叠加不受分组和选取的影响, 用的是数据空间中所有文件
+        """
+        self.hover_grid = None
+        stack = self.li.get_wafer_stack()
+        if stack is None or stack.tested.size == 0:
+            return
+        mode = self.stack_combo.currentText()
+        self.stack_bin_combo.setVisible(mode == "Stacked Bin")
+        self.stack_param_combo.setVisible(mode == "Stacked Param")
+        levels = (0, 1)
+        if mode == "Stacked Bin":
+            bins = [str(each) for each in stack.bins()]
+            self._set_combo_items(self.stack_bin_combo, bins)
+            if not bins:
+                return
+            soft_bin = int(self.stack_bin_combo.currentText())
+            data, title = stack.bin_map(soft_bin), f"Bin {soft_bin} Frequency ({len(stack)} Wafers)"
+        elif mode == "Stacked Param":
+            # 不同文件的TEST_ID不同, 用TEXT对齐, 只有PTR/MPR有参数值
+            texts = [
+                each["TEXT"] for each in (self.li.capability_key_list or [])
+                if each["TEST_TYPE"] in (DatatType.PTR, DatatType.MPR)
+            ]
+            self._set_combo_items(self.stack_param_combo, list(dict.fromkeys(texts)))
+            if not texts:
+                return
+            text = self.stack_param_combo.currentText()
+            data, title = stack.param_map(text), f"{text} Mean ({len(stack)} Wafers)"
+            if np.isnan(data).all():
+                return
+            levels = (float(np.nanmin(data)), float(np.nanmax(data)))
+            if levels[0] == levels[1]:
+                levels = (levels[0] - 0.5, levels[1] + 0.5)
+        else:
+            data, title = stack.yield_map(), f"Stacked Yield ({len(stack)} Wafers)"
+
+        plot_item = self.graphics_widget.addPlot(title=title)
+        plot_item.invertY(True)
+        plot_item.hideAxis('bottom')
+        plot_item.hideAxis('left')
+        image = ImageItem(data, axisOrder="col-major")
+        image.setRect(QRectF(stack.x0 - 0.5, stack.y0 - 0.5, data.shape[0], data.shape[1]))
+        plot_item.addItem(image)
+        bar = ColorBarItem(values=levels, limits=levels, width=10, colorMap=pg.colormap.get("CET-D8"))
+        bar.setImageItem(image)
+        self.graphics_widget.addItem(bar)
+        plot_item.autoRange()
+        self.legend_widget.update_legend({}, {})
+
     def closeEvent(self, event):
         """关闭事件处理"""
         try:
@@ -18,6 +18,7 @@ from PySide2.QtGui import QCloseEvent
 from pyqtgraph import InfiniteLine, BarGraphItem
 
 from app_test.test_utils.wrapper_utils import Time
+from chart_core.chart_pyqtgraph.core.group_histogram import GroupHistogram
 from chart_core.chart_pyqtgraph.core.mixin import BasePlot, GraphRangeSignal, PlotWidget, RangeData
 from chart_core.chart_pyqtgraph.core.view_box import CustomViewBox
 from chart_core.chart_pyqtgraph.ui_components.ui_unit_chart import UnitChartWindow
@@ -99,9 +100,11 @@ class TransBarChart(UnitChartWindow, BasePlot):
             """
             show all front
             """
-            self.li.set_chart_data(None)
+            self.li.set_chart_mask(None)
             return
-        chart_prr_list = []
+        group_df = self.li.to_chart_csv_data.group_df
+        result = group_df.df[self.key].to_numpy()
+        chart_mask = np.zeros(len(result), dtype=bool)
         for ax in axs:
             """
             1. 选取X轴
@@ -121,16 +124,14 @@ class TransBarChart(UnitChartWindow, BasePlot):
                 key = self.ticks[i]
                 keys.append(key)
             for key in keys:
-                temp = self.li.to_chart_csv_data.group_df[key]
-                if len(temp) == 0:
+                positions = group_df.positions(key)
+                if len(positions) == 0:
                     continue
                 result_min, result_max = ax.top(), ax.bottom()
-                chart_prr = temp[
-                    (temp[self.key] > result_min) & (temp[self.key] < result_max)
-                    ]
-                chart_prr_list.append(chart_prr)
+                temp = result[positions]
+                chart_mask[positions[(temp > result_min) & (temp < result_max)]] = True
 
-        self.li.set_chart_data(pd.concat(chart_prr_list))
+        self.li.set_chart_mask(chart_mask)
 
     def set_range_data_to_chart(self, a, ax) -> bool:
         if hasattr(self, 'vb'):
@@ -177,34 +178,31 @@ class TransBarChart(UnitChartWindow, BasePlot):
         bin_height = self.list_bins[1] - self.list_bins[0]
 
         # 检查是否有分组
-        group_keys = self.li.to_chart_csv_data.group_df.keys()
+        group_df = self.li.to_chart_csv_data.group_df
+        group_keys = group_df.keys()
         has_grouping = len(group_keys) > 1 or next(iter(group_keys), "*@*") != "*@*"
+        # 所有组的计数一次算出, 行顺序和group_keys一致
+        group_counts = GroupHistogram.counts(group_df, self.key, self.list_bins)
 
         if not has_grouping:
             # 无分组逻辑
-            df = self.li.to_chart_csv_data.df
-            temp_dis = df[self.key].value_counts(bins=self.list_bins, sort=False)
-            bar_item = BarGraphItem(x0=0, y=bin_centers, width=temp_dis.values, height=bin_height,
+            bar_item = BarGraphItem(x0=0, y=bin_centers, width=group_counts.sum(axis=0), height=bin_height,
                                     brush=colors[0], name="All Data")
             self.pw.addItem(bar_item)
             self.bar_items.append(bar_item)
         else:
             # 有分组逻辑
-            for key, df in self.li.to_chart_csv_data.group_df.items():
+            for key, temp_dis in zip(group_keys, group_counts):
                 if self.li.to_chart_csv_data.select_group is not None:
                     if key not in self.li.to_chart_csv_data.select_group:
                         continue
-                if len(df) == 0:
-                    continue
-                
-                temp_dis = df[self.key].value_counts(bins=self.list_bins, sort=False)
-                if len(temp_dis) == 0:
+                if len(group_df.positions(key)) == 0:
                     continue
 
                 color = colors[color_index % len(colors)]
                 color_index += 1
                 
-                bar_item = BarGraphItem(x0=0, y=bin_centers, width=temp_dis.values, height=bin_height,
+                bar_item = BarGraphItem(x0=0, y=bin_centers, width=temp_dis, height=bin_height,
                                         brush=color, name=key)
                 self.pw.addItem(bar_item)
                 self.bar_items.append(bar_item)
@@ -15,11 +15,12 @@ import numpy as np
 import pandas as pd
 
 from PySide2 import QtCore
-from PySide2.QtCore import Qt
+from PySide2.QtCore import Qt, QTimer
 from PySide2.QtGui import QResizeEvent, QCloseEvent
 from pyqtgraph import ScatterPlotItem, InfiniteLine
 
 from chart_core.chart_pyqtgraph.core.mixin import BasePlot, GraphRangeSignal, PlotWidget, RangeData
+from chart_core.chart_pyqtgraph.core.scatter_lod import ScatterLod, ScatterLodWorker
 from chart_core.chart_pyqtgraph.core.view_box import CustomViewBox, pg
 from chart_core.chart_pyqtgraph.ui_components.ui_unit_chart import UnitChartWindow
 from common.li import Li
@@ -37,12 +38,14 @@ class TransScatterChart(UnitChartWindow, BasePlot):
             0b____X_ -> zoom x    X轴放大缩小
             0b_____X -> zoom y    Y轴放大缩小
     """
-    list_bins = None  # 用来提升性能
     scatter_list: list = None  # 用于缓存plot
     scatter_front_list: list = None  # 用于缓存plot
     scatter_size: int = 7
     brush_cache: dict = None
     limit_lines: List[InfiniteLine] = None  # limit线列表
+    lod_layers: list = None  # [(plot, x, y, brush)], 视图变化后按视图重新抽样
+    lod_generation: int = 0
+    lod_pending: bool = False
 
     def __init__(self, li: Li):
         super(TransScatterChart, self).__init__()
@@ -78,6 +81,16 @@ class TransScatterChart(UnitChartWindow, BasePlot):
         self.limit_lines = []
         self.p_range = RangeData()
 
+        self.lod_layers = []
+        self.lod_worker = ScatterLodWorker(self)
+        self.lod_worker.lodSignal.connect(self.apply_lod)
+        self.lod_worker.finished.connect(self.lod_worker_finished)
+        self.lod_timer = QTimer(self)
+        self.lod_timer.setSingleShot(True)
+        self.lod_timer.setInterval(60)
+        self.lod_timer.timeout.connect(self.start_lod)
+        self.vb.sigRangeChanged.connect(self.schedule_lod)
+
     def init_movable_line(self):
         v_line = InfiniteLine(angle=90, movable=False, label='x={value:0.0f}', labelOpts={'color': (0, 0, 0)})
         h_line = InfiniteLine(angle=0, movable=False, label='y={value:0.9f}', labelOpts={'color': (0, 0, 0)})
@@ -100,20 +113,18 @@ class TransScatterChart(UnitChartWindow, BasePlot):
         if not self.action_signal_binding.isChecked():
             return
         if axs is None:
-            self.li.set_chart_data(None)
+            self.li.set_chart_mask(None)
             return
-        chart_prr_list = []
+        temp = self.li.to_chart_csv_data.df
+        part_id, result = temp.PART_ID.to_numpy(), temp[self.key].to_numpy()
+        chart_mask = np.zeros(len(temp), dtype=bool)
         for ax in axs:
             part_id_min, part_id_max = ax.left(), ax.right()
             result_min, result_max = ax.top(), ax.bottom()
-            temp = self.li.to_chart_csv_data.df
-            chart_prr = temp[
-                ((temp.PART_ID > part_id_min) & (temp.PART_ID < part_id_max)) & (
-                        (temp[self.key] > result_min) & (temp[self.key] < result_max))
-                ]
-            chart_prr_list.append(chart_prr)
+            chart_mask |= (part_id > part_id_min) & (part_id < part_id_max) & \
+                          (result > result_min) & (result < result_max)
 
-        self.li.set_chart_data(pd.concat(chart_prr_list))
+        self.li.set_chart_mask(chart_mask)
 
     def set_range_data_to_chart(self, a, ax) -> bool:
         if hasattr(self, 'vb'):
@@ -135,13 +146,8 @@ class TransScatterChart(UnitChartWindow, BasePlot):
             return
         if len(self.li.df_module.prr_df) > 3E3:
             self.scatter_size = 3
-        if UiGlobalVariable.GraphPlotScatterSimple:
-            if not self.change:
-                self.list_bins = 5
-            else:
-                self.list_bins = int(
-                    abs(self.p_range.x_max - self.p_range.x_min) // UiGlobalVariable.GraphPlotScatterSimpleNum
-                )
+        self.lod_layers.clear()
+        self.lod_generation += 1
         try:
             self.pw.plotItem.legend.clear()
         except RuntimeError:
@@ -159,20 +165,15 @@ class TransScatterChart(UnitChartWindow, BasePlot):
         color_split_nm = 512 / 2 ** color_square_nm
         color_list = self.c[::int(color_split_nm)]
 
-        for index, (key, df) in enumerate(self.li.to_chart_csv_data.group_df.items()):
+        group_df = self.li.to_chart_csv_data.group_df
+        for index, key in enumerate(group_df.keys()):
             if self.li.to_chart_csv_data.select_group is not None:
                 if key not in self.li.to_chart_csv_data.select_group:
                     continue
             idx = int(index % color_split_nm)
-            if UiGlobalVariable.GraphPlotScatterSimple:
-                x = df.PART_ID
-                x = x[::self.list_bins + 1]
-                result = df[self.key][::self.list_bins + 1]
-            else:
-                x = df.PART_ID
-                result = df[self.key]
+            x, result = self.lod_data(group_df.column(key, "PART_ID"), group_df.column(key, self.key))
             brush = list(color_list[idx])
-            if self.li.to_chart_csv_data.chart_df is None:
+            if self.li.to_chart_csv_data.chart_mask is None:
                 brush[3] = 255
                 self.brush_cache[key] = brush
             else:
@@ -180,14 +181,15 @@ class TransScatterChart(UnitChartWindow, BasePlot):
             if index >= len(self.scatter_list):
                 plot = ScatterPlotItem(symbol='o', hoverable=False,
                                        size=self.scatter_size, pen=None, name=key, brush=tuple(brush))
-                plot.addPoints(x, result)
+                plot.addPoints(*self.lod_points(x, result))
                 self.scatter_list.append(plot)
                 self.pw.addItem(plot)
             else:
                 plot = self.scatter_list[index]
-                plot.setData(x, result, clear=True, brush=tuple(brush))  # x.to_numpy(), y.to_numpy()
+                plot.setData(*self.lod_points(x, result), clear=True, brush=tuple(brush))
                 self.pw.plotItem.legend.addItem(plot, name=key)
                 plot.show()
+            self.lod_layers.append((plot, x, result, tuple(brush)))
 
         # 添加limit线显示
         self._add_limit_lines()
@@ -324,33 +326,96 @@ class TransScatterChart(UnitChartWindow, BasePlot):
         self.set_df_chart()
         for each in self.scatter_front_list:
             each.clear()
-        if self.li.to_chart_csv_data.chart_df is None:
+        if self.li.to_chart_csv_data.chart_mask is None:
             return
 
-        for index, (key, df) in enumerate(self.li.to_chart_csv_data.group_chart_df.items()):
+        group_chart_df = self.li.to_chart_csv_data.group_chart_df
+        for index, key in enumerate(group_chart_df.keys()):
             if self.li.to_chart_csv_data.select_group is not None:
                 if key not in self.li.to_chart_csv_data.select_group:
                     continue
-            if len(df) == 0:
+            if len(group_chart_df.positions(key)) == 0:
                 continue
-            if UiGlobalVariable.GraphPlotScatterSimple:
-                x = df.PART_ID
-                x = x[::self.list_bins + 1]
-                result = df[self.key][::self.list_bins + 1]
-            else:
-                x = df.PART_ID
-                result = df[self.key]
+            x, result = self.lod_data(group_chart_df.column(key, "PART_ID"), group_chart_df.column(key, self.key))
             brush = self.brush_cache[key]
             if index >= len(self.scatter_front_list):
                 plot = ScatterPlotItem(symbol='o', size=self.scatter_size, pen=None, brush=tuple(brush))
-                plot.addPoints(x, result)
+                plot.addPoints(*self.lod_points(x, result))
                 self.scatter_front_list.append(plot)
                 self.pw.addItem(plot)
             else:
                 plot = self.scatter_front_list[index]
-                plot.setData(x, result, clear=True, brush=tuple(brush))  # x.to_numpy(), y.to_numpy()
+                plot.setData(*self.lod_points(x, result), clear=True, brush=tuple(brush))
                 plot.show()
+            self.lod_layers.append((plot, x, result, tuple(brush)))
+
+    @staticmethod
+    def lod_data(x, result) -> (np.ndarray, np.ndarray):
+        return x.to_numpy(dtype=np.float64), result.to_numpy(dtype=np.float64)
+
+    def lod_view(self):
+        """
+        第一次绘图时视图还没有设定, 用数据的X范围和p_range的Y范围
+        """
+        if self.change:
+            return self.vb.viewRange()
+        part_id = self.li.to_chart_csv_data.df.PART_ID
+        return [[part_id.min(), part_id.max()], [self.p_range.y_min, self.p_range.y_max]]
+
+    def lod_pixels(self):
+        return self.vb.width() or UiGlobalVariable.GraphPlotWidth, self.vb.height() or UiGlobalVariable.GraphPlotHeight
+
+    def lod_points(self, x: np.ndarray, result: np.ndarray):
+        """
+        GraphPlotScatterLod: 同步算一次抽样, 先显示出来, 之后视图变化由子线程重算
+        GraphPlotScatterSimple: 以前的固定间隔抽样, 第一次绘图每6个点取一个,
+            之后间隔为 视图X范围 // GraphPlotScatterSimpleNum + 1
+        """
+        if UiGlobalVariable.GraphPlotScatterLod:
+            index = ScatterLod.decimate(
+                x, result, self.lod_view(), self.lod_pixels(), UiGlobalVariable.GraphPlotScatterLodNum,
+                self.scatter_size
+            )
+            return x[index], result[index]
+        if UiGlobalVariable.GraphPlotScatterSimple:
+            if self.change:
+                (x_min, x_max), _ = self.lod_view()
+                step = int(abs(x_max - x_min) // UiGlobalVariable.GraphPlotScatterSimpleNum) + 1
+            else:
+                step = 6
+            return x[::step], result[::step]
+        return x, result
+
+    def schedule_lod(self, *args):
+        if not UiGlobalVariable.GraphPlotScatterLod or not self.lod_layers:
+            return
+        self.lod_timer.start()
+
+    def start_lod(self):
+        if self.lod_worker.isRunning():
+            self.lod_pending = True
+            return
+        self.lod_pending = False
+        self.lod_generation += 1
+        self.lod_worker.set_task(
+            self.lod_generation, [(x, result) for _, x, result, _ in self.lod_layers],
+            self.lod_view(), self.lod_pixels(), UiGlobalVariable.GraphPlotScatterLodNum, self.scatter_size
+        )
+        self.lod_worker.start()
+
+    def apply_lod(self, generation: int, index_list: list):
+        if generation != self.lod_generation or len(index_list) != len(self.lod_layers):
+            return
+        for (plot, x, result, brush), index in zip(self.lod_layers, index_list):
+            plot.setData(x[index], result[index], clear=True, brush=brush)
+
+    def lod_worker_finished(self):
+        if self.lod_pending:
+            self.start_lod()
 
     def closeEvent(self, event: QCloseEvent) -> None:
+        self.lod_timer.stop()
+        self.lod_pending = False
+        self.lod_worker.wait()
         self.__del__()
         super(TransScatterChart, self).closeEvent(event)
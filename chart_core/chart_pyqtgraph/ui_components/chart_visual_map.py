@@ -16,43 +16,7 @@ from pyqtgraph import GraphicsLayoutWidget, ImageItem, ColorBarItem, colormap, H
 
 import numpy as np
 
-try:
-    from chart_core.chart_pyqtgraph.core.visual.visual import *
-except ImportError:
-    # 如果无法导入visual模块，定义一个优化的coord_to_np函数
-    def coord_to_np(x, y, d, c):
-        """
-        Optimized fallback implementation when Cython module is not available
-
-        Parameters:
-        x: numpy array of x coordinates (int16)
-        y: numpy array of y coordinates (int16)
-        d: numpy array of data values (float32)
-        c: numpy array 2D output array (float64)
-        """
-        # 确保输入是numpy数组并转换类型
-        x = np.asarray(x, dtype=np.int16)
-        y = np.asarray(y, dtype=np.int16)
-        d = np.asarray(d, dtype=np.float32)
-
-        # 使用向量化操作进行边界检查，性能更好
-        valid_mask = ((x >= 0) & (x < c.shape[0]) &
-                     (y >= 0) & (y < c.shape[1]))
-
-        # 只处理有效的坐标，避免不必要的循环
-        if np.any(valid_mask):
-            valid_x = x[valid_mask]
-            valid_y = y[valid_mask]
-            valid_d = d[valid_mask]
-
-            # 使用numpy的高级索引，比循环快很多
-            c[valid_x, valid_y] = valid_d
-
-    # 如果还有其他函数，也提供fallback
-    def add(a, b):
-        """Fallback implementation for add function"""
-        return 1.1 + b + 1.1
-
+from chart_core.chart_pyqtgraph.core.visual.aggregate import coord_aggregate
 from chart_core.chart_pyqtgraph.ui_components.ui_unit_chart import UnitChartWindow
 from common.li import Li
 from ui_component.ui_app_variable import UiGlobalVariable
@@ -132,7 +96,7 @@ class VisualMapChart(UnitChartWindow):
             data_df = self.li.to_chart_csv_data.chart_df
         if data_df is None:
             return
-        map_group = data_df.groupby("GROUP")
+        map_group = data_df[["GROUP", "X_COORD", "Y_COORD", self.key]].groupby("GROUP")
         x, y = self.x_max - self.x_min + 1, self.y_max - self.y_min + 1
         self.pw.clear()
         if len(map_group) > 25:
@@ -147,12 +111,13 @@ class VisualMapChart(UnitChartWindow):
             return
         rounding = diff / 1E9
         for index, (key, df) in enumerate(map_group):
-            data = np.full([x, y], np.nan)
-            coord_to_np(
-                df.X_COORD.to_numpy() - self.x_min,
-                df.Y_COORD.to_numpy() - self.y_min,
+            # 同一坐标上的多颗die(复测/多片wafer)按设定聚合
+            data = coord_aggregate(
+                df.X_COORD.to_numpy(dtype=np.float64) - self.x_min,
+                df.Y_COORD.to_numpy(dtype=np.float64) - self.y_min,
                 df[self.key].to_numpy(),
-                data
+                (int(x), int(y)),
+                UiGlobalVariable.GraphVisualMapAggregate,
             )
             t_row, t_col = divmod(index, row)
             im = ImageItem(image=data)
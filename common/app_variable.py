@@ -7,9 +7,11 @@
 @Remark  : 
 """
 import os
-from dataclasses import dataclass
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from typing import Union, Dict
 
+import numpy as np
 import pandas as pd
 from numpy import (
     uint8 as U1,
@@ -79,28 +81,206 @@ class DataLiBackup:
     prr_df: pd.DataFrame = None
 
 
+class GroupIndex(Mapping):
+    """
+    数据分组的索引, 不按组拷贝数据:
+        codes: 每一行所属组的编号(按key排序后的序号)
+        order: 按codes稳定排序后的行号, 同一组的行号是order中的一段, 组内保持原来的行顺序
+        offsets: 第i组在order中的范围是 offsets[i]:offsets[i + 1]
+    按key取值时才用行号从df中take出该组的数据, 只需要某一列时用column
+    """
+    histogram_cache = None  # GroupHistogram 的细分计数缓存, 和分组同生命周期
+
+    def __init__(self, df: pd.DataFrame, by=("GROUP", "DA_GROUP"), sep: str = "@"):
+        self.df = df
+        code = np.zeros(len(df), dtype=np.int64)
+        levels = []
+        for each in by:
+            level_code, uniques = pd.factorize(df[each], sort=True)
+            code = code * len(uniques) + level_code
+            levels.append(uniques)
+        present, self.codes = np.unique(code, return_inverse=True)
+        self.codes = self.codes.reshape(-1)
+        names = []
+        for each in present:
+            values = []
+            for uniques in reversed(levels):
+                each, value_index = divmod(each, len(uniques))
+                values.append(str(uniques[value_index]))
+            names.append(sep.join(reversed(values)))
+        self.key_list = names
+        self.key_code = {key: index for index, key in enumerate(names)}
+        self.order = np.argsort(self.codes, kind="stable")
+        self.offsets = np.r_[0, np.cumsum(np.bincount(self.codes, minlength=len(names)))]
+
+    def masked(self, mask: np.ndarray) -> "GroupIndex":
+        """
+        只保留mask为True的行, 共享df和codes, 只重新生成order和offsets
+        """
+        index = GroupIndex.__new__(GroupIndex)
+        index.df, index.codes = self.df, self.codes
+        index.key_list, index.key_code = self.key_list, self.key_code
+        index.order = self.order[mask[self.order]]
+        index.offsets = np.r_[0, np.cumsum(np.bincount(self.codes[mask], minlength=len(self.key_list)))]
+        return index
+
+    def rows_of(self, keys) -> np.ndarray:
+        """
+        :return: 属于keys这些组的行, 对应df的bool mask
+        """
+        selected = np.zeros(len(self.key_list), dtype=bool)
+        selected[[self.key_code[key] for key in keys if key in self.key_code]] = True
+        return selected[self.codes]
+
+    def positions(self, key: str) -> np.ndarray:
+        code = self.key_code[key]
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def column(self, key: str, column: str) -> pd.Series:
+        return self.df[column].take(self.positions(key))
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        return self.df.take(self.positions(key))
+
+    def __iter__(self):
+        return iter(self.key_list)
+
+    def __len__(self):
+        return len(self.key_list)
+
+
 @dataclass
 class ToChartCsv:
+    """
+    chart_mask: 对应df每一行(每颗DIE)的选取状态, 所有图和导出共享, None表示没有选取
+    chart_df/group_chart_df 由chart_mask派生, 不再单独保存选取数据的拷贝
+    """
     # TODO: Must
     df: pd.DataFrame = None
-    group_df: Dict[str, pd.DataFrame] = None
-    chart_df: pd.DataFrame = None
-    group_chart_df: Dict[str, pd.DataFrame] = None
+    group_df: GroupIndex = None
+    chart_mask: np.ndarray = None
     select_group: set = None
 
     # TODO: Optional PAT
     limit: pd.DataFrame = None
     group_limit: Dict[str, pd.DataFrame] = None
 
+    _chart_cache: tuple = field(default=None, init=False, repr=False, compare=False)
+
+    def _derived(self):
+        """
+        缓存中保存df/group_df/chart_mask本身并用is比较, 只比较id的话旧对象释放后新对象可能复用同一个id
+        """
+        key = (self.df, self.group_df, self.chart_mask)
+        if self._chart_cache is None or any(a is not b for a, b in zip(self._chart_cache[0], key)):
+            self._chart_cache = (key, None, None)
+        return self._chart_cache
+
+    @property
+    def chart_df(self) -> Union[pd.DataFrame, None]:
+        """
+        选取的数据, 只有需要整张表时(如Mapping)才取出
+        """
+        if self.chart_mask is None:
+            return None
+        key, chart_df, group_chart_df = self._derived()
+        if chart_df is None:
+            chart_df = self.df[self.chart_mask]
+            self._chart_cache = (key, chart_df, group_chart_df)
+        return chart_df
+
+    @property
+    def group_chart_df(self) -> Union[GroupIndex, None]:
+        if self.chart_mask is None or self.group_df is None:
+            return None
+        key, chart_df, group_chart_df = self._derived()
+        if group_chart_df is None:
+            group_chart_df = self.group_df.masked(self.chart_mask)
+            self._chart_cache = (key, chart_df, group_chart_df)
+        return group_chart_df
+
 
 @dataclass
 class DataModule:
     """
     数据空间整合后的数据模型
+    Li.concat后prr_df/dtp_df的行按ID(文件)排序, 同一个ID的行是连续的一段, 用偏移表就可以按ID取出切片:
+        view(ID)的prr_df/dtp_df都是不复制数据的iloc切片
+    dtp_df的TEST_ID不再整体有序, 按TEST_ID取数据用test_rows, 不用dtp_df.loc[TEST_ID]
     """
     prr_df: pd.DataFrame = None
     dtp_df: pd.DataFrame = None  # 数据
     ptmd_df: pd.DataFrame = None  # 测试项目相关
+    _id_offsets: tuple = field(default=None, init=False, repr=False, compare=False)
+    _test_offsets: tuple = field(default=None, init=False, repr=False, compare=False)
+
+    @staticmethod
+    def id_offsets(id_array: np.ndarray) -> Dict[int, tuple]:
+        """
+        :param id_array: 已经按ID排序的ID列
+        :return: {ID: (start, stop)} 每个ID在数组中的范围
+        """
+        if len(id_array) > 1 and (id_array[1:] < id_array[:-1]).any():
+            raise ValueError("数据没有按ID排序, 需要先经过Li.concat")
+        ids, starts = np.unique(id_array, return_index=True)
+        stops = np.r_[starts[1:], len(id_array)]
+        return {int(unit_id): (int(start), int(stop)) for unit_id, start, stop in zip(ids, starts, stops)}
+
+    def partition(self) -> (Dict[int, tuple], Dict[int, tuple]):
+        """
+        生成prr_df/dtp_df的ID偏移表, 缓存中保存数据帧本身并用is比较, 数据帧被替换后会重新生成
+        """
+        frames = (self.prr_df, self.dtp_df)
+        if self._id_offsets is None or any(a is not b for a, b in zip(self._id_offsets[0], frames)):
+            self._id_offsets = (
+                frames,
+                self.id_offsets(self.prr_df["ID"].to_numpy()),
+                self.id_offsets(self.dtp_df["ID"].to_numpy()),
+            )
+        return self._id_offsets[1], self._id_offsets[2]
+
+    def view(self, unit_id: int) -> "DataModule":
+        """
+        取出一个文件的数据, prr_df/dtp_df不复制, ptmd_df只保留该文件有数据的测项
+        """
+        prr_offsets, dtp_offsets = self.partition()
+        prr_start, prr_stop = prr_offsets.get(unit_id, (0, 0))
+        dtp_start, dtp_stop = dtp_offsets.get(unit_id, (0, 0))
+        prr_df = self.prr_df.iloc[prr_start:prr_stop]
+        dtp_df = self.dtp_df.iloc[dtp_start:dtp_stop]
+        ptmd_df = self.ptmd_df
+        if ptmd_df is not None:
+            if "TEST_ID" in dtp_df.columns:
+                test_ids = dtp_df["TEST_ID"].unique()
+            else:
+                test_ids = dtp_df.index.get_level_values("TEST_ID").unique()
+            ptmd_df = ptmd_df[ptmd_df["TEST_ID"].isin(test_ids)]
+        return DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df)
+
+    def test_rows(self, test_id: int) -> pd.DataFrame:
+        """
+        和 dtp_df.loc[test_id] 一样, 取出一个测项的数据, index为DIE_ID
+        dtp_df按ID排序后TEST_ID不是整体有序的, loc会逐行比较, 这里按TEST_ID稳定排序一次, 每个测项取自己的一段
+        """
+        dtp_df = self.dtp_df
+        if self._test_offsets is None or self._test_offsets[0] is not dtp_df:
+            test_ids = dtp_df.index.get_level_values("TEST_ID").to_numpy()
+            order = np.argsort(test_ids, kind="stable")
+            unique_ids, starts = np.unique(test_ids[order], return_index=True)
+            stops = np.r_[starts[1:], len(order)]
+            offsets = {int(each): (int(start), int(stop)) for each, start, stop in zip(unique_ids, starts, stops)}
+            self._test_offsets = (dtp_df, order, offsets)
+        _, order, offsets = self._test_offsets
+        if test_id not in offsets:
+            raise KeyError(test_id)
+        start, stop = offsets[test_id]
+        positions = order[start:stop]
+        if positions[-1] - positions[0] + 1 == len(positions):
+            # 这个测项在dtp_df中本来就是连续的一段(如只有一个文件)
+            df = dtp_df.iloc[positions[0]:positions[-1] + 1]
+        else:
+            df = dtp_df.take(positions)
+        return df.droplevel("TEST_ID")
 
 
 class DatatType:
@@ -201,8 +381,28 @@ GlobalVariable.CACHE_PATH = os.path.join(GlobalVariable._CACHE_BASE, "STDF_CACHE
 GlobalVariable.JMP_CACHE_PATH = os.path.join(GlobalVariable._CACHE_BASE, "JMP_CACHE")
 GlobalVariable.LIMIT_PATH = os.path.join(GlobalVariable._CACHE_BASE, "LIMIT_CACHE")
 GlobalVariable.NGINX_PATH = os.path.join(GlobalVariable._CACHE_BASE, "NGINX_CACHE")
+GlobalVariable.RESULT_CACHE_PATH = os.path.join(GlobalVariable.CACHE_PATH, "RESULT_CACHE")  # 制程能力等计算结果
 
 # 设置其他类属性
+# 进程内共享的DataModule缓存上限(字节), 多个数据空间载入同一份HDF5时复用
+GlobalVariable.MODULE_CACHE_BUDGET = 4 * 1024 * 1024 * 1024
+# Summary报告并行生成的线程数, Summary文本的缓存数量
+GlobalVariable.SUMMARY_WORKERS = min(8, os.cpu_count() or 1)
+GlobalVariable.SUMMARY_CACHE_SIZE = 2000
+# 流式写Excel时每块的行数
+GlobalVariable.EXCEL_CHUNK_SIZE = 10000
+# 后台导出任务的线程数, 分块写CSV/Parquet时每块的行数
+GlobalVariable.EXPORT_WORKERS = 2
+GlobalVariable.CSV_CHUNK_SIZE = 100000
+# 给JMP的CSV中浮点数的格式, STDF的测试结果是R*4(float32), 9位有效数字可以无损还原; 复用已导出文件的数量
+GlobalVariable.CSV_FLOAT_FORMAT = "%.9g"
+GlobalVariable.EXPORT_CACHE_SIZE = 64
+# JMP脚本每次写入文件的测项数, 单个脚本的大小上限(超过后分成多个脚本)
+GlobalVariable.JMP_SCRIPT_CHUNK = 200
+GlobalVariable.JMP_SCRIPT_MAX_BYTES = 8 * 1024 * 1024
+# 磁盘上保存的计算结果(ResultCache)的文件数上限
+GlobalVariable.RESULT_CACHE_SIZE = 500
+
 GlobalVariable.STD_SUFFIXES = {
     ".std",
     ".stdf",
@@ -273,6 +473,8 @@ def _init_global_variable():
         os.makedirs(GlobalVariable.CACHE_PATH)
     if not os.path.exists(GlobalVariable.JMP_CACHE_PATH):
         os.makedirs(GlobalVariable.JMP_CACHE_PATH)
+    if not os.path.exists(GlobalVariable.RESULT_CACHE_PATH):
+        os.makedirs(GlobalVariable.RESULT_CACHE_PATH)
 
 GlobalVariable.init = staticmethod(_init_global_variable)
 
@@ -7,7 +7,7 @@
 @Software: PyCharm
 @Remark  : 
 """
-from typing import List, Union
+from typing import Callable, List, Union
 
 import pandas as pd
 import numpy as np
@@ -116,23 +116,26 @@ class CapabilityUtils:
 
     @staticmethod
     @Time()
-    def calculation_top_fail(df_module: DataModule):
+    def calculation_top_fail(df_module: DataModule, progress: Callable[[int, int], None] = None):
         """
         Top Fail如何计算? 算逐项fail即可.
         TODO:
             1. 去除多个文件中, 重复的数据
             2. 取数据并进行运算
         :param df_module:
+        :param progress: progress(已算测项数, 总测项数), 每个测项调用一次, 可以在其中抛出异常中断
         :return:
         """
         df_use_top_fail = df_module.prr_df
-        dtp_df = df_module.dtp_df
         top_fail_dict = {}
-        for row in df_module.ptmd_df.itertuples():  # type:PtmdModule
+        total = len(df_module.ptmd_df)
+        for index, row in enumerate(df_module.ptmd_df.itertuples()):  # type:PtmdModule
+            if progress is not None:
+                progress(index, total)
             " 逐项计算Top Fail "
             df_use_top_fail, fail_qty = CapabilityUtils.top_fail(
                 df_use_top_fail,
-                dtp_df.loc[row.TEST_ID]
+                df_module.test_rows(row.TEST_ID)
             )
             try:
                 top_fail_dict[row.TEST_ID] += fail_qty
@@ -188,7 +191,6 @@ class CapabilityUtils:
         :return:
         """
         df_use_top_fail = df_module.prr_df
-        dtp_df = df_module.dtp_df
 
         top_fail_dict = {}
         for row in df_module.ptmd_df.itertuples():  # type:PtmdModule
@@ -196,7 +198,7 @@ class CapabilityUtils:
             df_use_top_fail, fail_qty = CapabilityUtils.re_cal_top_fail(
                 row,
                 df_use_top_fail,
-                dtp_df.loc[row.TEST_ID]
+                df_module.test_rows(row.TEST_ID)
             )
             try:
                 top_fail_dict[row.TEST_ID] += fail_qty
@@ -370,17 +372,22 @@ class CapabilityUtils:
 
     @staticmethod
     @Time()
-    def calculation_capability(df_module: DataModule, top_fail_dict: dict) -> List[dict]:
+    def calculation_capability(df_module: DataModule, top_fail_dict: dict,
+                               progress: Callable[[int, int], None] = None) -> List[dict]:
         """
         python dict 是可以保持顺序的
             用于计算整个数据的Top Fail等信息
         :param df_module:
         :param top_fail_dict:
+        :param progress: progress(已算测项数, 总测项数), 每个测项调用一次, 可以在其中抛出异常中断
         :return:
         """
         capability_key_list = []
-        for row in df_module.ptmd_df.itertuples():  # type:PtmdModule
-            data_df = df_module.dtp_df.loc[row.TEST_ID].loc[:].copy()  # TODO: 10%时间开销
+        total = len(df_module.ptmd_df)
+        for index, row in enumerate(df_module.ptmd_df.itertuples()):  # type:PtmdModule
+            if progress is not None:
+                progress(index, total)
+            data_df = df_module.test_rows(row.TEST_ID).copy()  # TODO: 10%时间开销
             if row.DATAT_TYPE in {DatatType.PTR, DatatType.MPR}:
                 cal_data = CapabilityUtils.calculation_ptr(
                     row, top_fail_dict[row.TEST_ID], data_df
@@ -0,0 +1,236 @@
+"""
+-*- coding: utf-8 -*-
+@Author  : Link
+@Time    : 2026/10/19
+@Site    :
+@File    : group_capability.py
+@Software: PyCharm
+@Remark  : 分组制程能力, GROUP x DA_GROUP x TEST 一次分组规约
+"""
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from common.app_variable import DataModule, DatatType, FailFlag, LimitType
+
+
+class GroupCapability:
+    """
+    对长表dtp_df(index: TEST_ID, DIE_ID)的每一行算出 测项编码 * 组数 + 组编码, 用bincount一次算出所有(组, 测项)的:
+        QTY/REJECT_QTY/YIELD: 测试数量, FAIL_FLG为FAIL的数量, (QTY-REJECT_QTY)/QTY
+        FAIL_QTY: 组内第一个FAIL在这个测项的颗数(按capability_key_list的顺序), 和Top Fail的算法一致
+        AVG/STD/MIN/MAX: 只用PASS的数据, STD为样本标准差(ddof=1), 和CapabilityUtils.calculation_ptr一致
+        CPK: limit用capability_key_list中的, update_limit后有NEW_LO_LIMIT/NEW_HI_LIMIT时用新limit, STD为0时按1E-05算
+    输出的LO_LIMIT/HI_LIMIT为计算CPK时用的limit
+    FTR的AVG/STD/CPK等为NaN
+    """
+    HEAD = [
+        "GROUP", "DA_GROUP", "TEST_ID", "TEST_TYPE", "TEST_NUM", "TEST_TXT", "TEXT", "UNITS",
+        "LO_LIMIT", "HI_LIMIT", "LO_LIMIT_TYPE", "HI_LIMIT_TYPE",
+        "QTY", "FAIL_QTY", "REJECT_QTY", "REJECT_RATE", "YIELD", "AVG", "STD", "MIN", "MAX", "CPK",
+    ]
+
+    @staticmethod
+    def group_labels(df: pd.DataFrame, params: Union[list, None]) -> Union[pd.Series, str]:
+        """
+        和Li.set_data_group的分组一致: 多个列用'|'连接, 没有分组时为'*'
+        """
+        if not params:
+            return '*'
+        labels = None
+        for index, each in enumerate(params):
+            if index == 0:
+                labels = df[each].astype(str)
+            else:
+                labels = labels + "|" + df[each].astype(str)
+        return labels
+
+    @staticmethod
+    def cell_codes(df_module: DataModule, die_group, die_da_group, test_ids):
+        """
+        dtp_df每一行的(测项, 组)编码
+        :return: 升序的(GROUP, DA_GROUP), dtp_df中有效的行(测项在test_ids中且DIE在prr_df中), 有效行的 测项位置 * 组数 + 组编码,
+            有效行在prr_df中的位置
+        """
+        prr_df, dtp_df = df_module.prr_df, df_module.dtp_df
+        keys = pd.MultiIndex.from_arrays([
+            np.asarray(die_group, dtype=object), np.asarray(die_da_group, dtype=object)
+        ])
+        die_code, group_keys = pd.factorize(keys, sort=True)
+        test_code = pd.Index(test_ids).get_indexer(dtp_df.index.get_level_values("TEST_ID"))
+        die_pos = prr_df.index.get_indexer(dtp_df.index.get_level_values("DIE_ID"))
+        valid = (test_code >= 0) & (die_pos >= 0)
+        cell = test_code[valid].astype(np.int64) * len(group_keys) + die_code[die_pos[valid]]
+        return group_keys, valid, cell, die_pos[valid]
+
+    @staticmethod
+    def calculation(df_module: DataModule, die_group: pd.Series, die_da_group: pd.Series,
+                    capability_key_list: List[dict]) -> pd.DataFrame:
+        """
+        :param df_module: concat后的数据, prr_df的index为DIE_ID
+        :param die_group: 和prr_df行对齐的GROUP
+        :param die_da_group: 和prr_df行对齐的DA_GROUP
+        :param capability_key_list: Li.capability_key_list, 决定测项的顺序和limit
+        :return: 长表, 每个(GROUP, DA_GROUP, TEST_ID)一行, 列为 GroupCapability.HEAD
+        """
+        if df_module is None or not capability_key_list:
+            return pd.DataFrame(columns=GroupCapability.HEAD)
+        dtp_df = df_module.dtp_df
+        test_df = GroupCapability.effective_limits(pd.DataFrame(capability_key_list))
+        group_keys, valid, cell, die_pos = GroupCapability.cell_codes(
+            df_module, die_group, die_da_group, test_df["TEST_ID"]
+        )
+        n_test, n_group = len(test_df), len(group_keys)
+        size = n_test * n_group
+
+        fail = dtp_df["FAIL_FLG"].to_numpy()[valid] == FailFlag.FAIL
+        qty = np.bincount(cell, minlength=size)
+        reject_qty = np.bincount(cell[fail], minlength=size)
+        # 同一颗DIE的组编码相同, cell最小的FAIL行就是这颗DIE第一个FAIL的测项
+        fail_cell, fail_die = cell[fail], die_pos[fail]
+        order = np.lexsort((fail_cell, fail_die))
+        fail_cell, fail_die = fail_cell[order], fail_die[order]
+        first = np.r_[True, fail_die[1:] != fail_die[:-1]] if len(fail_die) else np.zeros(0, dtype=bool)
+        fail_qty = np.bincount(fail_cell[first], minlength=size)
+
+        result = dtp_df["RESULT"].to_numpy(dtype=np.float64)[valid]
+        pass_valid = ~fail & ~np.isnan(result)
+        pass_cell, pass_result = cell[pass_valid], result[pass_valid]
+        count = np.bincount(pass_cell, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(pass_cell, weights=pass_result, minlength=size) / count
+            # 两遍法, 先求均值再求离差平方和, 避免大数相减的精度问题
+            square = np.bincount(pass_cell, weights=(pass_result - mean[pass_cell]) ** 2, minlength=size)
+            std = np.where(count > 1, np.sqrt(square / (count - 1)), np.nan)
+        data_min = np.full(size, np.inf)
+        data_max = np.full(size, -np.inf)
+        np.minimum.at(data_min, pass_cell, pass_result)
+        np.maximum.at(data_max, pass_cell, pass_result)
+        data_min[count == 0] = np.nan
+        data_max[count == 0] = np.nan
+
+        test_index = np.repeat(np.arange(n_test), n_group)
+        group_index = np.tile(np.arange(n_group), n_test)
+        lo_limit = test_df["LO_LIMIT"].to_numpy(dtype=np.float64)[test_index]
+        hi_limit = test_df["HI_LIMIT"].to_numpy(dtype=np.float64)[test_index]
+        has_lo = (test_df["LO_LIMIT_TYPE"] != LimitType.NoLowLimit).to_numpy()[test_index]
+        has_hi = (test_df["HI_LIMIT_TYPE"] != LimitType.NoHighLimit).to_numpy()[test_index]
+        cpk_std = np.where(std == 0, 1E-05, std)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cpu = np.where(has_hi, (hi_limit - mean) / (3 * cpk_std), np.inf)
+            cpl = np.where(has_lo, (mean - lo_limit) / (3 * cpk_std), np.inf)
+        cpk = np.minimum(cpu, cpl)
+        cpk = np.where(has_lo | has_hi, np.abs(np.round(cpk, 6)), np.nan)
+
+        is_ptr = test_df["TEST_TYPE"].isin([DatatType.PTR, DatatType.MPR]).to_numpy()[test_index]
+        for each in (mean, std, data_min, data_max, cpk):
+            each[~is_ptr] = np.nan
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            reject_rate = reject_qty / qty * 100
+        df = pd.DataFrame({
+            "GROUP": group_keys.get_level_values(0)[group_index],
+            "DA_GROUP": group_keys.get_level_values(1)[group_index],
+            "QTY": qty,
+            "FAIL_QTY": fail_qty,
+            "REJECT_QTY": reject_qty,
+            "REJECT_RATE": np.round(reject_rate, 3),
+            "YIELD": np.round(100 - reject_rate, 3),
+            "AVG": np.round(mean, 6),
+            "STD": np.round(std, 6),
+            "MIN": np.round(data_min, 6),
+            "MAX": np.round(data_max, 6),
+            "CPK": cpk,
+        })
+        for column in ("TEST_ID", "TEST_TYPE", "TEST_NUM", "TEST_TXT", "TEXT", "UNITS",
+                       "LO_LIMIT", "HI_LIMIT", "LO_LIMIT_TYPE", "HI_LIMIT_TYPE"):
+            df[column] = test_df[column].to_numpy()[test_index]
+        return df.loc[qty > 0, GroupCapability.HEAD].reset_index(drop=True)
+
+    @staticmethod
+    def effective_limits(test_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Li.update_limit 只在capability_key_list中写入NEW_LO_LIMIT/NEW_HI_LIMIT, 原LO_LIMIT/HI_LIMIT不变
+        有新limit的测项用新limit替换LO_LIMIT/HI_LIMIT
+        """
+        for column in ("LO_LIMIT", "HI_LIMIT"):
+            new_column = "NEW_" + column
+            if new_column in test_df.columns:
+                test_df[column] = test_df[new_column].where(test_df[new_column].notna(), test_df[column])
+        return test_df
+
+    @staticmethod
+    def group_yield(prr_df: pd.DataFrame, die_group: pd.Series, die_da_group: pd.Series) -> pd.DataFrame:
+        """
+        每个(GROUP, DA_GROUP)的颗数良率, 用prr_df的FAIL_FLAG
+        :return: GROUP/DA_GROUP/TOTAL/PASS/FAIL/YIELD
+        """
+        keys = pd.MultiIndex.from_arrays([
+            np.asarray(die_group, dtype=object), np.asarray(die_da_group, dtype=object)
+        ])
+        die_code, group_keys = pd.factorize(keys, sort=True)
+        total = np.bincount(die_code, minlength=len(group_keys))
+        pass_qty = np.bincount(
+            die_code, weights=prr_df["FAIL_FLAG"].to_numpy() == FailFlag.PASS, minlength=len(group_keys)
+        ).astype(np.int64)
+        return pd.DataFrame({
+            "GROUP": group_keys.get_level_values(0),
+            "DA_GROUP": group_keys.get_level_values(1),
+            "TOTAL": total,
+            "PASS": pass_qty,
+            "FAIL": total - pass_qty,
+            "YIELD": np.round(pass_qty / np.maximum(total, 1) * 100, 3),
+        })
+
+    @staticmethod
+    def pivot(group_df: pd.DataFrame, values: List[str]) -> pd.DataFrame:
+        """
+        长表转成每个测项一行, 每个(组, 指标)一列, 列名为 {GROUP}@{DA_GROUP}_{指标}
+        """
+        head = ["TEST_ID", "TEST_TYPE", "TEXT", "UNITS", "LO_LIMIT", "HI_LIMIT", "LO_LIMIT_TYPE", "HI_LIMIT_TYPE"]
+        df = group_df.assign(ALL_GROUP=group_df["GROUP"] + "@" + group_df["DA_GROUP"])
+        wide = df.pivot(index="TEST_ID", columns="ALL_GROUP", values=values)
+        wide = wide[[(value, group) for group in df["ALL_GROUP"].unique() for value in values]]
+        wide.columns = ["{}_{}".format(group, value) for value, group in wide.columns]
+        info = df.drop_duplicates("TEST_ID")[head].set_index("TEST_ID")
+        return info.join(wide).reset_index()
+
+    @staticmethod
+    def trimmed_mean(df_module: DataModule, die_group, die_da_group, capability_key_list: List[dict],
+                     trim: float = 0.05) -> pd.DataFrame:
+        """
+        每个(组, PTR测项)去掉两头各trim比例后的均值, 用所有测试值(不区分PASS/FAIL)
+        按(测项, 组)编码和测试值一次排序, 用段内名次选出保留的数据, 再用bincount求和, 不需要逐个分组排序
+        :return: index为TEST_ID(PTR/MPR, capability顺序), columns为 GROUP@DA_GROUP
+        """
+        test_df = pd.DataFrame(capability_key_list)
+        if df_module is None or test_df.empty:
+            return pd.DataFrame()
+        test_df = test_df[test_df["TEST_TYPE"].isin([DatatType.PTR, DatatType.MPR])]
+        group_keys, valid, cell, _ = GroupCapability.cell_codes(
+            df_module, die_group, die_da_group, test_df["TEST_ID"]
+        )
+        n_test, n_group = len(test_df), len(group_keys)
+        size = n_test * n_group
+
+        result = df_module.dtp_df["RESULT"].to_numpy(dtype=np.float64)[valid]
+        not_nan = ~np.isnan(result)
+        cell, result = cell[not_nan], result[not_nan]
+        order = np.lexsort((result, cell))
+        sorted_cell, sorted_result = cell[order], result[order]
+        count = np.bincount(cell, minlength=size)
+        offset = np.cumsum(count) - count
+        # 和原来 sorted(data)[int(n*0.05): int(n*0.95)] 的截断位置一致
+        start = (count * trim).astype(np.int64)
+        stop = (count * (1 - trim)).astype(np.int64)
+        rank = np.arange(len(sorted_cell)) - offset[sorted_cell]
+        keep = (rank >= start[sorted_cell]) & (rank < stop[sorted_cell])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(sorted_cell[keep], weights=sorted_result[keep], minlength=size) / (stop - start)
+        mean[stop <= start] = np.nan
+        columns = ["{}@{}".format(group, da_group) for group, da_group in group_keys]
+        return pd.DataFrame(
+            mean.reshape(n_test, n_group), index=pd.Index(test_df["TEST_ID"].to_numpy(), name="TEST_ID"),
+            columns=columns
+        )
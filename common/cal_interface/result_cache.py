@@ -0,0 +1,158 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : result_cache.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 制程能力等计算结果的磁盘缓存, 放在HDF5缓存目录旁边, 重新打开同样的数据时不再重算
+"""
+import hashlib
+import os
+import pickle
+import threading
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from common.app_variable import GlobalVariable
+from parser_core.stdf_module_cache import ModuleCache
+
+
+class ResultCache:
+    """
+    1. dataset_key: 每个文件的(HDF5_PATH, 文件指纹, PART_FLAG, READ_FAIL) + 测试类型过滤, HDF5被重写后自动失效
+    2. 在dataset_key后面加上区分结果的部分作为完整的key:
+        ("capability", state_key): capability_key_list, top_fail_dict
+        ("limit", limit_key): update_limit 后的 capability_key_list, top_fail_dict
+        ("group", state_key, 分组): group_capability_df, group_yield_df
+    3. 每个key一个pickle文件, 文件名为key的sha1, 文件中同时保存key本身, 读取时核对
+    4. 超过 GlobalVariable.RESULT_CACHE_SIZE 个文件后删除最久没用过的
+    缓存只是加速, 读写出错时当作没有缓存
+    """
+    VERSION = 1
+    SUFFIX = ".pkl"
+    _lock = threading.RLock()
+
+    @staticmethod
+    def dataset_key(select_summary: pd.DataFrame, test_types: Union[List[str], None]) -> Union[tuple, None]:
+        """
+        :param select_summary: Li.select_summary, 行的顺序就是concat的顺序
+        :param test_types: Li.filter_by_test_type 的参数, None为不过滤
+        :return: 有文件不存在时为None, 不使用缓存
+        """
+        if select_summary is None or "HDF5_PATH" not in select_summary.columns:
+            return None
+        files = []
+        try:
+            for row in select_summary.itertuples():
+                path = getattr(row, "HDF5_PATH")
+                files.append((
+                    os.path.normcase(os.path.abspath(path)), ModuleCache.fingerprint(path),
+                    int(getattr(row, "PART_FLAG")), int(getattr(row, "READ_FAIL")),
+                ))
+        except (OSError, TypeError, ValueError):
+            return None
+        types = None if test_types is None else tuple(sorted(test_types))
+        return ResultCache.VERSION, tuple(files), types
+
+    @staticmethod
+    def array_key(array: Union[np.ndarray, None]) -> Union[str, None]:
+        if array is None:
+            return None
+        array = np.ascontiguousarray(array)
+        if array.dtype == bool:
+            array = np.packbits(array)
+        return hashlib.md5(array.tobytes()).hexdigest()
+
+    @staticmethod
+    def limit_key(limit_overlay: Union[Dict[int, Tuple[float, float, str, str]], None]) -> Union[tuple, None]:
+        """ {TEST_ID: (LO_LIMIT, HI_LIMIT, LO_TYPE, HI_TYPE)} 按TEST_ID排序, limit用repr保留全部精度 """
+        if not limit_overlay:
+            return None
+        return tuple(
+            (int(test_id), repr(float(lo)), repr(float(hi)), str(lo_type), str(hi_type))
+            for test_id, (lo, hi, lo_type, hi_type) in sorted(limit_overlay.items())
+        )
+
+    @staticmethod
+    def file_path(key: tuple) -> str:
+        name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(GlobalVariable.RESULT_CACHE_PATH, name + ResultCache.SUFFIX)
+
+    @classmethod
+    def get(cls, key: Union[tuple, None]):
+        """
+        :return: put时的value, 没有缓存时为None
+        """
+        if key is None:
+            return None
+        path = cls.file_path(key)
+        try:
+            with open(path, "rb") as f:
+                saved_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            cls.remove(path)
+            return None
+        if saved_key != key:
+            return None
+        try:
+            # 用修改时间记录最近一次使用, 淘汰时按它排序
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    @classmethod
+    def put(cls, key: Union[tuple, None], value):
+        if key is None:
+            return
+        path = cls.file_path(key)
+        temp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        try:
+            os.makedirs(GlobalVariable.RESULT_CACHE_PATH, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except Exception:
+            cls.remove(temp_path)
+            return
+        cls.evict()
+
+    @classmethod
+    def evict(cls):
+        with cls._lock:
+            try:
+                entries = [
+                    entry for entry in os.scandir(GlobalVariable.RESULT_CACHE_PATH)
+                    if entry.name.endswith(cls.SUFFIX)
+                ]
+            except OSError:
+                return
+            if len(entries) <= GlobalVariable.RESULT_CACHE_SIZE:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+            for entry in entries[:len(entries) - GlobalVariable.RESULT_CACHE_SIZE]:
+                cls.remove(entry.path)
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            if os.path.isfile(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            try:
+                entries = list(os.scandir(GlobalVariable.RESULT_CACHE_PATH))
+            except OSError:
+                return
+            for entry in entries:
+                if entry.name.endswith(cls.SUFFIX):
+                    cls.remove(entry.path)
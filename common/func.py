@@ -12,8 +12,9 @@ import json
 import os
 import pickle
 import random
-from typing import Union
+from typing import List, Union
 
+import numpy as np
 import pandas as pd
 from ui_component.ui_common.my_text_browser import Print
 
@@ -120,3 +121,32 @@ def get_obj_by_pickle(save_path: str, file_name: str, suffix='.pkl') -> Union[ob
     with open(file_path, 'rb') as file:
         li = pickle.loads(file.read())
     return li
+
+
+def join_columns(df: pd.DataFrame, columns: List[str], sep: str = '_') -> np.ndarray:
+    """
+    每行的 str(col1) + sep + str(col2) ..., 和 df[columns].apply(lambda x: sep.join(x.map(str)), axis=1) 一致
+    逐行apply时每行先转成所有列的公共类型(如int和float混合时int也写成'1.0'), 这里每列的值也先转成公共类型再转字符串
+    每列先编码, 只对出现过的组合拼接字符串, 再按编码取回每一行
+    空值(NaN/None)都写成'nan'
+    """
+    common_dtype = df[columns].iloc[:0].to_numpy().dtype
+    code = np.zeros(len(df), dtype=np.int64)
+    uniques = []
+    for col in columns:
+        col_code, col_unique = pd.factorize(df[col])
+        # factorize把NaN编码为-1, 放到最后一个
+        col_code = np.where(col_code < 0, len(col_unique), col_code)
+        col_unique = pd.Series(col_unique, dtype=df[col].dtype).astype(common_dtype).map(str).tolist()
+        uniques.append(col_unique + [str(np.nan)])
+        code = code * (len(col_unique) + 1) + col_code
+    combine, inverse = np.unique(code, return_inverse=True)
+    labels = np.empty(len(combine), dtype=object)
+    for index, each in enumerate(combine):
+        parts = []
+        for col_unique in reversed(uniques):
+            each, position = divmod(int(each), len(col_unique))
+            parts.append(col_unique[position])
+        labels[index] = sep.join(reversed(parts))
+    return labels[inverse.ravel()]
+
@@ -8,15 +8,26 @@
 @Mark    : 
 """
 
+import hashlib
+import itertools
+import os
 from multiprocessing import Process
-from typing import List, Dict, Union, Tuple
+from typing import List, Dict, Union, Tuple, Callable
 
+import numpy as np
 import pandas as pd
 from PySide2.QtCore import QObject, Signal
 
+from app_test.test_utils.log_utils import Print
 from app_test.test_utils.wrapper_utils import Time
-from common.app_variable import DataModule, ToChartCsv, GlobalVariable
+from common.app_variable import DataModule, ToChartCsv, GlobalVariable, GroupIndex
 from common.cal_interface.capability import CapabilityUtils
+from common.cal_interface.group_capability import GroupCapability
+from common.cal_interface.result_cache import ResultCache
+from common.li_state import LiStateHistory, LiSnapshot
+from common.wafer_stack import WaferStack
+from parser_core.stdf_bin_cube import BinCube
+from parser_core.stdf_module_cache import ModuleCache
 from parser_core.stdf_parser_file_write_read import ParserData
 from report_core.openxl_utils.utils import OpenXl
 
@@ -103,6 +114,20 @@ class SummaryCore:
 
         return tree_dict_list
 
+    def get_summary_lot(self) -> Tuple[pd.DataFrame, List[np.ndarray]]:
+        """
+        get_summary_tree的懒加载版本, 只汇总LOT这一层, 子节点只给出在summary_df中的行号, Tree展开时再取
+        :return: 每个LOT一行(LOT_ID/QTY/PASS/YIELD/START_T), 每个LOT在summary_df中的行号
+        """
+        group = self.summary_df.groupby(self.summary_df["LOT_ID"].astype(str))
+        lot_df = group.agg(QTY=("QTY", "sum"), PASS=("PASS", "sum"), START_T=("START_T", "min")).reset_index()
+        lot_df["YIELD"] = [
+            "0.0%" if qty == 0 else '{}%'.format(round(pass_qty / qty * 100, 2))
+            for qty, pass_qty in zip(lot_df["QTY"], lot_df["PASS"])
+        ]
+        indices = group.indices
+        return lot_df, [indices[key] for key in lot_df["LOT_ID"]]
+
     def add_custom_node(self, ids: List[int], new_lot_id: str):
         """
         将多个数据组合为一个自定义的LOT, 比如两个版本的数据对比, 将一部分分为版本A(LOT_A), 另一部分分为版本B(LOT_B)
@@ -136,7 +161,8 @@ class SummaryCore:
             return
         self.summary_df.loc[self.summary_df.ID.isin(ids), "LOT_ID"] = new_lot_id
 
-    def load_select_data(self, ids: List[int], quick: bool = False, sample_num: int = 1E4):
+    def load_select_data(self, ids: List[int], quick: bool = False, sample_num: int = 1E4,
+                         progress: Callable[[int, int], None] = None):
         """
         返回数据
         整理出一个比较完整的 ptmd 的整合dict
@@ -146,11 +172,21 @@ class SummaryCore:
         :param ids:
         :param quick:
         :param sample_num:
+        :param progress: progress(已载入的HDF5字节数, 总字节数), 每个文件载入前后调用, 可以在其中抛出异常中断
         :return:
         """
         id_module_dict = {}
         select_summary = self.summary_df[self.summary_df.ID.isin(ids)]
-        for select in select_summary.itertuples():
+        sizes = []
+        for path in select_summary["HDF5_PATH"]:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        total, done = sum(sizes), 0
+        for select, size in zip(select_summary.itertuples(), sizes):
+            if progress is not None:
+                progress(done, total)
             ID = getattr(select, "ID")
             data_module = ParserData.load_hdf5_analysis(
                 getattr(select, "HDF5_PATH"),
@@ -159,6 +195,11 @@ class SummaryCore:
                 unit_id=ID,
             )
             id_module_dict[ID] = data_module
+            done += size
+        if progress is not None:
+            progress(total, total)
+        if GlobalVariable.DEBUG:
+            Print.info("module cache: {}".format(ModuleCache.stats()))
         return select_summary, id_module_dict
 
     # def get_bin_summary(self, ids: List[int], group_params: Union[list, None], da_group_params: Union[list, None]):
@@ -193,17 +234,42 @@ class Li(QObject):
 
     # ======================== 用于绘图或是capability group
     to_chart_csv_data: ToChartCsv = None
+    # to_chart_csv_data.df 每次重新生成时取一个新的版本号(所有数据空间唯一), 用于导出缓存的key
+    data_version: int = 0
+    _version_count = itertools.count(1)
     group_params = None
     da_group_params = None
 
-    # ======================== 新增：操作状态管理
-    _original_df_module: DataModule = None  # 保存原始数据
-    _current_limit_changes: Dict[int, Tuple[float, float, str, str]] = None  # 当前limit变更
-    _operation_state: str = None  # 操作状态: None, 'limit_changed', 'data_filtered'
+    # ======================== 计算结果磁盘缓存(ResultCache)的dataset_key, 载入时设置, None时不使用缓存
+    result_key: tuple = None
+
+    # ======================== 操作状态管理: 版本化的快照, 共享原始数据, 支持多步撤销/重做
+    _state_history: LiStateHistory = None
+
+    # ======================== 分组制程能力(长表)和分组良率, calculation_group的结果
+    group_capability_df: pd.DataFrame = None
+    group_yield_df: pd.DataFrame = None
+
+    # ======================== 多片wafer叠加的Mapping, 数据空间增加文件时只合并新文件
+    wafer_stack: WaferStack = None
 
     def __init__(self):
         super(Li, self).__init__()
 
+    @property
+    def _operation_state(self) -> Union[str, None]:
+        """ 操作状态: None, 'limit_changed', 'limit_restored', 'data_filtered', 'data_screened' """
+        if self._state_history is None:
+            return None
+        return self._state_history.current.operation_state
+
+    @property
+    def _current_limit_changes(self) -> Union[Dict[int, Tuple[float, float, str, str]], None]:
+        """ 当前limit变更 """
+        if self._state_history is None:
+            return None
+        return self._state_history.current.limit_overlay
+
     def set_data(self,
                  select_summary: pd.DataFrame,
                  id_module_dict: Dict[int, DataModule]
@@ -236,9 +302,27 @@ class Li(QObject):
         for df_id, module in self.id_module_dict.items():
             data_module_list.append(module)
         self.df_module = ParserData.contact_data_module(data_module_list)
+        # 按ID稳定排序一次, 同一个ID内原来的顺序不变, DataModule.view按ID取连续的一段
+        for name in ("prr_df", "dtp_df"):
+            df = getattr(self.df_module, name)
+            if not df["ID"].is_monotonic_increasing:
+                setattr(self.df_module, name, df.take(np.argsort(df["ID"].to_numpy(), kind="stable")))
         self.df_module.prr_df.set_index(["DIE_ID"], inplace=True)
         self.df_module.dtp_df.set_index(["TEST_ID", "DIE_ID"], inplace=True)
         self.df_module.prr_df["DA_GROUP"] = "*"
+        self._state_history = None
+        self.result_key = None
+
+    def set_module(self, df_module: DataModule):
+        """
+        使用已经concat好的数据(如LiPipeline中复用的阶段结果), dtp_df共享, prr_df复制后重置DA_GROUP
+        浅拷贝上给已有的DA_GROUP列赋值可能写回保存的结果中, prr_df不大, 直接复制
+        """
+        prr_df = df_module.prr_df.copy()
+        prr_df["DA_GROUP"] = "*"
+        self.df_module = DataModule(prr_df=prr_df, dtp_df=df_module.dtp_df, ptmd_df=df_module.ptmd_df)
+        self._state_history = None
+        self.result_key = None
     
     def filter_by_test_type(self, test_types: List[str]):
         """
@@ -270,28 +354,104 @@ class Li(QObject):
                 self.df_module.dtp_df['TEST_ID'].isin(filtered_test_ids)
             ]
 
-    def calculation_top_fail(self):
+    def set_result_key(self, test_types: Union[List[str], None] = None):
+        """
+        在concat和filter_by_test_type之后调用, 之后的计算结果按这份数据缓存到磁盘
+        :param test_types: filter_by_test_type 的参数, 没有过滤时为None
+        """
+        self.result_key = ResultCache.dataset_key(self.select_summary, test_types)
+
+    def _result_cache_key(self, *args) -> Union[tuple, None]:
+        if self.result_key is None:
+            return None
+        return self.result_key + args
+
+    @staticmethod
+    def _state_key(snapshot: Union[LiSnapshot, None]) -> tuple:
+        """ 操作状态对应的缓存key, 没有操作过(None)和原始状态相同 """
+        if snapshot is None:
+            return None, None, None
+        return (
+            ResultCache.array_key(snapshot.die_mask),
+            ResultCache.array_key(None if snapshot.test_ids is None else np.sort(snapshot.test_ids)),
+            ResultCache.limit_key(snapshot.limit_overlay),
+        )
+
+    def state_key(self) -> tuple:
+        """
+        当前数据的key: 测试类型过滤 + 当前操作状态(删除/筛选/limit变更), 用于按数据状态缓存的结果(如Summary文本)
+        """
+        test_types = None if self.result_key is None else self.result_key[-1]
+        current = None if self._state_history is None else self._state_history.current
+        return (test_types,) + self._state_key(current)
+
+    def has_die_mask(self) -> bool:
+        """ 当前状态是否删除过DIE(drop_data_by_select_limit) """
+        return self._state_history is not None and self._state_history.current.die_mask is not None
+
+    def load_capability_cache(self, snapshot: LiSnapshot = None) -> bool:
+        """
+        从磁盘缓存中取出当前数据(或snapshot状态)的top fail和制程能力, 取到时不需要再计算
+        :return: 是否取到
+        """
+        value = ResultCache.get(self._result_cache_key("capability", self._state_key(snapshot)))
+        if value is None:
+            return False
+        self.set_capability(*value)
+        return True
+
+    def save_capability_cache(self, snapshot: LiSnapshot = None):
+        ResultCache.put(
+            self._result_cache_key("capability", self._state_key(snapshot)),
+            (self.capability_key_list, self.top_fail_dict),
+        )
+
+    def get_wafer_stack(self) -> Union[WaferStack, None]:
+        """
+        叠加当前数据空间中所有文件的wafer, 每个文件的坐标网格在第一次用到时生成并缓存
+        :return:
+        """
+        if self.select_summary is None or "HDF5_PATH" not in self.select_summary.columns:
+            return None
+        self.wafer_stack = WaferStack.update(self.wafer_stack, self.select_summary["HDF5_PATH"].tolist())
+        return self.wafer_stack
+
+    def get_bin_cube(self) -> Union[pd.DataFrame, None]:
+        """
+        当前数据空间中所有文件的Bin计数(文件 x SITE x BIN), 读取的是解析时保存的bin_cube, 不需要原始数据
+        :return: 列为 ID + BinCube.HEAD
+        """
+        if self.select_summary is None or "HDF5_PATH" not in self.select_summary.columns:
+            return None
+        return BinCube.concat(
+            [ParserData.load_bin_cube(path) for path in self.select_summary["HDF5_PATH"]],
+            self.select_summary["ID"].tolist(),
+        )
+
+    def calculation_top_fail(self, progress: Callable[[int, int], None] = None):
         """
         1. 计算top fail
         2. 需要在unstack的数据格式上
         3. 根据选取的数据来做计算
         :return:
         """
-        self.top_fail_dict = CapabilityUtils.calculation_top_fail(self.df_module)
+        self.top_fail_dict = CapabilityUtils.calculation_top_fail(self.df_module, progress=progress)
 
-    def calculation_capability(self):
+    def calculation_capability(self, progress: Callable[[int, int], None] = None):
         """
         1. 计算reject rate
         2. 计算cpk等
         :return:
         """
-        self.capability_key_list = CapabilityUtils.calculation_capability(self.df_module, self.top_fail_dict)
-        if self.capability_key_dict is None:
-            self.capability_key_dict = dict()
-        else:
-            self.capability_key_dict.clear()
-        for each in self.capability_key_list:
-            self.capability_key_dict[each["TEST_ID"]] = each
+        self.set_capability(
+            CapabilityUtils.calculation_capability(self.df_module, self.top_fail_dict, progress=progress),
+            self.top_fail_dict,
+        )
+
+    def set_capability(self, capability_key_list: list, top_fail_dict: dict):
+        """ 使用已有的计算结果(缓存或复用的阶段结果) """
+        self.capability_key_list, self.top_fail_dict = capability_key_list, top_fail_dict
+        self._update_capability_key_dict()
 
     @Time()
     def background_generation_data_use_to_chart_and_to_save_csv(self):
@@ -304,8 +464,14 @@ class Li(QObject):
             self.to_chart_csv_data = ToChartCsv()
         temp_result = self.df_module.dtp_df[["RESULT"]]
         temp_result = temp_result[~temp_result.index.duplicated(keep="last")]
-        temp_result = temp_result.unstack(0).RESULT
-        self.to_chart_csv_data.df = temp_result
+        self.set_chart_df(temp_result.unstack(0).RESULT)
+
+    def set_chart_df(self, df: pd.DataFrame):
+        """ unstack后的数据(DIE x TEST_ID), 每次设置都取一个新的数据版本号 """
+        if self.to_chart_csv_data is None:
+            self.to_chart_csv_data = ToChartCsv()
+        self.to_chart_csv_data.df = df
+        self.data_version = next(Li._version_count)
 
 
     def background_generation_limit_data_use_to_pat(self):
@@ -318,21 +484,22 @@ class Li(QObject):
         temp_result = temp_result[~temp_result.index.duplicated(keep="last")]
         self.to_chart_csv_data.limit = temp_result.unstack(0)
 
-    def set_chart_data(self, chart_df: Union[pd.DataFrame, None]):
+    def set_chart_mask(self, chart_mask: Union[np.ndarray, None], mode: str = "replace"):
         """
-        用于pyqtgraph绘图
-        :param chart_df:
+        用于pyqtgraph绘图, 更新共享的选取mask(对应to_chart_csv_data.df的行), 所有图表和导出都用这个mask
+        :param chart_mask: bool数组, None表示取消选取
+        :param mode: replace: 替换; add: 并入当前选取; remove: 从当前选取中去掉; intersect: 和当前选取取交集
         :return:
         """
-        self.to_chart_csv_data.chart_df = chart_df
-        if chart_df is None:
-            self.select_chart()
-            return
-        group_data = {}
-        for (group, da_group), df in self.to_chart_csv_data.chart_df.groupby(["GROUP", "DA_GROUP"]):
-            key = f"{group}@{da_group}"
-            group_data[key] = df
-        self.to_chart_csv_data.group_chart_df = group_data
+        current = self.to_chart_csv_data.chart_mask
+        if chart_mask is not None and current is not None and mode != "replace":
+            if mode == "add":
+                chart_mask = current | chart_mask
+            elif mode == "remove":
+                chart_mask = current & ~chart_mask
+            elif mode == "intersect":
+                chart_mask = current & chart_mask
+        self.to_chart_csv_data.chart_mask = chart_mask
         self.select_chart()
 
     def set_data_group(self, group_params: Union[list, None], da_group_params: Union[list, None]):
@@ -347,27 +514,11 @@ class Li(QObject):
         if self.df_module is None or self.df_module.prr_df is None:
             return
         self.group_params, self.da_group_params = group_params, da_group_params
-        if group_params is None:
-            temp_column_data = '*'
-        else:
-            temp_column_data = None
-            for index, each in enumerate(group_params):
-                if index == 0:
-                    temp_column_data = self.select_summary[each].astype(str)
-                else:
-                    temp_column_data = temp_column_data + "|" + self.select_summary[each].astype(str)
-
-        self.select_summary.loc[:, "GROUP"] = temp_column_data
-        if da_group_params is None:
-            temp_column_data = '*'
-        else:
-            temp_column_data = None
-            for index, each in enumerate(da_group_params):
-                if index == 0:
-                    temp_column_data = self.df_module.prr_df[each].astype(str)
-                else:
-                    temp_column_data = temp_column_data + "|" + self.df_module.prr_df[each].astype(str)
-        self.df_module.prr_df.loc[:, "DA_GROUP"] = temp_column_data
+        self.select_summary.loc[:, "GROUP"] = GroupCapability.group_labels(self.select_summary, group_params)
+        # prr_df可能和ModuleCache/LiPipeline中保存的数据共享内存, 复制后再写DA_GROUP
+        prr_df = self.df_module.prr_df.copy()
+        prr_df["DA_GROUP"] = GroupCapability.group_labels(prr_df, da_group_params)
+        self.df_module.prr_df = prr_df
 
         self.background_generation_data_use_to_chart_and_to_save_csv()
         data = pd.merge(self.to_chart_csv_data.df, self.df_module.prr_df, left_index=True, right_index=True)
@@ -375,12 +526,8 @@ class Li(QObject):
             data, self.select_summary[["ID", "GROUP"]], on="ID"
         )
 
-        group_data = {}
-        for (group, da_group), df in self.to_chart_csv_data.df.groupby(["GROUP", "DA_GROUP"]):
-            key = f"{group}@{da_group}"
-            group_data[key] = df
-        self.to_chart_csv_data.group_df = group_data
-        self.set_chart_data(None)
+        self.to_chart_csv_data.group_df = GroupIndex(self.to_chart_csv_data.df)
+        self.set_chart_mask(None)
         self.refresh_chart()
         return True
 
@@ -395,10 +542,6 @@ class Li(QObject):
         """
         # if not test_id_list:
         #     raise Exception("get_unstack_data_to_csv_or_jmp_or_altair must have test_id")
-        if self.to_chart_csv_data.chart_df is None:
-            df = self.to_chart_csv_data.df
-        else:
-            df = self.to_chart_csv_data.chart_df
         name_dict = {}
         calculation_capability = {}
         for test_id in test_id_list:
@@ -406,27 +549,98 @@ class Li(QObject):
             name_dict[test_id] = row["TEXT"]
             calculation_capability[row["TEXT"]] = row
         # rename -> key_id rename text
-        df = df[GlobalVariable.JMP_SCRIPT_HEAD + test_id_list].copy()
+        mask = self.to_chart_csv_data.chart_mask
+        if self.to_chart_csv_data.select_group is not None:
+            group_mask = self.to_chart_csv_data.group_df.rows_of(self.to_chart_csv_data.select_group)
+            mask = group_mask if mask is None else mask & group_mask
+        df = self.to_chart_csv_data.df[GlobalVariable.JMP_SCRIPT_HEAD + test_id_list]
+        df = df.copy() if mask is None else df.take(np.flatnonzero(mask))
         # {group}@{da_group}
         df["ALL_GROUP"] = df["GROUP"] + "@" + df["DA_GROUP"]
-        if self.to_chart_csv_data.select_group is not None:
-            df = df[df.ALL_GROUP.isin(self.to_chart_csv_data.select_group)]
         df = df.rename(columns=name_dict)
         return df, calculation_capability
 
-    def calculation_group(self, group_params: Union[list, None], da_group_params: Union[list, None]):
+    def jmp_export_key(self, columns: List[str]) -> tuple:
         """
-        分组的制程能力报表
-        TODO: future
-        :param group_params:
-        :param da_group_params:
-        :return:
+        get_unstack_data_to_csv_or_jmp_or_altair 导出数据的key: (数据版本, 选取的DIE, 选取的分组, 导出的列)
+        测项和分组方式都体现在列(及数据版本)中, key相同时导出的CSV内容相同
+        """
+        mask = self.to_chart_csv_data.chart_mask
+        mask_key = None if mask is None else hashlib.md5(np.packbits(mask).tobytes()).hexdigest()
+        select_group = self.to_chart_csv_data.select_group
+        group_key = None if select_group is None else tuple(sorted(str(each) for each in select_group))
+        return self.data_version, mask_key, group_key, tuple(str(each) for each in columns)
+
+    def die_groups(self, group_params: Union[list, None], da_group_params: Union[list, None]):
+        """
+        和prr_df行对齐的GROUP/DA_GROUP, 只是临时生成, 不改变当前绘图的分组
         """
+        prr_df = self.df_module.prr_df
+        summary_group = GroupCapability.group_labels(self.select_summary, group_params)
+        if isinstance(summary_group, str):
+            die_group = summary_group
+        else:
+            die_group = prr_df["ID"].map(pd.Series(summary_group.to_numpy(), index=self.select_summary["ID"]))
+        die_group = np.broadcast_to(np.asarray(die_group, dtype=object), len(prr_df))
+        die_da_group = np.broadcast_to(
+            np.asarray(GroupCapability.group_labels(prr_df, da_group_params), dtype=object), len(prr_df)
+        )
+        return die_group, die_da_group
+
+    def calculation_group(self, group_params: Union[list, None], da_group_params: Union[list, None]) \
+            -> Union[pd.DataFrame, None]:
+        """
+        分组的制程能力报表, GROUP x DA_GROUP x TEST 一次算完, 结果为长表, 给ProcessWidget和Excel导出使用
+        分组只在这里临时生成, 不改变当前绘图的分组
+        :param group_params: 根据Summary的分组, None为不分组
+        :param da_group_params: 根据prr数据(如SITE_NUM)的分组, None为不分组
+        :return: 列为 GroupCapability.HEAD
+        """
+        if self.df_module is None or self.select_summary is None or not self.capability_key_list:
+            self.QStatusMessage.emit("请先将数据载入到数据空间中!")
+            return None
+        summary_group = GroupCapability.group_labels(self.select_summary, group_params)
+        if not isinstance(summary_group, str):
+            summary_group = tuple(zip(self.select_summary["ID"].tolist(), summary_group.tolist()))
+        key = self._result_cache_key(
+            "group", self._state_key(None if self._state_history is None else self._state_history.current),
+            tuple(group_params or ()), tuple(da_group_params or ()), summary_group,
+        )
+        value = ResultCache.get(key)
+        if value is not None:
+            self.group_capability_df, self.group_yield_df = value
+            return self.group_capability_df
+        die_group, die_da_group = self.die_groups(group_params, da_group_params)
+        self.group_capability_df = GroupCapability.calculation(
+            self.df_module, die_group, die_da_group, self.capability_key_list
+        )
+        self.group_yield_df = GroupCapability.group_yield(self.df_module.prr_df, die_group, die_da_group)
+        ResultCache.put(key, (self.group_capability_df, self.group_yield_df))
+        return self.group_capability_df
+
+    def calculation_group_diff(self, group_params: Union[list, None], da_group_params: Union[list, None],
+                               reference: str, trim: float = 0.05) -> Union[pd.DataFrame, None]:
+        """
+        以reference组为基准, 每个组和它的截尾均值差(基准 - 组), 只看PTR/MPR
+        :param reference: GROUP@DA_GROUP
+        :param trim: 两头各去掉的比例
+        :return: index为TEST_ID, columns为 GROUP@DA_GROUP 的差值矩阵
+        """
+        if self.df_module is None or self.select_summary is None or not self.capability_key_list:
+            self.QStatusMessage.emit("请先将数据载入到数据空间中!")
+            return None
+        die_group, die_da_group = self.die_groups(group_params, da_group_params)
+        mean_df = GroupCapability.trimmed_mean(
+            self.df_module, die_group, die_da_group, self.capability_key_list, trim
+        )
+        if reference not in mean_df:
+            return None
+        return mean_df.rsub(mean_df[reference], axis=0)
 
     def update_limit(self, limit_new: Dict[int, Tuple[float, float, str, str]], only_pass: bool = False) -> bool:
         """
         基于原始数据重新计算使用新limit的fail rate
-        不修改原始数据，只是重新计算制程能力指标
+        不修改原始数据，只是重新计算制程能力指标, 新limit作为overlay记录在新的状态中
         :param limit_new: {TEST_ID: (LO_LIMIT, HI_LIMIT, LO_TYPE, HI_TYPE)}
         :param only_pass: 是否只保留PASS数据
         :return: 更新是否成功
@@ -436,18 +650,28 @@ class Li(QObject):
             return False
 
         try:
-            # 保存原始数据（如果还没保存）
-            if self._original_df_module is None:
-                self._original_df_module = self._deep_copy_datamodule(self.df_module)
+            # 第一次操作时以当前数据作为所有状态共享的原始数据
+            self._init_state_history()
 
-            # 保存当前limit变更
-            self._current_limit_changes = limit_new.copy()
-
-            # 基于原始数据和新limit重新计算制程能力
-            self._calculate_with_new_limits(limit_new, only_pass)
+            # 基于原始数据和新limit重新计算制程能力, 按当前状态和新limit缓存
+            key = self._result_cache_key(
+                "limit", self._state_key(self._state_history.current), ResultCache.limit_key(limit_new)
+            )
+            value = ResultCache.get(key)
+            if value is None:
+                self._calculate_with_new_limits(limit_new, only_pass)
+                ResultCache.put(key, (self.capability_key_list, self.top_fail_dict))
+            else:
+                self.capability_key_list, self.top_fail_dict = value
+                self._update_capability_key_dict()
 
-            # 更新操作状态
-            self._operation_state = 'limit_changed'
+            # 保存当前limit变更, 数据mask不变
+            self._state_history.push(self._state_history.current.evolve(
+                limit_overlay=limit_new.copy(),
+                operation_state='limit_changed',
+                capability_key_list=self.capability_key_list,
+                top_fail_dict=self.top_fail_dict,
+            ))
 
             # 发送更新信号
             self.update()
@@ -458,35 +682,100 @@ class Li(QObject):
             self.QStatusMessage.emit(f"Limit重新计算失败: {str(e)}")
             return False
 
-    def _deep_copy_datamodule(self, df_module: DataModule) -> DataModule:
+    def _init_state_history(self):
         """
-        深拷贝DataModule对象
+        不再深拷贝整份DataModule, 原始数据直接作为base被所有状态共享
         """
-        import copy
-        return DataModule(
-            prr_df=df_module.prr_df.copy(),
-            dtp_df=df_module.dtp_df.copy(),
-            ptmd_df=df_module.ptmd_df.copy()
+        if self._state_history is not None:
+            return
+        self._state_history = LiStateHistory(
+            base=self.df_module,
+            root=LiSnapshot(capability_key_list=self.capability_key_list, top_fail_dict=self.top_fail_dict),
         )
 
+    def _apply_snapshot(self, snapshot: LiSnapshot):
+        """
+        将状态对应的数据设置为当前数据, 状态中已经有计算结果的就不再重算
+        """
+        self.df_module = self._state_history.materialize(snapshot)
+        if snapshot.capability_key_list is None:
+            if not self.load_capability_cache(snapshot):
+                self.calculation_top_fail()
+                self.calculation_capability()
+                self.save_capability_cache(snapshot)
+            snapshot.capability_key_list = self.capability_key_list
+            snapshot.top_fail_dict = self.top_fail_dict
+        else:
+            self.top_fail_dict = snapshot.top_fail_dict
+            self.capability_key_list = snapshot.capability_key_list
+            self._update_capability_key_dict()
+        self.background_generation_data_use_to_chart_and_to_save_csv()
+
+    def _update_capability_key_dict(self):
+        if self.capability_key_dict is None:
+            self.capability_key_dict = dict()
+        else:
+            self.capability_key_dict.clear()
+        for each in self.capability_key_list:
+            self.capability_key_dict[each["TEST_ID"]] = each
+
+    def can_undo(self) -> bool:
+        return self._state_history is not None and self._state_history.can_undo()
+
+    def can_redo(self) -> bool:
+        return self._state_history is not None and self._state_history.can_redo()
+
+    def undo(self) -> bool:
+        """
+        撤销上一步的 limit变更/数据删除/测项筛选
+        :return:
+        """
+        if not self.can_undo():
+            self.QStatusMessage.emit("没有可以撤销的操作!")
+            return False
+        try:
+            self._apply_snapshot(self._state_history.undo())
+            self.update()
+            self.QStatusMessage.emit("已撤销上一步操作!")
+            return True
+        except Exception as e:
+            self.QStatusMessage.emit(f"撤销失败: {str(e)}")
+            return False
+
+    def redo(self) -> bool:
+        """
+        重做被撤销的操作
+        :return:
+        """
+        if not self.can_redo():
+            self.QStatusMessage.emit("没有可以重做的操作!")
+            return False
+        try:
+            self._apply_snapshot(self._state_history.redo())
+            self.update()
+            self.QStatusMessage.emit("已重做操作!")
+            return True
+        except Exception as e:
+            self.QStatusMessage.emit(f"重做失败: {str(e)}")
+            return False
+
     def _calculate_with_new_limits(self, limit_new: Dict[int, Tuple[float, float, str, str]], only_pass: bool = False):
         """
         基于原始数据和新limit计算制程能力
         只对limit有变化的项目重新计算，其他项目保持原始结果
         同时在capability结果中添加NEW_LO_LIMIT和NEW_HI_LIMIT信息
         """
-        # 获取原始的capability结果作为基础
-        # 如果还没有原始结果，先计算一次
-        if not hasattr(self, '_original_capability_key_list') or self._original_capability_key_list is None:
-            self._original_capability_key_list = [item.copy() for item in self.capability_key_list]
-            self._original_top_fail_dict = self.top_fail_dict.copy()
+        # 原始的capability结果作为基础, 在第一次操作时已经记录在root状态中
+        base_module = self._state_history.base
+        original_capability_key_list = self._state_history.root.capability_key_list
+        original_top_fail_dict = self._state_history.root.top_fail_dict
 
         # 检查哪些测试项目的limit真正发生了变化
         changed_test_ids = set()
         for test_id, (new_lo_limit, new_hi_limit, lo_type, hi_type) in limit_new.items():
             # 从原始ptmd中获取原始limit
-            original_ptmd = self._original_df_module.ptmd_df[
-                self._original_df_module.ptmd_df['TEST_ID'] == test_id
+            original_ptmd = base_module.ptmd_df[
+                base_module.ptmd_df['TEST_ID'] == test_id
             ]
             if len(original_ptmd) > 0:
                 # 如果是FTR类型，则不进行重算
@@ -509,17 +798,22 @@ class Li(QObject):
 
         # 如果没有任何limit变化，直接返回原始结果
         if len(changed_test_ids) == 0:
-            # 为所有项目添加NEW_LO_LIMIT和NEW_HI_LIMIT字段（使用原始值）
+            # 为所有项目添加NEW_LO_LIMIT和NEW_HI_LIMIT字段（使用原始值）, 结果属于新状态, 不改动原始结果
+            capability_key_list = []
             for item in self.capability_key_list:
+                item = item.copy()
                 item['NEW_LO_LIMIT'] = item['LO_LIMIT']
                 item['NEW_HI_LIMIT'] = item['HI_LIMIT']
                 item['RESCUED_FAIL_COUNT'] = 0
                 item['NEW_FAIL_RATE'] = item['FAIL_RATE']
+                capability_key_list.append(item)
+            self.capability_key_list = capability_key_list
+            self._update_capability_key_dict()
             return
 
         # 只对limit有变化的项目重新计算
         # 创建临时的ptmd_df副本用于计算
-        temp_ptmd_df = self._original_df_module.ptmd_df.copy()
+        temp_ptmd_df = base_module.ptmd_df.copy()
 
         # 只更新有变化的limit值
         for test_id in changed_test_ids:
@@ -529,10 +823,10 @@ class Li(QObject):
                 temp_ptmd_df.loc[mask, 'LO_LIMIT'] = lo_limit
                 temp_ptmd_df.loc[mask, 'HI_LIMIT'] = hi_limit
 
-        # 创建临时DataModule用于计算
+        # 创建临时DataModule用于计算, top fail和capability的计算只读数据, prr/dtp直接共享原始数据
         temp_df_module = DataModule(
-            prr_df=self._original_df_module.prr_df.copy(),
-            dtp_df=self._original_df_module.dtp_df.copy(),
+            prr_df=base_module.prr_df,
+            dtp_df=base_module.dtp_df,
             ptmd_df=temp_ptmd_df
         )
 
@@ -544,13 +838,12 @@ class Li(QObject):
 
         # 创建结果字典，方便查找
         temp_capability_dict = {item['TEST_ID']: item for item in temp_capability_key_list}
-        original_capability_dict = {item['TEST_ID']: item for item in self._original_capability_key_list}
 
         # 合并结果：对于limit有变化的使用新计算结果，否则使用原始结果
         final_capability_key_list = []
         final_top_fail_dict = {}
 
-        for original_item in self._original_capability_key_list:
+        for original_item in original_capability_key_list:
             test_id = original_item['TEST_ID']
 
             if test_id in changed_test_ids:
@@ -585,19 +878,14 @@ class Li(QObject):
                 original_item_copy['NEW_FAIL_RATE'] = original_item_copy['FAIL_RATE']
 
                 final_capability_key_list.append(original_item_copy)
-                final_top_fail_dict[test_id] = self._original_top_fail_dict[test_id]
+                final_top_fail_dict[test_id] = original_top_fail_dict[test_id]
 
         # 更新当前显示的数据
         self.top_fail_dict = final_top_fail_dict
         self.capability_key_list = final_capability_key_list
 
         # 更新capability字典
-        if self.capability_key_dict is None:
-            self.capability_key_dict = dict()
-        else:
-            self.capability_key_dict.clear()
-        for each in self.capability_key_list:
-            self.capability_key_dict[each["TEST_ID"]] = each
+        self._update_capability_key_dict()
 
     def _calculate_rescued_fail_count(self, test_id: int, new_lo_limit: float, new_hi_limit: float) -> int:
         """
@@ -609,16 +897,17 @@ class Li(QObject):
         """
         try:
             # 获取原始数据中该测试项目的数据
-            original_dtp = self._original_df_module.dtp_df[
-                self._original_df_module.dtp_df.index.get_level_values('TEST_ID') == test_id
+            base_module = self._state_history.base
+            original_dtp = base_module.dtp_df[
+                base_module.dtp_df.index.get_level_values('TEST_ID') == test_id
             ]
 
             if len(original_dtp) == 0:
                 return 0
 
             # 获取原始limit
-            original_ptmd = self._original_df_module.ptmd_df[
-                self._original_df_module.ptmd_df['TEST_ID'] == test_id
+            original_ptmd = base_module.ptmd_df[
+                base_module.ptmd_df['TEST_ID'] == test_id
             ]
 
             if len(original_ptmd) == 0:
@@ -707,32 +996,24 @@ class Li(QObject):
             self.QStatusMessage.emit("建议先执行'改变Limit后重算Rate'操作!")
 
         try:
-            # 筛选ptmd_df，只保留选中的测试项目
-            self.df_module.ptmd_df = self.df_module.ptmd_df[
-                self.df_module.ptmd_df['TEST_ID'].isin(test_ids)
-            ]
-
-            # 筛选dtp_df，只保留选中的测试项目数据
-            self.df_module.dtp_df = self.df_module.dtp_df[
-                self.df_module.dtp_df.index.get_level_values('TEST_ID').isin(test_ids)
-            ]
+            self._init_state_history()
+            current = self._state_history.current
 
             # 如果有limit变更，也要筛选相关的limit变更
-            if self._current_limit_changes:
+            filtered_limit_changes = current.limit_overlay
+            if filtered_limit_changes:
                 filtered_limit_changes = {
                     test_id: limit_info
-                    for test_id, limit_info in self._current_limit_changes.items()
+                    for test_id, limit_info in filtered_limit_changes.items()
                     if test_id in test_ids
                 }
-                self._current_limit_changes = filtered_limit_changes
 
-            # 重新计算制程能力
-            self.calculation_top_fail()
-            self.calculation_capability()
-            self.background_generation_data_use_to_chart_and_to_save_csv()
-
-            # 更新操作状态
-            self._operation_state = 'data_screened'
+            # 只记录保留的测项, ptmd_df/dtp_df在切换状态时按mask取出, 并重新计算制程能力
+            self._apply_snapshot(self._state_history.push(current.evolve(
+                test_ids=self._state_history.test_ids_within(current, test_ids),
+                limit_overlay=filtered_limit_changes,
+                operation_state='data_screened',
+            )))
 
             # 发送更新信号
             self.update()
@@ -746,22 +1027,17 @@ class Li(QObject):
         重置到原始数据状态
         :return: 重置是否成功
         """
-        if self._original_df_module is None:
+        if self._state_history is None:
             self.QStatusMessage.emit("没有保存的原始数据!")
             return False
 
         try:
-            # 恢复原始数据
-            self.df_module = self._deep_copy_datamodule(self._original_df_module)
-
-            # 重新计算制程能力
-            self.calculation_top_fail()
-            self.calculation_capability()
-            self.background_generation_data_use_to_chart_and_to_save_csv()
-
-            # 清除操作状态
-            self._operation_state = None
-            self._current_limit_changes = None
+            # 恢复原始数据, 也作为一步操作记录, 可以被撤销; 原始的计算结果直接复用
+            root = self._state_history.root
+            self._apply_snapshot(self._state_history.push(root.evolve(
+                capability_key_list=root.capability_key_list,
+                top_fail_dict=root.top_fail_dict,
+            )))
 
             # 发送更新信号
             self.update()
@@ -782,19 +1058,16 @@ class Li(QObject):
             self.QStatusMessage.emit("请先执行'改变Limit后重算Rate'操作!")
             return False
 
-        if self._original_df_module is None:
+        if self._state_history is None:
             self.QStatusMessage.emit("没有保存的原始数据!")
             return False
 
         try:
-            # 重新计算制程能力（使用原始limit）
-            self.calculation_top_fail()
-            self.calculation_capability()
-            self.background_generation_data_use_to_chart_and_to_save_csv()
-
-            # 清除limit变更记录，但保持操作状态
-            self._current_limit_changes = None
-            self._operation_state = 'limit_restored'
+            # 清除limit变更记录，但保持数据状态, 重新计算制程能力（使用原始limit）
+            self._apply_snapshot(self._state_history.push(self._state_history.current.evolve(
+                limit_overlay=None,
+                operation_state='limit_restored',
+            )))
 
             # 发送更新信号
             self.update()
@@ -833,8 +1106,8 @@ class Li(QObject):
 
             for test_id, (lo_limit, hi_limit, lo_type, hi_type) in limit_new.items():
                 # 从原始数据中获取该测试项目的数据
-                test_data = self._original_df_module.dtp_df[
-                    self._original_df_module.dtp_df.index.get_level_values('TEST_ID') == test_id
+                test_data = self._state_history.base.dtp_df[
+                    self._state_history.base.dtp_df.index.get_level_values('TEST_ID') == test_id
                 ]
 
                 if len(test_data) == 0:
@@ -857,22 +1130,12 @@ class Li(QObject):
                 )
 
             if die_ids_to_remove:
-                # 从当前数据中删除相应的DIE（实际修改数据）
-                self.df_module.prr_df = self.df_module.prr_df[
-                    ~self.df_module.prr_df.index.isin(die_ids_to_remove)
-                ]
-
-                self.df_module.dtp_df = self.df_module.dtp_df[
-                    ~self.df_module.dtp_df.index.get_level_values('DIE_ID').isin(die_ids_to_remove)
-                ]
-
-                # 重新计算制程能力（基于实际数据）
-                self.calculation_top_fail()
-                self.calculation_capability()
-                self.background_generation_data_use_to_chart_and_to_save_csv()
-
-                # 更新操作状态
-                self._operation_state = 'data_filtered'
+                # 只生成新的DIE mask, 原始数据不动, 并重新计算制程能力（基于mask后的数据）
+                current = self._state_history.current
+                self._apply_snapshot(self._state_history.push(current.evolve(
+                    die_mask=self._state_history.die_mask_without(current, die_ids_to_remove),
+                    operation_state='data_filtered',
+                )))
 
                 # 发送更新信号
                 self.update()
@@ -0,0 +1,213 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : li_pipeline.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 数据空间载入的分阶段计算, 可以中断, 完成的阶段下次复用
+"""
+import time
+import weakref
+from typing import Callable, Dict, List, Tuple, Union
+
+from common.app_variable import DataModule
+from common.cal_interface.result_cache import ResultCache
+from common.li import Li, SummaryCore
+
+
+class CalculationCancelled(Exception):
+    """ 计算被取消 """
+
+
+class LiPipeline:
+    """
+    TreeLoadWidget载入数据的各个阶段: load -> concat -> filter -> top_fail -> capability -> unstack
+    1. 每个阶段的结果和它的输入key一起保存, 再次运行时key相同的阶段直接复用:
+        load/concat: 选取的文件(ID, 文件指纹, PART_FLAG/READ_FAIL)
+        filter/top_fail/capability/unstack: 再加上测试类型过滤
+       只改测试类型过滤时不重新载入和concat; top_fail/capability没有复用时先查ResultCache
+    2. progress(阶段序号, 已完成, 总数) 在每个阶段内多次调用, 单位见STAGES(字节/行/测项)
+       在progress中抛出CalculationCancelled即可中断, 中断或出错时Li恢复为运行前的数据, 已完成的阶段保留
+    3. timings记录每个阶段的耗时(秒), 复用的阶段为None
+    4. unstack的结果是很宽的绘图数据, 只保存弱引用, 不让它在Li换掉之后(如set_data_group)还留在内存中,
+       已经被释放时重新计算
+    """
+    STAGES: Tuple[Tuple[str, str, str], ...] = (
+        ("load", "载入", "字节"),
+        ("concat", "合并", "行"),
+        ("filter", "过滤", "行"),
+        ("top_fail", "Top Fail", "测项"),
+        ("capability", "制程能力", "测项"),
+        ("unstack", "转置", "行"),
+    )
+    STAGE_INDEX = {name: index for index, (name, _, _) in enumerate(STAGES)}
+    WEAK_STAGES = ("unstack",)
+    BACKUP_FIELDS = (
+        "select_summary", "id_module_dict", "df_module", "_state_history", "result_key",
+        "capability_key_list", "top_fail_dict", "data_version",
+    )
+
+    def __init__(self, li: Li):
+        self.li = li
+        self.memo: Dict[str, tuple] = {}  # name -> (key, value), WEAK_STAGES的value为弱引用
+        self.timings: Dict[str, Union[float, None]] = {}
+        self.progress: Callable[[int, float, float], None] = None
+        self.disk_capability: Union[list, None] = None
+
+    def report(self, index: int, done: float, total: float):
+        if self.progress is not None:
+            self.progress(index, done, total)
+
+    def stage(self, name: str, key, func: Callable):
+        """
+        :param key: 阶段的输入, None时不复用
+        :param func: func(report), report(已完成, 总数), 返回阶段的结果
+        """
+        index = self.STAGE_INDEX[name]
+        self.report(index, 0, 1)
+        weak = name in self.WEAK_STAGES
+        item = self.memo.get(name)
+        if key is not None and item is not None and item[0] == key:
+            value = item[1]() if weak else item[1]
+            if value is not None:
+                self.timings[name] = None
+                self.report(index, 1, 1)
+                return value
+        # 这个阶段和之后的阶段都要重新计算, 先释放旧的结果
+        for each, _, _ in self.STAGES[index:]:
+            self.memo.pop(each, None)
+        start = time.perf_counter()
+        value = func(lambda done, total: self.report(index, done, total))
+        self.timings[name] = time.perf_counter() - start
+        self.memo[name] = (key, weakref.ref(value) if weak else value)
+        return value
+
+    def backup(self) -> dict:
+        li = self.li
+        backup = {name: getattr(li, name) for name in self.BACKUP_FIELDS}
+        backup["capability_key_dict"] = li.capability_key_dict
+        backup["capability_key_items"] = None if li.capability_key_dict is None else dict(li.capability_key_dict)
+        backup["chart_df"] = None if li.to_chart_csv_data is None else li.to_chart_csv_data.df
+        return backup
+
+    def restore(self, backup: dict):
+        li = self.li
+        for name in self.BACKUP_FIELDS:
+            setattr(li, name, backup[name])
+        # capability_key_dict 是原地更新的, 恢复内容而不换对象
+        if backup["capability_key_dict"] is not None:
+            backup["capability_key_dict"].clear()
+            backup["capability_key_dict"].update(backup["capability_key_items"])
+        li.capability_key_dict = backup["capability_key_dict"]
+        if li.to_chart_csv_data is not None:
+            li.to_chart_csv_data.df = backup["chart_df"]
+
+    def run(self, summary: SummaryCore, ids: List[int], test_types: Union[List[str], None] = None,
+            quick: bool = False, sample_num: int = 1E4, progress: Callable[[int, float, float], None] = None):
+        """
+        :param test_types: filter_by_test_type 的参数, None为不过滤
+        :param progress: progress(阶段序号, 已完成, 总数), 在其中抛出CalculationCancelled即可中断
+        """
+        self.timings = {}
+        self.progress = progress
+        self.disk_capability = None
+        backup = self.backup()
+        try:
+            self._run(summary, ids, test_types, quick, sample_num)
+        except BaseException:
+            self.restore(backup)
+            raise
+        finally:
+            self.progress = None
+
+    def _run(self, summary: SummaryCore, ids: List[int], test_types: Union[List[str], None],
+             quick: bool, sample_num: int):
+        li = self.li
+        select_summary = summary.summary_df[summary.summary_df.ID.isin(ids)]
+        load_key = ResultCache.dataset_key(select_summary, None)
+        if load_key is not None:
+            load_key = (tuple(select_summary["ID"].tolist()), quick, sample_num) + load_key
+        filter_key = None
+        if load_key is not None:
+            filter_key = load_key + (None if test_types is None else tuple(sorted(test_types)),)
+
+        id_module_dict = self.stage(
+            "load", load_key,
+            lambda report: summary.load_select_data(ids, quick, sample_num, progress=report)[1]
+        )
+        # select_summary每次都用最新的, 自定义LOT_ID等不影响已载入的数据
+        li.set_data(select_summary, id_module_dict)
+
+        li.set_module(self.stage("concat", load_key, self.concat))
+        filter_module = self.stage("filter", filter_key, lambda report: self.filter(test_types, report))
+        li.df_module = DataModule(
+            prr_df=li.df_module.prr_df, dtp_df=filter_module.dtp_df, ptmd_df=filter_module.ptmd_df
+        )
+        li.set_result_key(test_types)
+
+        li.top_fail_dict = self.stage("top_fail", filter_key, self.top_fail)
+        li.set_capability(self.stage("capability", filter_key, self.capability), li.top_fail_dict)
+        li.set_chart_df(self.stage("unstack", filter_key, self.unstack))
+
+    def concat(self, report) -> DataModule:
+        li = self.li
+        total = sum(len(module.dtp_df) for module in li.id_module_dict.values())
+        report(0, total)
+        # 只有一个文件时concat直接在这个文件的数据上set_index, 用浅拷贝保护load阶段保存的结果
+        li.id_module_dict = {
+            unit_id: DataModule(
+                prr_df=module.prr_df.copy(deep=False), dtp_df=module.dtp_df.copy(deep=False), ptmd_df=module.ptmd_df
+            )
+            for unit_id, module in li.id_module_dict.items()
+        }
+        li.concat()
+        report(total, total)
+        # 结果另外包一层, Li之后替换df_module中的数据帧不影响保存的结果
+        return DataModule(prr_df=li.df_module.prr_df, dtp_df=li.df_module.dtp_df, ptmd_df=li.df_module.ptmd_df)
+
+    def filter(self, test_types: Union[List[str], None], report) -> DataModule:
+        li = self.li
+        total = len(li.df_module.dtp_df)
+        report(0, total)
+        if test_types is not None:
+            li.filter_by_test_type(test_types)
+        report(total, total)
+        return DataModule(prr_df=li.df_module.prr_df, dtp_df=li.df_module.dtp_df, ptmd_df=li.df_module.ptmd_df)
+
+    def top_fail(self, report) -> dict:
+        li = self.li
+        if li.load_capability_cache():
+            # 磁盘缓存中有, capability阶段直接使用
+            self.disk_capability = li.capability_key_list
+            report(1, 1)
+            return li.top_fail_dict
+        li.calculation_top_fail(report)
+        return li.top_fail_dict
+
+    def capability(self, report) -> list:
+        li = self.li
+        if self.disk_capability is not None:
+            report(1, 1)
+            return self.disk_capability
+        li.calculation_capability(report)
+        li.save_capability_cache()
+        return li.capability_key_list
+
+    def unstack(self, report):
+        li = self.li
+        total = len(li.df_module.dtp_df)
+        report(0, total)
+        li.background_generation_data_use_to_chart_and_to_save_csv()
+        report(total, total)
+        return li.to_chart_csv_data.df
+
+    def timing_text(self) -> str:
+        """ 如: 载入 1.234s | 合并 复用 | ... """
+        texts = []
+        for name, text, _ in self.STAGES:
+            if name not in self.timings:
+                continue
+            seconds = self.timings[name]
+            texts.append("{} {}".format(text, "复用" if seconds is None else "{:.3f}s".format(seconds)))
+        return " | ".join(texts)
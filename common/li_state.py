@@ -0,0 +1,120 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : li_state.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : Li的操作状态(版本化, 写时复制)
+"""
+import dataclasses
+from dataclasses import dataclass
+from typing import Dict, Tuple, Union, List
+
+import numpy as np
+
+from common.app_variable import DataModule
+
+
+@dataclass
+class LiSnapshot:
+    """
+    数据空间的一个操作状态, 只记录相对base数据的差异, 不持有数据帧:
+        die_mask: 对应 base.prr_df 的行, None 表示全部保留
+        test_ids: 保留的 TEST_ID, None 表示全部保留
+        limit_overlay: {TEST_ID: (LO_LIMIT, HI_LIMIT, LO_TYPE, HI_TYPE)}, 只记录改过的测项
+        capability_key_list/top_fail_dict: 该状态下的计算结果, 撤销/重做时不需要重算
+    """
+    die_mask: Union[np.ndarray, None] = None
+    test_ids: Union[np.ndarray, None] = None
+    limit_overlay: Dict[int, Tuple[float, float, str, str]] = None
+    operation_state: str = None  # None, 'limit_changed', 'limit_restored', 'data_filtered', 'data_screened'
+    capability_key_list: list = None
+    top_fail_dict: dict = None
+
+    def evolve(self, **kwargs) -> "LiSnapshot":
+        """
+        在当前状态上派生新状态, 没有改动的mask和overlay直接共享引用
+        派生出来的状态默认需要重算制程能力
+        """
+        kwargs.setdefault("capability_key_list", None)
+        kwargs.setdefault("top_fail_dict", None)
+        return dataclasses.replace(self, **kwargs)
+
+
+class LiStateHistory:
+    """
+    1. base 是第一次操作前的 DataModule, 所有状态共享, 任何操作都不修改它
+    2. 过滤数据只生成新的 die/test mask, 改limit只生成 overlay, 内存开销和DIE数量/测项数量成正比
+    3. 在历史中间 push 新状态会丢弃后面可重做的状态
+    """
+
+    def __init__(self, base: DataModule, root: LiSnapshot):
+        self.base = base
+        self._snapshots: List[LiSnapshot] = [root]
+        self._cursor = 0
+
+    @property
+    def root(self) -> LiSnapshot:
+        return self._snapshots[0]
+
+    @property
+    def current(self) -> LiSnapshot:
+        return self._snapshots[self._cursor]
+
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    def can_redo(self) -> bool:
+        return self._cursor < len(self._snapshots) - 1
+
+    def push(self, snapshot: LiSnapshot) -> LiSnapshot:
+        del self._snapshots[self._cursor + 1:]
+        self._snapshots.append(snapshot)
+        self._cursor += 1
+        return snapshot
+
+    def undo(self) -> Union[LiSnapshot, None]:
+        if not self.can_undo():
+            return None
+        self._cursor -= 1
+        return self.current
+
+    def redo(self) -> Union[LiSnapshot, None]:
+        if not self.can_redo():
+            return None
+        self._cursor += 1
+        return self.current
+
+    def materialize(self, snapshot: LiSnapshot) -> DataModule:
+        """
+        按mask从base中取出该状态对应的数据, 没有mask时直接返回base的数据帧
+        prr_df index: DIE_ID, dtp_df index: (TEST_ID, DIE_ID)
+        """
+        prr_df, dtp_df, ptmd_df = self.base.prr_df, self.base.dtp_df, self.base.ptmd_df
+        if snapshot.die_mask is not None:
+            prr_df = prr_df[snapshot.die_mask]
+            dtp_df = dtp_df[dtp_df.index.get_level_values("DIE_ID").isin(prr_df.index)]
+        if snapshot.test_ids is not None:
+            ptmd_df = ptmd_df[ptmd_df["TEST_ID"].isin(snapshot.test_ids)]
+            dtp_df = dtp_df[dtp_df.index.get_level_values("TEST_ID").isin(snapshot.test_ids)]
+        return DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df)
+
+    def die_mask_without(self, snapshot: LiSnapshot, die_ids) -> np.ndarray:
+        """
+        在snapshot的die_mask基础上去掉die_ids, 返回新的mask
+        """
+        mask = ~self.base.prr_df.index.isin(die_ids)
+        if snapshot.die_mask is not None:
+            mask &= snapshot.die_mask
+        return mask
+
+    @staticmethod
+    def test_ids_within(snapshot: LiSnapshot, test_ids) -> np.ndarray:
+        """
+        在snapshot的test_ids基础上只保留test_ids, 返回新的TEST_ID数组
+        """
+        test_ids = np.asarray(list(test_ids))
+        if snapshot.test_ids is None:
+            return np.unique(test_ids)
+        return np.intersect1d(snapshot.test_ids, test_ids)
@@ -9,8 +9,11 @@
 """
 from typing import List, Dict, Optional
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from common.app_variable import DataModule
+from parser_core.stdf_bin_cube import BinCube
+from parser_core.stdf_die_history import DieHistory
 
 
 class SummaryGenerator:
@@ -65,59 +68,56 @@ class SummaryGenerator:
         """
         if prr_df is None or len(prr_df) == 0:
             return []
+        # 传入的prr_df已经是要统计的行, 所有行都算作FINAL
+        bin_cube = BinCube.build(prr_df, np.arange(len(prr_df)), bin_types=(bin_column,))
+        return SummaryGenerator.bin_statistics_from_cube(bin_cube, bin_column, bin_name_dict)
 
-        total_qty = len(prr_df)
-        bin_stats = []
-
-        # 按Bin分组统计
-        for bin_num, group in prr_df.groupby(bin_column):
-            qty = len(group)
-            percentage = (qty / total_qty * 100) if total_qty > 0 else 0
-
-            # 确保 bin_num 是整数类型用于比较
-            try:
-                bin_num_int = int(bin_num)
-            except (ValueError, TypeError):
-                bin_num_int = bin_num
-
-            # 判断是Pass还是Fail (通常Bin 1是Pass)
-            bin_type = "P" if bin_num_int == 1 else "F"
+    @staticmethod
+    def bin_statistics_from_cube(bin_cube: pd.DataFrame, bin_column: str, bin_name_dict: Optional[Dict] = None,
+                                 qty: str = "FINAL_QTY") -> List[Dict]:
+        """
+        从Bin计数(BinCube)计算Bin统计信息, 和按prr_df逐个分组统计的结果一致
+        :param bin_cube: BinCube.build 的结果或解析时保存的bin_cube
+        :param bin_column: Bin列名 ('HARD_BIN' 或 'SOFT_BIN')
+        :param bin_name_dict: Bin名称字典 {bin_num: bin_name}
+        :param qty: 计数列, FINAL_QTY为每个坐标最后一次测试
+        :return: Bin统计列表
+        """
+        if bin_cube is None or len(bin_cube) == 0:
+            return []
+        # (BIN, SITE)交叉表, 一行一个bin, 一列一个site
+        bins, sites, counts = BinCube.crosstab(bin_cube, bin_column, qty)
+        if len(bins) == 0:
+            return []
 
-            # 获取Bin名称
-            bin_name = bin_name_dict.get(bin_num_int, "") if bin_name_dict else ""
+        site_total = counts.sum(axis=0)
+        bin_total = counts.sum(axis=1)
+        total_qty = int(site_total.sum())
+        percentage = bin_total / total_qty * 100 if total_qty > 0 else np.zeros(len(bins))
+        site_percentage = counts / np.where(site_total > 0, site_total, 1) * 100
 
+        bin_stats = []
+        for i, bin_num in enumerate(bins.tolist()):
             # 按Site统计 - 只统计有该bin数据的site
-            site_stats = {}
-            if 'SITE_NUM' in group.columns:
-                for site_num in group['SITE_NUM'].unique():
-                    # 提取site编号（处理'S001'或数字格式）
-                    if isinstance(site_num, str) and site_num.startswith('S'):
-                        site_num_int = int(site_num[1:])
-                    else:
-                        site_num_int = int(site_num)
-
-                    site_bin_df = group[group['SITE_NUM'] == site_num]
-                    site_total = len(prr_df[prr_df['SITE_NUM'] == site_num])
-                    site_bin_qty = len(site_bin_df)
-                    site_bin_percentage = (site_bin_qty / site_total * 100) if site_total > 0 else 0
-                    site_stats[site_num_int] = {
-                        'QTY': site_bin_qty,
-                        'PERCENTAGE': site_bin_percentage
-                    }
-
+            site_stats = {
+                int(sites[j]): {
+                    'QTY': int(counts[i, j]),
+                    'PERCENTAGE': float(site_percentage[i, j])
+                } for j in np.flatnonzero(counts[i])
+            }
             bin_stats.append({
-                "BIN": bin_num_int,
-                "BIN_NAME": bin_name,
-                "BIN_TYPE": bin_type,
-                "QTY": qty,
-                "PERCENTAGE": percentage,
+                "BIN": bin_num,
+                "BIN_NAME": bin_name_dict.get(bin_num, "") if bin_name_dict else "",
+                # 判断是Pass还是Fail (通常Bin 1是Pass)
+                "BIN_TYPE": "P" if bin_num == 1 else "F",
+                "QTY": int(bin_total[i]),
+                "PERCENTAGE": float(percentage[i]),
                 "SITE_STATS": site_stats
             })
 
-        # 按Bin号排序
-        bin_stats.sort(key=lambda x: x["BIN"])
+        # bins已经按Bin号升序
         return bin_stats
-    
+
     @staticmethod
     def calculate_site_statistics(prr_df: pd.DataFrame) -> Dict:
         """
@@ -129,10 +129,11 @@ class SummaryGenerator:
             return {}
         
         site_stats = {}
+        passed = prr_df['FAIL_FLAG'].to_numpy() == 1  # FAIL_FLAG=1表示Pass
         
         # 全部统计
         total_qty = len(prr_df)
-        pass_qty = len(prr_df[prr_df['FAIL_FLAG'] == 1])  # FAIL_FLAG=1表示Pass
+        pass_qty = int(np.count_nonzero(passed))
         fail_qty = total_qty - pass_qty
         
         site_stats['All'] = {
@@ -143,27 +144,20 @@ class SummaryGenerator:
             'FAIL_RATE': (fail_qty / total_qty * 100) if total_qty > 0 else 0
         }
         
-        # 按Site统计
+        # 按Site统计, site编号转成整数编码后bincount
         if 'SITE_NUM' in prr_df.columns:
-            for site_num, group in prr_df.groupby('SITE_NUM'):
-                site_total = len(group)
-                site_pass = len(group[group['FAIL_FLAG'] == 1])
-                site_fail = site_total - site_pass
-
-                # 提取site编号（处理'S001'或数字格式）
-                if isinstance(site_num, str) and site_num.startswith('S'):
-                    site_num_int = int(site_num[1:])
-                else:
-                    site_num_int = int(site_num)
-                
+            sites, site_code = BinCube.factorize(BinCube.site_codes(prr_df['SITE_NUM']))
+            site_total = np.bincount(site_code, minlength=len(sites))
+            site_pass = np.bincount(site_code, weights=passed, minlength=len(sites)).astype(np.int64)
+            for site_num_int, total, pass_num in zip(sites.tolist(), site_total.tolist(), site_pass.tolist()):
+                fail_num = total - pass_num
                 site_key = f'{site_num_int}(S{site_num_int:03d})'
-
                 site_stats[site_key] = {
-                    'TOTAL': site_total,
-                    'PASS': site_pass,
-                    'FAIL': site_fail,
-                    'PASS_RATE': (site_pass / site_total * 100) if site_total > 0 else 0,
-                    'FAIL_RATE': (site_fail / site_total * 100) if site_total > 0 else 0,
+                    'TOTAL': total,
+                    'PASS': pass_num,
+                    'FAIL': fail_num,
+                    'PASS_RATE': (pass_num / total * 100) if total > 0 else 0,
+                    'FAIL_RATE': (fail_num / total * 100) if total > 0 else 0,
                     'SITE_NUM_INT': site_num_int  # 保存整数编号用于bin统计匹配
                 }
         
@@ -214,12 +208,14 @@ class SummaryGenerator:
         }
     
     @staticmethod
-    def generate_summary_text(summary_info: Dict, file_info: Dict, df_module: DataModule) -> str:
+    def generate_summary_text(summary_info: Dict, file_info: Dict, df_module: DataModule,
+                              bin_cube: pd.DataFrame = None) -> str:
         """
         生成Summary文本报告
         :param summary_info: Summary基本信息（从summary_df获取）
         :param file_info: 文件信息
         :param df_module: 数据模块（包含prr_df等）
+        :param bin_cube: 解析时保存的Bin计数, df_module是完整文件(ALL并且READ_FAIL)时可以直接用, 为None时由数据计算
         :return: 格式化的Summary文本
         """
         lines = []
@@ -228,9 +224,9 @@ class SummaryGenerator:
         prr_df_full = df_module.prr_df
         final_test_prr_df = prr_df_full
         if prr_df_full is not None and 'X_COORD' in prr_df_full.columns and 'Y_COORD' in prr_df_full.columns:
-            # 按照PART_ID排序，确保drop_duplicates保留的是时间上最后的记录
-            final_test_prr_df = prr_df_full.sort_values(by='PART_ID').drop_duplicates(
-                subset=['X_COORD', 'Y_COORD'], keep='last'
+            # 按照PART_ID排序后每个坐标时间上最后的记录, 同一份prr_df的DieHistory只建一次
+            final_test_prr_df = prr_df_full.take(
+                DieHistory.of(prr_df_full, order_by='PART_ID').final_positions()
             )
 
         # ==================== Basic Info ====================
@@ -319,7 +315,9 @@ class SummaryGenerator:
         lines.append("")
         
         # ==================== Soft Bin Statistic ====================
-        soft_bin_stats = SummaryGenerator.calculate_bin_statistics(final_test_prr_df, 'SOFT_BIN')
+        if bin_cube is None:
+            bin_cube = BinCube.build(final_test_prr_df, np.arange(len(final_test_prr_df)))
+        soft_bin_stats = SummaryGenerator.bin_statistics_from_cube(bin_cube, 'SOFT_BIN')
         
         lines.append("Soft Bin Statistic")
         lines.append(f"BIN:   Bin Name                       {'All':<16}")
@@ -342,7 +340,7 @@ class SummaryGenerator:
         lines.append("")
 
         # ==================== Hard Bin Statistic ====================
-        hard_bin_stats = SummaryGenerator.calculate_bin_statistics(final_test_prr_df, 'HARD_BIN')
+        hard_bin_stats = SummaryGenerator.bin_statistics_from_cube(bin_cube, 'HARD_BIN')
 
         lines.append("Hard Bin Statistic")
         lines.append(f"BIN:   Bin Name                       {'All':<16}")
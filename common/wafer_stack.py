@@ -0,0 +1,225 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : wafer_stack.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 多片wafer叠加的Mapping(良率/Bin频率/参数均值)
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Union, List
+
+import numpy as np
+
+from common.app_variable import FailFlag
+from parser_core.stdf_die_history import DieHistory
+from parser_core.stdf_module_cache import ModuleCache
+from parser_core.stdf_parser_file_write_read import ParserData
+
+
+class WaferGrid:
+    """
+    单个文件的坐标网格, 每个坐标取最后一次测试(Final Test):
+        row: 网格上该坐标对应的prr_df行号, 空位为-1
+        soft_bin: 网格上的SOFT_BIN, 空位为-1
+        passed: 网格上是否PASS
+    生成网格只读prr_df, 参数的网格按测项TEXT在用到时才载入完整数据生成并缓存
+    同一个HDF5(文件指纹不变)只生成一次
+    """
+    _lock = threading.RLock()
+    _cache: "OrderedDict[tuple, WaferGrid]" = OrderedDict()
+    CACHE_SIZE = 1000
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        prr_df = ParserData.load_prr_df(file_path)
+        final = DieHistory(prr_df).final_positions()
+        x = prr_df["X_COORD"].to_numpy()[final].astype(np.int64)
+        y = prr_df["Y_COORD"].to_numpy()[final].astype(np.int64)
+        if len(final):
+            self.x0, self.y0 = int(x.min()), int(y.min())
+            shape = (int(x.max()) - self.x0 + 1, int(y.max()) - self.y0 + 1)
+        else:
+            self.x0, self.y0, shape = 0, 0, (0, 0)
+        self.row = np.full(shape, -1, dtype=np.int64)
+        self.row[x - self.x0, y - self.y0] = final
+        filled = self.row >= 0
+        self.soft_bin = np.full(shape, -1, dtype=np.int64)
+        self.soft_bin[filled] = prr_df["SOFT_BIN"].to_numpy()[self.row[filled]]
+        self.passed = np.zeros(shape, dtype=bool)
+        self.passed[filled] = prr_df["FAIL_FLAG"].to_numpy()[self.row[filled]] == FailFlag.PASS
+        self._param: Dict[str, np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.row.shape
+
+    @property
+    def filled(self) -> np.ndarray:
+        return self.row >= 0
+
+    def param(self, text: str) -> np.ndarray:
+        """
+        :param text: 测项的TEXT(TEST_NUM:TEST_TXT), 不同文件的TEST_ID不同, 用TEXT对齐
+        :return: 网格上的测试值, 没有测试的为NaN
+        """
+        grid = self._param.get(text)
+        if grid is not None:
+            return grid
+        module, _ = ParserData.load_hdf5_full(self.file_path)
+        grid = np.full(self.shape, np.nan)
+        test_ids = module.ptmd_df.loc[module.ptmd_df["TEXT"] == text, "TEST_ID"].to_numpy()
+        if len(test_ids) and grid.size:
+            dtp_df = module.dtp_df
+            select = dtp_df["TEST_ID"].to_numpy() == test_ids[-1]
+            part_id = dtp_df["PART_ID"].to_numpy()[select]
+            result = dtp_df["RESULT"].to_numpy()[select].astype(np.float64)
+            prr_part_id = module.prr_df["PART_ID"].to_numpy()
+            filled = self.filled
+            # 网格上每个坐标的PART_ID -> 该PART_ID的测试值
+            part_lut = np.full(int(max(prr_part_id.max(initial=0), part_id.max(initial=0))) + 1, np.nan)
+            part_lut[part_id] = result
+            grid[filled] = part_lut[prr_part_id[self.row[filled]]]
+        self._param[text] = grid
+        return grid
+
+    @classmethod
+    def of(cls, file_path: str) -> "WaferGrid":
+        key = ModuleCache.make_key(file_path)
+        with cls._lock:
+            grid = cls._cache.get(key)
+            if grid is not None:
+                cls._cache.move_to_end(key)
+                return grid
+        grid = cls(file_path)
+        with cls._lock:
+            cls._cache[key] = grid
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return grid
+
+
+class WaferStack:
+    """
+    多片wafer叠加, 以增量的方式合并每个文件的WaferGrid:
+        tested: 每个坐标有测试的wafer数
+        passed: 每个坐标PASS的wafer数
+        bin_count: {SOFT_BIN: 每个坐标出现该bin的wafer数}
+        param_sum/param_count: {TEXT: 参数和/有效数量}, 在第一次用到时对已合并的文件补算
+    画布会随着新wafer的坐标范围扩展, 增加一片wafer只合并它自己的网格
+    """
+
+    def __init__(self):
+        self.keys: List[tuple] = []
+        self.grids: List[WaferGrid] = []
+        self.x0, self.y0 = 0, 0
+        self.tested = np.zeros((0, 0), dtype=np.int32)
+        self.passed = np.zeros((0, 0), dtype=np.int32)
+        self.bin_count: Dict[int, np.ndarray] = {}
+        self.param_sum: Dict[str, np.ndarray] = {}
+        self.param_count: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.grids)
+
+    def _expand(self, grid: WaferGrid):
+        if grid.row.size == 0:
+            return
+        if self.tested.size == 0:
+            x0, y0 = grid.x0, grid.y0
+            x1, y1 = grid.x0 + grid.shape[0], grid.y0 + grid.shape[1]
+        else:
+            x0, y0 = min(self.x0, grid.x0), min(self.y0, grid.y0)
+            x1 = max(self.x0 + self.tested.shape[0], grid.x0 + grid.shape[0])
+            y1 = max(self.y0 + self.tested.shape[1], grid.y0 + grid.shape[1])
+        if (x0, y0) == (self.x0, self.y0) and (x1 - x0, y1 - y0) == self.tested.shape:
+            return
+
+        def pad(array: np.ndarray, fill=0) -> np.ndarray:
+            new = np.full((x1 - x0, y1 - y0), fill, dtype=array.dtype)
+            if array.size:
+                new[self.x0 - x0:self.x0 - x0 + array.shape[0], self.y0 - y0:self.y0 - y0 + array.shape[1]] = array
+            return new
+
+        self.tested, self.passed = pad(self.tested), pad(self.passed)
+        self.bin_count = {key: pad(value) for key, value in self.bin_count.items()}
+        self.param_sum = {key: pad(value) for key, value in self.param_sum.items()}
+        self.param_count = {key: pad(value) for key, value in self.param_count.items()}
+        self.x0, self.y0 = x0, y0
+
+    def _window(self, grid: WaferGrid) -> Tuple[slice, slice]:
+        return (slice(grid.x0 - self.x0, grid.x0 - self.x0 + grid.shape[0]),
+                slice(grid.y0 - self.y0, grid.y0 - self.y0 + grid.shape[1]))
+
+    def _merge_param(self, text: str, grid: WaferGrid):
+        values = grid.param(text)
+        valid = ~np.isnan(values)
+        window = self._window(grid)
+        self.param_sum[text][window] += np.where(valid, values, 0)
+        self.param_count[text][window] += valid
+
+    def add(self, key: tuple, grid: WaferGrid):
+        """
+        合并一片wafer, 同一个key只合并一次
+        """
+        if key in self.keys:
+            return
+        self._expand(grid)
+        self.keys.append(key)
+        self.grids.append(grid)
+        if grid.row.size == 0:
+            return
+        window = self._window(grid)
+        self.tested[window] += grid.filled
+        self.passed[window] += grid.passed
+        soft_bin = grid.soft_bin[grid.filled]
+        for each in np.unique(soft_bin):
+            if each not in self.bin_count:
+                self.bin_count[int(each)] = np.zeros(self.tested.shape, dtype=np.int32)
+            self.bin_count[int(each)][window] += grid.soft_bin == each
+        for text in self.param_sum:
+            self._merge_param(text, grid)
+
+    def _ratio(self, count: np.ndarray, total: np.ndarray) -> np.ndarray:
+        result = np.full(count.shape, np.nan)
+        np.divide(count, total, out=result, where=total > 0)
+        return result
+
+    def yield_map(self) -> np.ndarray:
+        """ 每个坐标的良率(PASS的wafer数/测试的wafer数), 没有测试为NaN """
+        return self._ratio(self.passed, self.tested)
+
+    def bin_map(self, soft_bin: int) -> np.ndarray:
+        """ 每个坐标出现该bin的频率 """
+        count = self.bin_count.get(soft_bin)
+        if count is None:
+            count = np.zeros(self.tested.shape, dtype=np.int32)
+        return self._ratio(count, self.tested)
+
+    def param_map(self, text: str) -> np.ndarray:
+        """ 每个坐标的参数均值 """
+        if text not in self.param_sum:
+            self.param_sum[text] = np.zeros(self.tested.shape)
+            self.param_count[text] = np.zeros(self.tested.shape, dtype=np.int32)
+            for grid in self.grids:
+                if grid.row.size:
+                    self._merge_param(text, grid)
+        return self._ratio(self.param_sum[text], self.param_count[text])
+
+    def bins(self) -> List[int]:
+        return sorted(self.bin_count)
+
+    @staticmethod
+    def update(stack: Union["WaferStack", None], file_paths: List[str]) -> "WaferStack":
+        """
+        按文件列表更新叠加结果: 只是增加了文件时只合并新文件, 否则重新叠加
+        """
+        keys = [ModuleCache.make_key(path) for path in file_paths]
+        if stack is None or not set(stack.keys).issubset(keys):
+            stack = WaferStack()
+        for key, path in zip(keys, file_paths):
+            if key not in stack.keys:
+                stack.add(key, WaferGrid.of(path))
+        return stack
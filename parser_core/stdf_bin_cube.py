@@ -0,0 +1,196 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : stdf_bin_cube.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : Bin计数立方体(文件 x SITE x HARD/SOFT BIN)
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from common.app_variable import FailFlag
+from parser_core.stdf_die_history import DieHistory
+
+
+class BinCube:
+    """
+    在解析后保存HDF5时, 对每个文件按(BIN_TYPE, BIN, SITE_NUM, FAIL_FLAG)统计一次计数, 和prr_df一起存入HDF5
+    之后Bin相关的视图(Pareto/Summary/Mapping图例)都只读这个几百行的表, 不需要再读原始数据:
+        BIN_TYPE: HARD_BIN/SOFT_BIN
+        QTY: 所有测试记录的数量
+        FINAL_QTY: 每个坐标最后一次测试(按PART_ID排序)的数量, 和Summary的统计口径一致
+    多个文件合并时加一列ID(文件ID), 就是 文件 x SITE x BIN 的立方体
+    """
+    HDF5_KEY = "bin_cube"
+    BIN_TYPES = ("HARD_BIN", "SOFT_BIN")
+    HEAD = ("BIN_TYPE", "BIN", "SITE_NUM", "FAIL_FLAG", "QTY", "FINAL_QTY")
+
+    _lock = threading.RLock()
+    _cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+    CACHE_SIZE = 5000
+
+    @staticmethod
+    def build(prr_df: pd.DataFrame, final_positions: np.ndarray = None, bin_types=BIN_TYPES) -> pd.DataFrame:
+        """
+        :param prr_df: 单个文件或任意选取后的prr数据
+        :param final_positions: 最后一次测试的行号, None时按PART_ID排序取每个坐标的最后一次
+        :param bin_types: 只统计其中的BIN列
+        :return: 长表, 列为 BinCube.HEAD
+        """
+        if prr_df is None or len(prr_df) == 0:
+            return pd.DataFrame(columns=list(BinCube.HEAD))
+        if final_positions is None:
+            final_positions = DieHistory.of(prr_df, order_by="PART_ID").final_positions()
+        final = np.zeros(len(prr_df), dtype=np.int64)
+        final[final_positions] = 1
+        # 和groupby一样跳过分组列为空的行(如PRR中没有SOFT_BIN), 空值不能转成整数
+        valid = prr_df["SITE_NUM"].notna().to_numpy() & prr_df["FAIL_FLAG"].notna().to_numpy()
+        final = final[valid]
+        site_unique, site_code = BinCube.factorize(BinCube.site_codes(prr_df["SITE_NUM"][valid]))
+        flag_unique, flag_code = BinCube.factorize(prr_df["FAIL_FLAG"].to_numpy()[valid].astype(np.int64))
+        frames = []
+        for bin_type in bin_types:
+            bin_values = prr_df[bin_type].to_numpy()[valid]
+            has_bin = pd.notna(bin_values)
+            # 整数编码后一次bincount就是(BIN, SITE, FAIL_FLAG)的交叉表
+            bin_unique, bin_code = BinCube.factorize(bin_values[has_bin].astype(np.int64))
+            shape = (len(bin_unique), len(site_unique), len(flag_unique))
+            code = (bin_code * shape[1] + site_code[has_bin]) * shape[2] + flag_code[has_bin]
+            size = shape[0] * shape[1] * shape[2]
+            qty = np.bincount(code, minlength=size)
+            final_qty = np.bincount(code, weights=final[has_bin], minlength=size).astype(np.int64)
+            cell = np.flatnonzero(qty)
+            b, s, f = np.unravel_index(cell, shape)
+            frames.append(pd.DataFrame({
+                "BIN_TYPE": bin_type,
+                "BIN": bin_unique[b],
+                "SITE_NUM": site_unique[s],
+                "FAIL_FLAG": flag_unique[f],
+                "QTY": qty[cell],
+                "FINAL_QTY": final_qty[cell],
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def factorize(values: np.ndarray):
+        """
+        :return: 升序的唯一值, 每个值的编码
+        """
+        unique, code = np.unique(values, return_inverse=True)
+        return unique, code.ravel()
+
+    @staticmethod
+    def site_codes(site: pd.Series) -> np.ndarray:
+        """
+        SITE_NUM转成整数, 兼容'S001'这样的字符串
+        """
+        if not pd.api.types.is_numeric_dtype(site):
+            return site.astype(str).str.lstrip("S").astype(np.int64).to_numpy()
+        return site.to_numpy().astype(np.int64)
+
+    @classmethod
+    def get(cls, key: tuple) -> Union[pd.DataFrame, None]:
+        with cls._lock:
+            cube = cls._cache.get(key)
+            if cube is not None:
+                cls._cache.move_to_end(key)
+            return cube
+
+    @classmethod
+    def put(cls, key: tuple, cube: pd.DataFrame):
+        with cls._lock:
+            cls._cache[key] = cube
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @staticmethod
+    def select(cube: pd.DataFrame, bin_type: str) -> pd.DataFrame:
+        return cube[cube["BIN_TYPE"] == bin_type]
+
+    @staticmethod
+    def crosstab(cube: pd.DataFrame, bin_type: str, qty: str = "FINAL_QTY"):
+        """
+        :return: 升序的BIN, 升序的SITE_NUM, shape为(BIN数, SITE数)的计数, 没有数量的BIN/SITE不出现
+        """
+        df = BinCube.select(cube, bin_type)
+        df = df[df[qty] > 0]
+        bins, bin_code = BinCube.factorize(df["BIN"].to_numpy().astype(np.int64))
+        sites, site_code = BinCube.factorize(df["SITE_NUM"].to_numpy().astype(np.int64))
+        counts = np.bincount(
+            bin_code * len(sites) + site_code, weights=df[qty].to_numpy(), minlength=len(bins) * len(sites)
+        ).astype(np.int64).reshape(len(bins), len(sites))
+        return bins, sites, counts
+
+    @staticmethod
+    def bin_table(cube: pd.DataFrame, bin_type: str, qty: str = "FINAL_QTY") -> pd.DataFrame:
+        """
+        :return: index为BIN, columns为SITE_NUM的计数表, 没有数量的BIN不出现
+        """
+        bins, sites, counts = BinCube.crosstab(cube, bin_type, qty)
+        return pd.DataFrame(counts, index=pd.Index(bins, name="BIN"), columns=pd.Index(sites, name="SITE_NUM"))
+
+    @staticmethod
+    def bin_pass(cube: pd.DataFrame, bin_type: str, qty: str = "FINAL_QTY") -> Dict[int, bool]:
+        """
+        每个BIN是否为PASS BIN: 该BIN中PASS的数量不少于FAIL的数量
+        """
+        df = BinCube.select(cube, bin_type)
+        df = df[df[qty] > 0]
+        pass_qty = df[qty].where(df["FAIL_FLAG"] == FailFlag.PASS, 0).groupby(df["BIN"]).sum()
+        total_qty = df.groupby("BIN")[qty].sum()
+        return {int(key): bool(pass_qty[key] * 2 >= total_qty[key]) for key in total_qty.index}
+
+    @staticmethod
+    def legend(cube: pd.DataFrame, bin_type: str, qty: str = "FINAL_QTY") -> Dict[int, dict]:
+        """
+        Mapping图例用的统计
+        :return: {bin: {'count': int, 'percentage': float, 'is_pass': bool}}
+        """
+        table = BinCube.bin_table(cube, bin_type, qty)
+        if table.empty:
+            return {}
+        counts = table.sum(axis=1)
+        total = counts.sum()
+        is_pass = BinCube.bin_pass(cube, bin_type, qty)
+        return {
+            int(bin_num): {
+                'count': int(count),
+                'percentage': count / total * 100,
+                'is_pass': is_pass.get(int(bin_num), False),
+            } for bin_num, count in counts.items()
+        }
+
+    @staticmethod
+    def pareto(cube: pd.DataFrame, bin_type: str, qty: str = "FINAL_QTY", fail_only: bool = True) -> pd.DataFrame:
+        """
+        :return: 按数量降序的 BIN/QTY/PERCENTAGE/CUM_PERCENTAGE/IS_PASS, 百分比的分母是所有BIN的总数
+        """
+        table = BinCube.bin_table(cube, bin_type, qty)
+        head = ["BIN", "QTY", "PERCENTAGE", "CUM_PERCENTAGE", "IS_PASS"]
+        if table.empty:
+            return pd.DataFrame(columns=head)
+        is_pass = BinCube.bin_pass(cube, bin_type, qty)
+        df = table.sum(axis=1).rename("QTY").reset_index()
+        df["IS_PASS"] = df["BIN"].map(is_pass).fillna(False).astype(bool)
+        total = df["QTY"].sum()
+        if fail_only:
+            df = df[~df["IS_PASS"]]
+        df = df.sort_values(["QTY", "BIN"], ascending=[False, True], kind="mergesort").reset_index(drop=True)
+        df["PERCENTAGE"] = df["QTY"] / total * 100
+        df["CUM_PERCENTAGE"] = df["PERCENTAGE"].cumsum()
+        return df[head]
+
+    @staticmethod
+    def concat(cubes: List[pd.DataFrame], ids: List[int]) -> pd.DataFrame:
+        """
+        多个文件的Bin计数合并成 文件 x SITE x BIN 的立方体, ID为文件ID
+        """
+        if not cubes:
+            return pd.DataFrame(columns=["ID"] + list(BinCube.HEAD))
+        return pd.concat([cube.assign(ID=file_id) for cube, file_id in zip(cubes, ids)], ignore_index=True)
@@ -0,0 +1,178 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : stdf_die_history.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : DIE测试历史索引
+"""
+import hashlib
+import weakref
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.app_variable import PartFlags, FailFlag
+from parser_core.stdf_parser_func import PrrPartFlag
+
+
+class DieHistory:
+    """
+    对一份prr数据(含X_COORD, Y_COORD)一次性排序, 得到每个坐标上的测试历史, 所有数组和prr_df的行一一对应:
+        attempt: 该行是这个坐标上的第几次测试(从0开始)
+        first_pos/final_pos: 这个坐标上第一次/最后一次测试所在的行号
+        retest_count: 这个坐标上的复测次数(测试次数-1)
+        first_test: PART_FLG中FirstTest位为0, 首测
+        passed: FAIL_FLAG == PASS
+        last_pass_at_xy: 只看PASS的行时, 该坐标上最后一次测试(READ_FAIL为False时的XY_COORD)
+    测试的先后默认按行顺序, 也可以传入order(行号数组, 如PART_ID的argsort)来指定
+    by: 额外的分组列, 比如GROUP, 不同分组的同一坐标分开算
+    """
+    attempt: np.ndarray = None
+    first_pos: np.ndarray = None
+    final_pos: np.ndarray = None
+    retest_count: np.ndarray = None
+    order: np.ndarray = None
+
+    first_test: np.ndarray = None
+    passed: np.ndarray = None
+    last_pass_at_xy: np.ndarray = None
+
+    _frame_cache: Dict[tuple, Tuple[weakref.ref, str, "DieHistory"]] = {}
+    # 参与计算的列, 这些列的内容决定索引的结果
+    SOURCE_COLUMNS = ("X_COORD", "Y_COORD", "PART_FLG", "FAIL_FLAG")
+
+    def __init__(self, prr_df: pd.DataFrame, order: np.ndarray = None, by: str = None):
+        length = len(prr_df)
+        self.order = np.arange(length) if order is None else np.asarray(order)
+        code = self.xy_code(prr_df)
+        if by is not None:
+            group_code, _ = pd.factorize(prr_df[by])
+            code = (group_code.astype(np.int64) << 32) | code
+        self.attempt, self.first_pos, self.final_pos, self.retest_count = self._attempts(code, self.order)
+
+        if "PART_FLG" in prr_df.columns:
+            part_flg = prr_df["PART_FLG"].to_numpy()
+            self.first_test = part_flg & PrrPartFlag.FirstTest != PrrPartFlag.FirstTest
+        if "FAIL_FLAG" in prr_df.columns:
+            self.passed = prr_df["FAIL_FLAG"].to_numpy() == FailFlag.PASS
+            pass_index = np.flatnonzero(self.passed)
+            _, _, pass_final_pos, _ = self._attempts(code[pass_index], np.arange(len(pass_index)))
+            self.last_pass_at_xy = np.zeros(length, dtype=bool)
+            self.last_pass_at_xy[pass_index] = pass_final_pos == np.arange(len(pass_index))
+
+    @staticmethod
+    def xy_code(prr_df: pd.DataFrame) -> np.ndarray:
+        """
+        X_COORD/Y_COORD都是I2, 合并成一个int64
+        """
+        x = prr_df["X_COORD"].to_numpy().astype(np.int64)
+        y = prr_df["Y_COORD"].to_numpy().astype(np.int64)
+        return ((x & 0xFFFF) << 16) | (y & 0xFFFF)
+
+    @staticmethod
+    def _attempts(code: np.ndarray, order: np.ndarray):
+        """
+        按order的先后, 用一次稳定排序把相同code的行排在一起, 再算出每一行的测试序号和首末行号
+        """
+        length = len(code)
+        attempt = np.zeros(length, dtype=np.int64)
+        first_pos = np.zeros(length, dtype=np.int64)
+        final_pos = np.zeros(length, dtype=np.int64)
+        retest_count = np.zeros(length, dtype=np.int64)
+        if length == 0:
+            return attempt, first_pos, final_pos, retest_count
+        sorted_pos = order[np.argsort(code[order], kind="stable")]
+        sorted_code = code[sorted_pos]
+        starts = np.flatnonzero(np.r_[True, sorted_code[1:] != sorted_code[:-1]])
+        counts = np.diff(np.r_[starts, length])
+        group = np.repeat(np.arange(len(starts)), counts)
+        attempt[sorted_pos] = np.arange(length) - starts[group]
+        first_pos[sorted_pos] = sorted_pos[starts][group]
+        final_pos[sorted_pos] = sorted_pos[starts + counts - 1][group]
+        retest_count[sorted_pos] = (counts - 1)[group]
+        return attempt, first_pos, final_pos, retest_count
+
+    @staticmethod
+    def data_version(df: pd.DataFrame, columns) -> str:
+        """
+        参与计算的列的内容摘要(按行位置), 同一个DataFrame被原地排序或修改后摘要改变
+        """
+        digest = hashlib.md5(str(len(df)).encode())
+        for column in columns:
+            if column is not None and column in df.columns:
+                digest.update(pd.util.hash_array(df[column].to_numpy()).tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def of(cls, df: pd.DataFrame, order_by: str = None, by: str = None) -> "DieHistory":
+        """
+        同一个DataFrame对象只建一次索引, 数据帧被释放后自动失效
+        缓存用弱引用确认是同一个对象, 再比较参与计算的列的摘要, 原地排序或修改过的数据帧会重新建索引
+        order_by: 按该列排序(和DataFrame.sort_values默认的quicksort一致)决定测试的先后, None为行顺序
+        """
+        key = (id(df), order_by, by)
+        version = cls.data_version(df, cls.SOURCE_COLUMNS + (order_by, by))
+        item = cls._frame_cache.get(key)
+        if item is not None and item[0]() is df and item[1] == version:
+            return item[2]
+        order = None if order_by is None else df[order_by].to_numpy().argsort(kind="quicksort")
+        history = cls(df, order=order, by=by)
+        cls._frame_cache[key] = (weakref.ref(df, lambda _, k=key: cls._frame_cache.pop(k, None)), version, history)
+        return history
+
+    def __len__(self):
+        return len(self.attempt)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(each.nbytes for each in (
+            self.attempt, self.first_pos, self.final_pos, self.retest_count, self.order,
+            self.first_test, self.passed, self.last_pass_at_xy,
+        ) if each is not None)
+
+    @property
+    def is_first(self) -> np.ndarray:
+        return self.attempt == 0
+
+    @property
+    def is_final(self) -> np.ndarray:
+        return self.final_pos == np.arange(len(self))
+
+    def first_positions(self) -> np.ndarray:
+        """
+        每个坐标第一次测试的行号, 按测试先后排列, 等同于排序后 drop_duplicates(keep='first')
+        """
+        return self.order[self.is_first[self.order]]
+
+    def final_positions(self) -> np.ndarray:
+        """
+        每个坐标最后一次测试的行号, 按测试先后排列, 等同于排序后 drop_duplicates(keep='last')
+        """
+        return self.order[self.is_final[self.order]]
+
+    def select(self, part_flag: int, read_fail: int) -> np.ndarray:
+        """
+        和以前的ParserData.get_prr_data逻辑一致, 返回的是prr_df的行号, 行顺序也一致(FINALLY是首测PASS在前, 复测在后)
+        :param part_flag: PART_FLAGS = ('ALL', 'FIRST', 'RETEST', 'FINALLY', "XY_COORD")
+        :param read_fail:
+        :return:
+        """
+        if read_fail:
+            mask = np.ones(len(self), dtype=bool)
+        else:
+            mask = self.passed
+        if part_flag == PartFlags.FIRST:
+            mask = mask & self.first_test
+        elif part_flag == PartFlags.RETEST:
+            mask = mask & ~self.first_test
+        elif part_flag == PartFlags.FINALLY:
+            return np.concatenate([
+                np.flatnonzero(mask & self.first_test & self.passed),
+                np.flatnonzero(mask & ~self.first_test),
+            ])
+        elif part_flag == PartFlags.XY_COORD:
+            mask = mask & (self.is_final if read_fail else self.last_pass_at_xy)
+        return np.flatnonzero(mask)
@@ -0,0 +1,115 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : stdf_module_cache.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 进程级共享的DataModule缓存
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple, Union
+
+from common.app_variable import DataModule, GlobalVariable
+from parser_core.stdf_die_history import DieHistory
+
+
+class ModuleCache:
+    """
+    多个MDI数据空间(StdfLoadUi)以及Contact/Merge窗口会反复载入同一份HDF5,
+    这里在进程内缓存单文件完整的DataModule和它的DieHistory, 各数据空间共享同一份底层数组
+    1. key: (HDF5_PATH, 文件指纹), 文件指纹为(size, mtime), HDF5被重写后自动失效
+    2. 缓存的是没有按PART_FLAG/READ_FAIL筛选的完整数据, 切换条件时只需要用DieHistory换一个mask
+    3. 缓存中的DataModule是只读的, 取出后只能做浅拷贝再加列, 不要原地修改
+    4. 超过 GlobalVariable.MODULE_CACHE_BUDGET 后按LRU淘汰
+    """
+    _lock = threading.RLock()
+    _cache: "OrderedDict[tuple, Tuple[DataModule, DieHistory, int]]" = OrderedDict()
+    _used_bytes: int = 0
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @staticmethod
+    def fingerprint(file_path: str) -> Tuple[int, int]:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def make_key(file_path: str) -> tuple:
+        return (
+            os.path.normcase(os.path.abspath(file_path)),
+            ModuleCache.fingerprint(file_path),
+        )
+
+    @staticmethod
+    def module_nbytes(module: DataModule, history: DieHistory) -> int:
+        nbytes = history.nbytes
+        for df in (module.prr_df, module.dtp_df, module.ptmd_df):
+            if df is not None:
+                nbytes += int(df.memory_usage(index=True, deep=True).sum())
+        return nbytes
+
+    @classmethod
+    def get(cls, key: tuple) -> Union[Tuple[DataModule, DieHistory], None]:
+        with cls._lock:
+            item = cls._cache.get(key)
+            if item is None:
+                cls.misses += 1
+                return None
+            cls._cache.move_to_end(key)
+            cls.hits += 1
+            return item[0], item[1]
+
+    @classmethod
+    def put(cls, key: tuple, module: DataModule, history: DieHistory):
+        nbytes = cls.module_nbytes(module, history)
+        with cls._lock:
+            if key in cls._cache:
+                cls._used_bytes -= cls._cache.pop(key)[-1]
+            if nbytes > GlobalVariable.MODULE_CACHE_BUDGET:
+                # 单个文件就超出预算, 不进缓存
+                return
+            cls._cache[key] = (module, history, nbytes)
+            cls._used_bytes += nbytes
+            cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        while cls._used_bytes > GlobalVariable.MODULE_CACHE_BUDGET and len(cls._cache) > 1:
+            _, (_, _, nbytes) = cls._cache.popitem(last=False)
+            cls._used_bytes -= nbytes
+            cls.evictions += 1
+
+    @classmethod
+    def invalidate(cls, file_path: str):
+        """
+        HDF5被重新解析覆盖时调用, 删除该文件所有条件下的缓存
+        """
+        path = os.path.normcase(os.path.abspath(file_path))
+        with cls._lock:
+            for key in [key for key in cls._cache if key[0] == path]:
+                cls._used_bytes -= cls._cache.pop(key)[-1]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._cache.clear()
+            cls._used_bytes = 0
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            total = cls.hits + cls.misses
+            return {
+                "ENTRIES": len(cls._cache),
+                "USED_MB": round(cls._used_bytes / 1024 / 1024, 2),
+                "BUDGET_MB": round(GlobalVariable.MODULE_CACHE_BUDGET / 1024 / 1024, 2),
+                "HITS": cls.hits,
+                "MISSES": cls.misses,
+                "EVICTIONS": cls.evictions,
+                "HIT_RATE": "{}%".format(round(cls.hits / total * 100, 2)) if total else "0.0%",
+            }
@@ -8,7 +8,7 @@
 @Mark    : 
 """
 import os
-from typing import Union, List, ValuesView
+from typing import Union, List, Tuple, ValuesView
 
 import pandas as pd
 import numpy as np
@@ -17,7 +17,10 @@ from pandas import DataFrame as Df
 from app_test.test_utils.wrapper_utils import Time
 from common.app_variable import TestVariable as TestVar, DataModule, GlobalVariable as GloVar, PtmdModule, TestVariable, \
     PartFlags, FailFlag
-from parser_core.stdf_parser_func import PrrPartFlag, DtpTestFlag
+from parser_core.stdf_bin_cube import BinCube
+from parser_core.stdf_die_history import DieHistory
+from parser_core.stdf_module_cache import ModuleCache
+from parser_core.stdf_parser_func import DtpTestFlag
 
 
 class ParserData:
@@ -91,9 +94,11 @@ class ParserData:
     @staticmethod
     def save_hdf5(df_module: DataModule, file_path: str) -> bool:
         try:
+            ModuleCache.invalidate(file_path)
             df_module.prr_df.to_hdf(file_path, "prr_df", mode="w")
             df_module.ptmd_df.to_hdf(file_path, "ptmd_df", mode="r+", format="table")
             df_module.dtp_df.to_hdf(file_path, "dtp_df", mode="r+")
+            BinCube.build(df_module.prr_df).to_hdf(file_path, BinCube.HDF5_KEY, mode="r+")
             return True
         except Exception as err:
             print(err)
@@ -113,22 +118,10 @@ class ParserData:
 
     @staticmethod
     def get_prr_data(prr_df, part_flag, read_fail) -> pd.DataFrame:
-        df = prr_df
-        if not read_fail:
-            df = df[df.FAIL_FLAG == FailFlag.PASS]
-        if part_flag == PartFlags.FIRST:
-            df = df[df.PART_FLG & PrrPartFlag.FirstTest != PrrPartFlag.FirstTest]
-        if part_flag == PartFlags.RETEST:
-            df = df[df.PART_FLG & PrrPartFlag.FirstTest == PrrPartFlag.FirstTest]
-        if part_flag == PartFlags.FINALLY:
-            first_df = df[df.PART_FLG & PrrPartFlag.FirstTest != PrrPartFlag.FirstTest]
-            retest_df = df[df.PART_FLG & PrrPartFlag.FirstTest == PrrPartFlag.FirstTest]
-            first_pass_df = first_df[first_df.FAIL_FLAG == FailFlag.PASS]
-            df = pd.concat([first_pass_df, retest_df])
-        if part_flag == PartFlags.XY_COORD:
-            df1 = df[["DIE_ID", "X_COORD", "Y_COORD"]].groupby(["X_COORD", "Y_COORD"]).last()
-            df = df[df.DIE_ID.isin(df1.DIE_ID)]
-        return df
+        """
+        按PART_FLAG/READ_FAIL选取prr数据, 逻辑统一在DieHistory.select中
+        """
+        return prr_df.take(DieHistory(prr_df).select(part_flag, read_fail))
 
     @staticmethod
     def get_yield_data(df: pd.DataFrame):
@@ -165,25 +158,68 @@ class ParserData:
             ID是文件的ID, 用来区分多个STDF的
             ptmd_df需要被用来做多个文件间的limit对比
             只要想办法让每颗DIE的DIE_ID不同既可以安心的做数据分析处理了
+        完整数据和DieHistory放在进程级缓存 ModuleCache 中, 多个数据空间共享,
+        PART_FLAG/READ_FAIL改变时不需要重新读取HDF5, 只有ID/DIE_ID列是每次新建的
         :return: 在tree中处理并返回
         """
+        full_module, history = ParserData.load_hdf5_full(file_path)
+        return ParserData.attach_unit_id(
+            ParserData.select_module(full_module, history, part_flag, read_fail), unit_id
+        )
+
+    @staticmethod
+    def load_hdf5_full(file_path: str) -> Tuple[DataModule, DieHistory]:
+        """
+        从ModuleCache中取完整数据和DieHistory, 没有就读取HDF5后放入缓存, 取出的数据只读
+        :return:
+        """
+        key = ModuleCache.make_key(file_path)
+        item = ModuleCache.get(key)
+        if item is not None:
+            return item
+        full_module = ParserData.read_hdf5_module(file_path)
+        history = DieHistory(full_module.prr_df)
+        ModuleCache.put(key, full_module, history)
+        return full_module, history
+
+    @staticmethod
+    def load_bin_cube(file_path: str) -> pd.DataFrame:
+        """
+        读取解析时保存的Bin计数, 只读HDF5中很小的bin_cube, 不读原始数据
+        以前版本保存的HDF5没有bin_cube, 由完整数据计算一次
+        :return:
+        """
+        key = ModuleCache.make_key(file_path)
+        cube = BinCube.get(key)
+        if cube is not None:
+            return cube
+        try:
+            cube = pd.read_hdf(file_path, key=BinCube.HDF5_KEY)
+        except KeyError:
+            full_module, _ = ParserData.load_hdf5_full(file_path)
+            cube = BinCube.build(
+                full_module.prr_df,
+                DieHistory.of(full_module.prr_df, order_by="PART_ID").final_positions()
+            )
+        BinCube.put(key, cube)
+        return cube
+
+    @staticmethod
+    def read_hdf5_module(file_path: str) -> DataModule:
+        """
+        读取HDF5的完整数据, 不做PART_FLAG/READ_FAIL筛选, 不带ID信息, 用于缓存
+        :return:
+        """
         prr_df = pd.read_hdf(file_path, key="prr_df")
         dtp_df = pd.read_hdf(file_path, key="dtp_df")
         ptmd_df = pd.read_hdf(file_path, key="ptmd_df")
         if not isinstance(prr_df, Df) or not isinstance(dtp_df, Df) or not isinstance(ptmd_df, Df):
             raise Exception("ERROR@!!!load_hdf5_analysis")
-        prr_df.insert(0, column="ID", value=unit_id)
-        dtp_df.insert(0, column="ID", value=unit_id)
-        ptmd_df.insert(0, column="ID", value=unit_id)
 
-        prr_df["DIE_ID"] = prr_df["PART_ID"] + unit_id * 1000000
         prr_df["SITE_NUM"] = prr_df["SITE_NUM"].apply(lambda x: 'S{:0>3d}'.format(x))
         # TODO: TEXT看情况是否需要TEST_NUM
         ptmd_df["TEXT"] = ptmd_df["TEST_NUM"].astype(str) + ":" + ptmd_df["TEST_TXT"]
-        prr_df = ParserData.get_prr_data(prr_df, part_flag, read_fail)
 
-        dtp_df["DIE_ID"] = dtp_df["PART_ID"] + unit_id * 1000000
-        dtp_df = dtp_df[dtp_df.PART_ID.isin(prr_df.PART_ID)]
         temp_fail_exec = dtp_df.TEST_FLG & DtpTestFlag.TestFailed == DtpTestFlag.TestFailed
         temp_fail = dtp_df[temp_fail_exec].copy()
         temp_pass = dtp_df[~temp_fail_exec].copy()
@@ -194,6 +230,42 @@ class ParserData:
 
         return DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df)
 
+    @staticmethod
+    def select_module(full_module: DataModule, history: DieHistory, part_flag: int, read_fail: int) -> DataModule:
+        """
+        用DieHistory的mask从完整数据中选取, dtp_df按PART_ID查表筛选(等同于isin)
+        :return:
+        """
+        prr_df = full_module.prr_df.take(history.select(part_flag, read_fail))
+        prr_part_id = prr_df["PART_ID"].to_numpy()
+        dtp_part_id = full_module.dtp_df["PART_ID"].to_numpy()
+        part_id_lut = np.zeros(int(max(prr_part_id.max(initial=0), dtp_part_id.max(initial=0))) + 1, dtype=bool)
+        part_id_lut[prr_part_id] = True
+        dtp_df = full_module.dtp_df[part_id_lut[dtp_part_id]]
+        return DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=full_module.ptmd_df)
+
+    @staticmethod
+    def attach_unit_id(base_module: DataModule, unit_id: int) -> DataModule:
+        """
+        缓存中的DataModule是共享的, 这里浅拷贝后插入ID和DIE_ID, 原有的列数组不会被复制
+        列顺序和以前load_hdf5_analysis的输出保持一致
+        :param base_module:
+        :param unit_id:
+        :return:
+        """
+        prr_df = base_module.prr_df.copy(deep=False)
+        dtp_df = base_module.dtp_df.copy(deep=False)
+        ptmd_df = base_module.ptmd_df.copy(deep=False)
+        prr_df.insert(0, column="ID", value=unit_id)
+        dtp_df.insert(0, column="ID", value=unit_id)
+        ptmd_df.insert(0, column="ID", value=unit_id)
+
+        prr_df["DIE_ID"] = prr_df["PART_ID"] + unit_id * 1000000
+        dtp_df.insert(
+            dtp_df.columns.get_loc("FAIL_FLG"), column="DIE_ID", value=dtp_df["PART_ID"] + unit_id * 1000000
+        )
+        return DataModule(prr_df=prr_df, dtp_df=dtp_df, ptmd_df=ptmd_df)
+
     # @staticmethod
     # def contact_with_unstack_data_module(args: ValuesView[DataModule]):
     #     """
@@ -0,0 +1,123 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : export_writer.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 导出任务的写文件函数, 按块写入并报告进度, 进度回调中抛出ExportCancelled即可中断
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Union
+
+import pandas as pd
+
+from common.app_variable import GlobalVariable
+from report_core.openxl_utils.stream_writer import StreamExcel, ExcelSheet
+
+
+class ExportCancelled(Exception):
+    """ 导出任务被取消 """
+
+
+class ExportWriter:
+    """
+    所有写函数的最后一个参数都是 progress(已写行数, 总行数), 每写完一块调用一次
+    写到一半被取消或出错时, 由调用方(ExportScheduler)删除不完整的文件
+    """
+
+    @staticmethod
+    def csv(file_path: str, df: pd.DataFrame, header: Union[bool, List[str]] = True, index: bool = False,
+            encoding: str = 'utf_8_sig', float_format: str = None, chunk_size: int = None,
+            progress: Callable[[int, int], None] = None):
+        """
+        按chunk_size行分块追加写CSV, 只在第一块写表头, BOM由文件编码写一次
+        float_format: 如GlobalVariable.CSV_FLOAT_FORMAT, 每块用同样的格式, None时和to_csv的默认一致
+        """
+        chunk_size = chunk_size or GlobalVariable.CSV_CHUNK_SIZE
+        total = len(df)
+        with open(file_path, 'w', encoding=encoding, newline='') as f:
+            if total == 0:
+                df.to_csv(f, header=header, index=index)
+            for start in range(0, total, chunk_size):
+                df.iloc[start: start + chunk_size].to_csv(
+                    f, header=header if start == 0 else False, index=index, float_format=float_format
+                )
+                if progress is not None:
+                    progress(min(start + chunk_size, total), total)
+
+    @staticmethod
+    def excel(file_path: str, sheets: List[ExcelSheet], progress: Callable[[int, int], None] = None):
+        StreamExcel.write(file_path, sheets, progress)
+
+    @staticmethod
+    def parquet(file_path: str, df: pd.DataFrame, index: bool = False, chunk_size: int = None,
+                progress: Callable[[int, int], None] = None):
+        """
+        需要pyarrow, 每块一个row group; parquet的列名必须是字符串, TEST_ID列会转成str
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        chunk_size = chunk_size or GlobalVariable.CSV_CHUNK_SIZE
+        df = df.rename(columns=str)
+        total = len(df)
+        schema = pa.Schema.from_pandas(df, preserve_index=index)
+        with pq.ParquetWriter(file_path, schema) as writer:
+            for start in range(0, total, chunk_size):
+                writer.write_table(
+                    pa.Table.from_pandas(df.iloc[start: start + chunk_size], schema=schema, preserve_index=index)
+                )
+                if progress is not None:
+                    progress(min(start + chunk_size, total), total)
+
+
+class ExportCache:
+    """
+    已经导出的文件, key由调用方决定(如Li.jmp_export_key), 同样的数据再次导出时直接用已有的文件
+    记录写完时文件的大小和修改时间, 文件被删除或被覆盖后缓存失效
+    """
+    _lock = threading.RLock()
+    _cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (path, size, mtime_ns)
+
+    @staticmethod
+    def stat(path: str) -> Union[tuple, None]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    @classmethod
+    def get(cls, key: tuple) -> Union[str, None]:
+        with cls._lock:
+            item = cls._cache.get(key)
+            if item is None:
+                return None
+            path, size, mtime = item
+            if cls.stat(path) != (size, mtime):
+                del cls._cache[key]
+                return None
+            cls._cache.move_to_end(key)
+            return path
+
+    @classmethod
+    def put(cls, key: tuple, path: str):
+        with cls._lock:
+            st = cls.stat(path)
+            if st is None:
+                return
+            cls._cache[key] = (path,) + st
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > GlobalVariable.EXPORT_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def discard_path(cls, path: str):
+        """ 文件要被重写, 去掉指向它的缓存 """
+        path = os.path.normcase(os.path.abspath(path))
+        with cls._lock:
+            for key in [key for key, item in cls._cache.items() if os.path.normcase(os.path.abspath(item[0])) == path]:
+                del cls._cache[key]
@@ -0,0 +1,168 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : stream_writer.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 流式写Excel(write_only), 内存不随数据量增长, 可以在子进程中运行
+"""
+from dataclasses import dataclass, field
+from typing import List, Union, Callable
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from common.app_variable import GlobalVariable
+
+
+@dataclass
+class ExcelSheet:
+    """
+    name: sheet名
+    df: 数据
+    title: 第一行的标题, None时不写
+    header: 表头, None时为df的列名
+    index: 是否写入df的index(作为第一列)
+    """
+    name: str
+    df: pd.DataFrame
+    title: str = None
+    header: List[str] = None
+    index: bool = False
+    widths: List[float] = field(default=None, repr=False)
+
+
+class StreamExcel:
+    """
+    write_only的Workbook只能按行追加, 单元格写完即落盘:
+        1. 标题和表头用WriteOnlyCell带样式, 数据不逐个单元格设置样式
+        2. 列宽由表头和前WIDTH_SAMPLE行数据的文本长度一次算出, 在写数据前设置
+        3. 数据按EXCEL_CHUNK_SIZE行分块转成Python值再追加, 每块报告一次进度
+    参数都可以pickle, 直接作为multiprocessing.Process的target使用
+    """
+    HeaderFont = Font(bold=True, color="FFFFFF")
+    HeaderFill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    TitleFont = Font(size=14, bold=True)
+    CenterAlign = Alignment(horizontal='center')
+    WIDTH_SAMPLE = 1000
+    MAX_WIDTH = 50
+
+    @staticmethod
+    def column_widths(df: pd.DataFrame, header: List[str]) -> List[float]:
+        """
+        每列的宽度: 表头和采样数据中最长的文本 + 2, 不超过MAX_WIDTH
+        """
+        sample = df.head(StreamExcel.WIDTH_SAMPLE)
+        widths = []
+        for position, name in enumerate(header):
+            length = len(str(name))
+            if position < sample.shape[1] and len(sample):
+                length = max(length, int(sample.iloc[:, position].astype(str).str.len().max()))
+            widths.append(min(length + 2, StreamExcel.MAX_WIDTH))
+        return widths
+
+    @staticmethod
+    def header_cells(ws, values: list, font: Font, fill: PatternFill = None) -> List[WriteOnlyCell]:
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.font = font
+            if fill is not None:
+                cell.fill = fill
+                cell.alignment = StreamExcel.CenterAlign
+            cells.append(cell)
+        return cells
+
+    @staticmethod
+    def to_rows(block: pd.DataFrame) -> list:
+        """
+        DataFrame块转为Python值的行, NaN为空单元格
+        """
+        values = block.astype(object).to_numpy()
+        values[pd.isna(values)] = None
+        return values.tolist()
+
+    @staticmethod
+    def write(file_path: str, sheets: List[ExcelSheet], progress: Callable[[int, int], None] = None,
+              chunk_size: int = None):
+        """
+        :param file_path: xlsx路径
+        :param sheets: 按顺序写入的sheet, 空的DataFrame也会写表头
+        :param progress: progress(已写行数, 总行数)
+        :param chunk_size: 每块的行数
+        """
+        chunk_size = chunk_size or GlobalVariable.EXCEL_CHUNK_SIZE
+        total = sum(len(each.df) for each in sheets)
+        done = 0
+        wb = Workbook(write_only=True)
+        for sheet in sheets:
+            df = sheet.df.reset_index() if sheet.index else sheet.df
+            header = sheet.header if sheet.header is not None else [str(each) for each in df.columns]
+            if sheet.index and sheet.header is not None:
+                header = [str(sheet.df.index.name or "")] + list(header)
+            ws = wb.create_sheet(sheet.name)
+            widths = sheet.widths or StreamExcel.column_widths(df, header)
+            for position, width in enumerate(widths):
+                ws.column_dimensions[get_column_letter(position + 1)].width = width
+            head_row = 1
+            if sheet.title is not None:
+                ws.append(StreamExcel.header_cells(ws, [sheet.title], StreamExcel.TitleFont))
+                head_row = 2
+            ws.freeze_panes = "A{}".format(head_row + 1)
+            ws.append(StreamExcel.header_cells(ws, header, StreamExcel.HeaderFont, StreamExcel.HeaderFill))
+            if len(header):
+                ws.auto_filter.ref = "A{}:{}{}".format(
+                    head_row, get_column_letter(len(header)), head_row + len(df)
+                )
+            for start in range(0, len(df), chunk_size):
+                for row in StreamExcel.to_rows(df.iloc[start: start + chunk_size]):
+                    ws.append(row)
+                done += min(chunk_size, len(df) - start)
+                if progress is not None:
+                    progress(done, total)
+        if not sheets:
+            wb.create_sheet("Sheet")
+        wb.save(file_path)
+        if progress is not None:
+            progress(total, total)
+
+    @staticmethod
+    def run(file_path: str, sheets: List[ExcelSheet], queue=None, chunk_size: int = None):
+        """
+        子进程入口, 进度以(已写行数, 总行数)放入multiprocessing.Queue, 完成时放入(file_path, None), 异常时放入(None, str)
+        """
+        def progress(done: int, total: int):
+            if queue is not None:
+                queue.put((done, total))
+
+        try:
+            StreamExcel.write(file_path, sheets, progress, chunk_size)
+        except Exception as err:
+            if queue is not None:
+                queue.put((None, str(err)))
+            raise
+        if queue is not None:
+            queue.put((file_path, None))
+
+    @staticmethod
+    def raw_data_sheet(df_raw: pd.DataFrame, ptmd_df: pd.DataFrame, name: str = '测试数据',
+                       max_rows: Union[int, None] = None) -> ExcelSheet:
+        """
+        原始数据: 元数据列在前, TEST_ID列按升序, 表头为 TEST_NUM_TEST_TXT, 和CSV导出一致
+        """
+        if max_rows is not None and len(df_raw) > max_rows:
+            df_raw = df_raw.head(max_rows)
+        test_id_columns = sorted(col for col in df_raw.columns if isinstance(col, (int, np.integer)))
+        meta_columns = [col for col in df_raw.columns if not isinstance(col, (int, np.integer))]
+        df_to_save = df_raw[meta_columns + test_id_columns]
+        name_map = {
+            row.TEST_ID: f"{row.TEST_NUM}_{row.TEST_TXT}"
+            for row in ptmd_df.itertuples()
+        }
+        header = [name_map.get(col, str(col)) for col in df_to_save.columns]
+        return ExcelSheet(name=name, df=df_to_save, header=header, index=True)
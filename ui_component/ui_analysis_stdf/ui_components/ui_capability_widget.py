@@ -8,7 +8,7 @@
 @Mark    : 制程能力报告显示组件（混合显示：Table + 统计摘要）
 """
 import os
-from typing import List, Dict
+from typing import List, Dict, Union
 import pandas as pd
 from PySide2.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
                                 QTableWidget, QTableWidgetItem, QPushButton,
@@ -126,18 +126,9 @@ class CapabilityWidget(QWidget):
                 file_path = file_row.iloc[0].get('FILE_PATH', f"File_{file_id}")
                 file_name = os.path.basename(file_path)
                 
-                # 创建data_module的副本并设置正确的索引
-                file_data_module = DataModule(
-                    prr_df=data_module.prr_df.copy(),
-                    dtp_df=data_module.dtp_df.copy(),
-                    ptmd_df=data_module.ptmd_df.copy()
-                )
-                
-                # 设置索引（与Li.set_data中的逻辑一致）
-                if 'DIE_ID' in file_data_module.prr_df.columns:
-                    file_data_module.prr_df.set_index(["DIE_ID"], inplace=True)
-                if 'TEST_ID' in file_data_module.dtp_df.columns and 'DIE_ID' in file_data_module.dtp_df.columns:
-                    file_data_module.dtp_df.set_index(["TEST_ID", "DIE_ID"], inplace=True)
+                file_data_module = self.file_data_module(file_id, data_module)
+                if file_data_module is None:
+                    continue
                 
                 # 计算该文件的制程能力
                 file_top_fail_dict = CapabilityUtils.calculation_top_fail(file_data_module)
@@ -165,6 +156,28 @@ class CapabilityWidget(QWidget):
             import traceback
             print(f"生成单文件报告失败: {str(e)}\n{traceback.format_exc()}")
     
+    def file_data_module(self, file_id: int, data_module: DataModule) -> Union[DataModule, None]:
+        """
+        从合并后的df_module中按ID取出该文件的数据(不复制prr_df), 测项和limit用该文件自己的ptmd_df,
+        TEST_ID按TEXT换成合并后的TEST_ID
+        """
+        df_module = self.li.df_module
+        if df_module is None or df_module.prr_df is None or 'ID' not in df_module.prr_df.columns:
+            return None
+        view = df_module.view(file_id)
+        if len(view.prr_df) == 0:
+            return None
+        # 同一个TEXT可能有多行, 用dict做映射, Series.map在index重复时会报错
+        merged_ptmd = df_module.ptmd_df.drop_duplicates("TEXT")
+        test_id_map = dict(zip(merged_ptmd["TEXT"], merged_ptmd["TEST_ID"]))
+        test_ids = data_module.ptmd_df["TEXT"].map(test_id_map)
+        keep = test_ids.isin(view.ptmd_df["TEST_ID"]).values
+        ptmd_df = data_module.ptmd_df[keep].copy()
+        ptmd_df["TEST_ID"] = test_ids[keep].astype(view.ptmd_df["TEST_ID"].dtype).values
+        # 文件中TEXT重复的测项合并后是同一个TEST_ID, 只保留一行
+        ptmd_df = ptmd_df.drop_duplicates("TEST_ID")
+        return DataModule(prr_df=view.prr_df, dtp_df=view.dtp_df, ptmd_df=ptmd_df)
+    
     def add_report_tab(self, tab_name: str, df: pd.DataFrame, stats: Dict, capability_list: List[dict]):
         """
         添加报告Tab（混合显示：统计摘要 + Table）
@@ -10,8 +10,7 @@ import os
 import time
 import subprocess
 
-from PySide2.QtGui import QColor, QGuiApplication
-from PySide2.QtWidgets import QWidget, QHeaderView, QFileDialog, QTableWidgetItem
+from PySide2.QtWidgets import QWidget, QHeaderView, QFileDialog
 from PySide2.QtCore import Qt, QThread, Signal, Slot
 
 from typing import List, Set, Union
@@ -250,14 +249,7 @@ class FileLoadWidget(QWidget, FileLoadForm):
         if index == self.progressBar.maximum():
             return Print.info("{} > 完成数据解析!".format(self.title))
         # self.tableWidget.selectRow(index)
-        item = QTableWidgetItem(info['message'])
-        if info['status'] == -1:
-            item.setBackground(QColor(255, 110, 55))
-        elif info['status'] == 0:
-            item.setBackground(QColor(180, 208, 201))
-        else:
-            item.setBackground(QColor(176, 255, 210))
-        self.tableWidget.update_table_data(index, "MESSAGE", item)
+        self.tableWidget.set_message(index, info['message'], info['status'])
 
     def th_finished(self):
         """
@@ -279,8 +271,7 @@ class FileLoadWidget(QWidget, FileLoadForm):
         """
         if self.tableWidget.table_count == 0:
             return Print.warning("无文件结构被读取")
-        self.tableWidget.update_temp_data()
-        
+
         # 只选择勾选了R_FAIL的文件进行解析
         selected_files = self.tableWidget.get_selected_files_for_analysis()
         if not selected_files:
@@ -297,22 +288,4 @@ class FileLoadWidget(QWidget, FileLoadForm):
     def keyPressEvent(self, event):
         """ Ctrl + C复制表格内容 """
         if event.modifiers() == Qt.ControlModifier and event.key() == Qt.Key_C:
-            # 获取表格的选中行
-            ranges = self.tableWidget.selectedRanges()
-            if not ranges:
-                return
-            selected_ranges = ranges[0]  # 只取第一个数据块,其他的如果需要要做遍历,简单功能就不写得那么复杂了
-            text_str = "\t".join(GlobalVariable.FILE_TABLE_HEAD) + '\n'  # 最后总的内容
-            # 行（选中的行信息读取）
-            for row in range(selected_ranges.topRow(), selected_ranges.bottomRow() + 1):
-                row_str = ""
-                # 列（选中的列信息读取）
-                for col in range(selected_ranges.leftColumn(), selected_ranges.rightColumn() + 1):
-                    item = self.tableWidget.item(row, col)
-                    if item is None:
-                        row_str += '\t'
-                        continue
-                    row_str += item.text() + '\t'  # 制表符间隔数据
-                text_str += row_str + '\n'  # 换行
-            clipboard = QGuiApplication.clipboard()  # 获取剪贴板
-            clipboard.setText(text_str)  # 内容写入剪贴板
+            self.tableWidget.copy_selection()
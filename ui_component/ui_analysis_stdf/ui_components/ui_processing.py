@@ -8,13 +8,14 @@
 @Mark    : 
 """
 
+import os
 from typing import Union
 
-import numpy as np
 from PySide2.QtGui import QStandardItemModel, QStandardItem, Qt
-from PySide2.QtWidgets import QWidget
+from PySide2.QtWidgets import QWidget, QMessageBox, QFileDialog, QProgressDialog, QApplication
 from PySide2.QtCore import Slot, QModelIndex
 
+from common.cal_interface.group_capability import GroupCapability
 from ui_component.ui_app_variable import UiGlobalVariable
 from ui_component.ui_analysis_stdf.ui_designer.ui_processing import Ui_Form
 
@@ -26,14 +27,18 @@ class ProcessWidget(QWidget, Ui_Form):
     """
     需要的时候再运行, 即功能打开时运行而不是数据一改变就运行
     """
-    select_item_list = QStandardItemModel()
-    top_item_list = QStandardItemModel()  # yield, avg, limit ...
-    bot_item_list = QStandardItemModel()  # group by item
     li = None
+    # listView_3中的选项 -> GroupCapability结果中的列
+    PROCESS_VALUE_COLUMN = {"MEAN": "AVG", "STD": "STD", "CPK": "CPK"}
 
     def __init__(self, parent=None, icon=None):
         super(ProcessWidget, self).__init__(parent)
         self.setupUi(self)
+        # 每个窗口各自的model, 可以同时打开多个
+        self.select_item_list = QStandardItemModel(self)
+        self.top_item_list = QStandardItemModel(self)  # yield, avg, limit ...
+        self.bot_item_list = QStandardItemModel(self)  # group by item
+        self.bot_groups = []  # listView的每一行对应的(GROUP, DA_GROUP)
         self.setWindowTitle("制程能力")
         if icon:
             self.setWindowIcon(icon)
@@ -88,26 +93,30 @@ class ProcessWidget(QWidget, Ui_Form):
 
     def gen_listView(self):
         """
-        通过 GROUP 和 DA_GROUP 来做处理
+        通过 GROUP 和 DA_GROUP 来做处理, 组来自 Li.calculation_group 的 group_yield_df
+        组名中可能有'_'等字符, 点击时按行号取组, 不解析显示的文本
         :return:
         """
-        bot_item_list_df = self.li.front_df["GROUP"] + "_" + self.li.front_df["DA_GROUP"]  # type:pd.DataFrame
-        bot_item_list = bot_item_list_df.drop_duplicates(keep="first").tolist()
+        self.bot_groups = []
         self.bot_item_list.clear()
-        for index, each in enumerate(bot_item_list):
-            item = QStandardItem(each)
-            self.bot_item_list.appendRow(item)
+        if self.li is None or self.li.calculation_group(self.li.group_params, self.li.da_group_params) is None:
+            return
+        for row in self.li.group_yield_df.itertuples(index=False):
+            self.bot_groups.append((row.GROUP, row.DA_GROUP))
+            self.bot_item_list.appendRow(QStandardItem("{}-{}".format(row.GROUP, row.DA_GROUP)))
 
     def set_data(self, li):
         if self.li is not None:
-            self.li.front_df_signal.disconnect(self.set_front_df_process)
+            self.li.QCalculation.disconnect(self.set_front_df_process)
+            self.li.QChartRefresh.disconnect(self.set_front_df_process)
         self.li = li
-        self.li.front_df_signal.connect(self.set_front_df_process)
+        self.li.QCalculation.connect(self.set_front_df_process)
+        self.li.QChartRefresh.connect(self.set_front_df_process)
 
     @Slot()
     def set_front_df_process(self):
         """
-        将数据显示到前台中. 一般在这里的时候, 数据已经经理了group by阶段了
+        数据或分组改变后重新生成组列表
         :return:
         """
         if self.li is None:
@@ -118,117 +127,38 @@ class ProcessWidget(QWidget, Ui_Form):
     def top_row_change(self, model_index: QModelIndex):
         """
         放良率. 和 avg 对比
+        分组的结果都来自 Li.calculation_group, 所有(组, 测项)一次算完, 这里只做展示
         :param model_index:
         :return:
         """
-        if self.li is None:
+        if self.li is None or self.li.df_module is None:
             return
+        top_item = str(model_index.data()).lower()
 
-        if "GROUP" not in self.li.front_df or "DA_GROUP" not in self.li.front_df:
-            return
-
-        if model_index.data() == "yield":
-            df_group = self.li.front_df.groupby(["GROUP", "DA_GROUP"])
-            yield_data = []  # type:list
-            for key, each_df in df_group:
-                if not isinstance(key, tuple):
-                    item_name = str(key)
-                else:
-                    item_name = '-'.join([str(ea) for ea in key])
-                total = len(each_df)
-                fail_num = len(each_df[each_df["FAIL_FLAG"] != 1])
-                pass_num = len(each_df) - fail_num
-                yield_data.append({
-                    "Item": item_name,
-                    "Total": total,
-                    "Pass": pass_num,
-                    "Fail": fail_num,
-                    "Yield": "{}%".format(round(pass_num / total * 100, 3)),
-                })
-            self.cpk_info_table.setData(yield_data)
+        if top_item == "yield":
+            if self.li.calculation_group(self.li.group_params, self.li.da_group_params) is None:
+                return
+            df = self.li.group_yield_df
+            self.cpk_info_table.setData([
+                {
+                    "Item": "{}-{}".format(row.GROUP, row.DA_GROUP),
+                    "Total": row.TOTAL,
+                    "Pass": row.PASS,
+                    "Fail": row.FAIL,
+                    "Yield": "{}%".format(row.YIELD),
+                } for row in df.itertuples(index=False)
+            ])
             return
 
-        if model_index.data() == "data":
-            """
-            这个稍微复杂一些, 先将数据都获取到, 然后再整理起来
-            """
+        if top_item == "data":
             item_list = self.get_listView_3_choose_items()
             if item_list is None:
                 return
-            df_group = self.li.front_df.groupby(["GROUP", "DA_GROUP"])
-            group_cpk_dict = dict()
-            for key, each_df in df_group:
-                if not isinstance(key, tuple):
-                    item_name = str(key)
-                else:
-                    item_name = '-'.join([str(ea) for ea in key])
-                _cpk_df = each_df[each_df["FAIL_FLAG"] == 1][self.li.front_limit_dict.keys()]
-                _mean = _cpk_df.mean()
-                _std = _cpk_df.std()
-                temp_data_list = []
-                for index, item_key in enumerate(self.li.front_limit_dict.keys()):
-                    item = self.li.front_limit_dict[item_key]
-                    temp_std = _std[item_key]
-                    temp_mean = _mean[item_key]
-                    if temp_std == 0:
-                        cpk = 0
-                    else:
-                        cpk = round(min(
-                            [(item.h_limit - temp_mean) / (3 * temp_std),
-                             (temp_mean - item.l_limit) / (3 * temp_std)])
-                            , 6)
-                    temp_dict = {
-                        "SORT": item.test_sort,
-                        "TEST_TYPE": item.test_type,
-                        "Text": item_key,
-                        "UNITS": item.unit,
-                        "LO_LIMIT": item.l_limit,
-                        "HI_LIMIT": item.h_limit,
-                        "LO_LIMIT_TYPE": item.l_limit_type,
-                        "HI_LIMIT_TYPE": item.h_limit_type,
-                        f"{item_name}_Avg": round(_mean[item_key], 5),
-                        f"{item_name}_Stdev": round(_std[item_key], 5),
-                        f"{item_name}_Cpk": cpk,
-                    }
-                    temp_data_list.append(temp_dict)
-                group_cpk_dict[item_name] = temp_data_list
-
-            """
-            前台展示数据
-            """
-            data_table_list = []
-            for index, key in enumerate(group_cpk_dict.keys()):
-                temp_each_data = group_cpk_dict[key]
-                if index == 0:
-                    for i, row in enumerate(temp_each_data):
-                        d = {
-                            "SORT": row["SORT"],
-                            "TEST_TYPE": row["TEST_TYPE"],
-                            "Text": row["Text"],
-                            "UNITS": row["UNITS"],
-                            "LO_LIMIT": row["LO_LIMIT"],
-                            "HI_LIMIT": row["HI_LIMIT"],
-                            "LO_LIMIT_TYPE": row["LO_LIMIT_TYPE"],
-                            "HI_LIMIT_TYPE": row["HI_LIMIT_TYPE"],
-                        }
-                        for each in item_list:
-                            if each == "mean":
-                                d[f"{key}_Avg"] = row[f"{key}_Avg"]
-                            if each == "std":
-                                d[f"{key}_Stdev"] = row[f"{key}_Stdev"]
-                            if each == "cpk":
-                                d[f"{key}_Cpk"] = row[f"{key}_Cpk"]
-                        data_table_list.append(d)
-                else:
-                    for i, row in enumerate(temp_each_data):
-                        for each in item_list:
-                            if each == "mean":
-                                data_table_list[i][f"{key}_Avg"] = row[f"{key}_Avg"]
-                            if each == "std":
-                                data_table_list[i][f"{key}_Stdev"] = row[f"{key}_Stdev"]
-                            if each == "cpk":
-                                data_table_list[i][f"{key}_Cpk"] = row[f"{key}_Cpk"]
-            self.cpk_info_table.setData(data_table_list)
+            group_df = self.li.calculation_group(self.li.group_params, self.li.da_group_params)
+            if group_df is None or group_df.empty:
+                return
+            values = [self.PROCESS_VALUE_COLUMN[each.upper()] for each in item_list]
+            self.cpk_info_table.setData(GroupCapability.pivot(group_df, values).to_dict("records"))
             return
 
     @Slot(QModelIndex)
@@ -238,113 +168,69 @@ class ProcessWidget(QWidget, Ui_Form):
         :param model_index:
         :return:
         """
+        if self.li is None or self.li.df_module is None:
+            return
+        if not 0 <= model_index.row() < len(self.bot_groups):
+            return
+        group, da_group = self.bot_groups[model_index.row()]
         if self.radioButton_2.isChecked():
-            group, da_group = model_index.data().split("_")
-            df = self.li.front_df[(self.li.front_df["GROUP"] == group) & (self.li.front_df["DA_GROUP"] == da_group)]
-
-            cpk_list = []
-            first_fail_dict = {}
-            for num in df[df["FAIL_FLAG"] != 1]["FIRST_FAIL"]:
-                if num not in first_fail_dict:
-                    first_fail_dict[num] = 1
-                    continue
-                first_fail_dict[num] += 1
-
-            temp_df = df[df["FAIL_FLAG"] == 1][self.li.front_limit_dict.keys()]
-            _mean, _min, _max, _std, _median = temp_df.mean(), temp_df.min(), temp_df.max(), temp_df.std(), temp_df.median()
-            for key, item in self.li.front_limit_dict.items():
-                try:
-                    test_num, test_txt = key.split(":", 1)
-                except ValueError:
-                    raise Exception("重大错误: 测试数据测试项目没有指定TEST_NO和TEST_TEXT,测试程序漏洞@!!!!!")
-                reject_qty = 0
-                logic_or = []
-                if item.l_limit_type == ">":
-                    logic_or.append((df[key] <= item.l_limit))
-                if item.l_limit_type == ">=":
-                    logic_or.append((df[key] < item.l_limit))
-                if item.h_limit_type == "<":
-                    logic_or.append((df[key] >= item.h_limit))
-                if item.h_limit_type == "<=":
-                    logic_or.append((df[key] > item.h_limit))
-                if item.h_limit_type == "=":
-                    logic_or.append((df[key] != item.h_limit))
-                if len(logic_or) == 1:
-                    items = logic_or[0]
-                    reject_qty = len(df.loc[items])
-                if len(logic_or) > 1:
-                    items = np.logical_or(*logic_or)
-                    reject_qty = len(df.loc[items])
-
-                fail_qty = first_fail_dict.get(item.test_num, 0)
-                temp_std, temp_mean = _std[key], _mean[key]
-                cpk = 0 if temp_std == 0 else round(min([(item.h_limit - temp_mean) / (3 * temp_std),
-                                                         (temp_mean - item.l_limit) / (3 * temp_std)]), 6)
-                temp_dict = {
-                    "SORT": item.test_sort,
-                    "TEST_TYPE": item.test_type,
-                    "TEST_NUM": test_num,
-                    "TEST_TEXT": test_txt,
-                    "UNITS": str(item.unit),
-                    "LO_LIMIT": item.l_limit,
-                    "HI_LIMIT": item.h_limit,
-                    "Average": round(_mean[key], 6),
-                    "Stdev": round(_std[key], 6),
-                    "Cpk": cpk,
-                    "Text": key,
-                    "Total": len(df),
-                    "Fail": fail_qty,
-                    "Fail/Total": "{}%".format(round(fail_qty / len(df) * 100, 3)),
-                    "Reject": reject_qty,
-                    "Reject/Total": "{}%".format(round(reject_qty / len(df) * 100, 3)),
-                    "Min": round(_min[key], 6),
-                    "Max": round(_max[key], 6),
-                    "LO_LIMIT_TYPE": item.l_limit_type,
-                    "HI_LIMIT_TYPE": item.h_limit_type,
-                }
-                cpk_list.append(temp_dict)
-            self.cpk_info_table.setData(cpk_list)
+            """
+            VALUE, 这个组每个测项的制程能力, 取 Li.calculation_group 长表中这个组的行
+            Fail为组内第一个FAIL在这个测项的颗数, Fail/Total按组内总颗数算
+            """
+            group_df = self.li.calculation_group(self.li.group_params, self.li.da_group_params)
+            if group_df is None:
+                return
+            df = group_df[(group_df["GROUP"] == group) & (group_df["DA_GROUP"] == da_group)]
+            yield_df = self.li.group_yield_df
+            total = yield_df[(yield_df["GROUP"] == group) & (yield_df["DA_GROUP"] == da_group)]["TOTAL"].sum()
+            self.cpk_info_table.setData([
+                {
+                    "SORT": row.TEST_NUM,
+                    "TEST_TYPE": row.TEST_TYPE,
+                    "TEST_NUM": row.TEST_NUM,
+                    "TEST_TEXT": row.TEST_TXT,
+                    "UNITS": row.UNITS,
+                    "LO_LIMIT": row.LO_LIMIT,
+                    "HI_LIMIT": row.HI_LIMIT,
+                    "Average": round(row.AVG, 6),
+                    "Stdev": round(row.STD, 6),
+                    "Cpk": round(row.CPK, 6),
+                    "Text": row.TEXT,
+                    "Total": row.QTY,
+                    "Fail": row.FAIL_QTY,
+                    "Fail/Total": "{}%".format(round(row.FAIL_QTY / max(total, 1) * 100, 3)),
+                    "Reject": row.REJECT_QTY,
+                    "Reject/Total": "{}%".format(row.REJECT_RATE),
+                    "Min": round(row.MIN, 6),
+                    "Max": round(row.MAX, 6),
+                    "LO_LIMIT_TYPE": row.LO_LIMIT_TYPE,
+                    "HI_LIMIT_TYPE": row.HI_LIMIT_TYPE,
+                } for row in df.itertuples(index=False)
+            ])
             return
         if self.radioButton.isChecked():
             """
             DIFF, 只看均值以及PTR项目
+            每个组去掉两头5%后的均值, 所有组 x 测项由 Li.calculation_group_diff 一次算出
             """
-            group, da_group = model_index.data().split("_")
-            diff_compare_df = self.li.front_df[
-                (self.li.front_df["GROUP"] == group) & (self.li.front_df["DA_GROUP"] == da_group)]
-            length = len(diff_compare_df)
-            start, stop = int(length * 0.05), int(length * 0.95)
-
-            diff_data_list = []
-            df_group = self.li.front_df.groupby(["GROUP", "DA_GROUP"])
-            for test_item, test_tuple in self.li.front_limit_dict.items():  # type:str, GlobalVariable.LimitClass
-                if test_tuple.test_type == "FTR":
-                    continue
-                temp_dict = dict()
-                diff_data_list.append(temp_dict)
-                temp_dict["SORT"] = test_tuple.test_sort
-                temp_dict["ITEM"] = test_item
-                temp_dict["Unit"] = test_tuple.unit
-                temp_dict["LO_LIMIT"] = test_tuple.l_limit
-                temp_dict["HI_LIMIT"] = test_tuple.h_limit
-                temp_dict["LO_LIMIT_TYPE"] = test_tuple.l_limit_type
-                temp_dict["HI_LIMIT_TYPE"] = test_tuple.h_limit_type
-
-                compare_data = np.mean(sorted(diff_compare_df[test_item].to_list())[start: stop])
-                for key, each_df in df_group:
-                    if not isinstance(key, tuple):
-                        item_name = str(key)
-                    else:
-                        item_name = '-'.join([str(ea) for ea in key])
-                    temp_data = each_df[test_item].to_list()
-                    temp_length = len(each_df)
-                    temp_start, temp_stop = int(temp_length * 0.05), int(temp_length * 0.95)
-                    temp_data = sorted(temp_data)[temp_start: temp_stop]
-                    temp_data = np.mean(temp_data)
-                    gap = compare_data - temp_data
-                    temp_dict[item_name] = gap
-
-            self.cpk_info_table.setData(diff_data_list)
+            diff_df = self.li.calculation_group_diff(
+                self.li.group_params, self.li.da_group_params, "{}@{}".format(group, da_group)
+            )
+            if diff_df is None:
+                return
+            diff_df.columns = [each.replace("@", "-") for each in diff_df.columns]
+            test_df = pd.DataFrame(self.li.capability_key_list).set_index("TEST_ID").loc[diff_df.index]
+            info_df = pd.DataFrame({
+                "SORT": test_df["TEST_NUM"],
+                "ITEM": test_df["TEXT"],
+                "Unit": test_df["UNITS"],
+                "LO_LIMIT": test_df["LO_LIMIT"],
+                "HI_LIMIT": test_df["HI_LIMIT"],
+                "LO_LIMIT_TYPE": test_df["LO_LIMIT_TYPE"],
+                "HI_LIMIT_TYPE": test_df["HI_LIMIT_TYPE"],
+            })
+            self.cpk_info_table.setData(info_df.join(diff_df).to_dict("records"))
             return
 
     @Slot()
@@ -380,41 +266,44 @@ class ProcessWidget(QWidget, Ui_Form):
         if not file_path:
             return
 
+        from functools import partial
+        from report_core.export_writer import ExportWriter
+        from ui_component.ui_common.ui_export_job import ExportScheduler
+
         try:
-            self.export_capability_report(file_path)
-            QMessageBox.information(self, "成功", f"制程能力报告已导出到:\n{file_path}")
+            # 在GUI线程中准备好数据, 写文件放到后台导出队列
+            sheets = self.capability_report_sheets()
         except Exception as e:
-            QMessageBox.critical(self, "导出失败", f"导出制程能力报告失败:\n{str(e)}")
+            return QMessageBox.critical(self, "导出失败", f"导出制程能力报告失败:\n{str(e)}")
+        ExportScheduler.instance().submit(
+            "制程能力报告", partial(ExportWriter.excel, file_path, sheets), file_path,
+            on_finished=lambda: QMessageBox.information(self, "成功", f"制程能力报告已导出到:\n{file_path}"),
+            on_error=lambda error: QMessageBox.critical(self, "导出失败", f"导出制程能力报告失败:\n{error}"),
+        )
 
-    def export_capability_report(self, file_path):
-        """导出制程能力报告到Excel文件"""
-        import pandas as pd
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        from openpyxl.utils.dataframe import dataframe_to_rows
+    def export_capability_report(self, file_path, progress=None):
+        """
+        导出制程能力报告到Excel文件
+        用write_only流式写入, 只给标题和表头设置样式, 内存不随行数增长
+        """
+        from report_core.openxl_utils.stream_writer import StreamExcel
 
-        # 创建Excel工作簿
-        wb = Workbook()
+        StreamExcel.write(file_path, self.capability_report_sheets(), progress)
 
-        # 删除默认工作表
-        wb.remove(wb.active)
+    def capability_report_sheets(self) -> list:
+        """ 制程能力报告的各个sheet """
+        import pandas as pd
+        from report_core.openxl_utils.stream_writer import ExcelSheet
 
+        sheets = []
         # 1. 制程能力汇总表
         if self.li.capability_key_list:
-            capability_df = pd.DataFrame(self.li.capability_key_list)
-            ws_capability = wb.create_sheet("制程能力汇总")
+            sheets.append(ExcelSheet("制程能力汇总", pd.DataFrame(self.li.capability_key_list), title="制程能力分析报告"))
 
-            # 添加标题
-            ws_capability['A1'] = "制程能力分析报告"
-            ws_capability['A1'].font = Font(size=16, bold=True)
-            ws_capability.merge_cells('A1:H1')
-
-            # 添加数据
-            for r in dataframe_to_rows(capability_df, index=False, header=True):
-                ws_capability.append(r)
-
-            # 设置样式
-            self._format_excel_sheet(ws_capability, capability_df)
+        # 分组制程能力, 有分组时才导出
+        group_df = self.li.calculation_group(self.li.group_params, self.li.da_group_params)
+        if group_df is not None and not group_df.empty and (self.li.group_params or self.li.da_group_params):
+            sheets.append(ExcelSheet("分组制程能力", group_df, title="分组制程能力(GROUP x DA_GROUP x TEST)"))
 
         # 2. Top Fail分析表
         if self.li.top_fail_dict:
@@ -428,85 +317,18 @@ class ProcessWidget(QWidget, Ui_Form):
             ])
             # 按失效数量排序
             top_fail_df = top_fail_df.sort_values('FAIL_COUNT', ascending=False)
-
-            ws_top_fail = wb.create_sheet("Top_Fail分析")
-            ws_top_fail['A1'] = "Top Fail分析"
-            ws_top_fail['A1'].font = Font(size=14, bold=True)
-
-            for r in dataframe_to_rows(top_fail_df, index=False, header=True):
-                ws_top_fail.append(r)
-
-            self._format_excel_sheet(ws_top_fail, top_fail_df)
+            sheets.append(ExcelSheet("Top_Fail分析", top_fail_df, title="Top Fail分析"))
 
         # 3. 数据汇总表
         if self.li.select_summary is not None:
-            ws_summary = wb.create_sheet("数据汇总")
-            ws_summary['A1'] = "数据汇总信息"
-            ws_summary['A1'].font = Font(size=14, bold=True)
-
-            for r in dataframe_to_rows(self.li.select_summary, index=False, header=True):
-                ws_summary.append(r)
-
-            self._format_excel_sheet(ws_summary, self.li.select_summary)
+            sheets.append(ExcelSheet("数据汇总", self.li.select_summary.copy(), title="数据汇总信息"))
 
         # 4. 如果有当前表格数据，也导出
         current_data = self.cpk_info_table.data
         if current_data:
-            current_df = pd.DataFrame(current_data)
-            ws_current = wb.create_sheet("当前分析结果")
-            ws_current['A1'] = "当前分析结果"
-            ws_current['A1'].font = Font(size=14, bold=True)
-
-            for r in dataframe_to_rows(current_df, index=False, header=True):
-                ws_current.append(r)
-
-            self._format_excel_sheet(ws_current, current_df)
-
-        # 保存文件
-        wb.save(file_path)
+            sheets.append(ExcelSheet("当前分析结果", pd.DataFrame(current_data), title="当前分析结果"))
 
-    def _format_excel_sheet(self, worksheet, dataframe):
-        """格式化Excel工作表"""
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-        # 设置标题样式
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-
-        # 设置边框
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # 格式化标题行
-        for cell in worksheet[3]:  # 假设数据从第3行开始
-            if cell.value:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal='center')
-                cell.border = thin_border
-
-        # 格式化数据行
-        for row in worksheet.iter_rows(min_row=4, max_row=len(dataframe)+3):
-            for cell in row:
-                cell.border = thin_border
-                cell.alignment = Alignment(horizontal='center')
-
-        # 自动调整列宽
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
+        return sheets
 
     @Slot()
     def on_export_enhanced_report_clicked(self):
@@ -753,28 +575,30 @@ class ProcessWidget(QWidget, Ui_Form):
 
             print(f"生成CPK分布图，有效CPK值: {len(cpk_values)}个")
 
-        plt.figure(figsize=(10, 6))
-        plt.hist(cpk_values, bins=20, alpha=0.7, color='skyblue', edgecolor='black')
-        plt.axvline(x=1.33, color='red', linestyle='--', label='CPK=1.33 (可接受)')
-        plt.axvline(x=1.67, color='orange', linestyle='--', label='CPK=1.67 (良好)')
-        plt.axvline(x=2.0, color='green', linestyle='--', label='CPK=2.0 (优秀)')
-
-        plt.xlabel('CPK值')
-        plt.ylabel('频次')
-        plt.title('制程能力(CPK)分布图')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-
-        # 添加统计信息
-        mean_cpk = np.mean(cpk_values)
-        median_cpk = np.median(cpk_values)
-        plt.text(0.02, 0.98, f'平均CPK: {mean_cpk:.3f}\n中位数CPK: {median_cpk:.3f}\n样本数: {len(cpk_values)}',
-                transform=plt.gca().transAxes, verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-
-        plt.tight_layout()
-        plt.savefig(f"{output_dir}/CPK分布图_{timestamp}.png", dpi=300, bbox_inches='tight')
-        plt.close()
+            plt.figure(figsize=(10, 6))
+            plt.hist(cpk_values, bins=20, alpha=0.7, color='skyblue', edgecolor='black')
+            plt.axvline(x=1.33, color='red', linestyle='--', label='CPK=1.33 (可接受)')
+            plt.axvline(x=1.67, color='orange', linestyle='--', label='CPK=1.67 (良好)')
+            plt.axvline(x=2.0, color='green', linestyle='--', label='CPK=2.0 (优秀)')
+
+            plt.xlabel('CPK值')
+            plt.ylabel('频次')
+            plt.title('制程能力(CPK)分布图')
+            plt.legend()
+            plt.grid(True, alpha=0.3)
+
+            # 添加统计信息
+            mean_cpk = np.mean(cpk_values)
+            median_cpk = np.median(cpk_values)
+            plt.text(0.02, 0.98, f'平均CPK: {mean_cpk:.3f}\n中位数CPK: {median_cpk:.3f}\n样本数: {len(cpk_values)}',
+                    transform=plt.gca().transAxes, verticalalignment='top',
+                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+
+            plt.tight_layout()
+            plt.savefig(f"{output_dir}/CPK分布图_{timestamp}.png", dpi=300, bbox_inches='tight')
+            plt.close()
+        except Exception as e:
+            print(f"生成CPK分布图失败: {e}")
 
     def _generate_cpk_trend_chart(self, capability_data, output_dir, timestamp):
         """生成CPK趋势图"""
@@ -8,30 +8,122 @@
 @Mark    : Summary显示组件
 """
 import os
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Callable
 from PySide2.QtWidgets import QWidget, QVBoxLayout, QTabWidget, QTextEdit
 from PySide2.QtGui import QFont
-from PySide2.QtCore import Qt
+from PySide2.QtCore import Qt, QThread, Signal
 
 from common.li import Li, SummaryCore
-from common.app_variable import DataModule
+from common.app_variable import DataModule, PartFlags, GlobalVariable
 from common.summary_generator import SummaryGenerator
 from common.stdf_interface.stdf_parser import SemiStdfUtils
 from parser_core.stdf_parser_file_write_read import ParserData
 
 
+class SummaryCache:
+    """
+    每个文件的Summary文本缓存, key为(文件ID, PART_FLAG, READ_FAIL, Li.state_key())
+    数据被删除/筛选/改limit或撤销重做后state_key改变, 不会取到旧的文本
+    同时记录summary行的内容, LOT_ID等被修改后缓存失效
+    """
+    _lock = threading.RLock()
+    _cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    @staticmethod
+    def make_key(row, state_key: tuple) -> tuple:
+        return row.get('ID'), str(row.get('PART_FLAG', '')), str(row.get('READ_FAIL', '')), state_key
+
+    @staticmethod
+    def signature(row) -> tuple:
+        return tuple(str(each) for each in row.values)
+
+    @classmethod
+    def get(cls, key: tuple, signature: tuple):
+        with cls._lock:
+            item = cls._cache.get(key)
+            if item is None or item[0] != signature:
+                return None
+            cls._cache.move_to_end(key)
+            return item[1]
+
+    @classmethod
+    def put(cls, key: tuple, signature: tuple, text: str):
+        with cls._lock:
+            cls._cache[key] = (signature, text)
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > GlobalVariable.SUMMARY_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+
+class SummaryJob(QThread):
+    """
+    在子线程中用线程池并行生成Summary文本, 每完成一个Tab就发出 summarySignal(generation, tab_index, text, is_error)
+    cancel后不再开始新的任务, 已经在算的任务算完后丢弃, 不在GUI线程中等待
+    generation 用来丢弃上一次任务中已经发出但还没处理的结果
+    """
+    summarySignal = Signal(int, int, str, bool)
+
+    def __init__(self, generation: int, tasks: List[tuple], parent=None):
+        super(SummaryJob, self).__init__(parent)
+        self.tasks: List[tuple] = tasks  # [(tab_index, func), ...]
+        self.generation = generation
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self) -> None:
+        if not self.tasks:
+            return
+        executor = ThreadPoolExecutor(max_workers=GlobalVariable.SUMMARY_WORKERS)
+        futures = {executor.submit(self._call, func): tab_index for tab_index, func in self.tasks}
+        try:
+            for future in as_completed(futures):
+                if self._cancelled:
+                    for each in futures:
+                        each.cancel()
+                    break
+                text, is_error = future.result()
+                self.summarySignal.emit(self.generation, futures[future], text, is_error)
+        finally:
+            executor.shutdown(wait=True)
+
+    def _call(self, func: Callable[[], str]):
+        if self._cancelled:
+            return "", True
+        try:
+            return func(), False
+        except Exception as e:
+            return str(e), True
+
+
 class SummaryWidget(QWidget):
     """
     Summary显示组件
     使用Tab显示多个Summary：
     - 第一个Tab：综合Summary（所有数据）
     - 后续Tab：每个文件的独立Summary
+    Summary文本在SummaryJob的线程池中生成, 先放占位Tab, 每个文件生成完后填入
+    任务用提交时的数据(df_module), 生成过程中Li的数据被替换也不影响
     """
     
     def __init__(self, li: Li, summary: SummaryCore, parent=None):
         super(SummaryWidget, self).__init__(parent)
         self.li = li
         self.summary = summary
+        self.tab_edits: List[QTextEdit] = []
+        self.tasks: List[tuple] = []
+        self.df_module: DataModule = None
+        self.generation = 0
+        self.job: SummaryJob = None
+        # 取消后还在跑的任务, 结束前保留引用, finished后再释放
+        self.jobs: set = set()
         
         self.init_ui()
     
@@ -56,14 +148,52 @@ class SummaryWidget(QWidget):
             self.add_error_tab("错误", "请先加载STDF数据")
             return
         
-        # 清空现有Tab
+        # 清空现有Tab, 停掉还在跑的任务
+        self.cancel()
         self.tab_widget.clear()
+        self.tab_edits = []
+        self.tasks = []
+        # Li的数据替换时只改DataModule的属性, 这里取出当前的数据帧, 任务只用这一份
+        df_module = self.li.df_module
+        self.df_module = DataModule(prr_df=df_module.prr_df, dtp_df=df_module.dtp_df, ptmd_df=df_module.ptmd_df)
         
         # 1. 生成综合Summary
         self.generate_combined_summary()
         
         # 2. 为每个文件生成独立Summary
         self.generate_individual_summaries()
+
+        # 3. 在后台并行生成
+        if self.tasks:
+            # 先在GUI线程中建好按ID的切片索引, 子线程中的view只读
+            self.df_module.partition()
+            self.generation += 1
+            job = SummaryJob(self.generation, self.tasks)
+            job.summarySignal.connect(self.on_summary_finished)
+            job.finished.connect(self.on_job_finished)
+            self.job = job
+            self.jobs.add(job)
+            job.start()
+
+    def cancel(self):
+        """ 取消还没开始的Summary任务, 已经开始的任务在后台算完后丢弃结果, 不等待 """
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def on_job_finished(self):
+        job = self.sender()
+        self.jobs.discard(job)
+        job.deleteLater()
+
+    def on_summary_finished(self, generation: int, tab_index: int, text: str, is_error: bool):
+        if self.job is None or generation != self.job.generation or tab_index >= len(self.tab_edits):
+            return
+        self.set_tab_text(tab_index, text, is_error)
+
+    def closeEvent(self, event) -> None:
+        self.cancel()
+        super(SummaryWidget, self).closeEvent(event)
     
     def generate_combined_summary(self):
         """生成综合Summary（所有数据）"""
@@ -107,14 +237,12 @@ class SummaryWidget(QWidget):
             }
             
             # 生成Summary文本
-            summary_text = SummaryGenerator.generate_summary_text(
+            df_module = self.df_module
+            self.add_task("综合Summary", lambda: SummaryGenerator.generate_summary_text(
                 combined_info,
                 file_info,
-                self.li.df_module
-            )
-            
-            # 添加到Tab
-            self.add_summary_tab("综合Summary", summary_text)
+                df_module
+            ))
         
         except Exception as e:
             self.add_error_tab("综合Summary", f"生成综合Summary失败: {str(e)}")
@@ -124,25 +252,18 @@ class SummaryWidget(QWidget):
         为每个文件生成独立Summary
         优化：
         1. 直接从summary_df读取静态信息，避免重复读取STDF文件
-        2. 一次性分组prr_df，避免重复筛选
+        2. 通过DataModule.view按ID偏移表取切片，不做分组和筛选拷贝
         """
         try:
             summary_df = self.li.select_summary
 
-            # 优化：一次性按ID分组prr_df，避免重复筛选
-            if self.li.df_module is None or self.li.df_module.prr_df is None:
+            if self.df_module.prr_df is None:
                 self.add_error_tab("独立Summary", "没有可用的PRR数据")
                 return
 
-            # 检查是否有ID列
-            if 'ID' not in self.li.df_module.prr_df.columns:
-                # 如果没有ID列，只能逐个筛选
-                grouped_prr = None
-                grouped_dtp = None
-            else:
-                # 一次性分组，避免重复筛选
-                grouped_prr = self.li.df_module.prr_df.groupby('ID')
-                grouped_dtp = self.li.df_module.dtp_df.groupby('ID') if self.li.df_module.dtp_df is not None and 'ID' in self.li.df_module.dtp_df.columns else None
+            state_key = self.li.state_key()
+            # 删除过DIE时prr_df已经不是完整文件, 不能用解析时保存的Bin计数
+            die_masked = self.li.has_die_mask()
 
             # 按ID遍历每个文件
             for idx, row in summary_df.iterrows():
@@ -182,72 +303,70 @@ class SummaryWidget(QWidget):
                     'BURN_TIM': str(row.get('BURN_TIM', '--------')),
                 }
 
-                # 优化：使用分组结果，避免重复筛选
-                if grouped_prr is not None:
-                    try:
-                        file_prr_df = grouped_prr.get_group(file_id)
-                        file_dtp_df = grouped_dtp.get_group(file_id) if grouped_dtp is not None else None
-                        file_df_module = DataModule(
-                            prr_df=file_prr_df,
-                            dtp_df=file_dtp_df,
-                            ptmd_df=None
-                        )
-                    except KeyError:
-                        # 如果分组中没有该ID，使用传统筛选方式
-                        file_df_module = self.filter_data_by_id(file_id)
-                else:
-                    # 没有ID列，使用传统筛选方式
-                    file_df_module = self.filter_data_by_id(file_id)
-                
-                if file_df_module is None:
-                    self.add_error_tab(file_name, f"无法加载文件 {file_name} 的数据")
+                key, signature = SummaryCache.make_key(row, state_key), SummaryCache.signature(row)
+                summary_text = SummaryCache.get(key, signature)
+                if summary_text is not None:
+                    self.add_summary_tab(file_name, summary_text)
                     continue
-                
-                # 生成Summary文本
-                summary_text = SummaryGenerator.generate_summary_text(
-                    summary_info,
-                    file_info,
-                    file_df_module
-                )
-                
-                # 添加到Tab
-                self.add_summary_tab(file_name, summary_text)
+
+                self.add_task(file_name, self.summary_task(
+                    self.df_module, file_id, row, summary_info, file_info, key, signature, die_masked
+                ))
         
         except Exception as e:
             self.add_error_tab("错误", f"生成独立Summary失败: {str(e)}")
     
-    def filter_data_by_id(self, file_id: int) -> DataModule:
+    def summary_task(self, df_module: DataModule, file_id: int, row, summary_info: Dict, file_info: Dict,
+                     key: tuple, signature: tuple, die_masked: bool = False):
+        """
+        :param df_module: 提交任务时的数据, 和key中的state_key对应
+        :param die_masked: Li.has_die_mask(), 数据中的DIE被删除过
+        :return: 在线程池中执行的函数, 生成一个文件的Summary文本并放入缓存
+        """
+        file_name = file_info['FILE_NAME']
+        hdf5_path = row.get('HDF5_PATH')
+        # 完整文件(ALL并且READ_FAIL, 没有删除过DIE)时Bin统计直接用解析时保存的Bin计数
+        full_file = int(row.get('PART_FLAG', -1)) == PartFlags.ALL and int(row.get('READ_FAIL', 0)) \
+            and hdf5_path and not die_masked
+
+        def task() -> str:
+            file_df_module = self.filter_data_by_id(df_module, file_id)
+            if file_df_module is None:
+                raise ValueError(f"无法加载文件 {file_name} 的数据")
+            bin_cube = ParserData.load_bin_cube(hdf5_path) if full_file else None
+            summary_text = SummaryGenerator.generate_summary_text(
+                summary_info,
+                file_info,
+                file_df_module,
+                bin_cube
+            )
+            SummaryCache.put(key, signature, summary_text)
+            return summary_text
+
+        return task
+
+    def add_task(self, tab_name: str, func: Callable[[], str]):
+        """ 先放一个占位的Tab, 生成完后再填入 """
+        self.add_summary_tab(tab_name, "生成中...")
+        self.tasks.append((len(self.tab_edits) - 1, func))
+
+    @staticmethod
+    def filter_data_by_id(df_module: DataModule, file_id: int) -> DataModule:
         """
         根据文件ID筛选数据
+        :param df_module: 提交任务时的数据
         :param file_id: 文件ID
         :return: 筛选后的DataModule
         """
         try:
-            if self.li.df_module is None:
+            if df_module is None:
                 return None
             
-            # 筛选PRR数据
-            prr_df = self.li.df_module.prr_df
-            if 'ID' in prr_df.columns:
-                filtered_prr = prr_df[prr_df['ID'] == file_id].copy()
-            else:
-                filtered_prr = prr_df.copy()
-            
-            # 筛选DTP数据
-            dtp_df = self.li.df_module.dtp_df
-            if 'ID' in dtp_df.columns:
-                filtered_dtp = dtp_df[dtp_df['ID'] == file_id].copy()
-            else:
-                filtered_dtp = dtp_df.copy()
-            
-            # 筛选PTMD数据（通常不需要按ID筛选）
-            filtered_ptmd = self.li.df_module.ptmd_df.copy()
-            
-            return DataModule(
-                prr_df=filtered_prr,
-                dtp_df=filtered_dtp,
-                ptmd_df=filtered_ptmd
-            )
+            if 'ID' not in df_module.prr_df.columns:
+                return df_module
+
+            # prr_df为不复制数据的切片, 不要原地修改
+            return df_module.view(file_id)
         
         except Exception as e:
             print(f"Error filtering data by ID {file_id}: {e}")
@@ -261,22 +380,14 @@ class SummaryWidget(QWidget):
         """
         text_edit = QTextEdit()
         text_edit.setReadOnly(True)
-        text_edit.setPlainText(summary_text)
         
         # 设置等宽字体以保持对齐
         font = QFont("Courier New", 9)
         text_edit.setFont(font)
         
-        # 设置样式
-        text_edit.setStyleSheet("""
-            QTextEdit {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #cccccc;
-            }
-        """)
-        
+        self.tab_edits.append(text_edit)
         self.tab_widget.addTab(text_edit, tab_name)
+        self.set_tab_text(len(self.tab_edits) - 1, summary_text, False)
     
     def add_error_tab(self, tab_name: str, error_message: str):
         """
@@ -286,14 +397,29 @@ class SummaryWidget(QWidget):
         """
         text_edit = QTextEdit()
         text_edit.setReadOnly(True)
-        text_edit.setPlainText(f"错误: {error_message}")
+        self.tab_edits.append(text_edit)
+        self.tab_widget.addTab(text_edit, tab_name)
+        self.set_tab_text(len(self.tab_edits) - 1, error_message, True)
+
+    def set_tab_text(self, tab_index: int, text: str, is_error: bool):
+        text_edit = self.tab_edits[tab_index]
+        if is_error:
+            text_edit.setPlainText(f"错误: {text}")
+            text_edit.setStyleSheet("""
+                QTextEdit {
+                    background-color: #fff5f5;
+                    color: #cc0000;
+                    border: 1px solid #ff0000;
+                }
+            """)
+            return
+        text_edit.setPlainText(text)
+        
+        # 设置样式
         text_edit.setStyleSheet("""
             QTextEdit {
-                background-color: #fff5f5;
-                color: #cc0000;
-                border: 1px solid #ff0000;
+                background-color: #ffffff;
+                color: #000000;
+                border: 1px solid #cccccc;
             }
         """)
-        
-        self.tab_widget.addTab(text_edit, tab_name)
-
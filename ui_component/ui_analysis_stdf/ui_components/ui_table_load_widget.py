@@ -7,15 +7,16 @@
 @Remark  : 
 """
 from PySide2.QtCore import Slot, Qt, QTimer
-from PySide2.QtGui import QColor, QFont
-from PySide2.QtWidgets import QWidget, QAbstractItemView, QTableWidget, QMessageBox
+from PySide2.QtGui import QFont
+from PySide2.QtWidgets import QWidget, QAbstractItemView, QMessageBox
 
 from common.app_variable import GlobalVariable
 from common.li import Li, SummaryCore
 from ui_component.ui_analysis_stdf.ui_designer.ui_table_load import Ui_Form as TableLoadForm
 from ui_component.ui_common.ui_utils import QTableUtils, QWidgetUtils
-from ui_component.ui_module.table_module import PauseTableWidget
+from ui_component.ui_module.table_model import CapabilityTableView
 
+import numpy as np
 import pyqtgraph as pg
 
 pg.setConfigOptions(antialias=True)
@@ -38,7 +39,7 @@ class TableLoadWidget(QWidget, TableLoadForm):
         self.li = li
         self.summary = summary
         self.setWindowTitle("Data TEST NO&ITEM Analysis")
-        self.cpk_info_table = PauseTableWidget(self)  # type:QTableWidget
+        self.cpk_info_table = CapabilityTableView(self)
         self.cpk_info_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.cpk_info_table.setEditable(True)
         # self.cpk_info_table.setFont(QFont("", 8))
@@ -57,6 +58,15 @@ class TableLoadWidget(QWidget, TableLoadForm):
         self.btn_clear_table.clicked.connect(self.clear_table_data)
         self.horizontalLayout_2.insertWidget(3, self.btn_clear_table)
 
+        # 撤销/重做 limit变更、数据删除、测项筛选
+        self.btn_undo = QPushButton("撤销")
+        self.btn_undo.clicked.connect(self.on_btn_undo_clicked)
+        self.horizontalLayout_2.insertWidget(4, self.btn_undo)
+        self.btn_redo = QPushButton("重做")
+        self.btn_redo.clicked.connect(self.on_btn_redo_clicked)
+        self.horizontalLayout_2.insertWidget(5, self.btn_redo)
+        self.update_undo_buttons()
+
     def init_plot(self):
         self.gw.setMaximumWidth(20)
         self.plot.setMouseEnabled(x=False, y=False)
@@ -77,10 +87,12 @@ class TableLoadWidget(QWidget, TableLoadForm):
             return
         self.cpk_info_table.setData(self.li.capability_key_list)
         self.cpk_info_table.sortByColumn(GlobalVariable.TEST_ID_COLUMN, Qt.SortOrder.AscendingOrder)
+        self.plot_scrollbar()
         QWidgetUtils.widget_change_color(widget=self, background_color="#3316C6")
 
         # 数据加载完成后启用按钮
         self.enable_buttons(True)
+        self.update_undo_buttons()
 
     def plot_scrollbar(self):
         """
@@ -89,42 +101,28 @@ class TableLoadWidget(QWidget, TableLoadForm):
         QTimer.singleShot(50, self.plot_points)
 
     def plot_points(self):
+        """
+        标色由Model按列数组完成, 这里只画右边的概览点
+        """
         self.plot.clear()
-        length = self.cpk_info_table.rowCount()
+        model = self.cpk_info_table.table_model
+        length = model.rowCount()
         self.plot.setYRange(0, length)
-        x, y, z, cpk_l, top_fail_l, reject_l = [], [], [], [], [], []
-        
-        # 动态获取列索引
-        cpk_col = self.cpk_info_table.get_column_index(GlobalVariable.CPK_COLUMN_NAME)
-        top_fail_col = self.cpk_info_table.get_column_index(GlobalVariable.TOP_FAIL_COLUMN_NAME)
-        reject_col = self.cpk_info_table.get_column_index(GlobalVariable.REJECT_COLUMN_NAME)
-        
-        for index in range(length):
-            cpk = float(self.cpk_info_table.item(index, cpk_col).text())
-            top_fail = float(self.cpk_info_table.item(index, top_fail_col).text())
-            reject = float(self.cpk_info_table.item(index, reject_col).text())
-            if GlobalVariable.CPK_LO < cpk < GlobalVariable.CPK_HI:
-                x.append(0)
-                cpk_l.append(length - index)
-                item = self.cpk_info_table.item(index, cpk_col)
-                item.setBackground(QColor(250, 194, 5, 50))
-            if top_fail > GlobalVariable.TOP_FAIL_LO:
-                y.append(1)
-                top_fail_l.append(length - index)
-                item = self.cpk_info_table.item(index, top_fail_col)
-                item.setBackground(QColor(217, 83, 25, 150))
-            if reject > GlobalVariable.REJECT_LO:
-                z.append(2)
-                reject_l.append(length - index)
-                item = self.cpk_info_table.item(index, reject_col)
-                item.setBackground(QColor(217, 83, 25, 30))
-
+        if length == 0:
+            return
+        position = length - np.arange(length)
         plot = pg.ScatterPlotItem(symbol='s', size=3, pen=None)
-        plot.addPoints(x, cpk_l, pen=(250, 194, 5))
-        plot.addPoints(y, top_fail_l, pen=(217, 83, 25))
-        plot.addPoints(z, reject_l, pen=(217, 83, 25))
+        for x, name, pen in (
+                (0, GlobalVariable.CPK_COLUMN_NAME, (250, 194, 5)),
+                (1, GlobalVariable.TOP_FAIL_COLUMN_NAME, (217, 83, 25)),
+                (2, GlobalVariable.REJECT_COLUMN_NAME, (217, 83, 25)),
+        ):
+            highlight = model.highlight.get(model.column_index(name))
+            if highlight is None:
+                continue
+            y = position[highlight[0][model.rows]]
+            plot.addPoints(np.full(len(y), x), y, pen=pen)
         self.plot.addItem(plot)
-        self.cpk_info_table.resizeRowsToContents()
 
     @Slot(bool)
     def on_checkBox_clicked(self, e):
@@ -224,31 +222,41 @@ class TableLoadWidget(QWidget, TableLoadForm):
             self.cal_table()
             self.li.QStatusMessage.emit(f"分析范围已限制为{len(test_ids)}个测试项目")
 
-    def cpk_table_row_hide(self, hide: bool):
-        for i in range(self.cpk_info_table.rowCount()):
-            self.cpk_info_table.setRowHidden(i, hide)
+    @Slot()
+    def on_btn_undo_clicked(self):
+        if self.li.undo():
+            self.cal_table()
+            self.update_operation_buttons()
+
+    @Slot()
+    def on_btn_redo_clicked(self):
+        if self.li.redo():
+            self.cal_table()
+            self.update_operation_buttons()
+
+    def update_operation_buttons(self):
+        """
+        撤销/重做后, 按照当前状态恢复第二步和第三步按钮
+        """
+        limit_changed = self.li._operation_state == 'limit_changed'
+        self.pushButton_2.setEnabled(limit_changed)
+        self.pushButton_4.setEnabled(limit_changed)
+
+    def update_undo_buttons(self):
+        self.btn_undo.setEnabled(self.li.can_undo())
+        self.btn_redo.setEnabled(self.li.can_redo())
 
     @Slot()
     def on_lineEdit_returnPressed(self):
         """
-        若可以查询到, 先隐藏所有行
+        按TEST_NUM和TEST_TXT通配符筛选, 查询不到时显示所有行
         """
-        regex = self.lineEdit.text()
-        regex = "*{}*".format(regex)
-        items = self.cpk_info_table.findItems(regex, Qt.MatchWildcard)
-        if len(items) == 0:
+        count = self.cpk_info_table.set_filter(
+            self.lineEdit.text(), [GlobalVariable.TEST_NUM_COLUMN_NAME, GlobalVariable.TEST_TXT_COLUMN_NAME]
+        )
+        if count == 0:
             self.li.QStatusMessage.emit("无法根据筛选条件查询到匹配行@!显示所有行.")
-            self.cpk_table_row_hide(False)
-            return
-        self.cpk_table_row_hide(True)
-        # 动态获取列索引
-        test_num_col = self.cpk_info_table.get_column_index(GlobalVariable.TEST_NUM_COLUMN_NAME)
-        test_txt_col = self.cpk_info_table.get_column_index(GlobalVariable.TEST_TXT_COLUMN_NAME)
-        
-        for each in items:
-            if each.column() not in {test_num_col, test_txt_col}:
-                continue
-            self.cpk_info_table.setRowHidden(each.row(), False)
+        self.plot_scrollbar()
 
     def message_show(self, text: str) -> bool:
         res = QMessageBox.question(self, '待确认', text,
@@ -291,6 +299,7 @@ class TableLoadWidget(QWidget, TableLoadForm):
         self.cpk_info_table.clear()
         self.plot.clear()
         self.enable_buttons(False)
+        self.update_undo_buttons()
         from ui_component.ui_common.my_text_browser import Print
         Print.info("已清空Data TEST NO&ITEM Analysis表格")
 
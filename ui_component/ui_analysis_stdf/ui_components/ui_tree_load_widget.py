@@ -6,24 +6,37 @@
 @File    : ui_tree_load_widget.py
 @Remark  :
 """
+import traceback
 from typing import List
 
 from PySide2.QtCore import Slot, QThread, Signal
-from PySide2.QtWidgets import QWidget, QTreeWidgetItem, QInputDialog
+from PySide2.QtWidgets import QWidget, QInputDialog
 
+from common.app_variable import DatatType
 from common.li import SummaryCore, Li
+from common.li_pipeline import LiPipeline, CalculationCancelled
 from ui_component.ui_analysis_stdf.ui_designer.ui_tree_load import Ui_Form as TreeLoadForm
 from ui_component.ui_common.my_text_browser import Print
-from ui_component.ui_common.ui_utils import TreeUtils, QWidgetUtils
+from ui_component.ui_app_variable import UiGlobalVariable
+from ui_component.ui_common.ui_utils import QWidgetUtils
 
 
 class QthCalculation(QThread):
+    """
+    在工作线程中运行LiPipeline, requestInterruption()后在下一次报告进度时中断
+    status: finished / cancelled / error
+    """
     li = None
     summary = None
     ids = None
-    eventSignal = Signal(int)
+    pipeline: LiPipeline = None
+    status: str = None
+    _last_event: tuple = None
+    eventSignal = Signal(int, object, object)  # 阶段序号, 已完成, 总数
 
     def set_li(self, li: Li):
+        if self.li is not li:
+            self.pipeline = LiPipeline(li)
         self.li = li
 
     def set_summary(self, summary: SummaryCore):
@@ -32,33 +45,37 @@ class QthCalculation(QThread):
     def set_ids(self, ids: List[int]):
         self.ids = ids
 
-    def event_send(self, i: int):
-        self.eventSignal.emit(i)
+    def event_send(self, index: int, done, total):
+        if self.isInterruptionRequested():
+            raise CalculationCancelled()
+        # 同一阶段的进度变化不到千分之一时不发信号
+        permille = int(done / total * 1000) if total else 0
+        if (index, permille) == self._last_event:
+            return
+        self._last_event = (index, permille)
+        self.eventSignal.emit(index, done, total)
 
     def run(self) -> None:
-        self.event_send(1)
-        self.li.set_data(*self.summary.load_select_data(
-            self.ids, self.parent().checkBox.checkState(), self.parent().spinBox.value()
-        ))
-        self.event_send(2)
-        self.li.concat()
-        
-        # 根据加载类型过滤数据
+        self._last_event = None
+        # 根据加载类型过滤数据, 'PF' 或 None 不过滤，加载所有数据
+        test_types = None
         if hasattr(self.parent(), '_load_type') and self.parent()._load_type:
-            from common.app_variable import DatatType
             if self.parent()._load_type == 'P':
-                self.li.filter_by_test_type([DatatType.PTR, DatatType.MPR])
+                test_types = [DatatType.PTR, DatatType.MPR]
             elif self.parent()._load_type == 'F':
-                self.li.filter_by_test_type([DatatType.FTR])
-            # 'PF' 或 None 不过滤，加载所有数据
-        
-        self.event_send(3)
-        self.li.calculation_top_fail()
-        self.event_send(4)
-        self.li.calculation_capability()
-        self.event_send(5)
-        self.li.background_generation_data_use_to_chart_and_to_save_csv()
-        self.event_send(6)
+                test_types = [DatatType.FTR]
+        try:
+            self.pipeline.run(
+                self.summary, self.ids, test_types,
+                self.parent().checkBox.checkState(), self.parent().spinBox.value(), progress=self.event_send,
+            )
+        except CalculationCancelled:
+            self.status = "cancelled"
+        except Exception:
+            traceback.print_exc()
+            self.status = "error"
+        else:
+            self.status = "finished"
 
 
 class TreeLoadWidget(QWidget, TreeLoadForm):
@@ -66,6 +83,7 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
     DataTree & Limit List
     """
     parent = None
+    STAGE_STEPS = 1000  # 进度条上每个阶段的刻度数
 
     def __init__(self, li: Li, summary: SummaryCore, parent=None):
         super(TreeLoadWidget, self).__init__(parent)
@@ -74,11 +92,11 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
         self.li = li
         self.summary = summary
         self.th = QthCalculation(self)
-        self.th.eventSignal.connect(lambda x: self.progressBar.setValue(x))
+        self.th.eventSignal.connect(self.th_progress)
         self.th.set_li(self.li)
         self.th.set_summary(self.summary)
-        self.th.finished.connect(self.li.update)
-        self.progressBar.setMaximum(6)
+        self.th.finished.connect(self.th_finished)
+        self.progressBar.setMaximum(len(LiPipeline.STAGES) * self.STAGE_STEPS)
         self.pushButton_2.setEnabled(True)
         
         # 添加P和F数据载入按钮
@@ -95,14 +113,16 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
         self.btn_clear_tree = QPushButton("清空")
         self.btn_clear_tree.clicked.connect(self.clear_tree_data)
         self.horizontalLayout.insertWidget(4, self.btn_clear_tree)
+
+        # 取消正在运行的载入计算
+        self.btn_cancel_load = QPushButton("取消载入")
+        self.btn_cancel_load.setEnabled(False)
+        self.btn_cancel_load.clicked.connect(self.cancel_load)
+        self.horizontalLayout.insertWidget(5, self.btn_cancel_load)
         
         # 用于标记当前加载类型
         self._load_type = None
 
-    @Slot(QTreeWidgetItem)
-    def on_treeWidget_itemChanged(self, e: QTreeWidgetItem):
-        TreeUtils.tree_item_change(self.treeWidget, e)
-
     @Slot()
     def on_pushButton_pressed(self):
         """
@@ -137,21 +157,50 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
             return Print.warning("未载入数据到数据空间!")
         self.th.set_summary(self.summary)
         self.th.set_li(self.li)
-        ids = TreeUtils.get_tree_ids(self.treeWidget)
+        ids = self.treeWidget.checked_ids()
         if self.li is None:
             return Print.warning("未载入Li!")
         if not ids:
             return Print.warning("未选择数据!")
         self.progressBar.setValue(0)
         self.th.set_ids(ids)
+        self.btn_cancel_load.setEnabled(True)
         self.th.start()
 
+    def cancel_load(self):
+        if self.th.isRunning():
+            self.th.requestInterruption()
+
+    def th_progress(self, index: int, done, total):
+        """
+        进度条按阶段分段, 文字显示当前阶段的 已完成/总数 和单位
+        """
+        _, text, unit = LiPipeline.STAGES[index]
+        ratio = done / total if total else 0
+        self.progressBar.setValue(index * self.STAGE_STEPS + int(ratio * self.STAGE_STEPS))
+        if unit == "字节":
+            done, total, unit = round(done / 1024 / 1024, 1), round(total / 1024 / 1024, 1), "MB"
+        self.progressBar.setFormat("{}: {}/{} {}".format(text, done, total, unit))
+
+    def th_finished(self):
+        self.btn_cancel_load.setEnabled(False)
+        self.progressBar.setFormat("%p%")
+        if self.th.status == "cancelled":
+            self.progressBar.setValue(0)
+            return Print.warning("已取消载入, 数据空间中仍为之前的数据")
+        if self.th.status == "error":
+            self.progressBar.setValue(0)
+            return Print.error("数据载入计算失败, 数据空间中仍为之前的数据")
+        self.progressBar.setValue(self.progressBar.maximum())
+        Print.info("载入完成: {}".format(self.th.pipeline.timing_text()))
+        self.li.update()
+
     @Slot()
     def on_pushButton_2_pressed(self):
         """
         Merge多份数据成为一份自定义的数据
         """
-        ids = TreeUtils.get_tree_ids(self.treeWidget)
+        ids = self.treeWidget.checked_ids()
         if not ids:
             return Print.warning("未载入数据到数据空间, 无法解析!")
         remark, _ = QInputDialog.getText(self, "输入自定义LOT_ID", "请填写自定义的LOT_ID用于整合多个LOT成为一个数据;自定义输入的长度不能<2!")
@@ -159,8 +208,7 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
         if len(remark) < 2:
             return Print.warning("自定义输入的长度不能<2!")
         self.summary.add_custom_node(ids, remark)
-        TreeUtils.set_data_to_tree(self.treeWidget, self.summary.get_summary_tree(), True)
-        self.treeWidget.expandAll()
+        self.update_tree()
 
     def clear_tree_data(self):
         """
@@ -173,6 +221,13 @@ class TreeLoadWidget(QWidget, TreeLoadForm):
     def set_tree(self):
         if not self.summary.ready:
             return Print.warning("数据解析未成功的!")
-        TreeUtils.set_data_to_tree(self.treeWidget, self.summary.get_summary_tree(), True)
-        self.treeWidget.expandAll()
+        self.update_tree()
         QWidgetUtils.widget_change_color(widget=self, background_color="#3316C6")
+
+    def update_tree(self):
+        """
+        LOT节点一次生成, 文件节点在展开时才生成; 文件不多时和原来一样全部展开
+        """
+        self.treeWidget.set_summary(self.summary.summary_df, *self.summary.get_summary_lot(), True)
+        if len(self.summary.summary_df) <= UiGlobalVariable.TREE_EXPAND_ALL_QTY:
+            self.treeWidget.expandAll()
@@ -12,7 +12,7 @@ from PySide2.QtCore import *
 from PySide2.QtGui import *
 from PySide2.QtWidgets import *
 
-from ui_component.ui_module.table_module import QtTableWidget
+from ui_component.ui_module.table_model import FileTableView
 
 
 class Ui_Form(object):
@@ -24,7 +24,7 @@ class Ui_Form(object):
         self.verticalLayout.setObjectName(u"verticalLayout")
         self.gridLayout_2 = QGridLayout()
         self.gridLayout_2.setObjectName(u"gridLayout_2")
-        self.tableWidget = QtTableWidget(Form)
+        self.tableWidget = FileTableView(Form)
         self.tableWidget.setObjectName(u"tableWidget")
 
         self.gridLayout_2.addWidget(self.tableWidget, 0, 0, 1, 1)
@@ -70,6 +70,14 @@ class Ui_MainWindow(object):
         icon9 = QIcon()
         icon9.addFile(u":/pyqt/source/images/lc_dbformrename.png", QSize(), QIcon.Normal, QIcon.Off)
         self.action_summary.setIcon(icon9)
+        self.action_qt_bin_pareto = QAction(MainWindow)
+        self.action_qt_bin_pareto.setObjectName(u"action_qt_bin_pareto")
+        icon10 = QIcon()
+        icon10.addFile(u":/pyqt/source/images/lc_drawchart.png", QSize(), QIcon.Normal, QIcon.Off)
+        self.action_qt_bin_pareto.setIcon(icon10)
+        self.action_processing_report = QAction(MainWindow)
+        self.action_processing_report.setObjectName(u"action_processing_report")
+        self.action_processing_report.setIcon(icon9)
         self.centralwidget = QWidget(MainWindow)
         self.centralwidget.setObjectName(u"centralwidget")
         MainWindow.setCentralWidget(self.centralwidget)
@@ -89,10 +97,13 @@ class Ui_MainWindow(object):
         self.toolBar.addSeparator()
         self.toolBar.addAction(self.action_limit)
         self.toolBar.addSeparator()
+        self.toolBar.addAction(self.action_processing_report)
+        self.toolBar.addSeparator()
         self.toolBar.addAction(self.action_qt_scatter)
         self.toolBar.addAction(self.action_qt_distribution_trans)
         self.toolBar.addAction(self.action_qt_mapping)
         self.toolBar.addAction(self.action_qt_visual_map)
+        self.toolBar.addAction(self.action_qt_bin_pareto)
         self.toolBar.addSeparator()
         self.toolBar.addAction(self.action_summary)
         self.toolBar.addSeparator()
@@ -137,10 +148,18 @@ class Ui_MainWindow(object):
         self.action_qt_mapping.setText(QCoreApplication.translate("MainWindow", u"mapping", None))
 #if QT_CONFIG(tooltip)
         self.action_qt_mapping.setToolTip(QCoreApplication.translate("MainWindow", u"Mapping\u56fe", None))
+#endif // QT_CONFIG(tooltip)
+        self.action_qt_bin_pareto.setText(QCoreApplication.translate("MainWindow", u"bin_pareto", None))
+#if QT_CONFIG(tooltip)
+        self.action_qt_bin_pareto.setToolTip(QCoreApplication.translate("MainWindow", u"Bin Pareto\u56fe", None))
 #endif // QT_CONFIG(tooltip)
         self.action_summary.setText(QCoreApplication.translate("MainWindow", u"Summary", None))
 #if QT_CONFIG(tooltip)
         self.action_summary.setToolTip(QCoreApplication.translate("MainWindow", u"\u751f\u6210Summary\u62a5\u544a", None))
+#endif // QT_CONFIG(tooltip)
+        self.action_processing_report.setText(QCoreApplication.translate("MainWindow", u"\u5236\u7a0b\u80fd\u529b\u62a5\u544a", None))
+#if QT_CONFIG(tooltip)
+        self.action_processing_report.setToolTip(QCoreApplication.translate("MainWindow", u"\u5236\u7a0b\u80fd\u529b\u62a5\u544a", None))
 #endif // QT_CONFIG(tooltip)
         self.toolBar.setWindowTitle(QCoreApplication.translate("MainWindow", u"toolBar", None))
     # retranslateUi
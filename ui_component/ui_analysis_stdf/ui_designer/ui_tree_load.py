@@ -12,6 +12,8 @@ from PySide2.QtCore import *
 from PySide2.QtGui import *
 from PySide2.QtWidgets import *
 
+from ui_component.ui_module.tree_model import LotTreeView
+
 
 class Ui_Form(object):
     def setupUi(self, Form):
@@ -22,10 +24,7 @@ class Ui_Form(object):
         self.verticalLayout.setObjectName(u"verticalLayout")
         self.horizontalLayout_2 = QHBoxLayout()
         self.horizontalLayout_2.setObjectName(u"horizontalLayout_2")
-        self.treeWidget = QTreeWidget(Form)
-        __qtreewidgetitem = QTreeWidgetItem()
-        __qtreewidgetitem.setText(0, u"1");
-        self.treeWidget.setHeaderItem(__qtreewidgetitem)
+        self.treeWidget = LotTreeView(Form)
         self.treeWidget.setObjectName(u"treeWidget")
 
         self.horizontalLayout_2.addWidget(self.treeWidget)
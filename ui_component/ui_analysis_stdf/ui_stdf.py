@@ -10,6 +10,7 @@
 import math
 import sys
 import datetime as dt
+from functools import partial
 from typing import Union, List
 from pydoc import help
 
@@ -28,6 +29,9 @@ from ui_component.ui_analysis_stdf.ui_components.ui_data_group import DataGroupW
 from ui_component.ui_common.ui_console import ConsoleWidget
 from ui_component.ui_analysis_stdf.ui_designer.ui_home_load import Ui_MainWindow
 from ui_component.ui_common.ui_utils import QTableUtils
+from ui_component.ui_common.ui_export_job import ExportScheduler
+from report_core.export_writer import ExportWriter
+from report_core.openxl_utils.stream_writer import StreamExcel, ExcelSheet
 from ui_component.ui_analysis_stdf.ui_components.ui_file_load_widget import FileLoadWidget  # 文件选取
 from ui_component.ui_analysis_stdf.ui_components.ui_tree_load_widget import TreeLoadWidget  # 载入的数据选取
 from ui_component.ui_analysis_stdf.ui_components.ui_table_load_widget import TableLoadWidget  # 测试项选取
@@ -181,7 +185,7 @@ class StdfLoadUi(QMainWindow, Ui_MainWindow):
             self,
             "保存数据为CSV文件",
             f"STDF_Data_{self.space_nm}.csv",
-            "CSV Files (*.csv);;Excel Files (*.xlsx)"
+            "CSV Files (*.csv);;Excel Files (*.xlsx);;Parquet Files (*.parquet)"
         )
 
         if not file_path:
@@ -191,113 +195,94 @@ class StdfLoadUi(QMainWindow, Ui_MainWindow):
             # 根据文件扩展名决定保存格式
             if file_path.endswith('.xlsx'):
                 self.save_data_to_excel(file_path)
+            elif file_path.endswith('.parquet'):
+                self.save_data_to_parquet(file_path)
             else:
                 self.save_data_to_csv(file_path)
 
         except Exception as e:
             QMessageBox.critical(self, "保存失败", f"数据保存失败: {str(e)}")
 
+    def export_submit(self, title: str, func, file_path: str):
+        """ 放入后台导出队列, 完成或失败后在状态栏提示 """
+        ExportScheduler.instance().submit(
+            "{}: {}".format(self.space_nm, title), func, file_path,
+            on_finished=lambda: self.mdi_space_message_emit(f"{title}已保存: {file_path}"),
+            on_error=lambda error: self.mdi_space_message_emit(f"{title}保存失败: {error}"),
+        )
+
+    def raw_data_sheet(self, max_rows: int = None) -> Union[ExcelSheet, None]:
+        """ 原始测试数据, 列顺序和表头在CSV/Excel/Parquet导出中一致 """
+        if not self.li.to_chart_csv_data or self.li.to_chart_csv_data.df is None:
+            return None
+        return StreamExcel.raw_data_sheet(self.li.to_chart_csv_data.df, self.li.df_module.ptmd_df, max_rows=max_rows)
+
     def save_data_to_csv(self, file_path):
-        """保存数据到CSV文件"""
+        """
+        保存数据到CSV文件
+        每个文件一个后台导出任务, 分块写入
+        """
         # 保存制程能力数据
         if self.li.capability_key_list:
             capability_df = pd.DataFrame(self.li.capability_key_list)
             capability_path = file_path.replace('.csv', '_capability.csv')
-            capability_df.to_csv(capability_path, encoding='utf-8-sig', index=False)
-            self.mdi_space_message_emit(f"制程能力数据已保存: {capability_path}")
+            self.export_submit("制程能力数据", partial(ExportWriter.csv, capability_path, capability_df), capability_path)
 
         # 保存原始测试数据
-        if self.li.to_chart_csv_data and self.li.to_chart_csv_data.df is not None:
+        sheet = self.raw_data_sheet()
+        if sheet is not None:
             test_data_path = file_path.replace('.csv', '_test_data.csv')
+            self.export_submit("测试数据", partial(
+                ExportWriter.csv, test_data_path, sheet.df, header=sheet.header, index=True
+            ), test_data_path)
 
-            # --- 方案二修复版：处理混合类型列名并排序 ---
-            df_raw = self.li.to_chart_csv_data.df
-
-            # 1. 分离TEST_ID列（整数）和元数据列（字符串）
-            test_id_columns = [col for col in df_raw.columns if isinstance(col, int)]
-            meta_columns = [col for col in df_raw.columns if not isinstance(col, int)]
-
-            # 2. 对TEST_ID列进行排序
-            sorted_test_ids = sorted(test_id_columns)
-
-            # 3. 合并列顺序（元数据列在前）
-            final_column_order = meta_columns + sorted_test_ids
-            df_to_save = df_raw[final_column_order]
-
-            # 4. 创建 TEST_ID -> TEST_NUM_TEST_TXT 的映射
-            name_map = {
-                row.TEST_ID: f"{row.TEST_NUM}_{row.TEST_TXT}"
-                for row in self.li.df_module.ptmd_df.itertuples()
-            }
+        # 保存汇总信息
+        if self.li.select_summary is not None:
+            summary_path = file_path.replace('.csv', '_summary.csv')
+            # 复制一份给后台线程, 之后载入新数据时GUI线程会改动select_summary
+            self.export_submit(
+                "汇总信息", partial(ExportWriter.csv, summary_path, self.li.select_summary.copy()), summary_path
+            )
 
-            # 5. 生成与最终DataFrame列顺序一致的描述性表头列表
-            header_list = [name_map.get(col, str(col)) for col in df_to_save.columns]
+    def save_data_to_excel(self, file_path):
+        """
+        保存数据到Excel文件
+        用write_only流式写入, 在后台导出队列中执行
+        """
+        sheets = []
+        # 保存制程能力数据
+        if self.li.capability_key_list:
+            sheets.append(ExcelSheet('制程能力', pd.DataFrame(self.li.capability_key_list)))
 
-            # 6. 导出CSV
-            df_to_save.to_csv(test_data_path, header=header_list, encoding='utf-8-sig')
-            self.mdi_space_message_emit(f"测试数据已保存: {test_data_path}")
+        # 保存测试数据, 限制数据量，避免Excel文件过大
+        sheet = self.raw_data_sheet(max_rows=200000)
+        if sheet is not None:
+            if len(self.li.to_chart_csv_data.df) > 200000:
+                self.mdi_space_message_emit("测试数据量较大，仅保存前20万行")
+            sheets.append(sheet)
 
         # 保存汇总信息
         if self.li.select_summary is not None:
-            summary_path = file_path.replace('.csv', '_summary.csv')
-            self.li.select_summary.to_csv(summary_path, encoding='utf-8-sig', index=False)
-            self.mdi_space_message_emit(f"汇总信息已保存: {summary_path}")
+            sheets.append(ExcelSheet('汇总信息', self.li.select_summary.copy()))
 
-    def save_data_to_excel(self, file_path):
-        """保存数据到Excel文件"""
-        import pandas as pd
-
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            # 保存制程能力数据
-            if self.li.capability_key_list:
-                capability_df = pd.DataFrame(self.li.capability_key_list)
-                capability_df.to_excel(writer, sheet_name='制程能力', index=False)
-
-            # 保存测试数据
-            if self.li.to_chart_csv_data and self.li.to_chart_csv_data.df is not None:
-                # 限制数据量，避免Excel文件过大
-                df_raw = self.li.to_chart_csv_data.df
-                if len(df_raw) > 200000:  # 如果数据量太大，只保存前20万行
-                    df_raw = df_raw.head(200000)
-                    self.mdi_space_message_emit("测试数据量较大，仅保存前20万行")
-
-                # --- 与CSV导出相同的排序逻辑 ---
-                # 1. 分离TEST_ID列（整数）和元数据列（字符串）
-                test_id_columns = [col for col in df_raw.columns if isinstance(col, int)]
-                meta_columns = [col for col in df_raw.columns if not isinstance(col, int)]
-
-                # 2. 对TEST_ID列进行排序
-                sorted_test_ids = sorted(test_id_columns)
-
-                # 3. 合并列顺序（元数据列在前）
-                final_column_order = meta_columns + sorted_test_ids
-                df_to_save = df_raw[final_column_order]
-
-                # 4. 创建 TEST_ID -> TEST_NUM_TEST_TXT 的映射
-                name_map = {
-                    row.TEST_ID: f"{row.TEST_NUM}_{row.TEST_TXT}"
-                    for row in self.li.df_module.ptmd_df.itertuples()
-                }
-
-                # 5. 生成与最终DataFrame列顺序一致的描述性表头列表
-                header_list = [name_map.get(col, str(col)) for col in df_to_save.columns]
-
-                # 6. 导出Excel
-                df_to_save.to_excel(writer, sheet_name='测试数据', header=header_list)
-
-            # 保存汇总信息
-            if self.li.select_summary is not None:
-                self.li.select_summary.to_excel(writer, sheet_name='汇总信息', index=False)
-
-            # 保存Top Fail信息
-            if self.li.top_fail_dict:
-                top_fail_df = pd.DataFrame([
-                    {'TEST_ID': k, 'FAIL_COUNT': v}
-                    for k, v in self.li.top_fail_dict.items()
-                ])
-                top_fail_df.to_excel(writer, sheet_name='Top_Fail', index=False)
-
-        self.mdi_space_message_emit(f"Excel文件已保存: {file_path}")
+        # 保存Top Fail信息
+        if self.li.top_fail_dict:
+            top_fail_df = pd.DataFrame([
+                {'TEST_ID': k, 'FAIL_COUNT': v}
+                for k, v in self.li.top_fail_dict.items()
+            ])
+            sheets.append(ExcelSheet('Top_Fail', top_fail_df))
+
+        self.export_submit("Excel文件", partial(ExportWriter.excel, file_path, sheets), file_path)
+
+    def save_data_to_parquet(self, file_path):
+        """
+        原始测试数据保存为Parquet(需要pyarrow), 列名为TEST_ID
+        """
+        sheet = self.raw_data_sheet()
+        if sheet is None:
+            return self.mdi_space_message_emit("没有测试数据可以保存!")
+        self.export_submit("Parquet文件", partial(ExportWriter.parquet, file_path, sheet.df, index=True), file_path)
 
     @Slot()
     def on_action_console_triggered(self):
@@ -374,6 +359,13 @@ class StdfLoadUi(QMainWindow, Ui_MainWindow):
         self.chart_ui.show()
         self.chart_ui.raise_()
 
+    @Slot()
+    def on_action_qt_bin_pareto_triggered(self):
+        """ 使用PYQT来拉出Bin Pareto图, 不需要选取测试项 """
+        self.chart_ui.add_chart_dock([], ChartType.BinPareto)
+        self.chart_ui.show()
+        self.chart_ui.raise_()
+
     @Slot()
     def on_action_qt_visual_map_triggered(self):
         """ 使用PYQT来拉出Visual Map图 """
@@ -402,6 +394,23 @@ class StdfLoadUi(QMainWindow, Ui_MainWindow):
         self.chart_ui.show()
         self.chart_ui.raise_()
 
+    @Slot()
+    def on_action_processing_report_triggered(self):
+        """ 生成分组制程能力报告 """
+        if self.li.df_module is None:
+            self.mdi_space_message_emit("请先加载STDF数据")
+            QMessageBox.warning(self, "警告", "请先加载STDF数据后再生成制程能力报告")
+            return
+
+        if self.li.capability_key_list is None or len(self.li.capability_key_list) == 0:
+            self.mdi_space_message_emit("制程能力数据未计算，请先选择数据并计算")
+            QMessageBox.warning(self, "警告", "请先在数据表格中选择数据并计算制程能力")
+            return
+
+        self.chart_ui.show_process_widget()
+        self.chart_ui.show()
+        self.chart_ui.raise_()
+
     @Slot()
     def on_action_summary_triggered(self):
         """ 生成Summary报告 """
@@ -95,6 +95,9 @@ class UiGlobalVariable:
     GraphPlotColumn = 1
     GraphPlotScatterSimple = False
     GraphPlotScatterSimpleNum = 10000
+    GraphPlotScatterLod = True  # 散点图按视图抽样(LOD), 开启时不再用上面的固定间隔抽样
+    GraphPlotScatterLodNum = 50000  # LOD: 视图内的点不超过这个数量时全部显示
+    GraphVisualMapAggregate = "last"  # 同一坐标有多颗die时: count/mean/median/min/max/last
     GraphPlotFloatRound = 6
     GraphPlotWidth = 1000
     GraphPlotHeight = 600
@@ -120,6 +123,16 @@ class UiGlobalVariable:
                 {'name': language.GraphSetting["GraphPlotScatterSimpleNum"], 'type': 'int',
                  'value': GraphPlotScatterSimpleNum},
 
+                {'name': language.GraphSetting["GraphPlotScatterLod"], 'type': 'bool',
+                 'value': GraphPlotScatterLod},
+
+                {'name': language.GraphSetting["GraphPlotScatterLodNum"], 'type': 'int',
+                 'value': GraphPlotScatterLodNum},
+
+                {'name': language.GraphSetting["GraphVisualMapAggregate"], 'type': 'list',
+                 'value': GraphVisualMapAggregate,
+                 'limits': ["last", "mean", "median", "min", "max", "count"]},
+
                 {'name': language.GraphSetting["GraphPlotWidth"], 'type': 'int',
                  'value': GraphPlotWidth},
 
@@ -167,5 +180,8 @@ class UiGlobalVariable:
     SUMMARY_GROUP = ["LOT_ID", "SBLOT_ID", "WAFER_ID", "FLOW_ID", "TEST_COD", "NODE_NAM", "BLUE_FILM_ID"]
     DATA_GROUP = ["SITE_NUM"]
 
+    # 文件数不超过这个数量时Tree全部展开, 再多就只显示LOT, 展开时再生成文件节点
+    TREE_EXPAND_ALL_QTY = 500
+
     PROCESS_VALUE = ["MEAN", "STD", "CPK"]
     PROCESS_TOP_ITEM_LIST = ["YIELD", "DATA"]
@@ -0,0 +1,251 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : ui_export_job.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 后台导出任务队列, CSV/Excel/JMP/Parquet的写文件都放到有限的线程池中, GUI线程只处理进度和完成通知
+"""
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Union
+
+from PySide2.QtCore import QObject, QTimer, Signal
+from PySide2.QtWidgets import QWidget, QHBoxLayout, QLabel, QProgressBar, QPushButton
+
+from common.app_variable import GlobalVariable
+from report_core.export_writer import ExportCancelled
+
+
+class ExportJob:
+    """
+    func: func(progress), 在工作线程中执行, progress(已写行数, 总行数)
+    paths: 任务会写的文件, 取消或出错时删除
+    lock_paths: 任务只读不写的文件(如复用的CSV), 和paths一样占用文件锁, 但出错时不删除
+    on_finished/on_error: 在GUI线程中回调, on_error的参数为错误信息
+    """
+
+    def __init__(self, job_id: int, title: str, func: Callable, paths: List[str],
+                 on_finished: Callable[[], None] = None, on_error: Callable[[str], None] = None,
+                 lock_paths: List[str] = None):
+        self.job_id = job_id
+        self.title = title
+        self.func = func
+        self.paths = paths
+        self.lock_paths = lock_paths or []
+        self.on_finished = on_finished
+        self.on_error = on_error
+        self.cancelled = threading.Event()
+        self.future = None
+        self.done = 0
+        self.total = 0
+
+
+class ExportScheduler(QObject):
+    """
+    全局唯一的导出调度器:
+        1. submit 把任务放入 GlobalVariable.EXPORT_WORKERS 个线程的线程池, 多出的任务排队
+        2. 工作线程只往 events 队列里放事件, GUI线程用QTimer取出后发信号和回调, 不在工作线程中碰Qt对象
+        3. cancel 后排队中的任务直接丢弃, 已经在写的任务在下一次报告进度时中断, 并删除写了一半的文件
+        4. 写同一个文件的任务用文件锁串行执行, 不会同时写
+    """
+    jobStarted = Signal(int, str)  # job_id, title
+    jobProgress = Signal(int, int, int)  # job_id, done, total
+    jobFinished = Signal(int, str, str)  # job_id, title, error('' 为成功)
+    jobCancelled = Signal(int, str)  # job_id, title
+
+    POLL_INTERVAL = 100
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "ExportScheduler":
+        """ 需要在QApplication创建之后调用 """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super(ExportScheduler, self).__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=GlobalVariable.EXPORT_WORKERS)
+        self.events = queue.Queue()
+        self.jobs: Dict[int, ExportJob] = {}
+        self.job_count = 0
+        self.path_locks: Dict[str, threading.Lock] = {}
+        self.path_locks_lock = threading.Lock()
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.POLL_INTERVAL)
+        self.timer.timeout.connect(self.poll)
+
+    def submit(self, title: str, func: Callable, paths: Union[str, Iterable[str]] = (),
+               on_finished: Callable[[], None] = None, on_error: Callable[[str], None] = None,
+               lock_paths: Union[str, Iterable[str]] = ()) -> int:
+        """
+        :param title: 显示在状态栏和消息中的任务名
+        :param func: func(progress), 写文件
+        :param paths: 任务会写的文件
+        :param lock_paths: 任务要读, 需要等写它的任务结束, 但不是这个任务写的文件
+        :return: job_id
+        """
+        self.job_count += 1
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        lock_paths = [lock_paths] if isinstance(lock_paths, str) else list(lock_paths)
+        job = ExportJob(self.job_count, title, func, paths, on_finished, on_error, lock_paths)
+        self.jobs[job.job_id] = job
+        job.future = self.executor.submit(self._run, job)
+        if not self.timer.isActive():
+            self.timer.start()
+        return job.job_id
+
+    def path_lock(self, path: str) -> threading.Lock:
+        path = os.path.normcase(os.path.abspath(path))
+        with self.path_locks_lock:
+            if path not in self.path_locks:
+                self.path_locks[path] = threading.Lock()
+            return self.path_locks[path]
+
+    def _run(self, job: ExportJob):
+        """ 工作线程 """
+        locks = [self.path_lock(path) for path in sorted(set(job.paths) | set(job.lock_paths))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            self._write(job)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _write(self, job: ExportJob):
+        if job.cancelled.is_set():
+            return self.events.put((job.job_id, "cancelled", None))
+        self.events.put((job.job_id, "started", None))
+
+        def progress(done: int, total: int):
+            if job.cancelled.is_set():
+                raise ExportCancelled()
+            self.events.put((job.job_id, "progress", (done, total)))
+
+        try:
+            job.func(progress)
+        except ExportCancelled:
+            self.remove_files(job.paths)
+            self.events.put((job.job_id, "cancelled", None))
+        except Exception as err:
+            traceback.print_exc()
+            self.remove_files(job.paths)
+            self.events.put((job.job_id, "error", str(err) or err.__class__.__name__))
+        else:
+            self.events.put((job.job_id, "finished", None))
+
+    @staticmethod
+    def remove_files(paths: List[str]):
+        for path in paths:
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def cancel(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.cancelled.set()
+        if job.future is not None and job.future.cancel():
+            # 还在排队, 不会再执行
+            self.events.put((job_id, "cancelled", None))
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def running(self) -> int:
+        """ 还没结束(包括排队中)的任务数 """
+        return len(self.jobs)
+
+    def current(self) -> Union[ExportJob, None]:
+        """ 最早提交的还没结束的任务 """
+        if not self.jobs:
+            return None
+        return self.jobs[min(self.jobs)]
+
+    def poll(self):
+        """ GUI线程, 处理工作线程放入的事件, 同一个任务的多次进度只发最后一次 """
+        progress = {}
+        while True:
+            try:
+                job_id, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            if kind == "progress":
+                job.done, job.total = payload
+                progress[job_id] = payload
+                continue
+            if kind == "started":
+                self.jobStarted.emit(job_id, job.title)
+                continue
+            progress.pop(job_id, None)
+            del self.jobs[job_id]
+            if kind == "cancelled":
+                self.jobCancelled.emit(job_id, job.title)
+            elif kind == "error":
+                self.jobFinished.emit(job_id, job.title, payload)
+                if job.on_error is not None:
+                    job.on_error(payload)
+            else:
+                self.jobFinished.emit(job_id, job.title, "")
+                if job.on_finished is not None:
+                    job.on_finished()
+        for job_id, (done, total) in progress.items():
+            self.jobProgress.emit(job_id, done, total)
+        if not self.jobs:
+            self.timer.stop()
+
+    def shutdown(self):
+        """ 退出程序前调用, 取消所有任务并等待正在写的任务中断 """
+        self.cancel_all()
+        self.executor.shutdown(wait=True)
+
+
+class ExportStatusWidget(QWidget):
+    """
+    放在状态栏上的导出进度: 任务名, 进度条, 取消按钮, 没有任务时隐藏
+    """
+
+    def __init__(self, parent=None):
+        super(ExportStatusWidget, self).__init__(parent)
+        self.scheduler = ExportScheduler.instance()
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.label = QLabel(self)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setMaximumWidth(200)
+        self.cancel_button = QPushButton("取消导出", self)
+        self.cancel_button.clicked.connect(self.scheduler.cancel_all)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
+        self.scheduler.jobStarted.connect(self.update_status)
+        self.scheduler.jobProgress.connect(self.update_status)
+        self.scheduler.jobFinished.connect(self.update_status)
+        self.scheduler.jobCancelled.connect(self.update_status)
+        self.hide()
+
+    def update_status(self, *args):
+        job = self.scheduler.current()
+        if job is None:
+            return self.hide()
+        self.label.setText("导出({}): {}".format(self.scheduler.running(), job.title))
+        if job.total:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(job.done / job.total * 1000))
+        else:
+            # 还没有报告进度时显示忙碌
+            self.progress_bar.setRange(0, 0)
+        self.show()
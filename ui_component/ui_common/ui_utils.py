@@ -11,7 +11,8 @@ from typing import List, Union, Dict, Tuple
 
 from PySide2.QtWidgets import QWidget
 from PySide2.QtCore import Qt, QTimer
-from PySide2.QtWidgets import QTreeWidget, QTreeWidgetItem, QTreeWidgetItemIterator, QHeaderView, QTableWidget
+from PySide2.QtWidgets import QTreeWidget, QTreeWidgetItem, QTreeWidgetItemIterator, QHeaderView, QTableWidget, \
+    QTableView
 
 from common.app_variable import GlobalVariable
 from common.func import timestamp_to_str
@@ -127,56 +128,83 @@ class TreeUtils:
 
 
 class QTableUtils:
+    """
+    兼容QTableWidget和CapabilityTableView(Model/View, 没有item)
+    """
+
+    @staticmethod
+    def get_select_rows(table_widget: Union[QTableWidget, QTableView]) -> List[int]:
+        if isinstance(table_widget, QTableWidget):
+            return sorted({table_widget.row(each) for each in table_widget.selectedItems()})
+        return sorted({each.row() for each in table_widget.selectionModel().selectedIndexes()})
+
+    @staticmethod
+    def get_text(table_widget: Union[QTableWidget, QTableView], row: int, column: int) -> str:
+        if isinstance(table_widget, QTableWidget):
+            return table_widget.item(row, column).text()
+        return table_widget.text(row, column)
+
+    @staticmethod
+    def get_row_limit(table_widget: Union[QTableWidget, QTableView], row: int,
+                      source: bool = False) -> Tuple[float, float, str, str]:
+        if isinstance(table_widget, QTableWidget):
+            return (
+                float(table_widget.item(row, GlobalVariable.LO_LIMIT_COLUMN).text()),
+                float(table_widget.item(row, GlobalVariable.HI_LIMIT_COLUMN).text()),
+                table_widget.item(row, GlobalVariable.LO_LIMIT_TYPE_COLUMN).text(),
+                table_widget.item(row, GlobalVariable.HI_LIMIT_TYPE_COLUMN).text(),
+            )
+        model = table_widget.table_model
+        return (
+            float(model.value(row, GlobalVariable.LO_LIMIT_COLUMN, source)),
+            float(model.value(row, GlobalVariable.HI_LIMIT_COLUMN, source)),
+            str(model.value(row, GlobalVariable.LO_LIMIT_TYPE_COLUMN, source)),
+            str(model.value(row, GlobalVariable.HI_LIMIT_TYPE_COLUMN, source)),
+        )
+
     @staticmethod
-    def get_table_widget_test_id(table_widget: QTableWidget) -> Union[List[int], None]:
+    def get_table_widget_test_id(table_widget: Union[QTableWidget, QTableView]) -> Union[List[int], None]:
         """
         还是按照小工具的方式, 先获取选中的测试项的行,
         再遍历获取TEST_ID,返回
         :return:
         """
-        items = table_widget.selectedItems()
-        select_index = set([
-            table_widget.row(each) for each in items
-        ])
+        select_index = QTableUtils.get_select_rows(table_widget)
         if not select_index:
             return None
-        select_index = sorted(list(select_index))
-        test_ids = []
-        for index in select_index:
-            test_id = int(table_widget.item(index, GlobalVariable.TEST_ID_COLUMN).text())
-            test_ids.append(test_id)
-        return test_ids
+        return [
+            int(QTableUtils.get_text(table_widget, index, GlobalVariable.TEST_ID_COLUMN)) for index in select_index
+        ]
 
     @staticmethod
-    def get_select_new_limit(table_widget: QTableWidget,
+    def get_select_new_limit(table_widget: Union[QTableWidget, QTableView],
                              ) -> Union[None, Dict[int, Tuple[float, float, str, str]]]:
-        test_ids = QTableUtils.get_table_widget_test_id(table_widget)
-        if test_ids is None:
+        select_index = QTableUtils.get_select_rows(table_widget)
+        if not select_index:
             print("未选取测试项目无法进行临时数据生成!")
             return
         limit_new = {}
-        for index in range(table_widget.rowCount()):
-            test_id = int(table_widget.item(index, GlobalVariable.TEST_ID_COLUMN).text())
-            if test_id not in test_ids:
-                continue
-            limit_min = float(table_widget.item(index, GlobalVariable.LO_LIMIT_COLUMN).text())
-            limit_max = float(table_widget.item(index, GlobalVariable.HI_LIMIT_COLUMN).text())
-            l_type = table_widget.item(index, GlobalVariable.LO_LIMIT_TYPE_COLUMN).text()
-            h_type = table_widget.item(index, GlobalVariable.HI_LIMIT_TYPE_COLUMN).text()
-            limit_new[test_id] = (limit_min, limit_max, l_type, h_type)
+        for index in select_index:
+            test_id = int(QTableUtils.get_text(table_widget, index, GlobalVariable.TEST_ID_COLUMN))
+            limit_new[test_id] = QTableUtils.get_row_limit(table_widget, index)
         return limit_new
 
     @staticmethod
-    def get_all_new_limit(table_widget: QTableWidget,
+    def get_all_new_limit(table_widget: Union[QTableWidget, QTableView],
                           ) -> Dict[int, Tuple[float, float, str, str]]:
+        """
+        CapabilityTableView按原始行遍历, 筛选隐藏的行也包括在内
+        """
         limit_new = {}
-        for index in range(table_widget.rowCount()):
-            test_id = int(table_widget.item(index, GlobalVariable.TEST_ID_COLUMN).text())
-            limit_min = float(table_widget.item(index, GlobalVariable.LO_LIMIT_COLUMN).text())
-            limit_max = float(table_widget.item(index, GlobalVariable.HI_LIMIT_COLUMN).text())
-            l_type = table_widget.item(index, GlobalVariable.LO_LIMIT_TYPE_COLUMN).text()
-            h_type = table_widget.item(index, GlobalVariable.HI_LIMIT_TYPE_COLUMN).text()
-            limit_new[test_id] = (limit_min, limit_max, l_type, h_type)
+        if isinstance(table_widget, QTableWidget):
+            for index in range(table_widget.rowCount()):
+                test_id = int(table_widget.item(index, GlobalVariable.TEST_ID_COLUMN).text())
+                limit_new[test_id] = QTableUtils.get_row_limit(table_widget, index)
+            return limit_new
+        model = table_widget.table_model
+        for index in range(model.length):
+            test_id = int(model.value(index, GlobalVariable.TEST_ID_COLUMN, True))
+            limit_new[test_id] = QTableUtils.get_row_limit(table_widget, index, True)
         return limit_new
 
 
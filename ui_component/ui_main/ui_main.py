@@ -12,8 +12,9 @@ import subprocess
 import pandas as pd
 import psutil
 import datetime as dt
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Callable
 import gc
+from functools import partial
 
 from PySide2.QtCore import QTimer, Slot, Qt, QObject
 from PySide2.QtGui import QIcon, QPixmap
@@ -30,8 +31,11 @@ from chart_core.chart_jmp.jmp_script_factory import JmpScript
 from chart_core.chart_jmp_factory.class_jmp_factory import NewJmpFactory
 from chart_core.chart_pyqtgraph.ui_components.chart_sample_line import PyqtCanvas
 from common.app_variable import GlobalVariable
+from common.func import join_columns
+from report_core.export_writer import ExportWriter, ExportCache
 from ui_component.ui_common.my_text_browser import UiMessage, MQTextBrowser
 from ui_component.ui_common.ui_utils import MdiLoad
+from ui_component.ui_common.ui_export_job import ExportScheduler, ExportStatusWidget
 from ui_component.ui_main.mdi_data_concat import ContactWidget
 from ui_component.ui_main.mdi_data_merge import MergeWidget
 from ui_component.ui_main.ui_designer.ui_main import Ui_MainWindow
@@ -122,6 +126,12 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
         self.now_space_timer.timeout.connect(self.scan_now_space)
         self.now_space_timer.start(300)
 
+        " 后台导出任务的进度和取消, 完成后记录到TextBrowser "
+        self.export_status = ExportStatusWidget(self)
+        self.statusbar.addPermanentWidget(self.export_status)
+        ExportScheduler.instance().jobFinished.connect(self.export_job_finished)
+        ExportScheduler.instance().jobCancelled.connect(self.export_job_cancelled)
+
         if not license_control:
             for each in UiGlobalVariable.WEB_ACTIONS:
                 if hasattr(self, each.name):
@@ -131,6 +141,24 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
     def m_append(self, mes: UiMessage):
         self.text_browser.m_append(mes)
 
+    @Slot(int, str, str)
+    def export_job_finished(self, job_id: int, title: str, error: str):
+        if error:
+            message = "导出失败: {} >>> {}".format(title, error)
+            self.m_append(UiMessage.error(message))
+        else:
+            message = "导出完成: {}".format(title)
+            self.m_append(UiMessage.info(message))
+        self.mdi_space_message_emit(message)
+
+    @Slot(int, str)
+    def export_job_cancelled(self, job_id: int, title: str):
+        self.mdi_space_message_emit("导出已取消: {}".format(title))
+
+    def closeEvent(self, event) -> None:
+        ExportScheduler.instance().shutdown()
+        super(Main_Ui, self).closeEvent(event)
+
     def recode_system_status(self):
         """
         系统状态监控
@@ -288,38 +316,20 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
         if save_csv is None:
             save_csv = "{}/temp_jmp_data.csv".format(GlobalVariable.JMP_CACHE_PATH)
 
-        csv_file_path = self.save_df_to_csv(jmp_df, save_csv)
+        # 检查是否有GROUP或DA_GROUP分组用于颜色叠加, 要在确定CSV之前加上OVERLAY_GROUP列
+        by_columns, overlay_column = self.overlay_group(jmp_df)
+
+        csv_file_path = self.jmp_csv_path(jmp_df, save_csv)
         if csv_file_path is None:
             return self.mdi_space_message_emit('CSV数据产生失败!!!@')
 
-        # 检查是否有GROUP或DA_GROUP分组用于颜色叠加
-        by_columns = []
-        if 'GROUP' in jmp_df.columns and jmp_df['GROUP'].nunique() > 1:
-            by_columns.append('GROUP')
-        if 'DA_GROUP' in jmp_df.columns and jmp_df['DA_GROUP'].nunique() > 1:
-            by_columns.append('DA_GROUP')
-
-        overlay_column = None
-        if len(by_columns) > 1:
-            # Create a new combined column for overlaying
-            # Robustly create the OVERLAY_GROUP column
-            # Ensure all columns are string type before joining
-            # Robustly create the OVERLAY_GROUP column
-            # Ensure all columns are string type before joining
-            jmp_df['OVERLAY_GROUP'] = jmp_df[by_columns].apply(lambda x: '_'.join(x.map(str)), axis=1)
-            overlay_column = 'OVERLAY_GROUP'
-        elif by_columns:
-            overlay_column = by_columns[0]
-
-        jmp_script = JmpScript.factory(
-            JmpFile.load_csv_file(csv_file_path),
-            NewJmpFactory.jmp_distribution(
-                capability=temp_calculation, title=title, by_columns=by_columns, overlay_column=overlay_column, show_color_chart=show_color_chart
-            )
-        )
-        JmpFile.save_with_run_script(
-            jmp_script, scrip_name="{}/temp_{}.jsl".format(GlobalVariable.JMP_CACHE_PATH, title)
+        # 测项很多时脚本按块写入并分成多个, 在导出线程中生成
+        write_scripts = partial(
+            NewJmpFactory.distribution_files, csv_file_path, "{}/temp_{}.jsl".format(GlobalVariable.JMP_CACHE_PATH, title),
+            capability=temp_calculation, title=title, by_columns=by_columns, overlay_column=overlay_column,
+            show_color_chart=show_color_chart
         )
+        self.save_csv_with_run_script(jmp_df, csv_file_path, write_scripts)
 
     @Slot()
     def on_action_distribution_trans_triggered(self, script_name='distribution'):
@@ -333,34 +343,21 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
             show_color_chart = self.message_show("是否显示颜色对比图？")
-            distribution_csv_path = self.save_df_to_csv(
+            # 检查是否有GROUP或DA_GROUP分组用于颜色叠加 (与竖向图逻辑对齐)
+            by_columns, overlay_column = self.overlay_group(jmp_df)
+            distribution_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
             if distribution_csv_path is None:
                 return self.message_show('CSV数据产生失败!!! ')
-            # 检查是否有GROUP或DA_GROUP分组用于颜色叠加 (与竖向图逻辑对齐)
-            by_columns = []
-            if 'GROUP' in jmp_df.columns and jmp_df['GROUP'].nunique() > 1:
-                by_columns.append('GROUP')
-            if 'DA_GROUP' in jmp_df.columns and jmp_df['DA_GROUP'].nunique() > 1:
-                by_columns.append('DA_GROUP')
-
-            overlay_column = None
-            if len(by_columns) > 1:
-                jmp_df['OVERLAY_GROUP'] = jmp_df[by_columns].apply(lambda x: '_'.join(x.map(str)), axis=1)
-                overlay_column = 'OVERLAY_GROUP'
-            elif by_columns:
-                overlay_column = by_columns[0]
 
-            jmp_script = JmpScript.factory(
-                JmpFile.load_csv_file(distribution_csv_path),
-                NewJmpFactory.jmp_distribution_trans_bar(
-                    capability=temp_calculation, title=script_name, by_columns=by_columns, overlay_column=overlay_column, show_color_chart=show_color_chart
-                )
-            )
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name="{}/temp_{}.jsl".format(GlobalVariable.JMP_CACHE_PATH, script_name)
+            write_scripts = partial(
+                NewJmpFactory.distribution_files, distribution_csv_path,
+                "{}/temp_{}.jsl".format(GlobalVariable.JMP_CACHE_PATH, script_name),
+                capability=temp_calculation, title=script_name, by_columns=by_columns, overlay_column=overlay_column,
+                show_color_chart=show_color_chart, trans=True
             )
+            self.save_csv_with_run_script(jmp_df, distribution_csv_path, write_scripts)
 
     @Slot()
     def on_action_comparing_triggered(self, script_name='fit_plot_data'):
@@ -373,7 +370,7 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
-            fit_csv_path = self.save_df_to_csv(jmp_df,
+            fit_csv_path = self.jmp_csv_path(jmp_df,
                                                "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name))
             if fit_csv_path is None:
                 return self.message_show(f'CSV数据产生失败!!! ')
@@ -382,8 +379,8 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                 JmpFile.load_csv_file(fit_csv_path),
                 JmpFactory.comparing(temp_calculation, jmp_df=jmp_df)
             )
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
+            self.save_csv_with_run_script(
+                jmp_df, fit_csv_path, jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
 
     @Slot()
@@ -445,7 +442,7 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return self.message_show(f"数据获取失败: {str(e)}")
 
         # 保存CSV文件
-        fit_csv_path = self.save_df_to_csv(
+        fit_csv_path = self.jmp_csv_path(
             jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name)
         )
         if fit_csv_path is None:
@@ -465,8 +462,8 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                     )
                 ))
             )
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
+            self.save_csv_with_run_script(
+                jmp_df, fit_csv_path, jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
             self.mdi_space_message_emit(f"线性回归分析完成！参考列: {reference_text} (TEST_ID: {remark})")
         except Exception as e:
@@ -483,7 +480,7 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
-            distribution_csv_path = self.save_df_to_csv(
+            distribution_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
             if distribution_csv_path is None:
@@ -492,9 +489,9 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                 JmpFile.load_csv_file(distribution_csv_path),
                 JmpFactory.scatter(temp_calculation)
             )
-            JmpFile.save_with_run_script(jmp_script,
-                                         scrip_name="{}/temp_{}.jsl".format(
-                                             GlobalVariable.JMP_CACHE_PATH, script_name))
+            self.save_csv_with_run_script(jmp_df, distribution_csv_path, jmp_script,
+                                          scrip_name="{}/temp_{}.jsl".format(
+                                              GlobalVariable.JMP_CACHE_PATH, script_name))
 
     @Slot()
     def on_action_box_plot_triggered(self, script_name='distribution_box'):
@@ -504,7 +501,7 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
-            distribution_csv_path = self.save_df_to_csv(
+            distribution_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
             if distribution_csv_path is None:
@@ -519,9 +516,9 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                     JmpFile.load_csv_file(distribution_csv_path),
                     JmpFactory.scatter_box(temp_calculation),
                 )
-            JmpFile.save_with_run_script(jmp_script,
-                                         scrip_name="{}/temp_{}.jsl".format(
-                                             GlobalVariable.JMP_CACHE_PATH, script_name))
+            self.save_csv_with_run_script(jmp_df, distribution_csv_path, jmp_script,
+                                          scrip_name="{}/temp_{}.jsl".format(
+                                              GlobalVariable.JMP_CACHE_PATH, script_name))
 
     @Slot()
     def on_action_mapping_triggered(self):
@@ -546,15 +543,15 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
             mapping_csv_str = "{}_{}".format("bin_temp", bin_head)
-            mapping_csv_path = self.save_df_to_csv(
+            mapping_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, mapping_csv_str)
             )
             jmp_script = JmpScript.factory(
                 JmpFile.load_csv_file(mapping_csv_path),
                 JmpFactory.bin_mapping(temp_calculation, jmp_df=jmp_df, bin_head=bin_head),
             )
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, mapping_csv_str)
+            self.save_csv_with_run_script(
+                jmp_df, mapping_csv_path, jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, mapping_csv_str)
             )
             self.mapping_select_dialog.hide()
 
@@ -569,7 +566,7 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
-            visual_csv_path = self.save_df_to_csv(
+            visual_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
             if visual_csv_path is None:
@@ -584,8 +581,8 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                     JmpFile.load_csv_file(visual_csv_path),
                     JmpFactory.points_visual_map(temp_calculation, jmp_df=jmp_df),
                 )
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
+            self.save_csv_with_run_script(
+                jmp_df, visual_csv_path, jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, script_name)
             )
 
     @Slot()
@@ -603,7 +600,10 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             return
         jmp_df, temp_calculation = data
         if self.setting.comboBox.currentText() == UiGlobalVariable.PLOT_BACKEND[0]:
-            multi_csv_path = self.save_df_to_csv(
+            by_columns, overlay_column = [], None
+            if 0 in item_select or 1 in item_select:
+                by_columns, overlay_column = self.overlay_group(jmp_df)
+            multi_csv_path = self.jmp_csv_path(
                 jmp_df, "{}/temp_{}.csv".format(GlobalVariable.JMP_CACHE_PATH, "mult_csv")
             )
             if multi_csv_path is None:
@@ -613,19 +613,6 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
             for each in item_select:
                 fac_jsl_script = ""
                 if each == 0 or each == 1:  # "测试数据分布图" or "横向分布图"
-                    by_columns = []
-                    if 'GROUP' in jmp_df.columns and jmp_df['GROUP'].nunique() > 1:
-                        by_columns.append('GROUP')
-                    if 'DA_GROUP' in jmp_df.columns and jmp_df['DA_GROUP'].nunique() > 1:
-                        by_columns.append('DA_GROUP')
-
-                    overlay_column = None
-                    if len(by_columns) > 1:
-                        jmp_df['OVERLAY_GROUP'] = jmp_df[by_columns].apply(lambda x: '_'.join(x.map(str)), axis=1)
-                        overlay_column = 'OVERLAY_GROUP'
-                    elif by_columns:
-                        overlay_column = by_columns[0]
-
                     if each == 0:
                         fac_jsl_script = NewJmpFactory.jmp_distribution(
                             capability=temp_calculation, title="Distribution Chart", by_columns=by_columns,
@@ -648,8 +635,8 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
                                               bin_head=bin_head)
                 jmp_fac_string.append(fac_jsl_script)
             jmp_script = JmpScript.factory(*jmp_fac_string)
-            JmpFile.save_with_run_script(
-                jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, "multi_csv")
+            self.save_csv_with_run_script(
+                jmp_df, multi_csv_path, jmp_script, scrip_name='{}/temp_{}.jsl'.format(GlobalVariable.JMP_CACHE_PATH, "multi_csv")
             )
 
     @Slot()
@@ -723,16 +710,94 @@ class Main_Ui(QMainWindow, Ui_MainWindow):
         else:
             return False
 
-    def save_df_to_csv(self, data_object: pd.DataFrame, file_path):
-        if data_object is None:
-            return self.mdi_space_message_emit('未查询 空数据无法保存!!! ')
-        if any(data_object):
-            data_object.to_csv(file_path, encoding='utf_8_sig', index=False)
-            self.mdi_space_message_emit(f'数据保存成功,路径在:>>>{file_path},开始执行JMP脚本')
-            return file_path
-        else:
+    @staticmethod
+    def overlay_group(jmp_df: pd.DataFrame):
+        """
+        GROUP/DA_GROUP中有多个分组的列用于颜色叠加, 两个都有时加一列OVERLAY_GROUP
+        :return: by_columns, overlay_column
+        """
+        by_columns = []
+        if 'GROUP' in jmp_df.columns and jmp_df['GROUP'].nunique() > 1:
+            by_columns.append('GROUP')
+        if 'DA_GROUP' in jmp_df.columns and jmp_df['DA_GROUP'].nunique() > 1:
+            by_columns.append('DA_GROUP')
+
+        overlay_column = None
+        if len(by_columns) > 1:
+            jmp_df['OVERLAY_GROUP'] = join_columns(jmp_df, by_columns, '_')
+            overlay_column = 'OVERLAY_GROUP'
+        elif by_columns:
+            overlay_column = by_columns[0]
+        return by_columns, overlay_column
+
+    def jmp_export_key(self, data_object: pd.DataFrame) -> Union[tuple, None]:
+        mdi = self.mdi()  # type:StdfLoadUi
+        if mdi is None or mdi.li.to_chart_csv_data is None:
+            return None
+        return mdi.li.jmp_export_key(list(data_object.columns))
+
+    def jmp_csv_path(self, data_object: pd.DataFrame, file_path) -> Union[str, None]:
+        """
+        检查数据是否为空, 返回给JMP脚本读取的CSV路径, CSV在save_csv_with_run_script中写入
+        同样的数据(Li.jmp_export_key)已经导出过时, 返回已有的CSV
+        """
+        if data_object is None or not any(data_object):
             self.mdi_space_message_emit('未查询 空数据无法保存!!! ')
             return None
+        key = self.jmp_export_key(data_object)
+        if key is not None:
+            cache_path = ExportCache.get(key)
+            if cache_path is not None:
+                return cache_path
+        return file_path
+
+    def save_csv_with_run_script(self, data_object: pd.DataFrame, file_path,
+                                 jmp_script: Union[str, Callable[[], List[str]]], scrip_name: str = None):
+        """
+        CSV和JMP脚本放到后台导出队列中写入, 写完后再执行JMP脚本
+        file_path是缓存中已有的CSV时不再写入CSV
+        :param jmp_script: 脚本字符串(保存为scrip_name), 或者写脚本文件并返回路径的函数(如NewJmpFactory.distribution_files)
+        """
+        if file_path is None:
+            return
+        key = self.jmp_export_key(data_object)
+        reuse = key is not None and ExportCache.get(key) == file_path
+        scrip_paths = []
+
+        def export(progress):
+            if not reuse:
+                ExportWriter.csv(
+                    file_path, data_object, float_format=GlobalVariable.CSV_FLOAT_FORMAT, progress=progress
+                )
+            if callable(jmp_script):
+                scrip_paths.extend(jmp_script())
+            else:
+                with open(scrip_name, "w", encoding="utf-8") as f:
+                    f.write(jmp_script)
+                scrip_paths.append(scrip_name)
+
+        def run_script():
+            if reuse:
+                self.mdi_space_message_emit(f'复用已导出的数据:>>>{file_path},开始执行JMP脚本')
+            else:
+                if key is not None:
+                    ExportCache.put(key, file_path)
+                self.mdi_space_message_emit(f'数据保存成功,路径在:>>>{file_path},开始执行JMP脚本')
+            for each in scrip_paths:
+                JmpFile.run_script(each)
+
+        # paths只放这个任务写的文件, 出错时删除; 复用的CSV是缓存中的文件, 只占用文件锁
+        paths = [] if reuse else [file_path]
+        if not callable(jmp_script) and scrip_name:
+            paths.append(scrip_name)
+        if not reuse:
+            # 这个文件要被重写, 之前指向它的缓存失效
+            ExportCache.discard_path(file_path)
+        # 复用时也占用这个路径, 排在之前重写它的任务之后, 不会在CSV写到一半时执行脚本
+        ExportScheduler.instance().submit(
+            "JMP数据: {}".format(os.path.basename(file_path)), export,
+            paths, on_finished=run_script, lock_paths=[file_path] if reuse else (),
+        )
 
 
 class Application(QApplication):
@@ -0,0 +1,648 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : table_model.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : 制程能力表/STDF文件选取表的Model/View, 数据按列存成数组, 只在显示时格式化可见的单元格
+"""
+import fnmatch
+from functools import lru_cache
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+from PySide2 import QtCore, QtWidgets, QtGui
+from PySide2.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide2.QtGui import QFont, QColor
+from PySide2.QtWidgets import QTableView, QAbstractItemView, QMenu, QFileDialog, QStyledItemDelegate, QComboBox
+
+from common.app_variable import GlobalVariable
+from common.func import timestamp_to_str
+
+translate = QtCore.QCoreApplication.translate
+
+# 需要格式化的浮点数字段: 精度
+FLOAT_FIELDS = {
+    'LO_LIMIT': 9,  # LO_LIMIT显示9位小数，支持uA级别
+    'HI_LIMIT': 9,  # HI_LIMIT显示9位小数，支持uA级别
+    'AVG': 9,  # 平均值显示9位小数
+    'STD': 9,  # 标准差显示9位小数
+    'CPK': 6,  # CPK显示6位小数（通常不需要太高精度）
+    'MIN': 9,  # 最小值显示9位小数
+    'MAX': 9,  # 最大值显示9位小数
+    'ALL_DATA_MIN': 9,  # 全数据最小值显示9位小数
+    'ALL_DATA_MAX': 9,  # 全数据最大值显示9位小数
+}
+
+
+def _strip_decimal(formatted: str, min_decimals: int) -> str:
+    """ 移除尾随零，但保留至少min_decimals位小数 """
+    if '.' not in formatted:
+        return formatted
+    integer_part, decimal_part = formatted.split('.')
+    decimal_part_stripped = decimal_part.rstrip('0')
+    if len(decimal_part_stripped) < min_decimals:
+        decimal_part_stripped = decimal_part[:min_decimals]
+    if not decimal_part_stripped:
+        decimal_part_stripped = '0' * min_decimals
+    return f"{integer_part}.{decimal_part_stripped}"
+
+
+def _strip_mantissa(formatted: str) -> str:
+    """ 科学记数法移除尾数的尾随零, 至少保留1位小数 """
+    parts = formatted.lower().split('e')
+    if len(parts) != 2:
+        return formatted
+    mantissa_str, exponent_str = parts
+    if '.' in mantissa_str:
+        integer_part, decimal_part = mantissa_str.split('.')
+        mantissa_str = f"{integer_part}.{decimal_part.rstrip('0') or '0'}"
+    return f"{mantissa_str}e{exponent_str}"
+
+
+@lru_cache(maxsize=65536)
+def smart_format_float(value: float, precision: int = 9, min_decimals: int = 3) -> str:
+    """
+    智能格式化浮点数：
+    - 对于绝对值 >= 1e-3 的数值，使用固定小数点格式
+    - 对于绝对值 < 1e-3 的数值，使用科学记数法
+    - 对于零值，显示为 "0"
+    - 智能检测有效数字，移除浮点数精度误差导致的尾数
+    同一个值在表格中会反复出现(limit), 结果做了缓存
+    """
+    if value == 0:
+        return "0"
+
+    abs_value = abs(value)
+
+    # 对于非常小的数值（< 1e-3）或非常大的数值（>= 1e6），使用科学记数法
+    if abs_value < 1e-3 or abs_value >= 1e6:
+        # 尝试不同的精度，找到最简洁但准确的表示(0.1%的相对误差)
+        for test_decimals in range(1, precision + 1):
+            formatted = f"{value:.{test_decimals}e}"
+            if abs(float(formatted) - value) / abs_value < 0.001:
+                return _strip_mantissa(formatted)
+        return _strip_mantissa(f"{value:.{precision}e}")
+
+    # 对于正常范围的数值，使用固定小数点格式, 从min_decimals开始逐步增加精度
+    for test_decimals in range(min_decimals, precision + 1):
+        rounded_value = round(value, test_decimals)
+        if abs(rounded_value - value) / abs_value < 0.001:
+            return _strip_decimal(f"{rounded_value:.{test_decimals}f}", min_decimals)
+    return _strip_decimal(f"{value:.{precision}f}", min_decimals)
+
+
+def format_value(key: str, value) -> str:
+    """
+    和pyqtgraph TableWidget的显示一致: FLOAT_FIELDS用smart_format_float, 其他浮点数为'%0.3g', 其余为str
+    """
+    if key in FLOAT_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+        # 对于limit字段，至少保留3位小数；其他字段保留1位小数
+        min_decimals = 3 if key in ['LO_LIMIT', 'HI_LIMIT'] else 1
+        return smart_format_float(float(value), FLOAT_FIELDS[key], min_decimals)
+    if isinstance(value, (float, np.floating)):
+        return '%0.3g' % value
+    return str(value)
+
+
+class CapabilityTableModel(QAbstractTableModel):
+    """
+    capability_key_list按列存成数组:
+        rows: 当前显示的行(排序+筛选后)对应的原始行号, 排序和筛选都只是改这个数组
+        edits: 修改过的单元格 {(原始行号, 列): 文本}, 用于修改limit后重算
+    data()只对视图请求的单元格做格式化
+    """
+    q_font = QFont("", 8)
+
+    def __init__(self, parent=None):
+        super(CapabilityTableModel, self).__init__(parent)
+        self.columns: List[str] = []
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.length = 0
+        self.rows = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.mask: Union[np.ndarray, None] = None
+        self.edits: Dict[tuple, str] = {}
+        self.highlight: Dict[int, tuple] = {}
+        self.editable = False
+        self.q_font.setBold(True)
+
+    def set_data(self, data: List[dict]):
+        self.beginResetModel()
+        df = pd.DataFrame(data) if data else pd.DataFrame()
+        self.columns = [str(each) for each in df.columns]
+        self.arrays = {str(each): df[each].to_numpy() for each in df.columns}
+        self.length = len(df)
+        self.order = np.arange(self.length)
+        self.rows = self.order
+        self.mask = None
+        self.edits = {}
+        self.highlight = self.gen_highlight()
+        self.endResetModel()
+
+    def gen_highlight(self) -> Dict[int, tuple]:
+        """
+        CPK在(CPK_LO, CPK_HI)之间, FAIL_QTY和REJECT_QTY大于0的单元格标色
+        """
+        highlight = {}
+        for name, color, func in (
+                (GlobalVariable.CPK_COLUMN_NAME, QColor(250, 194, 5, 50),
+                 lambda a: (a > GlobalVariable.CPK_LO) & (a < GlobalVariable.CPK_HI)),
+                (GlobalVariable.TOP_FAIL_COLUMN_NAME, QColor(217, 83, 25, 150),
+                 lambda a: a > GlobalVariable.TOP_FAIL_LO),
+                (GlobalVariable.REJECT_COLUMN_NAME, QColor(217, 83, 25, 30),
+                 lambda a: a > GlobalVariable.REJECT_LO),
+        ):
+            array = self.numeric(name)
+            if array is None:
+                continue
+            with np.errstate(invalid="ignore"):
+                highlight[self.columns.index(name)] = (func(array), color)
+        return highlight
+
+    def numeric(self, name: str) -> Union[np.ndarray, None]:
+        """ 原始行顺序的数值列, 没有这一列时为None """
+        if name not in self.arrays:
+            return None
+        return pd.to_numeric(pd.Series(self.arrays[name]), errors="coerce").to_numpy(dtype=np.float64)
+
+    def column_index(self, name: str) -> int:
+        return self.columns.index(name) if name in self.columns else -1
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def text(self, row: int, column: int) -> str:
+        """
+        :param row: 视图中的行
+        """
+        source_row = int(self.rows[row])
+        edit = self.edits.get((source_row, column))
+        if edit is not None:
+            return edit
+        name = self.columns[column]
+        return format_value(name, self.arrays[name][source_row])
+
+    def value(self, row: int, column: int, source: bool = False):
+        """
+        修改过的单元格为修改后的文本, 否则为原始值(不经过格式化, 不损失limit的精度)
+        :param source: row为原始行号, 不受排序和筛选影响
+        """
+        source_row = row if source else int(self.rows[row])
+        edit = self.edits.get((source_row, column))
+        if edit is not None:
+            return edit
+        return self.arrays[self.columns[column]][source_row]
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.text(index.row(), index.column())
+        if role == Qt.BackgroundRole:
+            highlight = self.highlight.get(index.column())
+            if highlight is not None and highlight[0][self.rows[index.row()]]:
+                return highlight[1]
+            return None
+        if role == Qt.FontRole:
+            return self.q_font
+        return None
+
+    def setData(self, index: QModelIndex, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        if str(value) == self.text(index.row(), index.column()):
+            # 没有修改时不记录, 保留原始值的精度
+            return False
+        self.edits[(int(self.rows[index.row()]), index.column())] = str(value)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def flags(self, index: QModelIndex):
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if self.editable:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return str(section + 1)
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """
+        按原始数组排序(数值按数值排), 稳定排序, 空值在最后
+        """
+        if column < 0 or column >= len(self.columns):
+            return
+        series = pd.Series(self.arrays[self.columns[column]])
+        ascending = order == Qt.AscendingOrder
+        try:
+            sort_series = series.sort_values(ascending=ascending, kind="mergesort", na_position="last")
+        except TypeError:
+            sort_series = series.astype(str).sort_values(ascending=ascending, kind="mergesort")
+        self.beginResetModel()
+        self.order = sort_series.index.to_numpy()
+        self.update_rows()
+        self.endResetModel()
+
+    def set_filter(self, pattern: Union[str, None], columns: List[str]) -> int:
+        """
+        通配符筛选, 任一列匹配即显示, 大小写不敏感
+        :return: 匹配的行数, 0时显示所有行
+        """
+        mask = None
+        if pattern:
+            regex = fnmatch.translate("*{}*".format(pattern))
+            for name in columns:
+                if name not in self.arrays:
+                    continue
+                match = pd.Series(self.arrays[name]).astype(str).str.match(regex, case=False).to_numpy()
+                mask = match if mask is None else mask | match
+        count = self.length if mask is None else int(np.count_nonzero(mask))
+        self.beginResetModel()
+        self.mask = mask if count else None
+        self.update_rows()
+        self.endResetModel()
+        return count
+
+    def update_rows(self):
+        self.rows = self.order if self.mask is None else self.order[self.mask[self.order]]
+
+    def serialize(self, rows: List[int], columns: List[int]) -> str:
+        """ 和pyqtgraph TableWidget一致: 表头 + 每行以tab分隔 """
+        data = [[self.columns[c] for c in columns]]
+        for r in rows:
+            data.append([self.text(r, c) for c in columns])
+        return ''.join('\t'.join(row) + '\n' for row in data)
+
+
+class CapabilityTableView(QTableView):
+    """
+    替代PauseTableWidget展示capability_key_list, 保留setData/get_column_index/复制/黏贴的用法
+    """
+    q_font = QFont("", 8)
+
+    def __init__(self, *args, **kwds):
+        super(CapabilityTableView, self).__init__(*args, **kwds)
+        self.table_model = CapabilityTableModel(self)
+        self.setModel(self.table_model)
+        self.setSortingEnabled(True)
+        self.setAlternatingRowColors(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setEditable(False)
+        self.q_font.setBold(True)
+        self.horizontalHeader().setFont(self.q_font)
+        self.setFont(self.q_font)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 4)
+
+        self.contextMenu = QMenu()
+        self.contextMenu.addAction(translate("TableWidget", 'Copy Selection')).triggered.connect(self.copySel)
+        self.contextMenu.addAction(translate("TableWidget", 'Copy All')).triggered.connect(self.copyAll)
+        self.contextMenu.addAction(translate("TableWidget", 'Save Selection')).triggered.connect(self.saveSel)
+        self.contextMenu.addAction(translate("TableWidget", 'Save All')).triggered.connect(self.saveAll)
+        self.contextMenu.addAction(translate("PauseTableWidget", 'Paste')).triggered.connect(self.paste)
+
+    def setEditable(self, editable: bool = True):
+        self.table_model.editable = editable
+        if editable:
+            self.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        else:
+            self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+
+    def setData(self, data: List[dict]):
+        self.table_model.set_data(data)
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.resizeColumnsToContents()
+
+    def clear(self):
+        self.table_model.set_data([])
+
+    def rowCount(self) -> int:
+        return self.table_model.rowCount()
+
+    def columnCount(self) -> int:
+        return self.table_model.columnCount()
+
+    def get_column_index(self, column_name: str) -> int:
+        return self.table_model.column_index(column_name)
+
+    def text(self, row: int, column: int) -> str:
+        return self.table_model.text(row, column)
+
+    def selected_rows(self) -> List[int]:
+        return sorted({each.row() for each in self.selectionModel().selectedIndexes()})
+
+    def set_filter(self, pattern: Union[str, None], columns: List[str]) -> int:
+        return self.table_model.set_filter(pattern, columns)
+
+    def selection_bounds(self):
+        indexes = self.selectionModel().selectedIndexes()
+        if not indexes:
+            return None
+        rows = [each.row() for each in indexes]
+        columns = [each.column() for each in indexes]
+        return min(rows), max(rows), min(columns), max(columns)
+
+    def serialize(self, useSelection=False) -> str:
+        if useSelection:
+            bounds = self.selection_bounds()
+            if bounds is None:
+                return ''
+            rows = list(range(bounds[0], bounds[1] + 1))
+            columns = list(range(bounds[2], bounds[3] + 1))
+        else:
+            rows = list(range(self.rowCount()))
+            columns = list(range(self.columnCount()))
+        return self.table_model.serialize(rows, columns)
+
+    def copySel(self):
+        QtWidgets.QApplication.clipboard().setText(self.serialize(useSelection=True))
+
+    def copyAll(self):
+        QtWidgets.QApplication.clipboard().setText(self.serialize(useSelection=False))
+
+    def save(self, data: str):
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, translate("TableWidget", "Save As..."), "",
+            "{} (*.tsv)".format(translate("TableWidget", "Tab-separated values"))
+        )
+        if not file_name:
+            return
+        with open(file_name, 'w') as fd:
+            fd.write(data)
+
+    def saveSel(self):
+        self.save(self.serialize(useSelection=True))
+
+    def saveAll(self):
+        self.save(self.serialize(useSelection=False))
+
+    def contextMenuEvent(self, ev):
+        self.contextMenu.popup(ev.globalPos())
+
+    def paste(self):
+        """
+        将剪切板的数据复制到选中的位置, 第一行为表头
+        """
+        text = QtWidgets.QApplication.clipboard().text()  # type:str
+        text_rows = text.split('\n')[1:-1]
+        bounds = self.selection_bounds()
+        if not text_rows or bounds is None:
+            return
+        select_row, select_column = bounds[0], bounds[2]
+        for i, each in enumerate(text_rows):
+            item_row = i + select_row
+            if item_row >= self.rowCount():
+                break
+            for j, value in enumerate(each.split('\t')):
+                item_column = select_column + j
+                if item_column >= self.columnCount():
+                    break
+                self.table_model.setData(self.table_model.index(item_row, item_column), value)
+
+    def keyPressEvent(self, ev):
+        if ev.matches(QtGui.QKeySequence.StandardKey.Copy):
+            ev.accept()
+            self.copySel()
+        elif ev.matches(QtGui.QKeySequence.StandardKey.Paste):
+            ev.accept()
+            self.paste()
+        else:
+            super().keyPressEvent(ev)
+
+
+class FileTableModel(QAbstractTableModel):
+    """
+    STDF文件选取表, 每个文件一行:
+        READ_FAIL: 第一列的勾选框, 勾选后才会解析(只选取这个数据的Fail Result)
+        PART_FLAG: GlobalVariable.PART_FLAGS的下标, 用下拉框修改
+        MESSAGE: 解析进度的提示, status为-1/0/1时用不同的背景色
+    其余列直接读文件信息的DataFrame, 只在显示时转成文本
+    """
+    MESSAGE_COLOR = {
+        -1: QColor(255, 110, 55),
+        0: QColor(180, 208, 201),
+        1: QColor(176, 255, 210),
+    }
+    q_font = QFont("", 8)
+
+    def __init__(self, parent=None):
+        super(FileTableModel, self).__init__(parent)
+        self.head: List[str] = list(GlobalVariable.FILE_TABLE_HEAD)
+        self.df = pd.DataFrame()
+        self.read_fail = np.zeros(0, dtype=bool)
+        self.part_flag = np.zeros(0, dtype=np.int64)
+        self.message: List[str] = []
+        self.status = np.zeros(0, dtype=np.int64)
+
+    def set_table_head(self, table_head: List[str]):
+        self.beginResetModel()
+        self.head = list(table_head)
+        self.endResetModel()
+
+    def set_table_data(self, table_data: List[dict]):
+        self.beginResetModel()
+        self.df = pd.DataFrame(table_data)
+        self.read_fail = np.zeros(len(self.df), dtype=bool)
+        self.part_flag = np.zeros(len(self.df), dtype=np.int64)
+        self.message = [""] * len(self.df)
+        self.status = np.full(len(self.df), 1, dtype=np.int64)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.df)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.head)
+
+    def text(self, row: int, column: int) -> str:
+        key = self.head[column]
+        if key == "READ_FAIL":
+            return "R_FAIL"
+        if key == "PART_FLAG":
+            return GlobalVariable.PART_FLAGS[self.part_flag[row]]
+        if key == "MESSAGE":
+            return self.message[row]
+        if key not in self.df:
+            return ""
+        value = self.df[key].iat[row]
+        if key[-2:] == "_T":
+            return timestamp_to_str(value)
+        return str(value)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self.head[index.column()]
+        if role == Qt.DisplayRole:
+            return self.text(index.row(), index.column())
+        if role == Qt.EditRole and key == "PART_FLAG":
+            return int(self.part_flag[index.row()])
+        if role == Qt.CheckStateRole and key == "READ_FAIL":
+            return Qt.Checked if self.read_fail[index.row()] else Qt.Unchecked
+        if role == Qt.BackgroundRole and key == "MESSAGE" and self.message[index.row()]:
+            return self.MESSAGE_COLOR.get(int(self.status[index.row()]), self.MESSAGE_COLOR[1])
+        if role == Qt.FontRole:
+            return self.q_font
+        return None
+
+    def setData(self, index: QModelIndex, value, role=Qt.EditRole) -> bool:
+        if not index.isValid():
+            return False
+        key = self.head[index.column()]
+        if role == Qt.CheckStateRole and key == "READ_FAIL":
+            self.read_fail[index.row()] = Qt.CheckState(value) == Qt.Checked
+        elif role == Qt.EditRole and key == "PART_FLAG":
+            self.part_flag[index.row()] = int(value)
+        else:
+            return False
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index: QModelIndex):
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        key = self.head[index.column()]
+        if key == "READ_FAIL":
+            flags |= Qt.ItemIsUserCheckable
+        if key == "PART_FLAG":
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.head[section] if section < len(self.head) else None
+        return str(section + 1)
+
+    def set_column(self, key: str, array: np.ndarray, value, role):
+        """ 整列修改 """
+        array[:] = value
+        if len(self.df) and key in self.head:
+            column = self.head.index(key)
+            self.dataChanged.emit(self.index(0, column), self.index(len(self.df) - 1, column), [role])
+
+    def set_message(self, row: int, message: str, status: int):
+        if row >= len(self.df) or "MESSAGE" not in self.head:
+            return
+        self.message[row] = message
+        self.status[row] = status
+        index = self.index(row, self.head.index("MESSAGE"))
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.BackgroundRole])
+
+    def records(self, rows: Union[np.ndarray, List[int], None] = None) -> List[dict]:
+        """
+        文件信息和当前的PART_FLAG/READ_FAIL, 给解析线程使用
+        """
+        if rows is None:
+            rows = np.arange(len(self.df))
+        data = self.df.iloc[rows].to_dict(orient="records")
+        for row, each in zip(rows, data):
+            each["PART_FLAG"] = int(self.part_flag[row])
+            each["READ_FAIL"] = bool(self.read_fail[row])
+        return data
+
+
+class PartFlagDelegate(QStyledItemDelegate):
+    """
+    PART_FLAG列的下拉框, 只在编辑的单元格上创建
+    """
+
+    def createEditor(self, parent, option, index):
+        combobox = QComboBox(parent)
+        combobox.addItems(GlobalVariable.PART_FLAGS)
+        combobox.currentIndexChanged.connect(lambda _: self.commitData.emit(combobox))
+        return combobox
+
+    def setEditorData(self, editor: QComboBox, index: QModelIndex):
+        editor.blockSignals(True)
+        editor.setCurrentIndex(index.data(Qt.EditRole))
+        editor.blockSignals(False)
+
+    def setModelData(self, editor: QComboBox, model: QAbstractTableModel, index: QModelIndex):
+        model.setData(index, editor.currentIndex(), Qt.EditRole)
+
+
+class FileTableView(QTableView):
+    """
+    替代QtTableWidget, 保留set_table_data/set_read_all_r/set_all_part_flag/get_selected_files_for_analysis的用法
+    每个单元格不再创建QTableWidgetItem, PART_FLAG也不再每行一个QComboBox
+    """
+
+    def __init__(self, parent=None):
+        super(FileTableView, self).__init__(parent)
+        self.table_model = FileTableModel(self)
+        self.setModel(self.table_model)
+        self.setEditTriggers(QAbstractItemView.AllEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 6)
+
+    @property
+    def table_count(self) -> int:
+        return self.table_model.rowCount()
+
+    @property
+    def temp_table_data(self) -> List[dict]:
+        return self.table_model.records()
+
+    def set_table_head(self, table_head: List[str]):
+        self.table_model.set_table_head(table_head)
+        self.horizontalHeader().setFont(self.table_model.q_font)
+        if "PART_FLAG" in table_head:
+            self.setItemDelegateForColumn(list(table_head).index("PART_FLAG"), PartFlagDelegate(self))
+
+    def set_table_data(self, table_data: List[dict]) -> bool:
+        if len(table_data) == 0:
+            return False
+        self.table_model.set_table_data(table_data)
+        self.resizeColumnsToContents()
+        return True
+
+    def clearContents(self):
+        self.table_model.set_table_data([])
+
+    def set_read_all_r(self, status):
+        self.table_model.set_column(
+            "READ_FAIL", self.table_model.read_fail, status == Qt.Checked, Qt.CheckStateRole
+        )
+
+    def set_all_part_flag(self, flag: int):
+        self.table_model.set_column("PART_FLAG", self.table_model.part_flag, flag, Qt.DisplayRole)
+
+    def set_message(self, row: int, message: str, status: int):
+        self.table_model.set_message(row, message, status)
+
+    def get_selected_files_for_analysis(self) -> List[dict]:
+        """
+        获取勾选了R_FAIL的文件列表用于解析
+        :return: 勾选的文件数据列表
+        """
+        return self.table_model.records(np.flatnonzero(self.table_model.read_fail))
+
+    def copy_selection(self):
+        """ 复制选中区域, 带表头 """
+        indexes = self.selectionModel().selectedIndexes()
+        if not indexes:
+            return
+        rows = range(min(each.row() for each in indexes), max(each.row() for each in indexes) + 1)
+        columns = range(min(each.column() for each in indexes), max(each.column() for each in indexes) + 1)
+        text_str = "\t".join(self.table_model.head) + '\n'
+        for row in rows:
+            text_str += ''.join(self.table_model.text(row, column) + '\t' for column in columns) + '\n'
+        QtWidgets.QApplication.clipboard().setText(text_str)
@@ -17,6 +17,7 @@ from pyqtgraph import TableWidget
 
 from common.app_variable import GlobalVariable
 from common.func import timestamp_to_str
+from ui_component.ui_module.table_model import FLOAT_FIELDS, format_value
 
 translate = QtCore.QCoreApplication.translate
 
@@ -38,142 +39,14 @@ class PauseTableWidget(TableWidget):
 
         # 预处理数据，确保limit值和其他浮点数显示正确的精度
         # 由于pyqtgraph TableWidget的格式设置不起作用，我们手动格式化数据
+        # 数据量大的制程能力表用 CapabilityTableView, 只格式化可见的单元格
         if data:
-            formatted_data = []
-
-            # 需要格式化的浮点数字段
-            float_fields = {
-                'LO_LIMIT': 9,       # LO_LIMIT显示9位小数，支持uA级别
-                'HI_LIMIT': 9,       # HI_LIMIT显示9位小数，支持uA级别
-                'AVG': 9,            # 平均值显示9位小数
-                'STD': 9,            # 标准差显示9位小数
-                'CPK': 6,            # CPK显示6位小数（通常不需要太高精度）
-                'MIN': 9,            # 最小值显示9位小数
-                'MAX': 9,            # 最大值显示9位小数
-                'ALL_DATA_MIN': 9,   # 全数据最小值显示9位小数
-                'ALL_DATA_MAX': 9,   # 全数据最大值显示9位小数
-            }
-
-            def smart_format_float(value, precision=9, min_decimals=3):
-                """
-                智能格式化浮点数：
-                - 对于绝对值 >= 1e-3 的数值，使用固定小数点格式
-                - 对于绝对值 < 1e-3 的数值，使用科学记数法
-                - 对于零值，显示为 "0"
-                - 智能检测有效数字，移除浮点数精度误差导致的尾数
-                """
-                if value == 0:
-                    return "0"
-
-                abs_value = abs(value)
-
-                # 对于非常小的数值（< 1e-3）或非常大的数值（>= 1e6），使用科学记数法
-                if (abs_value < 1e-3 and abs_value != 0) or abs_value >= 1e6:
-                    # 智能检测科学记数法的精度
-                    # 策略：尝试不同的精度，找到最简洁但准确的表示
-
-                    # 对于科学记数法，从1位小数开始测试
-                    for test_decimals in range(1, precision + 1):
-                        # 格式化为科学记数法
-                        formatted = f"{value:.{test_decimals}e}"
-
-                        # 解析科学记数法字符串，提取尾数和指数
-                        # 例如: "1.400000037e-04" -> mantissa=1.400000037, exponent=-04
-                        parts = formatted.lower().split('e')
-                        if len(parts) == 2:
-                            mantissa_str = parts[0]
-                            exponent_str = parts[1]
-
-                            # 将字符串转回浮点数进行比较
-                            reconstructed_value = float(formatted)
-
-                            # 检查相对误差
-                            if abs_value > 0:
-                                relative_error = abs(reconstructed_value - value) / abs_value
-                                if relative_error < 0.001:  # 0.1%的相对误差
-                                    # 找到合适的精度，移除尾随零
-                                    if '.' in mantissa_str:
-                                        mantissa_parts = mantissa_str.split('.')
-                                        integer_part = mantissa_parts[0]
-                                        decimal_part = mantissa_parts[1].rstrip('0')
-
-                                        # 至少保留1位小数
-                                        if not decimal_part:
-                                            decimal_part = '0'
-
-                                        mantissa_str = f"{integer_part}.{decimal_part}"
-
-                                    return f"{mantissa_str}e{exponent_str}"
-
-                    # 如果没有找到合适的精度，使用默认精度并移除尾随零
-                    formatted = f"{value:.{precision}e}"
-                    parts = formatted.lower().split('e')
-                    if len(parts) == 2:
-                        mantissa_str = parts[0]
-                        exponent_str = parts[1]
-                        if '.' in mantissa_str:
-                            mantissa_parts = mantissa_str.split('.')
-                            integer_part = mantissa_parts[0]
-                            decimal_part = mantissa_parts[1].rstrip('0')
-                            if not decimal_part:
-                                decimal_part = '0'
-                            mantissa_str = f"{integer_part}.{decimal_part}"
-                        return f"{mantissa_str}e{exponent_str}"
-
-                    return formatted
-
-                # 对于正常范围的数值，使用固定小数点格式
-                else:
-                    # 策略：尝试不同的精度，找到最简洁但准确的表示
-                    # 从min_decimals开始，逐步增加精度，直到找到合适的表示
-
-                    for test_decimals in range(min_decimals, precision + 1):
-                        rounded_value = round(value, test_decimals)
-                        # 检查四舍五入后的值是否与原值足够接近
-                        # 使用相对误差 < 0.1% 作为判断标准
-                        if abs_value > 0:
-                            relative_error = abs(rounded_value - value) / abs_value
-                            if relative_error < 0.001:  # 0.1%的相对误差
-                                # 找到合适的精度，格式化并移除尾随零
-                                formatted = f"{rounded_value:.{test_decimals}f}"
-                                # 移除尾随零，但保留至少min_decimals位小数
-                                if '.' in formatted:
-                                    integer_part, decimal_part = formatted.split('.')
-                                    decimal_part_stripped = decimal_part.rstrip('0')
-                                    if len(decimal_part_stripped) < min_decimals:
-                                        decimal_part_stripped = decimal_part[:min_decimals]
-                                    if not decimal_part_stripped:
-                                        decimal_part_stripped = '0' * min_decimals
-                                    formatted = f"{integer_part}.{decimal_part_stripped}"
-                                return formatted
-
-                    # 如果没有找到合适的精度，使用最大精度
-                    formatted = f"{value:.{precision}f}"
-                    if '.' in formatted:
-                        integer_part, decimal_part = formatted.split('.')
-                        decimal_part_stripped = decimal_part.rstrip('0')
-                        if len(decimal_part_stripped) < min_decimals:
-                            decimal_part_stripped = decimal_part[:min_decimals]
-                        if not decimal_part_stripped:
-                            decimal_part_stripped = '0' * min_decimals
-                        formatted = f"{integer_part}.{decimal_part_stripped}"
-                    return formatted
-
-            for item in data:
-                formatted_item = {}
-                for key, value in item.items():
-                    if key in float_fields and isinstance(value, (int, float)):
-                        # 使用智能格式化
-                        precision = float_fields[key]
-                        # 对于limit字段，至少保留3位小数；其他字段保留1位小数
-                        min_decimals = 3 if key in ['LO_LIMIT', 'HI_LIMIT'] else 1
-                        formatted_item[key] = smart_format_float(value, precision, min_decimals)
-                    else:
-                        # 保持原始值
-                        formatted_item[key] = value
-                formatted_data.append(formatted_item)
-
-            # 使用格式化后的数据
+            formatted_data = [
+                {
+                    key: format_value(key, value) if key in FLOAT_FIELDS else value
+                    for key, value in item.items()
+                } for item in data
+            ]
             super(PauseTableWidget, self).setData(formatted_data)
         else:
             # 如果没有数据，直接调用父类方法
@@ -0,0 +1,222 @@
+#!/usr/local/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+@File    : tree_model.py
+@Author  : Link
+@Time    : 2026/10/19
+@Mark    : LOT Tree的Model/View, 展开LOT时才取子节点
+"""
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+from PySide2.QtCore import Qt, QAbstractItemModel, QModelIndex
+from PySide2.QtWidgets import QTreeView, QHeaderView
+
+from common.app_variable import GlobalVariable
+from common.func import timestamp_to_str
+
+
+class LotNode:
+    """
+    lot: LOT在lot_df中的行号
+    row: 文件在summary_df中的行号, LOT节点为None
+    """
+    __slots__ = ("lot", "row")
+
+    def __init__(self, lot: int, row: Union[int, None] = None):
+        self.lot = lot
+        self.row = row
+
+
+class LotTreeModel(QAbstractItemModel):
+    """
+    SummaryCore.get_summary_lot 的结果:
+        lot_df: 每个LOT一行, 一开始就显示
+        lot_rows: 每个LOT的文件在summary_df中的行号, 展开时按FETCH_SIZE分批生成子节点
+        checked: 每个文件是否勾选(summary_df行号), 勾选LOT只是改这个数组, 不需要子节点已经生成
+    """
+    FETCH_SIZE = 500
+
+    def __init__(self, parent=None):
+        super(LotTreeModel, self).__init__(parent)
+        self.head = GlobalVariable.LOT_TREE_HEAD
+        self.summary_df: Union[pd.DataFrame, None] = None
+        self.lot_df: Union[pd.DataFrame, None] = None
+        self.lot_rows: List[np.ndarray] = []
+        self.lot_nodes: List[LotNode] = []
+        self.children: List[List[LotNode]] = []
+        self.checked = np.zeros(0, dtype=bool)
+
+    def set_data(self, summary_df: Union[pd.DataFrame, None], lot_df: Union[pd.DataFrame, None],
+                 lot_rows: List[np.ndarray], is_checked: bool):
+        self.beginResetModel()
+        self.summary_df, self.lot_df, self.lot_rows = summary_df, lot_df, lot_rows
+        self.lot_nodes = [LotNode(lot) for lot in range(len(lot_rows))]
+        self.children = [[] for _ in lot_rows]
+        length = 0 if summary_df is None else len(summary_df)
+        self.checked = np.full(length, is_checked, dtype=bool)
+        self.endResetModel()
+
+    def clear(self):
+        self.set_data(None, None, [], False)
+
+    def node(self, index: QModelIndex) -> Union[LotNode, None]:
+        return index.internalPointer() if index.isValid() else None
+
+    def index(self, row: int, column: int, parent=QModelIndex()) -> QModelIndex:
+        node = self.node(parent)
+        if node is None:
+            if 0 <= row < len(self.lot_nodes):
+                return self.createIndex(row, column, self.lot_nodes[row])
+            return QModelIndex()
+        if node.row is None and 0 <= row < len(self.children[node.lot]):
+            return self.createIndex(row, column, self.children[node.lot][row])
+        return QModelIndex()
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        node = self.node(index)
+        if node is None or node.row is None:
+            return QModelIndex()
+        return self.createIndex(node.lot, 0, self.lot_nodes[node.lot])
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        node = self.node(parent)
+        if node is None:
+            return len(self.lot_nodes)
+        if node.row is None and parent.column() == 0:
+            return len(self.children[node.lot])
+        return 0
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return len(self.head)
+
+    def hasChildren(self, parent=QModelIndex()) -> bool:
+        node = self.node(parent)
+        if node is None:
+            return len(self.lot_nodes) > 0
+        return node.row is None and len(self.lot_rows[node.lot]) > 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self.node(parent)
+        if node is None or node.row is not None:
+            return False
+        return len(self.children[node.lot]) < len(self.lot_rows[node.lot])
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self.node(parent)
+        if node is None or node.row is not None:
+            return
+        children = self.children[node.lot]
+        rows = self.lot_rows[node.lot][len(children): len(children) + self.FETCH_SIZE]
+        self.beginInsertRows(parent, len(children), len(children) + len(rows) - 1)
+        children.extend(LotNode(node.lot, int(row)) for row in rows)
+        self.endInsertRows()
+
+    def check_state(self, node: LotNode):
+        if node.row is not None:
+            return Qt.Checked if self.checked[node.row] else Qt.Unchecked
+        checked = np.count_nonzero(self.checked[self.lot_rows[node.lot]])
+        if checked == 0:
+            return Qt.Unchecked
+        if checked == len(self.lot_rows[node.lot]):
+            return Qt.Checked
+        return Qt.PartiallyChecked
+
+    def text(self, node: LotNode, column: int) -> str:
+        key = self.head[column]
+        if node.row is None:
+            if key not in self.lot_df:
+                return ""
+            value = self.lot_df[key].iat[node.lot]
+        else:
+            if key not in self.summary_df:
+                return ""
+            value = self.summary_df[key].iat[node.row]
+        if key[-2:] == "_T":
+            return timestamp_to_str(value)
+        return str(value)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        node = self.node(index)
+        if node is None:
+            return None
+        if role == Qt.DisplayRole:
+            return self.text(node, index.column())
+        if role == Qt.CheckStateRole and index.column() == 0:
+            return self.check_state(node)
+        return None
+
+    def setData(self, index: QModelIndex, value, role=Qt.EditRole) -> bool:
+        node = self.node(index)
+        if node is None or role != Qt.CheckStateRole or index.column() != 0:
+            return False
+        state = Qt.CheckState(value) == Qt.Checked
+        if node.row is None:
+            self.checked[self.lot_rows[node.lot]] = state
+            lot_index = index
+        else:
+            self.checked[node.row] = state
+            lot_index = self.parent(index)
+        # LOT和已生成的子节点一起刷新
+        self.dataChanged.emit(lot_index, lot_index, [Qt.CheckStateRole])
+        children = self.children[lot_index.row()]
+        if children:
+            self.dataChanged.emit(
+                self.index(0, 0, lot_index), self.index(len(children) - 1, 0, lot_index), [Qt.CheckStateRole]
+            )
+        return True
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section < len(self.head):
+            return self.head[section]
+        return None
+
+    def checked_ids(self) -> List[int]:
+        """
+        勾选文件的ID, 按Tree上的顺序
+        """
+        if not self.lot_rows:
+            return []
+        rows = np.concatenate(self.lot_rows)
+        rows = rows[self.checked[rows]]
+        return [int(each) for each in self.summary_df["ID"].to_numpy()[rows]]
+
+
+class LotTreeView(QTreeView):
+    """
+    替代QTreeWidget展示SummaryCore的LOT树, 几千个文件也只生成展开的那部分子节点
+    """
+
+    def __init__(self, parent=None):
+        super(LotTreeView, self).__init__(parent)
+        self.tree_model = LotTreeModel(self)
+        self.setModel(self.tree_model)
+        self.setUniformRowHeights(True)
+        self.header().setSectionResizeMode(QHeaderView.Interactive)
+
+    def set_summary(self, summary_df: pd.DataFrame, lot_df: pd.DataFrame, lot_rows: List[np.ndarray],
+                    is_checked: bool = True):
+        self.tree_model.set_data(summary_df, lot_df, lot_rows, is_checked)
+        for column in range(self.tree_model.columnCount()):
+            self.resizeColumnToContents(column)
+
+    def expandAll(self):
+        """ 先生成所有子节点再展开 """
+        for row in range(self.tree_model.rowCount()):
+            index = self.tree_model.index(row, 0)
+            while self.tree_model.canFetchMore(index):
+                self.tree_model.fetchMore(index)
+        super(LotTreeView, self).expandAll()
+
+    def checked_ids(self) -> List[int]:
+        return self.tree_model.checked_ids()
+
+    def clear(self):
+        self.tree_model.clear()
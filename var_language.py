@@ -41,6 +41,9 @@ class LanguageZh:
         "GraphPlotColumn": "绘图分列数",
         "GraphPlotScatterSimple": "开启散点图抽样",
         "GraphPlotScatterSimpleNum": "散点趋势图抽样数",
+        "GraphPlotScatterLod": "开启散点图视图LOD抽样",
+        "GraphPlotScatterLodNum": "散点图视图内全量显示点数",
+        "GraphVisualMapAggregate": "VisualMap同坐标聚合方式",
         "GraphPlotFloatRound": "绘图小数精确位",
         "GraphPlotWidth": "绘图最大宽度",
         "GraphPlotHeight": "绘图最大高度",